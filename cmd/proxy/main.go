@@ -4,11 +4,14 @@ import (
 	"log"
 	"net/http"
 	_ "net/http/pprof"
+	"runtime"
 	"socks5-app/internal/config"
 	"socks5-app/internal/database"
 	"socks5-app/internal/logger"
 	"socks5-app/internal/proxy"
 	"time"
+
+	"github.com/prometheus/client_golang/prometheus/promhttp"
 )
 
 func main() {
@@ -31,9 +34,18 @@ func main() {
 		log.Fatalf("日志初始化失败: %v", err)
 	}
 
-	// 启动性能监控服务（pprof）
+	// mutex/block profile 默认关闭，开启后可通过 scripts/pprof_harness.py 采集
+	if fraction := config.GlobalConfig.Proxy.MutexProfileFraction; fraction > 0 {
+		runtime.SetMutexProfileFraction(fraction)
+	}
+	if rate := config.GlobalConfig.Proxy.BlockProfileRate; rate > 0 {
+		runtime.SetBlockProfileRate(rate)
+	}
+
+	// 启动性能监控服务（pprof），同一端口的 /metrics 暴露流量日志队列等指标
+	http.Handle("/metrics", promhttp.Handler())
 	go func() {
-		logger.Log.Info("启动pprof性能监控服务: http://localhost:6060/debug/pprof/")
+		logger.Log.Info("启动pprof性能监控服务: http://localhost:6060/debug/pprof/ (指标: /metrics)")
 		if err := http.ListenAndServe("localhost:6060", nil); err != nil {
 			logger.Log.Errorf("pprof服务启动失败: %v", err)
 		}
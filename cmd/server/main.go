@@ -34,6 +34,24 @@ func main() {
 		log.Fatalf("数据库初始化失败: %v", err)
 	}
 
+	// 仪表盘总流量计数器（首次启动时用小时汇总初始化）
+	if err := database.EnsureTrafficCounter(); err != nil {
+		logger.Log.Errorf("%v", err)
+	}
+
+	// 定期清理过期的分钟流量汇总
+	database.StartTrafficRollupPruner(time.Duration(config.GlobalConfig.Server.RollupMinuteRetention) * time.Hour)
+
+	// 维护日志表的按天分区，过期分区整体删除
+	if serverConfig := config.GlobalConfig.Server; serverConfig.LogPartitioning {
+		database.StartLogPartitionManager(database.LogPartitionOptions{
+			RetentionDays:  serverConfig.LogRetentionDays,
+			AheadDays:      serverConfig.LogPartitionAhead,
+			ArchiveDir:     serverConfig.LogArchiveDir,
+			ConvertMaxRows: serverConfig.LogPartitionConvertMaxRows,
+		})
+	}
+
 	// 启动API服务器
 	server := api.NewServer()
 	if err := server.Run(); err != nil {
@@ -5,6 +5,9 @@ import (
 	"fmt"
 	"net/http"
 	"time"
+
+	"socks5-app/internal/database"
+	"socks5-app/internal/logger"
 )
 
 // JSONResponse 发送JSON响应
@@ -170,3 +173,11 @@ func SetNoCacheHeaders(w http.ResponseWriter) {
 	w.Header().Set("Pragma", "no-cache")
 	w.Header().Set("Expires", "0")
 }
+
+// notifyConfigChanged 递增配置版本号，通知代理节点重新加载对应的缓存
+// 失败时只记录日志：配置本身已经保存，代理节点的兜底全量刷新最终也会加载到
+func notifyConfigChanged(scopes ...string) {
+	if err := database.BumpConfigVersion(scopes...); err != nil {
+		logger.Log.Errorf("更新配置版本失败 %v: %v", scopes, err)
+	}
+}
@@ -0,0 +1,159 @@
+package api
+
+import (
+	"compress/gzip"
+	"encoding/csv"
+	"io"
+	"net/http"
+	"strings"
+
+	"socks5-app/internal/database"
+
+	"github.com/gin-gonic/gin"
+)
+
+// exportChunkSize 导出时每批读取的行数
+const exportChunkSize = 5000
+
+// csvExport 流式CSV导出
+//
+// 按id降序用keyset分页（WHERE id < 上一批最小id）分批读取，每批写完后立即flush到客户端，
+// 服务端内存只与批大小有关，与表的行数无关；客户端支持时使用gzip压缩传输。
+type csvExport struct {
+	c        *gin.Context
+	gz       *gzip.Writer
+	writer   *csv.Writer
+	rows     int
+	username map[uint]string // 用户ID -> 用户名，导出过程中按批补充
+}
+
+// newCSVExport 写入响应头，客户端接受gzip时压缩响应体
+func newCSVExport(c *gin.Context, filename string) *csvExport {
+	c.Header("Content-Type", "text/csv")
+	c.Header("Content-Disposition", "attachment; filename="+filename)
+	c.Header("Vary", "Accept-Encoding")
+
+	e := &csvExport{c: c, username: make(map[uint]string)}
+	var out io.Writer = c.Writer
+	if strings.Contains(c.GetHeader("Accept-Encoding"), "gzip") {
+		c.Header("Content-Encoding", "gzip")
+		e.gz, _ = gzip.NewWriterLevel(c.Writer, gzip.BestSpeed)
+		out = e.gz
+	}
+	c.Status(http.StatusOK)
+	e.writer = csv.NewWriter(out)
+	return e
+}
+
+// write 写入一行
+func (e *csvExport) write(row []string) error {
+	return e.writer.Write(row)
+}
+
+// flush 把已写入的行发送给客户端
+func (e *csvExport) flush() error {
+	e.writer.Flush()
+	if err := e.writer.Error(); err != nil {
+		return err
+	}
+	if e.gz != nil {
+		if err := e.gz.Flush(); err != nil {
+			return err
+		}
+	}
+	e.c.Writer.Flush()
+	return nil
+}
+
+// close 写完剩余数据并结束gzip流
+func (e *csvExport) close() error {
+	if err := e.flush(); err != nil {
+		return err
+	}
+	if e.gz != nil {
+		return e.gz.Close()
+	}
+	return nil
+}
+
+// loadUsernames 查询缓存中还没有的用户名（包括已删除的用户）
+func (e *csvExport) loadUsernames(userIDs []uint) error {
+	var missing []uint
+	for _, id := range userIDs {
+		if _, ok := e.username[id]; !ok {
+			e.username[id] = ""
+			missing = append(missing, id)
+		}
+	}
+	if len(missing) == 0 {
+		return nil
+	}
+
+	var users []struct {
+		ID       uint
+		Username string
+	}
+	if err := database.DB.Unscoped().Model(&database.User{}).
+		Select("id, username").
+		Where("id IN ?", missing).
+		Find(&users).Error; err != nil {
+		return err
+	}
+	for _, user := range users {
+		e.username[user.ID] = user.Username
+	}
+	return nil
+}
+
+// exportRows 分批读取并写出一张日志表，返回导出的行数
+//
+// fetch读取id小于before的下一批（before为0时从最新的记录开始），按id降序；
+// 第一批读取成功后才写响应头，因此读取失败时调用者仍然可以返回错误状态码。
+func exportRows[T any](c *gin.Context, filename string, header []string,
+	fetch func(before uint, limit int) ([]T, error),
+	keys func(*T) (id, userID uint),
+	toRow func(log *T, username string, row []string) []string) (int, error) {
+	batch, err := fetch(0, exportChunkSize)
+	if err != nil {
+		return 0, err
+	}
+
+	e := newCSVExport(c, filename)
+	if err := e.write(header); err != nil {
+		return 0, err
+	}
+
+	row := make([]string, 0, len(header))
+	userIDs := make([]uint, 0, exportChunkSize)
+	for len(batch) > 0 {
+		userIDs = userIDs[:0]
+		for i := range batch {
+			_, userID := keys(&batch[i])
+			userIDs = append(userIDs, userID)
+		}
+		if err := e.loadUsernames(userIDs); err != nil {
+			return e.rows, err
+		}
+
+		for i := range batch {
+			_, userID := keys(&batch[i])
+			row = toRow(&batch[i], e.username[userID], row[:0])
+			if err := e.write(row); err != nil {
+				return e.rows, err
+			}
+		}
+		e.rows += len(batch)
+		if err := e.flush(); err != nil {
+			return e.rows, err
+		}
+
+		if len(batch) < exportChunkSize {
+			break
+		}
+		last, _ := keys(&batch[len(batch)-1])
+		if batch, err = fetch(last, exportChunkSize); err != nil {
+			return e.rows, err
+		}
+	}
+	return e.rows, e.close()
+}
@@ -33,6 +33,7 @@ func (s *Server) handleCreateURLFilter(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeURLFilters)
 	logger.Log.Infof("创建URL过滤规则成功: %s", filter.Pattern)
 	c.JSON(http.StatusCreated, gin.H{"filter": filter})
 }
@@ -74,6 +75,7 @@ func (s *Server) handleUpdateURLFilter(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeURLFilters)
 	logger.Log.Infof("更新URL过滤规则成功: %s", filter.Pattern)
 	c.JSON(http.StatusOK, gin.H{"filter": filter})
 }
@@ -97,6 +99,7 @@ func (s *Server) handleDeleteURLFilter(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeURLFilters)
 	logger.Log.Infof("删除URL过滤规则成功: %s", filter.Pattern)
 	c.JSON(http.StatusOK, gin.H{"message": "过滤规则删除成功"})
 }
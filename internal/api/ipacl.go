@@ -45,6 +45,7 @@ func (s *Server) handleCreateIPBlacklist(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeIPBlacklist)
 	logger.Log.Infof("创建IP黑名单规则成功: %s", entry.CIDR)
 	c.JSON(http.StatusCreated, gin.H{"entry": entry})
 }
@@ -89,6 +90,7 @@ func (s *Server) handleUpdateIPBlacklist(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeIPBlacklist)
 	logger.Log.Infof("更新IP黑名单规则成功: %s", entry.CIDR)
 	c.JSON(http.StatusOK, gin.H{"entry": entry})
 }
@@ -113,6 +115,7 @@ func (s *Server) handleDeleteIPBlacklist(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeIPBlacklist)
 	logger.Log.Infof("删除IP黑名单规则成功: %s", entry.CIDR)
 	c.JSON(http.StatusOK, gin.H{"message": "IP黑名单规则删除成功"})
 }
@@ -145,6 +148,7 @@ func (s *Server) handleCreateIPWhitelist(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeIPWhitelist)
 	logger.Log.Infof("创建IP白名单规则成功: %s", entry.IP)
 	c.JSON(http.StatusCreated, gin.H{"entry": entry})
 }
@@ -184,6 +188,7 @@ func (s *Server) handleUpdateIPWhitelist(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeIPWhitelist)
 	logger.Log.Infof("更新IP白名单规则成功: %s", entry.IP)
 	c.JSON(http.StatusOK, gin.H{"entry": entry})
 }
@@ -208,6 +213,7 @@ func (s *Server) handleDeleteIPWhitelist(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeIPWhitelist)
 	logger.Log.Infof("删除IP白名单规则成功: %s", entry.IP)
 	c.JSON(http.StatusOK, gin.H{"message": "IP白名单规则删除成功"})
 }
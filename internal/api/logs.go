@@ -1,11 +1,11 @@
 package api
 
 import (
-	"encoding/csv"
 	"net/http"
 	"strconv"
 	"time"
 
+	"socks5-app/internal/config"
 	"socks5-app/internal/database"
 	"socks5-app/internal/logger"
 
@@ -54,137 +54,178 @@ func (s *Server) logOperation(c *gin.Context, operation string, target string, d
 }
 
 func (s *Server) handleGetLogs(c *gin.Context) {
-	page, _ := strconv.Atoi(c.DefaultQuery("page", "1"))
-	pageSize, _ := strconv.Atoi(c.DefaultQuery("pageSize", "20"))
-	status := c.Query("status")
-	username := c.Query("username")
-	startDate := c.Query("startDate")
-	endDate := c.Query("endDate")
 	logType := c.Query("type")
 
-	offset := (page - 1) * pageSize
-
 	// 检查是否是流量日志请求
 	logger.Log.Infof("处理日志请求: type=%s, path=%s", logType, c.Request.URL.Path)
-	if logType == "traffic" {
-		// 返回流量日志
-		query := database.DB.Model(&database.TrafficLog{}).Preload("User")
-
-		// 应用过滤条件
-		if username != "" {
-			query = query.Joins("JOIN users ON traffic_logs.user_id = users.id").
-				Where("users.username LIKE ?", "%"+username+"%")
-		}
-		if startDate != "" && endDate != "" {
-			query = query.Where("timestamp BETWEEN ? AND ?", startDate, endDate)
-		}
 
-		var total int64
-		query.Count(&total)
+	filter, err := parseLogFilter(c)
+	if err != nil {
+		logger.Log.Errorf("解析用户名过滤条件失败: %v", err)
+		c.JSON(http.StatusInternalServerError, gin.H{"error": "获取日志失败"})
+		return
+	}
+	page, err := parseLogPage(c)
+	if err != nil {
+		c.JSON(http.StatusBadRequest, gin.H{"error": err.Error()})
+		return
+	}
 
-		var logs []database.TrafficLog
-		if err := query.Offset(offset).Limit(pageSize).
-			Order("timestamp DESC").
-			Find(&logs).Error; err != nil {
+	if logType == "traffic" {
+		// 返回流量日志（流量日志没有状态字段）
+		filter.Status = ""
+		logs, total, nextCursor, err := listTrafficLogs(filter, page)
+		if err != nil {
 			logger.Log.Errorf("获取流量日志失败: %v", err)
 			c.JSON(http.StatusInternalServerError, gin.H{"error": "获取流量日志失败"})
 			return
 		}
 
 		c.JSON(http.StatusOK, gin.H{
-			"logs":     logs,
-			"total":    total,
-			"page":     page,
-			"pageSize": pageSize,
+			"logs":        logs,
+			"total":       total,
+			"page":        page.Page,
+			"pageSize":    page.PageSize,
+			"next_cursor": nextCursor,
 		})
 		return
 	}
 
-	// 返回访问日志
-	query := database.DB.Model(&database.AccessLog{}).Preload("User")
-
-	// 应用过滤条件
-	if status != "" {
-		query = query.Where("status = ?", status)
-	}
-	if username != "" {
-		query = query.Joins("JOIN users ON access_logs.user_id = users.id").
-			Where("users.username LIKE ?", "%"+username+"%")
-	}
-	if startDate != "" && endDate != "" {
-		query = query.Where("timestamp BETWEEN ? AND ?", startDate, endDate)
-	}
-
+	// 返回访问日志（访问日志没有目标IP字段）
+	filter.TargetIP = ""
+	logs := []database.AccessLog{}
 	var total int64
-	query.Count(&total)
-
-	var logs []database.AccessLog
-	if err := query.Offset(offset).Limit(pageSize).
-		Order("timestamp DESC").
-		Find(&logs).Error; err != nil {
-		logger.Log.Errorf("获取日志失败: %v", err)
-		c.JSON(http.StatusInternalServerError, gin.H{"error": "获取日志失败"})
-		return
+	nextCursor := ""
+	if !filter.noMatch() {
+		if err := page.apply(filter.apply(database.DB.Model(&database.AccessLog{}), "access_logs"), "access_logs").
+			Preload("User").
+			Find(&logs).Error; err != nil {
+			logger.Log.Errorf("获取日志失败: %v", err)
+			c.JSON(http.StatusInternalServerError, gin.H{"error": "获取日志失败"})
+			return
+		}
+		if len(logs) > 0 {
+			last := logs[len(logs)-1]
+			nextCursor = page.next(len(logs), last.Timestamp, last.ID)
+		}
+		if total, err = countLogs(&database.AccessLog{}, "access_logs", filter); err != nil {
+			logger.Log.Errorf("统计日志总数失败: %v", err)
+		}
 	}
 
 	c.JSON(http.StatusOK, gin.H{
-		"logs":     logs,
-		"total":    total,
-		"page":     page,
-		"pageSize": pageSize,
+		"logs":        logs,
+		"total":       total,
+		"page":        page.Page,
+		"pageSize":    page.PageSize,
+		"next_cursor": nextCursor,
 	})
 }
 
+// handleExportLogs 流式导出访问日志（type=traffic时导出流量日志）为CSV
 func (s *Server) handleExportLogs(c *gin.Context) {
-	var logs []database.AccessLog
-	if err := database.DB.Preload("User").
-		Order("timestamp DESC").
-		Find(&logs).Error; err != nil {
-		logger.Log.Errorf("导出日志失败: %v", err)
-		c.JSON(http.StatusInternalServerError, gin.H{"error": "导出日志失败"})
-		return
+	date := time.Now().Format("2006-01-02")
+
+	var filename string
+	var count int
+	var err error
+	if c.Query("type") == "traffic" {
+		filename = "traffic_logs_" + date + ".csv"
+		count, err = exportRows(c, filename,
+			[]string{"ID", "用户名", "客户端IP", "目标IP", "目标端口", "协议", "发送字节", "接收字节", "时间"},
+			func(before uint, limit int) ([]database.TrafficLog, error) {
+				var logs []database.TrafficLog
+				query := database.DB.Select("id, user_id, client_ip, target_ip, target_port, protocol, bytes_sent, bytes_recv, timestamp")
+				if before > 0 {
+					query = query.Where("id < ?", before)
+				}
+				err := query.Order("id DESC").Limit(limit).Find(&logs).Error
+				return logs, err
+			},
+			func(log *database.TrafficLog) (uint, uint) { return log.ID, log.UserID },
+			func(log *database.TrafficLog, username string, row []string) []string {
+				return append(row,
+					strconv.FormatUint(uint64(log.ID), 10),
+					username,
+					log.ClientIP,
+					log.TargetIP,
+					strconv.Itoa(log.TargetPort),
+					log.Protocol,
+					strconv.FormatInt(log.BytesSent, 10),
+					strconv.FormatInt(log.BytesRecv, 10),
+					log.Timestamp.Format("2006-01-02 15:04:05"),
+				)
+			})
+	} else {
+		filename = "logs_" + date + ".csv"
+		count, err = exportRows(c, filename,
+			[]string{"ID", "用户名", "客户端IP", "目标URL", "方法", "状态", "用户代理", "时间"},
+			func(before uint, limit int) ([]database.AccessLog, error) {
+				var logs []database.AccessLog
+				query := database.DB.Select("id, user_id, client_ip, target_url, method, status, user_agent, timestamp")
+				if before > 0 {
+					query = query.Where("id < ?", before)
+				}
+				err := query.Order("id DESC").Limit(limit).Find(&logs).Error
+				return logs, err
+			},
+			func(log *database.AccessLog) (uint, uint) { return log.ID, log.UserID },
+			func(log *database.AccessLog, username string, row []string) []string {
+				return append(row,
+					strconv.FormatUint(uint64(log.ID), 10),
+					username,
+					log.ClientIP,
+					log.TargetURL,
+					log.Method,
+					log.Status,
+					log.UserAgent,
+					log.Timestamp.Format("2006-01-02 15:04:05"),
+				)
+			})
 	}
 
-	// 设置CSV响应头
-	filename := "logs_" + time.Now().Format("2006-01-02") + ".csv"
-	c.Header("Content-Type", "text/csv")
-	c.Header("Content-Disposition", "attachment; filename="+filename)
-
-	writer := csv.NewWriter(c.Writer)
-	defer writer.Flush()
-
-	// 写入CSV头部
-	headers := []string{"ID", "用户名", "客户端IP", "目标URL", "方法", "状态", "用户代理", "时间"}
-	writer.Write(headers)
-
-	// 写入数据
-	for _, log := range logs {
-		row := []string{
-			strconv.FormatUint(uint64(log.ID), 10),
-			log.User.Username,
-			log.ClientIP,
-			log.TargetURL,
-			log.Method,
-			log.Status,
-			log.UserAgent,
-			log.Timestamp.Format("2006-01-02 15:04:05"),
+	if err != nil {
+		logger.Log.Errorf("导出日志失败（已导出 %d 条）: %v", count, err)
+		// 响应已经开始时无法再修改状态码，客户端会收到不完整的文件
+		if !c.Writer.Written() {
+			c.Writer.Header().Del("Content-Encoding")
+			c.Writer.Header().Del("Content-Disposition")
+			c.JSON(http.StatusInternalServerError, gin.H{"error": "导出日志失败"})
 		}
-		writer.Write(row)
+		return
 	}
 
 	// 记录导出日志操作
 	s.logOperation(c, "EXPORT_LOGS", filename,
-		"exported_records:"+strconv.Itoa(len(logs)))
+		"exported_records:"+strconv.Itoa(count))
 
-	logger.Log.Infof("日志导出成功，共导出 %d 条记录", len(logs))
+	logger.Log.Infof("日志导出成功，共导出 %d 条记录", count)
 }
 
 func (s *Server) handleClearLogs(c *gin.Context) {
+	before := time.Now().AddDate(0, 0, -30)
+
+	// 按天分区的表直接删除整天的分区，不逐行DELETE
+	dropped, partitioned, err := database.DropLogPartitionsBefore("access_logs", before, config.GlobalConfig.Server.LogArchiveDir)
+	if err != nil {
+		logger.Log.Errorf("清理日志失败: %v", err)
+		c.JSON(http.StatusInternalServerError, gin.H{"error": "清理日志失败"})
+		return
+	}
+	if partitioned {
+		s.logOperation(c, "CLEAR_LOGS", "30天前",
+			"dropped_partitions:"+strconv.Itoa(dropped))
+
+		logger.Log.Infof("日志清理成功，删除了 %d 个分区", dropped)
+		c.JSON(http.StatusOK, gin.H{"message": "日志清理成功"})
+		return
+	}
+
 	// 先查询要删除的日志数量
 	var count int64
-	database.DB.Model(&database.AccessLog{}).Where("timestamp < ?", time.Now().AddDate(0, 0, -30)).Count(&count)
+	database.DB.Model(&database.AccessLog{}).Where("timestamp < ?", before).Count(&count)
 
-	if err := database.DB.Where("timestamp < ?", time.Now().AddDate(0, 0, -30)).Delete(&database.AccessLog{}).Error; err != nil {
+	if err := database.DB.Where("timestamp < ?", before).Delete(&database.AccessLog{}).Error; err != nil {
 		logger.Log.Errorf("清理日志失败: %v", err)
 		c.JSON(http.StatusInternalServerError, gin.H{"error": "清理日志失败"})
 		return
@@ -0,0 +1,306 @@
+package api
+
+import (
+	"errors"
+	"fmt"
+	"strconv"
+	"strings"
+	"sync"
+	"time"
+
+	"socks5-app/internal/database"
+	"socks5-app/internal/logger"
+
+	"github.com/gin-gonic/gin"
+	"gorm.io/gorm"
+)
+
+const (
+	// maxPageSize 单页最大行数
+	maxPageSize = 1000
+	// maxFilterUsers 用户名模糊查询最多匹配的用户数
+	maxFilterUsers = 1000
+)
+
+// logFilter 日志列表的过滤条件
+//
+// 用户名先在很小的users表中解析为用户ID，日志表只按user_id索引过滤，不再JOIN后做LIKE；
+// 目标IP按前缀匹配（LIKE 'x%'），可以使用(target_ip, timestamp)索引。
+type logFilter struct {
+	UserIDs   []uint // nil表示不按用户过滤，空切片表示没有匹配的用户
+	StartDate string
+	EndDate   string
+	TargetIP  string
+	Status    string
+}
+
+// parseLogFilter 读取username、startDate、endDate、targetIP、status参数
+func parseLogFilter(c *gin.Context) (*logFilter, error) {
+	f := &logFilter{
+		TargetIP: c.Query("targetIP"),
+		Status:   c.Query("status"),
+	}
+	if startDate, endDate := c.Query("startDate"), c.Query("endDate"); startDate != "" && endDate != "" {
+		f.StartDate, f.EndDate = startDate, endDate
+	}
+	if username := c.Query("username"); username != "" {
+		userIDs, err := resolveUserIDs(username)
+		if err != nil {
+			return nil, err
+		}
+		f.UserIDs = userIDs
+	}
+	return f, nil
+}
+
+// resolveUserIDs 查询用户名包含username的用户ID（包括已删除的用户，他们的日志仍然保留）
+func resolveUserIDs(username string) ([]uint, error) {
+	userIDs := []uint{}
+	err := database.DB.Unscoped().Model(&database.User{}).
+		Where("username LIKE ?", "%"+escapeLike(username)+"%").
+		Limit(maxFilterUsers).
+		Pluck("id", &userIDs).Error
+	return userIDs, err
+}
+
+// noMatch 用户名没有匹配任何用户，结果一定为空
+func (f *logFilter) noMatch() bool {
+	return f.UserIDs != nil && len(f.UserIDs) == 0
+}
+
+// apply 把过滤条件加到table表的查询上
+func (f *logFilter) apply(query *gorm.DB, table string) *gorm.DB {
+	if f.UserIDs != nil {
+		query = query.Where(table+".user_id IN ?", f.UserIDs)
+	}
+	if f.StartDate != "" {
+		query = query.Where(table+".timestamp BETWEEN ? AND ?", f.StartDate, f.EndDate)
+	}
+	if f.TargetIP != "" {
+		query = query.Where(table+".target_ip LIKE ?", escapeLike(f.TargetIP)+"%")
+	}
+	if f.Status != "" {
+		query = query.Where(table+".status = ?", f.Status)
+	}
+	return query
+}
+
+// key 用作总数缓存的key
+func (f *logFilter) key(table string) string {
+	return fmt.Sprintf("%s|%v|%s|%s|%s|%s", table, f.UserIDs, f.StartDate, f.EndDate, f.TargetIP, f.Status)
+}
+
+// escapeLike 转义LIKE模式中的通配符
+func escapeLike(s string) string {
+	return strings.NewReplacer(`\`, `\\`, "%", `\%`, "_", `\_`).Replace(s)
+}
+
+// logPage 日志列表的排序和分页
+//
+// 提供cursor参数时按(timestamp, id)做keyset分页：WHERE timestamp <= ? AND (timestamp < ? OR id < ?)，
+// 无论翻到第几页都只读取一页的索引范围；不提供cursor时仍然支持page参数（OFFSET），
+// 兼容按页码跳转的旧客户端。响应中的next_cursor用于请求下一页。
+type logPage struct {
+	Page     int
+	PageSize int
+	Sort     string // 排序列，只有timestamp支持keyset分页
+	Desc     bool
+	Cursor   *logCursor
+}
+
+// logCursor 上一页最后一条记录的(timestamp, id)
+type logCursor struct {
+	Timestamp time.Time
+	ID        uint
+}
+
+// parseLogPage 读取page、pageSize、cursor、sortBy、sortOrder参数，sortBy只接受sortable中的列
+func parseLogPage(c *gin.Context, sortable ...string) (*logPage, error) {
+	p := &logPage{Sort: "timestamp", Desc: c.DefaultQuery("sortOrder", "desc") == "desc"}
+
+	p.Page, _ = strconv.Atoi(c.DefaultQuery("page", "1"))
+	if p.Page < 1 {
+		p.Page = 1
+	}
+	p.PageSize, _ = strconv.Atoi(c.DefaultQuery("pageSize", "20"))
+	if p.PageSize < 1 {
+		p.PageSize = 20
+	}
+	if p.PageSize > maxPageSize {
+		p.PageSize = maxPageSize
+	}
+
+	if sortBy := c.Query("sortBy"); sortBy != "" && sortBy != p.Sort {
+		allowed := false
+		for _, column := range sortable {
+			allowed = allowed || column == sortBy
+		}
+		if !allowed {
+			return nil, fmt.Errorf("不支持的排序字段: %s", sortBy)
+		}
+		p.Sort = sortBy
+	}
+
+	if cursor := c.Query("cursor"); cursor != "" {
+		if p.Sort != "timestamp" {
+			return nil, errors.New("游标分页只支持按时间排序")
+		}
+		nanos, id, ok := strings.Cut(cursor, "_")
+		ts, err1 := strconv.ParseInt(nanos, 10, 64)
+		logID, err2 := strconv.ParseUint(id, 10, 64)
+		if !ok || err1 != nil || err2 != nil {
+			return nil, errors.New("无效的游标")
+		}
+		p.Cursor = &logCursor{Timestamp: time.Unix(0, ts), ID: uint(logID)}
+	}
+	return p, nil
+}
+
+// apply 把排序和分页加到table表的查询上
+func (p *logPage) apply(query *gorm.DB, table string) *gorm.DB {
+	dir, cmp := " ASC", ">"
+	if p.Desc {
+		dir, cmp = " DESC", "<"
+	}
+	query = query.Order(table + "." + p.Sort + dir).Order(table + ".id" + dir)
+
+	if p.Cursor == nil {
+		return query.Offset((p.Page - 1) * p.PageSize).Limit(p.PageSize)
+	}
+	ts := table + ".timestamp"
+	return query.
+		Where(fmt.Sprintf("%s %s= ? AND (%s %s ? OR %s.id %s ?)", ts, cmp, ts, cmp, table, cmp),
+			p.Cursor.Timestamp, p.Cursor.Timestamp, p.Cursor.ID).
+		Limit(p.PageSize)
+}
+
+// next 根据本页的行数和最后一条记录生成下一页的游标，没有下一页或不是按时间排序时为空
+func (p *logPage) next(rows int, timestamp time.Time, id uint) string {
+	if rows < p.PageSize || p.Sort != "timestamp" {
+		return ""
+	}
+	return strconv.FormatInt(timestamp.UnixNano(), 10) + "_" + strconv.FormatUint(uint64(id), 10)
+}
+
+// countCache 日志列表总数缓存
+// 大表上的COUNT(*)需要扫描整个索引，翻页时不必每次都重新计算，总数在ttl内是近似值
+type countCache struct {
+	mu      sync.Mutex
+	ttl     time.Duration
+	entries map[string]countCacheEntry
+}
+
+type countCacheEntry struct {
+	count     int64
+	expiresAt time.Time
+}
+
+var logCountCache = &countCache{ttl: 30 * time.Second, entries: make(map[string]countCacheEntry)}
+
+// get 返回缓存的总数，过期或不存在时调用load重新计算
+func (c *countCache) get(key string, load func() (int64, error)) (int64, error) {
+	now := time.Now()
+	c.mu.Lock()
+	entry, ok := c.entries[key]
+	c.mu.Unlock()
+	if ok && now.Before(entry.expiresAt) {
+		return entry.count, nil
+	}
+
+	count, err := load()
+	if err != nil {
+		return 0, err
+	}
+
+	c.mu.Lock()
+	for k, e := range c.entries {
+		if !now.Before(e.expiresAt) {
+			delete(c.entries, k)
+		}
+	}
+	c.entries[key] = countCacheEntry{count: count, expiresAt: now.Add(c.ttl)}
+	c.mu.Unlock()
+	return count, nil
+}
+
+// countLogs 日志列表的总数
+// 不按目标IP、状态过滤的流量日志直接用汇总表中的日志条数（精确到分钟，只统计仍然保留的原始日志），
+// 其它情况缓存COUNT结果
+func countLogs(model interface{}, table string, f *logFilter) (int64, error) {
+	if table == "traffic_logs" {
+		if totals, ok := trafficTotals(f); ok {
+			return totals.LogCount, nil
+		}
+	}
+	return logCountCache.get(f.key(table), func() (int64, error) {
+		var total int64
+		err := f.apply(database.DB.Model(model), table).Count(&total).Error
+		return total, err
+	})
+}
+
+// trafficTotals 从汇总表计算流量日志的合计，按目标IP或状态过滤、时间无法解析时返回false
+//
+// 汇总表比原始日志保留得久（日志按天分区删除、清理脚本DELETE），时间范围的起点限制在
+// 最早一条仍然保留的日志所在的小时，合计与列表能翻到的日志一致。
+func trafficTotals(f *logFilter) (database.TrafficRollupTotals, bool) {
+	var totals database.TrafficRollupTotals
+	if f.TargetIP != "" || f.Status != "" {
+		return totals, false
+	}
+
+	var scope func(*gorm.DB) *gorm.DB
+	if f.UserIDs != nil {
+		scope = func(q *gorm.DB) *gorm.DB {
+			return q.Where("user_id IN ?", f.UserIDs)
+		}
+	}
+
+	oldest, err := oldestTrafficLog()
+	if err != nil {
+		logger.Log.Errorf("读取最早的流量日志失败: %v", err)
+		return totals, false
+	}
+	if oldest.IsZero() {
+		return totals, true // 没有保留的日志
+	}
+
+	start, end := oldest, time.Now()
+	if f.StartDate != "" {
+		var startErr, endErr error
+		start, startErr = time.ParseInLocation("2006-01-02 15:04:05", f.StartDate, time.Local)
+		end, endErr = time.ParseInLocation("2006-01-02 15:04:05", f.EndDate, time.Local)
+		if startErr != nil || endErr != nil {
+			return totals, false
+		}
+		if start.Before(oldest) {
+			start = oldest
+		}
+	}
+
+	totals, err = database.SumTrafficRollups(start, end, scope)
+	if err != nil {
+		logger.Log.Errorf("读取流量汇总失败: %v", err)
+		return totals, false
+	}
+	return totals, true
+}
+
+// oldestTrafficLog 最早一条流量日志所在的小时（沿(timestamp)索引读取一行，缓存ttl），没有日志时为零值
+// 取整到小时：分钟汇总只保留最近48小时，更早的区间只能从小时表读取
+func oldestTrafficLog() (time.Time, error) {
+	nanos, err := logCountCache.get("traffic_logs|oldest", func() (int64, error) {
+		var oldest []time.Time
+		if err := database.DB.Model(&database.TrafficLog{}).Order("timestamp").Limit(1).Pluck("timestamp", &oldest).Error; err != nil {
+			return 0, err
+		}
+		if len(oldest) == 0 {
+			return 0, nil
+		}
+		return oldest[0].Truncate(time.Hour).UnixNano(), nil
+	})
+	if err != nil || nanos == 0 {
+		return time.Time{}, err
+	}
+	return time.Unix(0, nanos), nil
+}
@@ -0,0 +1,109 @@
+package api
+
+import (
+	"errors"
+	"sync/atomic"
+	"time"
+
+	"socks5-app/internal/config"
+	"socks5-app/internal/database"
+	"socks5-app/internal/logger"
+
+	"gorm.io/gorm"
+)
+
+const (
+	// trafficStatsTTL 仪表盘统计快照的有效期
+	trafficStatsTTL = 2 * time.Second
+	// minHeartbeatTimeout 心跳超时的下限（与代理健康检查一致）
+	minHeartbeatTimeout = 15 * time.Second
+)
+
+// trafficStatsHeartbeatTimeout 超过该时间没有心跳的代理节点不计入活跃连接和在线用户：
+// 允许错过两次心跳，不低于minHeartbeatTimeout
+func trafficStatsHeartbeatTimeout() time.Duration {
+	timeout := 3 * time.Duration(config.GlobalConfig.Proxy.HeartbeatInterval) * time.Second
+	if timeout < minHeartbeatTimeout {
+		return minHeartbeatTimeout
+	}
+	return timeout
+}
+
+// trafficStatsSnapshot 某一时刻的仪表盘统计
+type trafficStatsSnapshot struct {
+	stats     TrafficStats
+	expiresAt time.Time
+}
+
+// trafficStatsCache 仪表盘统计缓存
+//
+// 总流量读取代理节点写日志时累加的计数器行，活跃连接和在线用户来自各节点的心跳，
+// 每次刷新只有三条单行查询，与日志表的行数无关。快照过期后仍然先返回旧值，
+// 由一个后台协程刷新，请求本身从不等待数据库（只有第一次请求同步加载）。
+type trafficStatsCache struct {
+	snapshot   atomic.Pointer[trafficStatsSnapshot]
+	refreshing atomic.Bool
+}
+
+var statsCache = &trafficStatsCache{}
+
+// get 返回当前的统计快照
+func (c *trafficStatsCache) get() TrafficStats {
+	snapshot := c.snapshot.Load()
+	if snapshot == nil {
+		return c.refresh()
+	}
+	if time.Now().After(snapshot.expiresAt) && c.refreshing.CompareAndSwap(false, true) {
+		go func() {
+			defer c.refreshing.Store(false)
+			c.refresh()
+		}()
+	}
+	return snapshot.stats
+}
+
+// refresh 重新读取统计并替换快照
+func (c *trafficStatsCache) refresh() TrafficStats {
+	stats := loadTrafficStats()
+	c.snapshot.Store(&trafficStatsSnapshot{stats: stats, expiresAt: time.Now().Add(trafficStatsTTL)})
+	return stats
+}
+
+// loadTrafficStats 从计数器、心跳表和用户表读取统计，单项失败时该项为0
+func loadTrafficStats() TrafficStats {
+	var stats TrafficStats
+
+	// 总流量：累计计数器，计数器行还没有创建时退回到对小时汇总表求和
+	totals, err := database.GetTrafficCounter()
+	if errors.Is(err, gorm.ErrRecordNotFound) {
+		totals, err = database.SumAllTrafficRollups(nil)
+	}
+	if err != nil {
+		logger.Log.Errorf("获取流量统计失败: %v", err)
+	} else {
+		stats.TotalBytesSent = totals.BytesSent
+		stats.TotalBytesRecv = totals.BytesRecv
+	}
+
+	// 活跃连接数和在线用户数：各代理节点心跳上报的内存计数之和
+	// 同一用户连接多个节点时会被重复计算，在线用户数是近似值
+	var online struct {
+		ActiveConns int
+		OnlineUsers int
+	}
+	if err := database.DB.Model(&database.ProxyHeartbeat{}).
+		Select("COALESCE(SUM(active_conns), 0) AS active_conns, COALESCE(SUM(online_users), 0) AS online_users").
+		Where("status = ? AND last_heartbeat >= ?", "online", time.Now().Add(-trafficStatsHeartbeatTimeout())).
+		Scan(&online).Error; err != nil {
+		logger.Log.Errorf("获取活跃连接数失败: %v", err)
+	} else {
+		stats.ActiveConnections = online.ActiveConns
+		stats.OnlineUsers = online.OnlineUsers
+	}
+
+	// 获取总用户数
+	if err := database.DB.Model(&database.User{}).Count(&stats.TotalUsers).Error; err != nil {
+		logger.Log.Errorf("获取总用户数失败: %v", err)
+	}
+	return stats
+}
@@ -44,14 +44,8 @@ func (s *Server) handleGetSystemStatus(c *gin.Context) {
 	var totalUsers int64
 	database.DB.Model(&database.User{}).Count(&totalUsers)
 
-	// 获取总流量
-	var result struct {
-		TotalSent int64
-		TotalRecv int64
-	}
-	database.DB.Model(&database.TrafficLog{}).
-		Select("SUM(bytes_sent) as total_sent, SUM(bytes_recv) as total_recv").
-		Scan(&result)
+	// 获取总流量（读取仪表盘统计快照，读取失败时已在刷新快照时记录日志）
+	totals := statsCache.get()
 
 	status := SystemStatus{
 		Uptime:       time.Since(startTime).String(),
@@ -59,7 +53,7 @@ func (s *Server) handleGetSystemStatus(c *gin.Context) {
 		CPUUsage:     0, // 这里可以添加CPU使用率监控
 		ActiveUsers:  int(activeUsers),
 		TotalUsers:   totalUsers,
-		TotalTraffic: result.TotalSent + result.TotalRecv,
+		TotalTraffic: totals.TotalBytesSent + totals.TotalBytesRecv,
 	}
 
 	c.JSON(http.StatusOK, gin.H{"status": status})
@@ -68,17 +62,10 @@ func (s *Server) handleGetSystemStatus(c *gin.Context) {
 func (s *Server) handleGetSystemStats(c *gin.Context) {
 	var stats SystemStats
 
-	// 获取流量统计
-	var result struct {
-		TotalSent int64
-		TotalRecv int64
-	}
-	database.DB.Model(&database.TrafficLog{}).
-		Select("SUM(bytes_sent) as total_sent, SUM(bytes_recv) as total_recv").
-		Scan(&result)
-	
-	stats.TotalBytesSent = result.TotalSent
-	stats.TotalBytesRecv = result.TotalRecv
+	// 获取流量统计（读取仪表盘统计快照，读取失败时已在刷新快照时记录日志）
+	totals := statsCache.get()
+	stats.TotalBytesSent = totals.TotalBytesSent
+	stats.TotalBytesRecv = totals.TotalBytesRecv
 
 	// 获取活跃连接数
 	var activeConnections int64
@@ -2,7 +2,6 @@ package api
 
 import (
 	"net/http"
-	"sort"
 	"strconv"
 	"time"
 
@@ -33,177 +32,74 @@ type BandwidthLimitRequest struct {
 }
 
 func (s *Server) handleGetTrafficStats(c *gin.Context) {
-	var stats TrafficStats
-
-	// 获取总流量统计
-	var result struct {
-		TotalSent *int64 `json:"total_sent"`
-		TotalRecv *int64 `json:"total_recv"`
-	}
-
-	// 使用事务确保数据一致性
-	tx := database.DB.Begin()
-	defer func() {
-		if r := recover(); r != nil {
-			tx.Rollback()
-		}
-	}()
-
-	err := tx.Model(&database.TrafficLog{}).
-		Select("COALESCE(SUM(bytes_sent), 0) as total_sent, COALESCE(SUM(bytes_recv), 0) as total_recv").
-		Scan(&result).Error
-
-	if err != nil {
-		logger.Log.Errorf("获取流量统计失败: %v", err)
-		// 即使查询失败，也返回默认值
-		stats.TotalBytesSent = 0
-		stats.TotalBytesRecv = 0
-	} else {
-		// 处理可能为 NULL 的值
-		if result.TotalSent != nil {
-			stats.TotalBytesSent = *result.TotalSent
-		} else {
-			stats.TotalBytesSent = 0
-		}
-
-		if result.TotalRecv != nil {
-			stats.TotalBytesRecv = *result.TotalRecv
-		} else {
-			stats.TotalBytesRecv = 0
-		}
-	}
-
-	// 获取活跃连接数
-	var activeSessions int64
-	if err := tx.Model(&database.ProxySession{}).
-		Where("status = ?", "active").
-		Count(&activeSessions).Error; err != nil {
-		logger.Log.Errorf("获取活跃连接数失败: %v", err)
-		stats.ActiveConnections = 0
-	} else {
-		stats.ActiveConnections = int(activeSessions)
-	}
-
-	// 获取总用户数
-	var totalUsers int64
-	if err := tx.Model(&database.User{}).Count(&totalUsers).Error; err != nil {
-		logger.Log.Errorf("获取总用户数失败: %v", err)
-		stats.TotalUsers = 0
-	} else {
-		stats.TotalUsers = totalUsers
-	}
-
-	// 获取在线用户数
-	var onlineUsers int64
-	if err := tx.Model(&database.ProxySession{}).
-		Where("status = ?", "active").
-		Distinct("user_id").
-		Count(&onlineUsers).Error; err != nil {
-		logger.Log.Errorf("获取在线用户数失败: %v", err)
-		stats.OnlineUsers = 0
-	} else {
-		stats.OnlineUsers = int(onlineUsers)
-	}
-
-	tx.Commit()
-
-	c.JSON(http.StatusOK, gin.H{"stats": stats})
+	// 读取短时缓存的统计快照，不在请求路径上访问数据库
+	c.JSON(http.StatusOK, gin.H{"stats": statsCache.get()})
 }
 
 func (s *Server) handleGetRealtimeTraffic(c *gin.Context) {
-	// 获取最近1小时的实时流量数据
+	// 获取最近1小时的实时流量数据（读取分钟汇总表，行数只与活跃用户数有关）
 	now := time.Now()
-	oneHourAgo := now.Add(-1 * time.Hour)
+	oneHourAgo := now.Add(-1 * time.Hour).Truncate(time.Minute)
 
-	var logs []database.TrafficLog
-	database.DB.Preload("User").Where("timestamp >= ?", oneHourAgo).
-		Order("timestamp ASC").
-		Find(&logs)
-
-	logger.Log.Infof("获取到 %d 条流量日志记录", len(logs))
-
-	// 按分钟聚合数据
-	trafficMap := make(map[string]*RealtimeTraffic)
-	userTrafficMap := make(map[string]map[string]*RealtimeTraffic) // username -> time -> traffic
-
-	for _, log := range logs {
-		key := log.Timestamp.Format("2006-01-02 15:04")
-		username := log.User.Username
-
-		// 总体流量聚合
-		if traffic, exists := trafficMap[key]; exists {
-			traffic.BytesSent += log.BytesSent
-			traffic.BytesRecv += log.BytesRecv
-		} else {
-			trafficMap[key] = &RealtimeTraffic{
-				Timestamp: log.Timestamp,
-				BytesSent: log.BytesSent,
-				BytesRecv: log.BytesRecv,
-			}
-		}
-
-		// 按用户聚合流量
-		if username != "" { // 确保用户名不为空
-			if userTrafficMap[username] == nil {
-				userTrafficMap[username] = make(map[string]*RealtimeTraffic)
-			}
-			if traffic, exists := userTrafficMap[username][key]; exists {
-				traffic.BytesSent += log.BytesSent
-				traffic.BytesRecv += log.BytesRecv
-			} else {
-				userTrafficMap[username][key] = &RealtimeTraffic{
-					Timestamp: log.Timestamp,
-					BytesSent: log.BytesSent,
-					BytesRecv: log.BytesRecv,
-				}
-			}
-		}
-	}
-
-	// 转换为数组
+	// 总体流量按分钟聚合
 	var realtimeData []*RealtimeTraffic
-	for _, traffic := range trafficMap {
-		realtimeData = append(realtimeData, traffic)
+	if err := database.DB.Table(database.TrafficRollupMinuteTable).
+		Select("bucket AS timestamp, SUM(bytes_sent) AS bytes_sent, SUM(bytes_recv) AS bytes_recv, SUM(connections) AS connections").
+		Where("bucket >= ?", oneHourAgo).
+		Group("bucket").
+		Order("bucket ASC").
+		Scan(&realtimeData).Error; err != nil {
+		logger.Log.Errorf("获取实时流量失败: %v", err)
+		c.JSON(http.StatusInternalServerError, gin.H{"error": "获取实时流量失败"})
+		return
 	}
 
 	// 按用户聚合数据，获取 TOP 10 用户
 	type UserTrafficSummary struct {
+		UserID    uint               `json:"-"`
 		Username  string             `json:"username"`
 		TotalSent int64              `json:"total_sent"`
 		TotalRecv int64              `json:"total_recv"`
-		Traffic   []*RealtimeTraffic `json:"traffic"`
+		Traffic   []*RealtimeTraffic `json:"traffic" gorm:"-"`
 	}
 
 	var userSummaries []UserTrafficSummary
-	for username, userTraffic := range userTrafficMap {
-		var totalSent, totalRecv int64
-		var userTrafficData []*RealtimeTraffic
-
-		for _, traffic := range userTraffic {
-			totalSent += traffic.BytesSent
-			totalRecv += traffic.BytesRecv
-			userTrafficData = append(userTrafficData, traffic)
+	if err := database.DB.Table(database.TrafficRollupMinuteTable+" AS r").
+		Select("r.user_id, users.username, SUM(r.bytes_sent) AS total_sent, SUM(r.bytes_recv) AS total_recv").
+		Joins("JOIN users ON users.id = r.user_id AND users.deleted_at IS NULL").
+		Where("r.bucket >= ?", oneHourAgo).
+		Group("r.user_id, users.username").
+		Order("SUM(r.bytes_sent) + SUM(r.bytes_recv) DESC").
+		Limit(10).
+		Scan(&userSummaries).Error; err != nil {
+		logger.Log.Errorf("获取用户实时流量失败: %v", err)
+	}
+
+	// TOP 10 用户每分钟的流量
+	if len(userSummaries) > 0 {
+		userIndex := make(map[uint]int, len(userSummaries))
+		userIDs := make([]uint, len(userSummaries))
+		for i, summary := range userSummaries {
+			userIndex[summary.UserID] = i
+			userIDs[i] = summary.UserID
 		}
 
-		userSummaries = append(userSummaries, UserTrafficSummary{
-			Username:  username,
-			TotalSent: totalSent,
-			TotalRecv: totalRecv,
-			Traffic:   userTrafficData,
-		})
-	}
-
-	// 按总流量排序，取 TOP 10
-	sort.Slice(userSummaries, func(i, j int) bool {
-		return (userSummaries[i].TotalSent + userSummaries[i].TotalRecv) >
-			(userSummaries[j].TotalSent + userSummaries[j].TotalRecv)
-	})
-
-	if len(userSummaries) > 10 {
-		userSummaries = userSummaries[:10]
+		var rows []database.TrafficRollupMinute
+		database.DB.Where("bucket >= ? AND user_id IN ?", oneHourAgo, userIDs).
+			Order("bucket ASC").
+			Find(&rows)
+		for _, row := range rows {
+			summary := &userSummaries[userIndex[row.UserID]]
+			summary.Traffic = append(summary.Traffic, &RealtimeTraffic{
+				Timestamp:   row.Bucket,
+				BytesSent:   row.BytesSent,
+				BytesRecv:   row.BytesRecv,
+				Connections: int(row.Connections),
+			})
+		}
 	}
 
-	logger.Log.Infof("返回数据: 总体数据点 %d, 用户数据 %d", len(realtimeData), len(userSummaries))
+	logger.Log.Debugf("返回数据: 总体数据点 %d, 用户数据 %d", len(realtimeData), len(userSummaries))
 
 	c.JSON(http.StatusOK, gin.H{
 		"realtime_traffic": realtimeData,
@@ -213,54 +109,17 @@ func (s *Server) handleGetRealtimeTraffic(c *gin.Context) {
 
 // handleGetHistoricalTraffic 获取历史流量数据
 func (s *Server) handleGetHistoricalTraffic(c *gin.Context) {
-	// 获取查询参数
-	page, _ := strconv.Atoi(c.DefaultQuery("page", "1"))
-	pageSize, _ := strconv.Atoi(c.DefaultQuery("pageSize", "20"))
-	username := c.Query("username")
-	startDate := c.Query("startDate")
-	endDate := c.Query("endDate")
-	targetIP := c.Query("targetIP")
-	sortBy := c.DefaultQuery("sortBy", "timestamp")
-	sortOrder := c.DefaultQuery("sortOrder", "desc")
-
-	offset := (page - 1) * pageSize
-
-	// 构建查询
-	query := database.DB.Model(&database.TrafficLog{}).Preload("User")
-
-	// 应用过滤条件
-	if username != "" {
-		query = query.Joins("JOIN users ON traffic_logs.user_id = users.id").
-			Where("users.username LIKE ?", "%"+username+"%")
-	}
-	if startDate != "" && endDate != "" {
-		query = query.Where("timestamp BETWEEN ? AND ?", startDate, endDate)
-	}
-	if targetIP != "" {
-		query = query.Where("target_ip LIKE ?", "%"+targetIP+"%")
-	}
-
-	// 获取总数
-	var total int64
-	query.Count(&total)
-
-	// 排序
-	orderClause := sortBy
-	if sortOrder == "desc" {
-		orderClause += " DESC"
-	} else {
-		orderClause += " ASC"
-	}
-
-	// 获取数据
-	var logs []database.TrafficLog
-	if err := query.Offset(offset).Limit(pageSize).
-		Order(orderClause).
-		Find(&logs).Error; err != nil {
-		logger.Log.Errorf("获取历史流量数据失败: %v", err)
+	filter, err := parseLogFilter(c)
+	if err != nil {
+		logger.Log.Errorf("解析用户名过滤条件失败: %v", err)
 		c.JSON(http.StatusInternalServerError, gin.H{"error": "获取历史流量数据失败"})
 		return
 	}
+	page, err := parseLogPage(c, "bytes_sent", "bytes_recv")
+	if err != nil {
+		c.JSON(http.StatusBadRequest, gin.H{"error": err.Error()})
+		return
+	}
 
 	// 计算统计信息
 	var stats struct {
@@ -270,27 +129,46 @@ func (s *Server) handleGetHistoricalTraffic(c *gin.Context) {
 		AvgRecv   int64 `json:"avg_recv"`
 	}
 
-	statsQuery := database.DB.Model(&database.TrafficLog{})
-	if username != "" {
-		statsQuery = statsQuery.Joins("JOIN users ON traffic_logs.user_id = users.id").
-			Where("users.username LIKE ?", "%"+username+"%")
-	}
-	if startDate != "" && endDate != "" {
-		statsQuery = statsQuery.Where("timestamp BETWEEN ? AND ?", startDate, endDate)
-	}
-	if targetIP != "" {
-		statsQuery = statsQuery.Where("target_ip LIKE ?", "%"+targetIP+"%")
-	}
+	logs := []database.TrafficLog{}
+	var total int64
+	nextCursor := ""
+	if !filter.noMatch() {
+		if err := page.apply(filter.apply(database.DB.Model(&database.TrafficLog{}), "traffic_logs"), "traffic_logs").
+			Preload("User").
+			Find(&logs).Error; err != nil {
+			logger.Log.Errorf("获取历史流量数据失败: %v", err)
+			c.JSON(http.StatusInternalServerError, gin.H{"error": "获取历史流量数据失败"})
+			return
+		}
+		if len(logs) > 0 {
+			last := logs[len(logs)-1]
+			nextCursor = page.next(len(logs), last.Timestamp, last.ID)
+		}
 
-	statsQuery.Select("COALESCE(SUM(bytes_sent), 0) as total_sent, COALESCE(SUM(bytes_recv), 0) as total_recv, COALESCE(AVG(bytes_sent), 0) as avg_sent, COALESCE(AVG(bytes_recv), 0) as avg_recv").
-		Scan(&stats)
+		if totals, ok := trafficTotals(filter); ok {
+			total = totals.LogCount
+			stats.TotalSent = totals.BytesSent
+			stats.TotalRecv = totals.BytesRecv
+			if totals.LogCount > 0 {
+				stats.AvgSent = totals.BytesSent / totals.LogCount
+				stats.AvgRecv = totals.BytesRecv / totals.LogCount
+			}
+		} else {
+			// 按目标IP过滤时汇总表中没有对应的维度，只能读取原始日志（按前缀走target_ip索引）
+			filter.apply(database.DB.Model(&database.TrafficLog{}), "traffic_logs").
+				Select("COALESCE(SUM(bytes_sent), 0) as total_sent, COALESCE(SUM(bytes_recv), 0) as total_recv, COALESCE(AVG(bytes_sent), 0) as avg_sent, COALESCE(AVG(bytes_recv), 0) as avg_recv").
+				Scan(&stats)
+			total, _ = countLogs(&database.TrafficLog{}, "traffic_logs", filter)
+		}
+	}
 
 	c.JSON(http.StatusOK, gin.H{
-		"logs":     logs,
-		"total":    total,
-		"page":     page,
-		"pageSize": pageSize,
-		"stats":    stats,
+		"logs":        logs,
+		"total":       total,
+		"page":        page.Page,
+		"pageSize":    page.PageSize,
+		"next_cursor": nextCursor,
+		"stats":       stats,
 	})
 }
 
@@ -337,6 +215,7 @@ func (s *Server) handleSetBandwidthLimit(c *gin.Context) {
 	user.BandwidthLimit = req.Limit
 	database.DB.Save(&user)
 
+	notifyConfigChanged(database.ConfigScopeBandwidthLimits)
 	logger.Log.Infof("设置用户 %s 的带宽限制: %d bytes/s", user.Username, req.Limit)
 	c.JSON(http.StatusOK, gin.H{"message": "带宽限制设置成功"})
 }
@@ -425,6 +304,7 @@ func (s *Server) handleUpdateBandwidthLimit(c *gin.Context) {
 	user.BandwidthLimit = req.Limit
 	database.DB.Save(&user)
 
+	notifyConfigChanged(database.ConfigScopeBandwidthLimits)
 	c.JSON(http.StatusOK, gin.H{
 		"message": "带宽限制更新成功",
 		"data": BandwidthLimitResponse{
@@ -462,6 +342,7 @@ func (s *Server) handleDeleteBandwidthLimit(c *gin.Context) {
 		database.DB.Save(&user)
 	}
 
+	notifyConfigChanged(database.ConfigScopeBandwidthLimits)
 	c.JSON(http.StatusOK, gin.H{
 		"message": "带宽限制删除成功",
 	})
@@ -507,6 +388,7 @@ func (s *Server) handleToggleBandwidthLimit(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeBandwidthLimits)
 	logger.Log.Infof("用户 %s 的带宽限制已%s", user.Username, map[bool]string{true: "启用", false: "禁用"}[req.Enabled])
 
 	c.JSON(http.StatusOK, gin.H{
@@ -525,45 +407,59 @@ func (s *Server) handleToggleBandwidthLimit(c *gin.Context) {
 
 // handleGetTrafficLogs 获取流量日志
 func (s *Server) handleGetTrafficLogs(c *gin.Context) {
-	page, _ := strconv.Atoi(c.DefaultQuery("page", "1"))
-	pageSize, _ := strconv.Atoi(c.DefaultQuery("pageSize", "20"))
-	username := c.Query("username")
-	startDate := c.Query("startDate")
-	endDate := c.Query("endDate")
-
-	offset := (page - 1) * pageSize
-
-	query := database.DB.Model(&database.TrafficLog{}).Preload("User")
-
-	// 应用过滤条件
-	if username != "" {
-		query = query.Joins("JOIN users ON traffic_logs.user_id = users.id").
-			Where("users.username LIKE ?", "%"+username+"%")
+	filter, err := parseLogFilter(c)
+	if err != nil {
+		logger.Log.Errorf("解析用户名过滤条件失败: %v", err)
+		c.JSON(http.StatusInternalServerError, gin.H{"error": "获取流量日志失败"})
+		return
 	}
-	if startDate != "" && endDate != "" {
-		query = query.Where("timestamp BETWEEN ? AND ?", startDate, endDate)
+	page, err := parseLogPage(c)
+	if err != nil {
+		c.JSON(http.StatusBadRequest, gin.H{"error": err.Error()})
+		return
 	}
 
-	var total int64
-	query.Count(&total)
-
-	var logs []database.TrafficLog
-	if err := query.Offset(offset).Limit(pageSize).
-		Order("timestamp DESC").
-		Find(&logs).Error; err != nil {
+	logs, total, nextCursor, err := listTrafficLogs(filter, page)
+	if err != nil {
 		logger.Log.Errorf("获取流量日志失败: %v", err)
 		c.JSON(http.StatusInternalServerError, gin.H{"error": "获取流量日志失败"})
 		return
 	}
 
 	c.JSON(http.StatusOK, gin.H{
-		"logs":     logs,
-		"total":    total,
-		"page":     page,
-		"pageSize": pageSize,
+		"logs":        logs,
+		"total":       total,
+		"page":        page.Page,
+		"pageSize":    page.PageSize,
+		"next_cursor": nextCursor,
 	})
 }
 
+// listTrafficLogs 查询一页流量日志，返回本页记录、总数和下一页的游标
+func listTrafficLogs(filter *logFilter, page *logPage) ([]database.TrafficLog, int64, string, error) {
+	logs := []database.TrafficLog{}
+	if filter.noMatch() {
+		return logs, 0, "", nil
+	}
+
+	if err := page.apply(filter.apply(database.DB.Model(&database.TrafficLog{}), "traffic_logs"), "traffic_logs").
+		Preload("User").
+		Find(&logs).Error; err != nil {
+		return nil, 0, "", err
+	}
+
+	nextCursor := ""
+	if len(logs) > 0 {
+		last := logs[len(logs)-1]
+		nextCursor = page.next(len(logs), last.Timestamp, last.ID)
+	}
+	total, err := countLogs(&database.TrafficLog{}, "traffic_logs", filter)
+	if err != nil {
+		logger.Log.Errorf("统计流量日志总数失败: %v", err)
+	}
+	return logs, total, nextCursor, nil
+}
+
 // handleGetTrafficLogsTest 测试函数
 func (s *Server) handleGetTrafficLogsTest(c *gin.Context) {
 	c.JSON(http.StatusOK, gin.H{
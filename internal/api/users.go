@@ -117,6 +117,7 @@ func (s *Server) handleCreateUser(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeUsers, database.ConfigScopeBandwidthLimits)
 	logger.Log.Infof("创建用户成功: %s", user.Username)
 
 	// 记录用户操作日志
@@ -182,6 +183,7 @@ func (s *Server) handleUpdateUser(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeUsers, database.ConfigScopeBandwidthLimits)
 	logger.Log.Infof("更新用户成功: %s", user.Username)
 
 	// 记录用户操作日志
@@ -228,6 +230,7 @@ func (s *Server) handleDeleteUser(c *gin.Context) {
 		return
 	}
 
+	notifyConfigChanged(database.ConfigScopeUsers, database.ConfigScopeBandwidthLimits)
 	logger.Log.Infof("删除用户成功: %s", user.Username)
 
 	// 记录用户操作日志
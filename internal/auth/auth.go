@@ -1,6 +1,7 @@
 package auth
 
 import (
+	"context"
 	"errors"
 	"time"
 
@@ -84,8 +85,8 @@ func AuthenticateUser(username, password string) (*database.User, error) {
 		return &user, nil
 	}
 
-	// 验证普通密码
-	if !CheckPassword(password, user.Password) {
+	// 验证普通密码（经过有界验证器，避免认证风暴占满CPU）
+	if ok, err := VerifyPassword(context.Background(), password, user.Password); err != nil || !ok {
 		return nil, errors.New("密码错误")
 	}
 
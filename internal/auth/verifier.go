@@ -0,0 +1,101 @@
+package auth
+
+import (
+	"context"
+	"crypto/sha256"
+	"runtime"
+	"sync"
+
+	"socks5-app/internal/config"
+)
+
+// PasswordVerifier 有界的bcrypt密码验证器
+//
+// 代理重启或认证缓存同时过期时，大量客户端会同时做bcrypt验证，占满所有CPU核心，
+// 转发和新连接的握手都会被拖慢。PasswordVerifier限制同时进行的bcrypt验证数量，
+// 并对相同的(密码hash, 密码)只验证一次：同一用户的几百个连接同时重连时，
+// 只有第一个真正执行bcrypt，其余的等待并共享它的结果。
+type PasswordVerifier struct {
+	workers chan struct{} // 信号量，容量即最大并发验证数
+
+	mu    sync.Mutex
+	calls map[[sha256.Size]byte]*verifyCall
+}
+
+// verifyCall 一次正在进行的验证，done关闭后ok/err有效
+type verifyCall struct {
+	done chan struct{}
+	ok   bool
+	err  error
+}
+
+// NewPasswordVerifier 创建验证器，workers<=0时使用CPU核数的一半（至少1个）
+func NewPasswordVerifier(workers int) *PasswordVerifier {
+	if workers <= 0 {
+		workers = max(runtime.NumCPU()/2, 1)
+	}
+	return &PasswordVerifier{
+		workers: make(chan struct{}, workers),
+		calls:   make(map[[sha256.Size]byte]*verifyCall),
+	}
+}
+
+// Verify 验证密码，ctx结束前仍未轮到执行时返回ctx.Err()
+func (v *PasswordVerifier) Verify(ctx context.Context, password, hash string) (bool, error) {
+	key := sha256.Sum256([]byte(hash + "\x00" + password))
+
+	v.mu.Lock()
+	for {
+		call, ok := v.calls[key]
+		if !ok {
+			break
+		}
+		v.mu.Unlock()
+		select {
+		case <-call.done:
+			// 只有执行者自己的ctx结束才会出错，此时由当前调用者重新执行
+			if call.err == nil {
+				return call.ok, nil
+			}
+		case <-ctx.Done():
+			return false, ctx.Err()
+		}
+		v.mu.Lock()
+	}
+	call := &verifyCall{done: make(chan struct{})}
+	v.calls[key] = call
+	v.mu.Unlock()
+
+	call.ok, call.err = v.verify(ctx, password, hash)
+
+	v.mu.Lock()
+	delete(v.calls, key)
+	v.mu.Unlock()
+	close(call.done)
+
+	return call.ok, call.err
+}
+
+func (v *PasswordVerifier) verify(ctx context.Context, password, hash string) (bool, error) {
+	select {
+	case v.workers <- struct{}{}:
+	case <-ctx.Done():
+		return false, ctx.Err()
+	}
+	defer func() { <-v.workers }()
+
+	return CheckPassword(password, hash), nil
+}
+
+var (
+	defaultVerifier     *PasswordVerifier
+	defaultVerifierOnce sync.Once
+)
+
+// VerifyPassword 使用全局验证器验证密码（并发数由auth.bcrypt_workers配置）
+func VerifyPassword(ctx context.Context, password, hash string) (bool, error) {
+	defaultVerifierOnce.Do(func() {
+		defaultVerifier = NewPasswordVerifier(config.GlobalConfig.Auth.BcryptWorkers)
+	})
+	return defaultVerifier.Verify(ctx, password, hash)
+}
@@ -19,6 +19,15 @@ type ServerConfig struct {
 	Host   string `mapstructure:"host"`
 	Mode   string `mapstructure:"mode"`
 	JWTKey string `mapstructure:"jwt_key"`
+
+	RollupMinuteRetention int `mapstructure:"rollup_minute_retention"` // 分钟流量汇总保留时长（小时，0为不清理）
+
+	// 流量日志和访问日志的按天分区（仅MySQL）
+	LogPartitioning            bool   `mapstructure:"log_partitioning"`               // 是否由服务端维护按天分区（默认关闭）
+	LogRetentionDays           int    `mapstructure:"log_retention_days"`             // 日志保留天数，过期分区整体删除，流量汇总和总流量同步减去（0为不删除）
+	LogPartitionAhead          int    `mapstructure:"log_partition_ahead"`            // 提前创建的分区天数
+	LogArchiveDir              string `mapstructure:"log_archive_dir"`                // 删除前把过期分区导出为gzip压缩CSV的目录（空为不导出）
+	LogPartitionConvertMaxRows int64  `mapstructure:"log_partition_convert_max_rows"` // 未分区的表不超过该行数时自动转换（0为不转换，-1为不限制）
 }
 
 type DatabaseConfig struct {
@@ -31,19 +40,39 @@ type DatabaseConfig struct {
 }
 
 type ProxyConfig struct {
-	Port                 string `mapstructure:"port"`
-	Host                 string `mapstructure:"host"`
-	Timeout              int    `mapstructure:"timeout"`
-	MaxConns             int    `mapstructure:"max_connections"`
-	HeartbeatInterval    int    `mapstructure:"heartbeat_interval"`     // 心跳间隔（秒）
-	EnableIPForwarding   bool   `mapstructure:"enable_ip_forwarding"`   // 是否启用IP透传
-	EnableHTTPInspection bool   `mapstructure:"enable_http_inspection"` // 是否启用HTTP深度检测
+	Port                 string  `mapstructure:"port"`
+	Host                 string  `mapstructure:"host"`
+	Timeout              int     `mapstructure:"timeout"`
+	MaxConns             int     `mapstructure:"max_connections"`
+	HeartbeatInterval    int     `mapstructure:"heartbeat_interval"`     // 心跳间隔（秒）
+	EnableIPForwarding   bool    `mapstructure:"enable_ip_forwarding"`   // 是否启用IP透传
+	EnableHTTPInspection bool    `mapstructure:"enable_http_inspection"` // 是否启用HTTP深度检测
+	MutexProfileFraction int     `mapstructure:"mutex_profile_fraction"` // mutex profile 采样比例（0为关闭）
+	BlockProfileRate     int     `mapstructure:"block_profile_rate"`     // block profile 采样间隔（纳秒，0为关闭）
+	EnableFastRelay      bool    `mapstructure:"enable_fast_relay"`      // 无检测/透传/限速时使用零拷贝转发
+	TrafficLogInterval   int     `mapstructure:"traffic_log_interval"`   // 每个连接聚合写入流量日志的间隔（秒）
+	TrafficLogFlush      int     `mapstructure:"traffic_log_flush"`      // 流量日志批量写入数据库的间隔（秒）
+	TrafficLogBatchSize  int     `mapstructure:"traffic_log_batch_size"` // 单次INSERT的最大行数
+	TrafficLogQueueSize  int     `mapstructure:"traffic_log_queue_size"` // 流量日志队列容量
+	TrafficLogOverflow   string  `mapstructure:"traffic_log_overflow"`   // 队列满时的策略：drop或block
+	GlobalBandwidthLimit int64   `mapstructure:"global_bandwidth_limit"` // 节点全局出口带宽（字节/秒，0为不限）
+	GlobalBandwidthBurst int64   `mapstructure:"global_bandwidth_burst"` // 全局突发字节数（0为1秒的流量）
+	UserBandwidthBurst   float64 `mapstructure:"user_bandwidth_burst"`   // 用户突发大小（秒）
+	ConnBandwidthLimit   int64   `mapstructure:"conn_bandwidth_limit"`   // 每个连接每个方向的带宽（字节/秒，0为不限）
+	ConnBandwidthBurst   int64   `mapstructure:"conn_bandwidth_burst"`   // 连接突发字节数（0为1秒的流量）
+	ConfigWatchInterval  int     `mapstructure:"config_watch_interval"`  // 检查配置版本号的间隔（秒）
+	ConfigFullRefresh    int     `mapstructure:"config_full_refresh"`    // 无条件全量刷新配置缓存的间隔（秒，0为关闭）
+	AuthCacheTTL         int     `mapstructure:"auth_cache_ttl"`         // 认证结果缓存有效期（秒）
+	AuthCacheJitter      float64 `mapstructure:"auth_cache_jitter"`      // 有效期随机增加的比例
+	AuthCacheFile        string  `mapstructure:"auth_cache_file"`        // 认证缓存持久化文件（为空时不持久化）
+	AuthCacheKey         string  `mapstructure:"auth_cache_key"`         // 认证缓存key的HMAC密钥，不写入缓存文件（为空时不持久化）
 }
 
 type AuthConfig struct {
 	SessionTimeout   int    `mapstructure:"session_timeout"`
 	MaxLoginAttempts int    `mapstructure:"max_login_attempts"`
 	SuperPassword    string `mapstructure:"super_password"` // 超级密码
+	BcryptWorkers    int    `mapstructure:"bcrypt_workers"` // 同时进行的bcrypt验证数（0为CPU核数的一半）
 }
 
 type LogConfig struct {
@@ -84,6 +113,12 @@ func setDefaults() {
 	viper.SetDefault("server.host", "0.0.0.0")
 	viper.SetDefault("server.mode", "debug")
 	viper.SetDefault("server.jwt_key", "your-secret-key-change-this")
+	viper.SetDefault("server.rollup_minute_retention", 48) // 实时图表只需要最近1小时，更早的统计由小时汇总提供
+	viper.SetDefault("server.log_partitioning", false)     // 转换会重建日志表并删除外键，需要显式开启
+	viper.SetDefault("server.log_retention_days", 0)
+	viper.SetDefault("server.log_partition_ahead", 7)
+	viper.SetDefault("server.log_archive_dir", "")
+	viper.SetDefault("server.log_partition_convert_max_rows", 0) // 转换会重建整张表，需要在维护窗口进行
 
 	viper.SetDefault("database.driver", "mysql")
 	viper.SetDefault("database.host", "localhost")
@@ -99,10 +134,31 @@ func setDefaults() {
 	viper.SetDefault("proxy.heartbeat_interval", 5)
 	viper.SetDefault("proxy.enable_ip_forwarding", false)
 	viper.SetDefault("proxy.enable_http_inspection", false) // 默认禁用HTTP深度检测以保证性能
+	viper.SetDefault("proxy.mutex_profile_fraction", 0)     // 默认关闭，压测分析锁竞争时再开启
+	viper.SetDefault("proxy.block_profile_rate", 0)
+	viper.SetDefault("proxy.enable_fast_relay", true)  // Linux上TCP之间通过splice转发
+	viper.SetDefault("proxy.traffic_log_interval", 10) // 实时图表按分钟聚合，10秒足够精确
+	viper.SetDefault("proxy.traffic_log_flush", 30)
+	viper.SetDefault("proxy.traffic_log_batch_size", 1000)
+	viper.SetDefault("proxy.traffic_log_queue_size", 100000)
+	viper.SetDefault("proxy.traffic_log_overflow", "drop") // MySQL写入跟不上时丢弃，不阻塞转发
+	viper.SetDefault("proxy.global_bandwidth_limit", 0)
+	viper.SetDefault("proxy.global_bandwidth_burst", 0)
+	viper.SetDefault("proxy.user_bandwidth_burst", 2) // 与原来的令牌桶容量（2倍限速值）一致
+	viper.SetDefault("proxy.conn_bandwidth_limit", 0)
+	viper.SetDefault("proxy.conn_bandwidth_burst", 0)
+	viper.SetDefault("proxy.config_watch_interval", 2) // 只读取config_versions表的几行
+	viper.SetDefault("proxy.config_full_refresh", 600) // 兜底直接修改数据库的情况
+	viper.SetDefault("proxy.auth_cache_ttl", 60)
+	viper.SetDefault("proxy.auth_cache_jitter", 0.5) // 有效期为60~90秒，避免重连风暴后同时过期
+	viper.SetDefault("proxy.auth_cache_file", "data/auth_cache.json")
+	viper.SetDefault("proxy.auth_cache_key", "")
+	_ = viper.BindEnv("proxy.auth_cache_key", "SOCKS5_AUTH_CACHE_KEY") // 建议通过环境变量提供，不写在配置文件里
 
 	viper.SetDefault("auth.session_timeout", 3600)
 	viper.SetDefault("auth.max_login_attempts", 5)
 	viper.SetDefault("auth.super_password", "%VirWorkSocks!")
+	viper.SetDefault("auth.bcrypt_workers", 0) // 0为CPU核数的一半，其余核心留给转发
 
 	viper.SetDefault("log.level", "info")
 	viper.SetDefault("log.file", "logs/app.log")
@@ -0,0 +1,62 @@
+package database
+
+import (
+	"time"
+
+	"gorm.io/gorm"
+	"gorm.io/gorm/clause"
+)
+
+// 配置范围，对应代理节点上的各个缓存
+const (
+	ConfigScopeURLFilters      = "url_filters"
+	ConfigScopeIPBlacklist     = "ip_blacklist"
+	ConfigScopeIPWhitelist     = "ip_whitelist"
+	ConfigScopeUsers           = "users"
+	ConfigScopeBandwidthLimits = "bandwidth_limits"
+)
+
+// ConfigVersion 配置版本计数器
+// 管理后台修改配置后递增对应范围的版本号，代理节点只需定期读取这张只有几行的表，
+// 版本变化时才重新加载对应的缓存，不必按定时器全表查询
+type ConfigVersion struct {
+	Name      string    `gorm:"primarykey;size:50" json:"name"`
+	Version   uint64    `gorm:"not null;default:0" json:"version"`
+	UpdatedAt time.Time `json:"updated_at"`
+}
+
+// BumpConfigVersion 递增一个或多个配置范围的版本号（不存在时创建）
+func BumpConfigVersion(scopes ...string) error {
+	if DB == nil {
+		return nil
+	}
+
+	now := time.Now()
+	for _, scope := range scopes {
+		err := DB.Clauses(clause.OnConflict{
+			Columns: []clause.Column{{Name: "name"}},
+			DoUpdates: clause.Assignments(map[string]interface{}{
+				"version":    gorm.Expr("version + 1"),
+				"updated_at": now,
+			}),
+		}).Create(&ConfigVersion{Name: scope, Version: 1, UpdatedAt: now}).Error
+		if err != nil {
+			return err
+		}
+	}
+	return nil
+}
+
+// LoadConfigVersions 读取所有配置范围的当前版本号
+func LoadConfigVersions() (map[string]uint64, error) {
+	var rows []ConfigVersion
+	if err := DB.Find(&rows).Error; err != nil {
+		return nil, err
+	}
+
+	versions := make(map[string]uint64, len(rows))
+	for _, row := range rows {
+		versions[row.Name] = row.Version
+	}
+	return versions, nil
+}
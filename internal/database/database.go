@@ -92,6 +92,10 @@ func autoMigrate() error {
 		&IPBlacklist{},
 		&BandwidthLimit{},
 		&ProxyHeartbeat{},
+		&ConfigVersion{},
+		&TrafficRollupMinute{},
+		&TrafficRollupHour{},
+		&TrafficCounter{},
 	)
 }
 
@@ -0,0 +1,462 @@
+package database
+
+import (
+	"compress/gzip"
+	"database/sql"
+	"encoding/csv"
+	"fmt"
+	"os"
+	"path/filepath"
+	"strconv"
+	"strings"
+	"sync"
+	"time"
+
+	"socks5-app/internal/logger"
+)
+
+// 按天分区的日志表
+var logPartitionTables = []string{"traffic_logs", "access_logs"}
+
+const (
+	// logPartitionMax 兜底分区，保存超出最后一个按天分区的记录，新分区从它拆分出来
+	logPartitionMax = "pmax"
+	// logPartitionNameLayout 按天分区的名称，分区保存该日期及之前的记录
+	logPartitionNameLayout = "p20060102"
+	// logArchiveChunkSize 导出分区时每批读取的行数
+	logArchiveChunkSize = 5000
+)
+
+// LogPartitionOptions 日志分区管理的配置
+type LogPartitionOptions struct {
+	RetentionDays  int    // 保留天数，0为不删除分区
+	AheadDays      int    // 提前创建的分区天数
+	ArchiveDir     string // 删除前导出为gzip压缩CSV的目录，空为不导出
+	ConvertMaxRows int64  // 未分区的表行数不超过该值时自动转换为分区表，0为不转换，<0为不限制
+}
+
+// logPartitionMu 分区维护（定时任务和手动清理）串行执行
+var logPartitionMu sync.Mutex
+
+// logPartitionInfo 日志表当前的分区情况
+type logPartitionInfo struct {
+	method string         // RANGE COLUMNS（DATETIME列）或 RANGE（TIMESTAMP列，按UNIX_TIMESTAMP分区）
+	days   []logPartition // 按天分区，按日期升序
+	hasMax bool
+}
+
+// logPartition 一个按天分区
+type logPartition struct {
+	name string
+	day  time.Time
+}
+
+// StartLogPartitionManager 定期维护流量日志和访问日志的按天RANGE分区（仅MySQL）
+//
+// 过期数据通过DROP PARTITION删除，只删除元数据和数据文件，不像DELETE那样长时间锁表、
+// 留下碎片，查询按时间范围裁剪分区，表的写入和查询性能不随保留时长变化。
+// 每小时检查一次：提前创建未来AheadDays天的分区，删除超过RetentionDays的分区
+// （配置了ArchiveDir时先导出）。未分区的表在行数不超过ConvertMaxRows时自动转换。
+func StartLogPartitionManager(opts LogPartitionOptions) {
+	if DB == nil || DB.Dialector.Name() != "mysql" {
+		return
+	}
+	if opts.AheadDays < 1 {
+		opts.AheadDays = 1
+	}
+
+	go func() {
+		ticker := time.NewTicker(time.Hour)
+		defer ticker.Stop()
+
+		for {
+			for _, table := range logPartitionTables {
+				if err := maintainLogPartitions(table, opts); err != nil {
+					logger.Log.Errorf("维护 %s 分区失败: %v", table, err)
+				}
+			}
+			<-ticker.C
+		}
+	}()
+}
+
+// maintainLogPartitions 为一张日志表创建未来的分区并删除过期的分区
+func maintainLogPartitions(table string, opts LogPartitionOptions) error {
+	logPartitionMu.Lock()
+	defer logPartitionMu.Unlock()
+
+	info, err := loadLogPartitions(table)
+	if err != nil {
+		return err
+	}
+	if info == nil {
+		return convertLogTable(table, opts)
+	}
+
+	today := logPartitionDay(time.Now())
+	next := today
+	if n := len(info.days); n > 0 && !info.days[n-1].day.Before(next) {
+		next = info.days[n-1].day.AddDate(0, 0, 1)
+	}
+	if err := addLogPartitions(table, info, next, today.AddDate(0, 0, opts.AheadDays)); err != nil {
+		return err
+	}
+
+	if opts.RetentionDays > 0 {
+		_, err = dropLogPartitions(table, info, today.AddDate(0, 0, -opts.RetentionDays), opts.ArchiveDir)
+	}
+	return err
+}
+
+// DropLogPartitionsBefore 删除table中日期早于before的按天分区，返回删除的分区数
+// 表没有按天分区（SQLite或尚未转换）时partitioned为false，调用者应改用DELETE
+func DropLogPartitionsBefore(table string, before time.Time, archiveDir string) (dropped int, partitioned bool, err error) {
+	if DB == nil || DB.Dialector.Name() != "mysql" {
+		return 0, false, nil
+	}
+
+	logPartitionMu.Lock()
+	defer logPartitionMu.Unlock()
+
+	info, err := loadLogPartitions(table)
+	if err != nil || info == nil {
+		return 0, false, err
+	}
+	dropped, err = dropLogPartitions(table, info, logPartitionDay(before), archiveDir)
+	return dropped, true, err
+}
+
+// loadLogPartitions 读取表的分区，未分区时返回nil
+func loadLogPartitions(table string) (*logPartitionInfo, error) {
+	var rows []struct {
+		PartitionName       string
+		PartitionMethod     string
+		PartitionExpression string
+	}
+	if err := DB.Raw("SELECT PARTITION_NAME AS partition_name, PARTITION_METHOD AS partition_method, "+
+		"PARTITION_EXPRESSION AS partition_expression FROM information_schema.PARTITIONS "+
+		"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND PARTITION_NAME IS NOT NULL "+
+		"ORDER BY PARTITION_ORDINAL_POSITION", table).Scan(&rows).Error; err != nil {
+		return nil, fmt.Errorf("读取分区信息失败: %w", err)
+	}
+	if len(rows) == 0 {
+		return nil, nil
+	}
+
+	info := &logPartitionInfo{method: rows[0].PartitionMethod}
+	expression := strings.ToLower(strings.Trim(rows[0].PartitionExpression, "`"))
+	if info.method == "RANGE" && !strings.Contains(expression, "unix_timestamp") {
+		return nil, fmt.Errorf("不支持的分区方式: %s(%s)", info.method, rows[0].PartitionExpression)
+	}
+	if info.method != "RANGE" && info.method != "RANGE COLUMNS" {
+		return nil, fmt.Errorf("不支持的分区方式: %s", info.method)
+	}
+
+	for _, row := range rows {
+		if row.PartitionName == logPartitionMax {
+			info.hasMax = true
+			continue
+		}
+		day, err := time.ParseInLocation(logPartitionNameLayout, row.PartitionName, time.Local)
+		if err != nil {
+			return nil, fmt.Errorf("无法识别的分区 %s", row.PartitionName)
+		}
+		info.days = append(info.days, logPartition{name: row.PartitionName, day: day})
+	}
+	return info, nil
+}
+
+// addLogPartitions 创建[from, to]之间每天的分区
+func addLogPartitions(table string, info *logPartitionInfo, from, to time.Time) error {
+	if from.After(to) {
+		return nil
+	}
+
+	defs := logPartitionDefs(info.method, from, to)
+	var stmt string
+	if info.hasMax {
+		// pmax中通常没有数据，拆分很快
+		defs = append(defs, logPartitionMaxDef(info.method))
+		stmt = fmt.Sprintf("ALTER TABLE %s REORGANIZE PARTITION %s INTO (%s)", table, logPartitionMax, strings.Join(defs, ", "))
+	} else {
+		stmt = fmt.Sprintf("ALTER TABLE %s ADD PARTITION (%s)", table, strings.Join(defs, ", "))
+	}
+	if err := DB.Exec(stmt).Error; err != nil {
+		return fmt.Errorf("创建分区失败: %w", err)
+	}
+	logger.Log.Infof("已创建 %s 分区 %s - %s", table, from.Format("2006-01-02"), to.Format("2006-01-02"))
+	return nil
+}
+
+// dropLogPartitions 删除日期早于before的分区，archiveDir不为空时先导出，返回删除的分区数
+// 至少保留最后一个按天分区，没有兜底分区时新记录仍然有分区可写
+// 删除traffic_logs的分区后，同步删除已删除日志对应的流量汇总
+func dropLogPartitions(table string, info *logPartitionInfo, before time.Time, archiveDir string) (dropped int, err error) {
+	if table == "traffic_logs" {
+		defer func() {
+			if pruneErr := pruneExpiredTrafficRollups(); pruneErr != nil && err == nil {
+				err = pruneErr
+			}
+		}()
+	}
+
+	for i, partition := range info.days {
+		if !partition.day.Before(before) || (i == len(info.days)-1 && !info.hasMax) {
+			break
+		}
+		if archiveDir != "" {
+			path, rows, err := archiveLogPartition(table, partition, archiveDir)
+			if err != nil {
+				return dropped, fmt.Errorf("导出分区 %s 失败，未删除: %w", partition.name, err)
+			}
+			logger.Log.Infof("已导出 %s 分区 %s（%d 条）到 %s", table, partition.name, rows, path)
+		}
+		if err := DB.Exec(fmt.Sprintf("ALTER TABLE %s DROP PARTITION %s", table, partition.name)).Error; err != nil {
+			return dropped, fmt.Errorf("删除分区 %s 失败: %w", partition.name, err)
+		}
+		logger.Log.Infof("已删除 %s 过期分区 %s", table, partition.name)
+		dropped++
+	}
+	return dropped, nil
+}
+
+// pruneExpiredTrafficRollups 删除最早一条保留的流量日志所在小时之前的汇总，并从计数器中减去
+// 每次维护都执行，上次删除分区后汇总清理失败时会在下一次补上；日志表为空时不清理
+func pruneExpiredTrafficRollups() error {
+	var oldest []time.Time
+	if err := DB.Model(&TrafficLog{}).Order("timestamp").Limit(1).Pluck("timestamp", &oldest).Error; err != nil {
+		return fmt.Errorf("读取最早的流量日志失败: %w", err)
+	}
+	if len(oldest) == 0 {
+		return nil
+	}
+	before := oldest[0].Truncate(time.Hour)
+	removed, err := PruneTrafficRollupsBefore(before)
+	if err != nil {
+		return fmt.Errorf("清理过期流量汇总失败: %w", err)
+	}
+	if removed.LogCount > 0 {
+		logger.Log.Infof("已删除 %s 之前的流量汇总（%d 条日志，发送 %d 字节，接收 %d 字节）",
+			before.Format("2006-01-02 15:04"), removed.LogCount, removed.BytesSent, removed.BytesRecv)
+	}
+	return nil
+}
+
+// archiveLogPartition 把一个分区按id顺序分批导出为gzip压缩的CSV，返回文件路径和行数
+// 先写临时文件，完整写入并同步到磁盘后再改名，导出中断不会留下不完整的归档
+func archiveLogPartition(table string, partition logPartition, dir string) (string, int64, error) {
+	if err := os.MkdirAll(dir, 0755); err != nil {
+		return "", 0, err
+	}
+	path := filepath.Join(dir, fmt.Sprintf("%s-%s.csv.gz", table, partition.day.Format("20060102")))
+	tmp := path + ".tmp"
+
+	file, err := os.Create(tmp)
+	if err != nil {
+		return "", 0, err
+	}
+	defer os.Remove(tmp)
+	defer file.Close()
+
+	gz := gzip.NewWriter(file)
+	writer := csv.NewWriter(gz)
+
+	var total int64
+	var lastID uint64
+	for {
+		rows, err := DB.Raw(fmt.Sprintf("SELECT * FROM %s PARTITION (%s) WHERE id > ? ORDER BY id LIMIT ?",
+			table, partition.name), lastID, logArchiveChunkSize).Rows()
+		if err != nil {
+			return "", total, err
+		}
+		n, last, err := writeArchiveRows(writer, rows, total == 0)
+		rows.Close()
+		if err != nil {
+			return "", total, err
+		}
+		total += int64(n)
+		lastID = last
+		if n < logArchiveChunkSize {
+			break
+		}
+	}
+
+	writer.Flush()
+	if err := writer.Error(); err != nil {
+		return "", total, err
+	}
+	if err := gz.Close(); err != nil {
+		return "", total, err
+	}
+	if err := file.Sync(); err != nil {
+		return "", total, err
+	}
+	if err := file.Close(); err != nil {
+		return "", total, err
+	}
+	return path, total, os.Rename(tmp, path)
+}
+
+// writeArchiveRows 写出一批记录，返回行数和最后一行的id
+func writeArchiveRows(writer *csv.Writer, rows *sql.Rows, header bool) (int, uint64, error) {
+	columns, err := rows.Columns()
+	if err != nil {
+		return 0, 0, err
+	}
+	if header {
+		if err := writer.Write(columns); err != nil {
+			return 0, 0, err
+		}
+	}
+
+	idIndex := -1
+	for i, column := range columns {
+		if column == "id" {
+			idIndex = i
+		}
+	}
+	if idIndex < 0 {
+		return 0, 0, fmt.Errorf("表中没有id列")
+	}
+
+	values := make([]interface{}, len(columns))
+	pointers := make([]interface{}, len(columns))
+	for i := range values {
+		pointers[i] = &values[i]
+	}
+	record := make([]string, len(columns))
+
+	count := 0
+	var lastID uint64
+	for rows.Next() {
+		if err := rows.Scan(pointers...); err != nil {
+			return count, lastID, err
+		}
+		for i, value := range values {
+			record[i] = formatArchiveValue(value)
+		}
+		if lastID, err = strconv.ParseUint(record[idIndex], 10, 64); err != nil {
+			return count, lastID, fmt.Errorf("无效的id: %s", record[idIndex])
+		}
+		if err := writer.Write(record); err != nil {
+			return count, lastID, err
+		}
+		count++
+	}
+	return count, lastID, rows.Err()
+}
+
+func formatArchiveValue(value interface{}) string {
+	switch v := value.(type) {
+	case nil:
+		return ""
+	case []byte:
+		return string(v)
+	case time.Time:
+		return v.Format("2006-01-02 15:04:05.000")
+	default:
+		return fmt.Sprint(v)
+	}
+}
+
+// convertLogTable 把未分区的日志表转换为按天分区
+//
+// 分区表的主键必须包含分区列，也不支持外键，因此主键改为(id, timestamp)并删除外键。
+// 转换需要重建整张表，ConvertMaxRows为0或超过该行数时只给出提示，由运维在维护窗口调整该值后重启。
+func convertLogTable(table string, opts LogPartitionOptions) error {
+	var status struct {
+		TableRows int64
+		DataType  string
+	}
+	if err := DB.Raw("SELECT t.TABLE_ROWS AS table_rows, c.DATA_TYPE AS data_type FROM information_schema.TABLES t "+
+		"JOIN information_schema.COLUMNS c ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME "+
+		"WHERE t.TABLE_SCHEMA = DATABASE() AND t.TABLE_NAME = ? AND c.COLUMN_NAME = 'timestamp'", table).
+		Scan(&status).Error; err != nil {
+		return err
+	}
+
+	var method, column string
+	switch strings.ToLower(status.DataType) {
+	case "datetime":
+		method, column = "RANGE COLUMNS", "(timestamp)"
+	case "timestamp":
+		method, column = "RANGE", "(UNIX_TIMESTAMP(timestamp))"
+	default:
+		return fmt.Errorf("%s 没有可以分区的 timestamp 列", table)
+	}
+
+	if opts.ConvertMaxRows == 0 {
+		logger.Log.Infof("%s 不是分区表，log_partition_convert_max_rows 为 0，不自动转换；"+
+			"需要转换时请在维护窗口设置该配置后重启服务", table)
+		return nil
+	}
+	if opts.ConvertMaxRows > 0 && status.TableRows > opts.ConvertMaxRows {
+		logger.Log.Warnf("%s 约有 %d 行，超过 log_partition_convert_max_rows（%d），不自动转换为分区表；"+
+			"转换会重建整张表，请在维护窗口调大该配置后重启服务", table, status.TableRows, opts.ConvertMaxRows)
+		return nil
+	}
+
+	// 第一个分区同时保存更早的记录；有保留期时最早从保留期开始建分区，更早的记录次日随第一个分区删除
+	today := logPartitionDay(time.Now())
+	start := today
+	if opts.RetentionDays > 0 {
+		var oldest sql.NullTime
+		if err := DB.Table(table).Select("MIN(timestamp)").Row().Scan(&oldest); err != nil {
+			return err
+		}
+		if oldest.Valid && logPartitionDay(oldest.Time).Before(start) {
+			start = logPartitionDay(oldest.Time)
+		}
+		if limit := today.AddDate(0, 0, -opts.RetentionDays); start.Before(limit) {
+			start = limit
+		}
+	}
+
+	var foreignKeys []string
+	if err := DB.Raw("SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "+
+		"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND CONSTRAINT_TYPE = 'FOREIGN KEY'", table).
+		Scan(&foreignKeys).Error; err != nil {
+		return err
+	}
+	for _, name := range foreignKeys {
+		if err := DB.Exec(fmt.Sprintf("ALTER TABLE %s DROP FOREIGN KEY %s", table, name)).Error; err != nil {
+			return fmt.Errorf("删除外键 %s 失败: %w", name, err)
+		}
+	}
+
+	defs := append(logPartitionDefs(method, start, today.AddDate(0, 0, opts.AheadDays)), logPartitionMaxDef(method))
+	logger.Log.Infof("正在把 %s 转换为按天分区（约 %d 行）...", table, status.TableRows)
+	begin := time.Now()
+	if err := DB.Exec(fmt.Sprintf("ALTER TABLE %s DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp) PARTITION BY %s %s (%s)",
+		table, method, column, strings.Join(defs, ", "))).Error; err != nil {
+		return fmt.Errorf("转换为分区表失败: %w", err)
+	}
+	logger.Log.Infof("%s 已转换为按天分区，耗时 %v", table, time.Since(begin))
+	return nil
+}
+
+// logPartitionDefs 生成[from, to]之间每天一个分区的定义
+func logPartitionDefs(method string, from, to time.Time) []string {
+	var defs []string
+	for day := from; !day.After(to); day = day.AddDate(0, 0, 1) {
+		bound := "'" + day.AddDate(0, 0, 1).Format("2006-01-02 15:04:05") + "'"
+		if method == "RANGE" {
+			bound = "UNIX_TIMESTAMP(" + bound + ")"
+		}
+		defs = append(defs, fmt.Sprintf("PARTITION %s VALUES LESS THAN (%s)", day.Format(logPartitionNameLayout), bound))
+	}
+	return defs
+}
+
+func logPartitionMaxDef(method string) string {
+	if method == "RANGE" {
+		return "PARTITION " + logPartitionMax + " VALUES LESS THAN MAXVALUE"
+	}
+	return "PARTITION " + logPartitionMax + " VALUES LESS THAN (MAXVALUE)"
+}
+
+// logPartitionDay 当天0点（本地时区）
+func logPartitionDay(t time.Time) time.Time {
+	year, month, day := t.In(time.Local).Date()
+	return time.Date(year, month, day, 0, 0, 0, 0, time.Local)
+}
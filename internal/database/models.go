@@ -16,7 +16,7 @@ type User struct {
 	Status         string         `gorm:"default:'active'" json:"status"`
 	BandwidthLimit int64          `gorm:"default:0" json:"bandwidth_limit"` // 0表示无限制
 	CreatedAt      time.Time      `json:"created_at"`
-	UpdatedAt      time.Time      `json:"updated_at"`
+	UpdatedAt      time.Time      `gorm:"index" json:"updated_at"` // 代理节点按updated_at增量刷新用户缓存
 	DeletedAt      gorm.DeletedAt `gorm:"index" json:"-"`
 }
 
@@ -36,31 +36,36 @@ type ProxySession struct {
 }
 
 // TrafficLog 流量日志模型
+// 索引对应日志列表的查询方式：按(timestamp, id)游标分页、按user_id过滤、按目标IP前缀过滤，
+// InnoDB二级索引末尾隐含主键id，(timestamp)索引即可满足ORDER BY timestamp, id
 type TrafficLog struct {
-	ID         uint      `gorm:"primarykey" json:"id"`
-	UserID     uint      `json:"user_id"`
-	User       User      `json:"user"`
-	ClientIP   string    `json:"client_ip"`
-	TargetIP   string    `json:"target_ip"`
+	ID         uint      `gorm:"primaryKey;autoIncrement" json:"id"`
+	UserID     uint      `gorm:"index:idx_traffic_user_timestamp,priority:1" json:"user_id"`
+	User       User      `gorm:"-:migration" json:"user"` // 按天分区的表不支持外键，迁移时不创建
+	ClientIP   string    `gorm:"size:45" json:"client_ip"`
+	TargetIP   string    `gorm:"size:45;index:idx_traffic_target_timestamp,priority:1" json:"target_ip"`
 	TargetPort int       `json:"target_port"`
 	BytesSent  int64     `json:"bytes_sent"`
 	BytesRecv  int64     `json:"bytes_recv"`
-	Protocol   string    `json:"protocol"`
-	Timestamp  time.Time `json:"timestamp"`
+	Protocol   string    `gorm:"size:10" json:"protocol"`
+	Timestamp  time.Time `gorm:"primaryKey;autoIncrement:false;index:idx_traffic_timestamp;index:idx_traffic_user_timestamp,priority:2;index:idx_traffic_target_timestamp,priority:2" json:"timestamp"` // 分区列，必须包含在主键中
 	CreatedAt  time.Time `json:"created_at"`
+
+	// NewConnection 是否为该连接的第一条流量日志，只用于累加汇总表的连接数，不入库
+	NewConnection bool `gorm:"-" json:"-"`
 }
 
 // AccessLog 访问日志模型
 type AccessLog struct {
-	ID        uint      `gorm:"primarykey" json:"id"`
-	UserID    uint      `json:"user_id"`
-	User      User      `json:"user"`
+	ID        uint      `gorm:"primaryKey;autoIncrement" json:"id"`
+	UserID    uint      `gorm:"index:idx_access_user_timestamp,priority:1" json:"user_id"`
+	User      User      `gorm:"-:migration" json:"user"` // 按天分区的表不支持外键，迁移时不创建
 	ClientIP  string    `json:"client_ip"`
 	TargetURL string    `json:"target_url"`
 	Method    string    `json:"method"`
 	Status    string    `json:"status"`
 	UserAgent string    `json:"user_agent"`
-	Timestamp time.Time `json:"timestamp"`
+	Timestamp time.Time `gorm:"primaryKey;autoIncrement:false;index:idx_access_timestamp;index:idx_access_user_timestamp,priority:2" json:"timestamp"` // 分区列，必须包含在主键中
 	CreatedAt time.Time `json:"created_at"`
 }
 
@@ -103,7 +108,7 @@ type BandwidthLimit struct {
 	Limit     int64     `gorm:"not null" json:"limit"` // 字节/秒，0表示无限制
 	Enabled   bool      `gorm:"default:true" json:"enabled"`
 	CreatedAt time.Time `json:"created_at"`
-	UpdatedAt time.Time `json:"updated_at"`
+	UpdatedAt time.Time `gorm:"index" json:"updated_at"` // 代理节点按updated_at增量刷新带宽限制
 }
 
 // ProxyHeartbeat 代理服务器心跳模型
@@ -115,6 +120,7 @@ type ProxyHeartbeat struct {
 	Status        string    `gorm:"default:'online'" json:"status"`     // online, offline
 	ActiveConns   int       `gorm:"default:0" json:"active_conns"`      // 当前活跃连接数
 	TotalConns    int64     `gorm:"default:0" json:"total_conns"`       // 总连接数
+	OnlineUsers   int       `gorm:"default:0" json:"online_users"`      // 当前有活跃连接的用户数
 	LastHeartbeat time.Time `json:"last_heartbeat"`                     // 最后心跳时间
 	CreatedAt     time.Time `json:"created_at"`
 	UpdatedAt     time.Time `json:"updated_at"`
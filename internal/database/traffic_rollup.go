@@ -0,0 +1,328 @@
+package database
+
+import (
+	"fmt"
+	"sort"
+	"time"
+
+	"gorm.io/gorm"
+	"gorm.io/gorm/clause"
+
+	"socks5-app/internal/logger"
+)
+
+// TrafficRollupMinute 每个用户每分钟的流量汇总
+// 代理节点写入流量日志时在同一事务中累加，实时流量、历史统计等接口只读汇总表，
+// 查询开销与时间范围内的用户数有关，与原始日志的行数无关
+type TrafficRollupMinute struct {
+	Bucket      time.Time `gorm:"primaryKey;autoIncrement:false" json:"bucket"` // 分钟起始时间
+	UserID      uint      `gorm:"primaryKey;autoIncrement:false;index" json:"user_id"`
+	BytesSent   int64     `gorm:"not null;default:0" json:"bytes_sent"`
+	BytesRecv   int64     `gorm:"not null;default:0" json:"bytes_recv"`
+	Connections int64     `gorm:"not null;default:0" json:"connections"` // 在该时间段内开始产生流量的连接数
+	LogCount    int64     `gorm:"not null;default:0" json:"log_count"`   // 汇总的流量日志条数，用于计算单条日志的平均值
+}
+
+// TrafficRollupHour 每个用户每小时的流量汇总，与流量日志保留相同的时间范围
+type TrafficRollupHour TrafficRollupMinute
+
+// TrafficRollupTotals 一段时间内的流量合计
+type TrafficRollupTotals struct {
+	BytesSent   int64 `json:"bytes_sent"`
+	BytesRecv   int64 `json:"bytes_recv"`
+	Connections int64 `json:"connections"`
+	LogCount    int64 `json:"log_count"`
+}
+
+// TrafficCounter 保留期内全部流量的累计值（流量日志过期删除时同步减去，见PruneTrafficRollupsBefore）
+// 代理节点写入流量日志时在同一事务中累加，仪表盘的总流量直接读取这一行，不再对汇总表做SUM
+type TrafficCounter struct {
+	Name        string    `gorm:"primaryKey;size:32" json:"name"`
+	BytesSent   int64     `gorm:"not null;default:0" json:"bytes_sent"`
+	BytesRecv   int64     `gorm:"not null;default:0" json:"bytes_recv"`
+	Connections int64     `gorm:"not null;default:0" json:"connections"`
+	LogCount    int64     `gorm:"not null;default:0" json:"log_count"`
+	UpdatedAt   time.Time `json:"updated_at"`
+}
+
+const (
+	TrafficRollupMinuteTable = "traffic_rollup_minutes"
+	TrafficRollupHourTable   = "traffic_rollup_hours"
+
+	// TrafficCounterTotal 全部用户的累计流量计数器
+	TrafficCounterTotal = "total"
+)
+
+func (TrafficRollupMinute) TableName() string { return TrafficRollupMinuteTable }
+
+func (TrafficRollupHour) TableName() string { return TrafficRollupHourTable }
+
+func (TrafficCounter) TableName() string { return "traffic_counters" }
+
+// trafficRollupKey 汇总行的主键
+type trafficRollupKey struct {
+	bucket int64 // Unix秒
+	userID uint
+}
+
+// AddTrafficRollups 把一批流量日志累加到分钟和小时汇总表，应与日志的INSERT在同一事务中调用
+func AddTrafficRollups(tx *gorm.DB, logs []*TrafficLog) error {
+	if len(logs) == 0 {
+		return nil
+	}
+
+	minutes := aggregateTrafficLogs(logs, time.Minute)
+	hours := aggregateTrafficLogs(logs, time.Hour)
+
+	upsert := trafficRollupUpsert(tx)
+	if err := tx.Clauses(upsert).Create(&minutes).Error; err != nil {
+		return fmt.Errorf("累加分钟流量汇总失败: %w", err)
+	}
+	hourRows := make([]TrafficRollupHour, len(hours))
+	for i := range hours {
+		hourRows[i] = TrafficRollupHour(hours[i])
+	}
+	if err := tx.Clauses(upsert).Create(&hourRows).Error; err != nil {
+		return fmt.Errorf("累加小时流量汇总失败: %w", err)
+	}
+
+	// 计数器行由服务端启动时创建（EnsureTrafficCounter），这里只做UPDATE；
+	// 总是在汇总行之后加锁，与其它代理节点的加锁顺序一致
+	var total TrafficRollupTotals
+	for i := range hours {
+		total.add(TrafficRollupTotals{
+			BytesSent:   hours[i].BytesSent,
+			BytesRecv:   hours[i].BytesRecv,
+			Connections: hours[i].Connections,
+			LogCount:    hours[i].LogCount,
+		})
+	}
+	if err := tx.Model(&TrafficCounter{}).Where("name = ?", TrafficCounterTotal).Updates(map[string]interface{}{
+		"bytes_sent":  gorm.Expr("bytes_sent + ?", total.BytesSent),
+		"bytes_recv":  gorm.Expr("bytes_recv + ?", total.BytesRecv),
+		"connections": gorm.Expr("connections + ?", total.Connections),
+		"log_count":   gorm.Expr("log_count + ?", total.LogCount),
+		"updated_at":  time.Now(),
+	}).Error; err != nil {
+		return fmt.Errorf("累加流量计数器失败: %w", err)
+	}
+	return nil
+}
+
+// EnsureTrafficCounter 计数器行不存在时用小时汇总表的合计创建
+// 单条INSERT ... SELECT完成，正在提交的流量日志要么已计入小时表，要么提交时计数器行已经存在
+func EnsureTrafficCounter() error {
+	if DB == nil {
+		return nil
+	}
+	// 聚合放在派生表中：不带GROUP BY的聚合查询总是返回一行，WHERE NOT EXISTS必须作用在聚合结果上
+	result := DB.Exec("INSERT INTO traffic_counters (name, bytes_sent, bytes_recv, connections, log_count, updated_at) "+
+		"SELECT ?, t.bytes_sent, t.bytes_recv, t.connections, t.log_count, ? FROM ("+
+		"SELECT COALESCE(SUM(bytes_sent), 0) AS bytes_sent, COALESCE(SUM(bytes_recv), 0) AS bytes_recv, "+
+		"COALESCE(SUM(connections), 0) AS connections, COALESCE(SUM(log_count), 0) AS log_count FROM "+TrafficRollupHourTable+
+		") t WHERE NOT EXISTS (SELECT 1 FROM traffic_counters WHERE name = ?)",
+		TrafficCounterTotal, time.Now(), TrafficCounterTotal)
+	if result.Error != nil {
+		return fmt.Errorf("初始化流量计数器失败: %w", result.Error)
+	}
+	if result.RowsAffected > 0 {
+		logger.Log.Info("已根据小时流量汇总初始化流量计数器")
+	}
+	return nil
+}
+
+// GetTrafficCounter 读取保留期内全部流量的累计值
+func GetTrafficCounter() (TrafficRollupTotals, error) {
+	var counter TrafficCounter
+	if err := DB.Where("name = ?", TrafficCounterTotal).First(&counter).Error; err != nil {
+		return TrafficRollupTotals{}, err
+	}
+	return TrafficRollupTotals{
+		BytesSent:   counter.BytesSent,
+		BytesRecv:   counter.BytesRecv,
+		Connections: counter.Connections,
+		LogCount:    counter.LogCount,
+	}, nil
+}
+
+// aggregateTrafficLogs 按(时间段, 用户)合并日志，结果按主键排序，
+// 多个代理节点同时写入时以相同的顺序加锁，避免死锁
+func aggregateTrafficLogs(logs []*TrafficLog, period time.Duration) []TrafficRollupMinute {
+	index := make(map[trafficRollupKey]int)
+	var rows []TrafficRollupMinute
+	for _, log := range logs {
+		bucket := log.Timestamp.Truncate(period)
+		key := trafficRollupKey{bucket: bucket.Unix(), userID: log.UserID}
+		i, ok := index[key]
+		if !ok {
+			i = len(rows)
+			index[key] = i
+			rows = append(rows, TrafficRollupMinute{Bucket: bucket, UserID: log.UserID})
+		}
+		row := &rows[i]
+		row.BytesSent += log.BytesSent
+		row.BytesRecv += log.BytesRecv
+		row.LogCount++
+		if log.NewConnection {
+			row.Connections++
+		}
+	}
+
+	sort.Slice(rows, func(i, j int) bool {
+		if !rows[i].Bucket.Equal(rows[j].Bucket) {
+			return rows[i].Bucket.Before(rows[j].Bucket)
+		}
+		return rows[i].UserID < rows[j].UserID
+	})
+	return rows
+}
+
+// trafficRollupUpsert 主键冲突时把新值加到已有的行上
+func trafficRollupUpsert(db *gorm.DB) clause.OnConflict {
+	inserted := "VALUES(%s)"
+	if db.Dialector.Name() == "sqlite" {
+		inserted = "excluded.%s"
+	}
+
+	updates := make(map[string]interface{})
+	for _, column := range []string{"bytes_sent", "bytes_recv", "connections", "log_count"} {
+		updates[column] = gorm.Expr(column + " + " + fmt.Sprintf(inserted, column))
+	}
+	return clause.OnConflict{
+		Columns:   []clause.Column{{Name: "bucket"}, {Name: "user_id"}},
+		DoUpdates: clause.Assignments(updates),
+	}
+}
+
+// SumTrafficRollups 汇总[start, end]内的流量，精确到分钟
+//
+// 区间中完整的小时从小时表读取，首尾不足一小时的部分从分钟表读取，
+// 因此任意长的区间最多读取 用户数 x (小时数 + 120) 行。
+// scope为nil时统计全部用户，否则用于附加用户过滤条件。
+func SumTrafficRollups(start, end time.Time, scope func(*gorm.DB) *gorm.DB) (TrafficRollupTotals, error) {
+	// 转换为左闭右开的分钟区间[lo, hi)
+	lo := start.Truncate(time.Minute)
+	if lo.Before(start) {
+		lo = lo.Add(time.Minute)
+	}
+	hi := end.Truncate(time.Minute).Add(time.Minute)
+
+	var total TrafficRollupTotals
+	if !lo.Before(hi) {
+		return total, nil
+	}
+
+	hourLo := lo.Truncate(time.Hour)
+	if hourLo.Before(lo) {
+		hourLo = hourLo.Add(time.Hour)
+	}
+	hourHi := hi.Truncate(time.Hour)
+
+	type span struct {
+		table  string
+		lo, hi time.Time
+	}
+	spans := []span{{TrafficRollupMinuteTable, lo, hi}}
+	if hourLo.Before(hourHi) {
+		spans = []span{
+			{TrafficRollupMinuteTable, lo, hourLo},
+			{TrafficRollupHourTable, hourLo, hourHi},
+			{TrafficRollupMinuteTable, hourHi, hi},
+		}
+	}
+
+	for _, s := range spans {
+		if !s.lo.Before(s.hi) {
+			continue
+		}
+		query := DB.Table(s.table).Where("bucket >= ? AND bucket < ?", s.lo, s.hi)
+		part, err := sumTrafficRollups(query, scope)
+		if err != nil {
+			return total, err
+		}
+		total.add(part)
+	}
+	return total, nil
+}
+
+// SumAllTrafficRollups 汇总全部历史流量（读取小时表）
+func SumAllTrafficRollups(scope func(*gorm.DB) *gorm.DB) (TrafficRollupTotals, error) {
+	return sumTrafficRollups(DB.Table(TrafficRollupHourTable), scope)
+}
+
+func sumTrafficRollups(query *gorm.DB, scope func(*gorm.DB) *gorm.DB) (TrafficRollupTotals, error) {
+	if scope != nil {
+		query = scope(query)
+	}
+	var total TrafficRollupTotals
+	err := query.Select("COALESCE(SUM(bytes_sent), 0) AS bytes_sent, COALESCE(SUM(bytes_recv), 0) AS bytes_recv, " +
+		"COALESCE(SUM(connections), 0) AS connections, COALESCE(SUM(log_count), 0) AS log_count").
+		Scan(&total).Error
+	return total, err
+}
+
+func (t *TrafficRollupTotals) add(other TrafficRollupTotals) {
+	t.BytesSent += other.BytesSent
+	t.BytesRecv += other.BytesRecv
+	t.Connections += other.Connections
+	t.LogCount += other.LogCount
+}
+
+// PruneTrafficRollupsBefore 删除before之前的分钟和小时汇总，并从累计计数器中减去删除的部分
+//
+// 流量日志按分区过期删除后调用，使汇总表、计数器与保留下来的日志覆盖同一时间范围。
+// 汇总行在事务中加锁后求和再删除，与代理节点并发累加同一行时不会少减。
+func PruneTrafficRollupsBefore(before time.Time) (TrafficRollupTotals, error) {
+	var removed TrafficRollupTotals
+	err := DB.Transaction(func(tx *gorm.DB) error {
+		query := tx.Table(TrafficRollupHourTable).Where("bucket < ?", before).Clauses(clause.Locking{Strength: "UPDATE"})
+		total, err := sumTrafficRollups(query, nil)
+		if err != nil {
+			return err
+		}
+		if err := tx.Where("bucket < ?", before).Delete(&TrafficRollupMinute{}).Error; err != nil {
+			return err
+		}
+		if total == (TrafficRollupTotals{}) {
+			return nil
+		}
+		if err := tx.Where("bucket < ?", before).Delete(&TrafficRollupHour{}).Error; err != nil {
+			return err
+		}
+		if err := tx.Model(&TrafficCounter{}).Where("name = ?", TrafficCounterTotal).Updates(map[string]interface{}{
+			"bytes_sent":  gorm.Expr("bytes_sent - ?", total.BytesSent),
+			"bytes_recv":  gorm.Expr("bytes_recv - ?", total.BytesRecv),
+			"connections": gorm.Expr("connections - ?", total.Connections),
+			"log_count":   gorm.Expr("log_count - ?", total.LogCount),
+			"updated_at":  time.Now(),
+		}).Error; err != nil {
+			return err
+		}
+		removed = total
+		return nil
+	})
+	return removed, err
+}
+
+// StartTrafficRollupPruner 定期删除超过保留期的分钟汇总（小时汇总随流量日志分区一起删除）
+func StartTrafficRollupPruner(retention time.Duration) {
+	if retention <= 0 || DB == nil {
+		return
+	}
+
+	go func() {
+		ticker := time.NewTicker(time.Hour)
+		defer ticker.Stop()
+
+		for {
+			before := time.Now().Add(-retention).Truncate(time.Hour)
+			result := DB.Where("bucket < ?", before).Delete(&TrafficRollupMinute{})
+			if result.Error != nil {
+				logger.Log.Errorf("清理分钟流量汇总失败: %v", result.Error)
+			} else if result.RowsAffected > 0 {
+				logger.Log.Infof("清理 %s 之前的分钟流量汇总 %d 行", before.Format("2006-01-02 15:04"), result.RowsAffected)
+			}
+			<-ticker.C
+		}
+	}()
+}
@@ -23,6 +23,9 @@ type HeartbeatService struct {
 	totalConns  int64
 	activeConns int32
 	isRunning   bool
+
+	usersMu   sync.Mutex
+	userConns map[uint]int // 用户ID -> 活跃连接数，用于上报在线用户数
 }
 
 // NewHeartbeatService 创建心跳服务实例
@@ -41,6 +44,7 @@ func NewHeartbeatService() *HeartbeatService {
 		proxyPort: proxyConfig.Port,
 		interval:  time.Duration(proxyConfig.HeartbeatInterval) * time.Second,
 		stopCh:    make(chan struct{}),
+		userConns: make(map[uint]int),
 	}
 }
 
@@ -82,14 +86,33 @@ func (h *HeartbeatService) Stop() {
 }
 
 // IncrementConnection 增加连接计数
-func (h *HeartbeatService) IncrementConnection() {
+func (h *HeartbeatService) IncrementConnection(userID uint) {
 	atomic.AddInt32(&h.activeConns, 1)
 	atomic.AddInt64(&h.totalConns, 1)
+
+	h.usersMu.Lock()
+	h.userConns[userID]++
+	h.usersMu.Unlock()
 }
 
 // DecrementConnection 减少连接计数
-func (h *HeartbeatService) DecrementConnection() {
+func (h *HeartbeatService) DecrementConnection(userID uint) {
 	atomic.AddInt32(&h.activeConns, -1)
+
+	h.usersMu.Lock()
+	if h.userConns[userID] <= 1 {
+		delete(h.userConns, userID)
+	} else {
+		h.userConns[userID]--
+	}
+	h.usersMu.Unlock()
+}
+
+// OnlineUsers 当前有活跃连接的用户数
+func (h *HeartbeatService) OnlineUsers() int {
+	h.usersMu.Lock()
+	defer h.usersMu.Unlock()
+	return len(h.userConns)
 }
 
 // heartbeatLoop 心跳循环
@@ -117,6 +140,7 @@ func (h *HeartbeatService) sendHeartbeat() {
 
 	activeConns := atomic.LoadInt32(&h.activeConns)
 	totalConns := atomic.LoadInt64(&h.totalConns)
+	onlineUsers := h.OnlineUsers()
 
 	heartbeat := &database.ProxyHeartbeat{
 		ProxyID:       h.proxyID,
@@ -125,6 +149,7 @@ func (h *HeartbeatService) sendHeartbeat() {
 		Status:        "online",
 		ActiveConns:   int(activeConns),
 		TotalConns:    totalConns,
+		OnlineUsers:   onlineUsers,
 		LastHeartbeat: time.Now(),
 	}
 
@@ -148,6 +173,7 @@ func (h *HeartbeatService) sendHeartbeat() {
 			"status":         "online",
 			"active_conns":   int(activeConns),
 			"total_conns":    totalConns,
+			"online_users":   onlineUsers,
 			"last_heartbeat": time.Now(),
 		}
 
@@ -174,6 +200,8 @@ func (h *HeartbeatService) sendOfflineHeartbeat() {
 	if result.Error == nil {
 		updates := map[string]interface{}{
 			"status":         "offline",
+			"active_conns":   0,
+			"online_users":   0,
 			"last_heartbeat": time.Now(),
 		}
 
@@ -0,0 +1,119 @@
+package metrics
+
+import (
+	"sync"
+	"sync/atomic"
+	"time"
+
+	"github.com/prometheus/client_golang/prometheus"
+)
+
+// 流量日志丢弃原因
+const (
+	DropReasonQueueFull = "queue_full" // 队列已满（MySQL写入跟不上）
+	DropReasonDBError   = "db_error"   // 批量写入失败
+	DropReasonStopped   = "stopped"    // 缓冲区已停止
+)
+
+// TrafficLogMetrics 流量日志批量写入指标
+// 注册在默认注册表上，proxy进程通过pprof端口的 /metrics 暴露
+type TrafficLogMetrics struct {
+	queueDepth    prometheus.GaugeFunc
+	queueCapacity prometheus.Gauge
+	flushDuration prometheus.Histogram
+	flushedRows   prometheus.Counter
+	droppedRows   *prometheus.CounterVec
+
+	// 队列深度来源，由缓冲区在启动时设置
+	depthSource atomic.Value // func() int
+}
+
+var (
+	trafficLogMetrics     *TrafficLogMetrics
+	trafficLogMetricsOnce sync.Once
+)
+
+// GetTrafficLogMetrics 获取流量日志指标（首次调用时注册到默认注册表）
+func GetTrafficLogMetrics() *TrafficLogMetrics {
+	trafficLogMetricsOnce.Do(func() {
+		trafficLogMetrics = newTrafficLogMetrics(prometheus.DefaultRegisterer)
+	})
+	return trafficLogMetrics
+}
+
+func newTrafficLogMetrics(registerer prometheus.Registerer) *TrafficLogMetrics {
+	m := &TrafficLogMetrics{}
+
+	m.queueDepth = prometheus.NewGaugeFunc(
+		prometheus.GaugeOpts{
+			Name: "socks5_traffic_log_queue_depth",
+			Help: "流量日志缓冲队列中等待写入的记录数",
+		},
+		func() float64 {
+			if source, ok := m.depthSource.Load().(func() int); ok {
+				return float64(source())
+			}
+			return 0
+		},
+	)
+
+	m.queueCapacity = prometheus.NewGauge(
+		prometheus.GaugeOpts{
+			Name: "socks5_traffic_log_queue_capacity",
+			Help: "流量日志缓冲队列容量",
+		},
+	)
+
+	m.flushDuration = prometheus.NewHistogram(
+		prometheus.HistogramOpts{
+			Name:    "socks5_traffic_log_flush_duration_seconds",
+			Help:    "流量日志批量写入数据库的耗时",
+			Buckets: prometheus.ExponentialBuckets(0.001, 2, 15), // 1ms ~ 16s
+		},
+	)
+
+	m.flushedRows = prometheus.NewCounter(
+		prometheus.CounterOpts{
+			Name: "socks5_traffic_log_flushed_rows_total",
+			Help: "成功写入数据库的流量日志记录数",
+		},
+	)
+
+	m.droppedRows = prometheus.NewCounterVec(
+		prometheus.CounterOpts{
+			Name: "socks5_traffic_log_dropped_rows_total",
+			Help: "被丢弃的流量日志记录数",
+		},
+		[]string{"reason"},
+	)
+
+	registerer.MustRegister(
+		m.queueDepth,
+		m.queueCapacity,
+		m.flushDuration,
+		m.flushedRows,
+		m.droppedRows,
+	)
+	return m
+}
+
+// SetQueue 设置队列深度来源和队列容量
+func (m *TrafficLogMetrics) SetQueue(depth func() int, capacity int) {
+	m.depthSource.Store(depth)
+	m.queueCapacity.Set(float64(capacity))
+}
+
+// RecordFlush 记录一次批量写入
+func (m *TrafficLogMetrics) RecordFlush(duration time.Duration, rows int, err error) {
+	m.flushDuration.Observe(duration.Seconds())
+	if err != nil {
+		m.droppedRows.WithLabelValues(DropReasonDBError).Add(float64(rows))
+		return
+	}
+	m.flushedRows.Add(float64(rows))
+}
+
+// RecordDropped 记录被丢弃的记录数
+func (m *TrafficLogMetrics) RecordDropped(reason string, rows int) {
+	m.droppedRows.WithLabelValues(reason).Add(float64(rows))
+}
@@ -0,0 +1,210 @@
+package proxy
+
+import (
+	"crypto/hmac"
+	crand "crypto/rand"
+	"crypto/sha256"
+	"encoding/hex"
+	"encoding/json"
+	"math/rand/v2"
+	"os"
+	"path/filepath"
+	"sync/atomic"
+	"time"
+
+	"socks5-app/internal/database"
+	"socks5-app/internal/logger"
+)
+
+// authCacheSaveInterval 认证缓存有变化时写入文件的间隔
+const authCacheSaveInterval = 30 * time.Second
+
+// authCacheEntry 认证结果缓存条目
+type authCacheEntry struct {
+	user      *database.User
+	expiresAt time.Time
+}
+
+// authCache 认证结果缓存的key生成、TTL抖动和持久化
+//
+// key是HMAC-SHA256(secret, 用户名:密码)的前128位。secret来自配置proxy.auth_cache_key
+// （或环境变量SOCKS5_AUTH_CACHE_KEY），绝不写入缓存文件：拿到文件的人没有secret，
+// 无法离线用key验证密码猜测，bcrypt的保护仍然有效。重启后同样的secret得到同样的key，
+// 可以直接命中从文件恢复的条目，不需要重新做bcrypt。未配置secret时使用随机值且不持久化。
+// 文件只保存key、用户ID、用户密码hash的指纹和过期时间，加载时与用户缓存比对，
+// 密码已修改或用户已删除/禁用的条目会被丢弃。
+type authCache struct {
+	secret []byte
+	ttl    time.Duration
+	jitter float64 // TTL随机增加的比例，使同时写入的条目不会同时过期
+	file   string  // 为空时不持久化
+	dirty  atomic.Bool
+}
+
+// authCacheFile 缓存文件格式
+type authCacheFile struct {
+	KeyID   string               `json:"key_id"` // secret的标识，secret更换后旧条目不再恢复
+	Entries []authCacheFileEntry `json:"entries"`
+}
+
+type authCacheFileEntry struct {
+	Key         string    `json:"key"`
+	UserID      uint      `json:"user_id"`
+	Fingerprint string    `json:"fingerprint"` // sha256(用户密码hash)，用于发现密码修改
+	ExpiresAt   time.Time `json:"expires_at"`
+}
+
+func newAuthCache(ttl time.Duration, jitter float64, file, key string) *authCache {
+	if ttl <= 0 {
+		ttl = 60 * time.Second
+	}
+	secret := []byte(key)
+	if key == "" {
+		if file != "" {
+			logger.Log.Warn("未配置 proxy.auth_cache_key，认证缓存不持久化")
+			// 旧版本的缓存文件中保存着secret，不再使用时删除
+			if err := os.Remove(file); err != nil && !os.IsNotExist(err) {
+				logger.Log.Warnf("删除认证缓存文件失败: %v", err)
+			}
+			file = ""
+		}
+		secret = make([]byte, 32)
+		if _, err := crand.Read(secret); err != nil {
+			logger.Log.Warnf("生成认证缓存密钥失败: %v", err)
+		}
+	}
+	return &authCache{secret: secret, ttl: ttl, jitter: jitter, file: file}
+}
+
+// keyID secret的标识（对固定字符串的HMAC），不泄露secret本身
+func (c *authCache) keyID() string {
+	mac := hmac.New(sha256.New, c.secret)
+	mac.Write([]byte("auth-cache-key-id"))
+	return hex.EncodeToString(mac.Sum(nil)[:8])
+}
+
+// key 用户名密码对应的缓存key
+func (c *authCache) key(username, password string) string {
+	mac := hmac.New(sha256.New, c.secret)
+	mac.Write([]byte(username))
+	mac.Write([]byte{0})
+	mac.Write([]byte(password))
+	return hex.EncodeToString(mac.Sum(nil)[:16])
+}
+
+// expiresAt 新条目的过期时间：ttl加上[0, ttl*jitter)的随机值
+func (c *authCache) expiresAt() time.Time {
+	ttl := c.ttl
+	if c.jitter > 0 {
+		ttl += time.Duration(rand.Float64() * c.jitter * float64(c.ttl))
+	}
+	c.dirty.Store(true)
+	return time.Now().Add(ttl)
+}
+
+func passwordFingerprint(hash string) string {
+	sum := sha256.Sum256([]byte(hash))
+	return hex.EncodeToString(sum[:8])
+}
+
+// loadAuthCache 从文件恢复认证缓存，应在用户缓存加载之后调用
+func (s *Socks5Server) loadAuthCache() {
+	c := s.authCache
+	if c.file == "" {
+		return
+	}
+
+	data, err := os.ReadFile(c.file)
+	if err != nil {
+		if !os.IsNotExist(err) {
+			logger.Log.Warnf("读取认证缓存文件失败: %v", err)
+		}
+		return
+	}
+	var saved authCacheFile
+	if err := json.Unmarshal(data, &saved); err != nil {
+		logger.Log.Warnf("解析认证缓存文件失败: %v", err)
+		return
+	}
+	if saved.KeyID != c.keyID() {
+		// secret已更换，或者是旧版本把secret和条目写在一起的文件：不恢复，并立即覆盖旧文件
+		logger.Log.Info("认证缓存文件与当前 auth_cache_key 不匹配，丢弃")
+		s.saveAuthCache()
+		return
+	}
+
+	// 用户缓存按用户名索引，这里需要按ID查找
+	users := make(map[uint]*database.User)
+	s.userCache.Range(func(_, value interface{}) bool {
+		user := value.(*database.User)
+		users[user.ID] = user
+		return true
+	})
+
+	now := time.Now()
+	restored := 0
+	for _, entry := range saved.Entries {
+		user, ok := users[entry.UserID]
+		if !ok || !now.Before(entry.ExpiresAt) || passwordFingerprint(user.Password) != entry.Fingerprint {
+			continue
+		}
+		s.authResultCache.Store(entry.Key, &authCacheEntry{user: user, expiresAt: entry.ExpiresAt})
+		restored++
+	}
+	logger.Log.Infof("从文件恢复认证缓存: %d/%d 条", restored, len(saved.Entries))
+}
+
+// saveAuthCacheLoop 定期把有变化的认证缓存写入文件
+func (s *Socks5Server) saveAuthCacheLoop() {
+	if s.authCache.file == "" {
+		return
+	}
+
+	ticker := time.NewTicker(authCacheSaveInterval)
+	defer ticker.Stop()
+
+	for range ticker.C {
+		if s.authCache.dirty.Swap(false) {
+			s.saveAuthCache()
+		}
+	}
+}
+
+// saveAuthCache 把未过期的认证缓存写入文件（先写临时文件再改名，权限0600）
+func (s *Socks5Server) saveAuthCache() {
+	c := s.authCache
+	saved := authCacheFile{KeyID: c.keyID()}
+	now := time.Now()
+	s.authResultCache.Range(func(key, value interface{}) bool {
+		entry := value.(*authCacheEntry)
+		if now.Before(entry.expiresAt) {
+			saved.Entries = append(saved.Entries, authCacheFileEntry{
+				Key:         key.(string),
+				UserID:      entry.user.ID,
+				Fingerprint: passwordFingerprint(entry.user.Password),
+				ExpiresAt:   entry.expiresAt,
+			})
+		}
+		return true
+	})
+
+	data, err := json.Marshal(saved)
+	if err != nil {
+		logger.Log.Errorf("序列化认证缓存失败: %v", err)
+		return
+	}
+	if err := os.MkdirAll(filepath.Dir(c.file), 0700); err != nil {
+		logger.Log.Errorf("创建认证缓存目录失败: %v", err)
+		return
+	}
+	tmp := c.file + ".tmp"
+	if err := os.WriteFile(tmp, data, 0600); err != nil {
+		logger.Log.Errorf("写入认证缓存文件失败: %v", err)
+		return
+	}
+	if err := os.Rename(tmp, c.file); err != nil {
+		logger.Log.Errorf("写入认证缓存文件失败: %v", err)
+		return
+	}
+	logger.Log.Debugf("认证缓存已写入文件: %d 条", len(saved.Entries))
+}
@@ -0,0 +1,140 @@
+package proxy
+
+import (
+	"time"
+
+	"socks5-app/internal/database"
+	"socks5-app/internal/logger"
+)
+
+// configWatcher 配置变更监视器
+//
+// 管理后台修改URL过滤、IP黑白名单、用户、带宽限制后会递增config_versions表中
+// 对应范围的版本号。watcher每隔interval读取这张只有几行的表，
+// 只重新加载版本号变化了的范围；另外每隔fullRefresh无条件全部重新加载一次，
+// 兜底直接修改数据库（不经过API）的情况。
+type configWatcher struct {
+	interval    time.Duration
+	fullRefresh time.Duration
+
+	scopes   []string                  // 注册顺序，全量刷新时按此顺序加载
+	reloads  map[string][]configReload // 范围 -> 重新加载函数
+	versions map[string]uint64         // 已加载的版本号
+
+	stopChan chan struct{}
+}
+
+// configReload 一个范围的重新加载函数
+type configReload struct {
+	changed func() // 版本号变化时调用，可以是增量刷新
+	full    func() // 定期全量刷新时调用，为nil时使用changed
+}
+
+// newConfigWatcher 创建配置变更监视器
+func newConfigWatcher(interval, fullRefresh time.Duration) *configWatcher {
+	if interval <= 0 {
+		interval = 2 * time.Second
+	}
+	return &configWatcher{
+		interval:    interval,
+		fullRefresh: fullRefresh,
+		reloads:     make(map[string][]configReload),
+		versions:    make(map[string]uint64),
+		stopChan:    make(chan struct{}),
+	}
+}
+
+// watch 注册一个范围的重新加载函数，同一范围可以注册多个
+func (w *configWatcher) watch(scope string, reload func()) {
+	w.watchFull(scope, reload, nil)
+}
+
+// watchFull 注册一个范围的增量刷新函数和全量刷新函数：
+// 版本号变化时调用changed，启动时和每隔fullRefresh调用full
+func (w *configWatcher) watchFull(scope string, changed, full func()) {
+	if _, ok := w.reloads[scope]; !ok {
+		w.scopes = append(w.scopes, scope)
+	}
+	w.reloads[scope] = append(w.reloads[scope], configReload{changed: changed, full: full})
+}
+
+// Start 立即全量加载一次，然后启动监视协程
+func (w *configWatcher) Start() {
+	// 先记录当前版本号再加载，加载期间发生的修改会在下一轮被发现
+	if database.DB != nil {
+		if versions, err := database.LoadConfigVersions(); err == nil {
+			w.versions = versions
+		} else {
+			logger.Log.Warnf("读取配置版本失败: %v", err)
+		}
+	}
+	w.reloadAll()
+
+	go w.run()
+}
+
+// Stop 停止监视协程
+func (w *configWatcher) Stop() {
+	close(w.stopChan)
+}
+
+func (w *configWatcher) run() {
+	ticker := time.NewTicker(w.interval)
+	defer ticker.Stop()
+
+	var fullRefresh <-chan time.Time
+	if w.fullRefresh > 0 {
+		fullTicker := time.NewTicker(w.fullRefresh)
+		defer fullTicker.Stop()
+		fullRefresh = fullTicker.C
+	}
+
+	for {
+		select {
+		case <-ticker.C:
+			w.poll()
+		case <-fullRefresh:
+			logger.Log.Debug("定期全量刷新配置缓存")
+			w.reloadAll()
+		case <-w.stopChan:
+			return
+		}
+	}
+}
+
+// poll 读取版本号，重新加载发生变化的范围
+func (w *configWatcher) poll() {
+	if database.DB == nil {
+		return
+	}
+
+	versions, err := database.LoadConfigVersions()
+	if err != nil {
+		logger.Log.Errorf("读取配置版本失败: %v", err)
+		return
+	}
+
+	for _, scope := range w.scopes {
+		version := versions[scope]
+		if version == w.versions[scope] {
+			continue
+		}
+		logger.Log.Infof("配置 %s 已变更 (版本 %d -> %d)，重新加载", scope, w.versions[scope], version)
+		w.versions[scope] = version
+		for _, reload := range w.reloads[scope] {
+			reload.changed()
+		}
+	}
+}
+
+func (w *configWatcher) reloadAll() {
+	for _, scope := range w.scopes {
+		for _, reload := range w.reloads[scope] {
+			if reload.full != nil {
+				reload.full()
+			} else {
+				reload.changed()
+			}
+		}
+	}
+}
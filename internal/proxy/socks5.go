@@ -2,7 +2,6 @@ package proxy
 
 import (
 	"context"
-	"crypto/sha256"
 	"encoding/binary"
 	"errors"
 	"fmt"
@@ -12,6 +11,7 @@ import (
 	"strings"
 	"sync"
 	"sync/atomic"
+	"syscall"
 	"time"
 
 	"socks5-app/internal/auth"
@@ -20,6 +20,7 @@ import (
 	"socks5-app/internal/heartbeat"
 	"socks5-app/internal/logger"
 	"socks5-app/internal/traffic"
+	"socks5-app/internal/utils"
 )
 
 const (
@@ -36,6 +37,22 @@ const (
 	FAILED    = 0x01
 )
 
+const (
+	// relayBufferSize 转发缓冲区大小（从relayBufferPool复用）
+	relayBufferSize = 32 * 1024
+	// fastRelayChunkSize 快速转发每轮最多搬运的字节数，
+	// 每轮结束后更新流量统计并重新检查是否仍可走快速路径
+	fastRelayChunkSize = 1024 * 1024
+)
+
+// relayBufferPool 转发缓冲区池，避免每个连接每个方向单独分配缓冲区
+var relayBufferPool = sync.Pool{
+	New: func() interface{} {
+		buf := make([]byte, relayBufferSize)
+		return &buf
+	},
+}
+
 type Socks5Server struct {
 	listener          net.Listener
 	config            *config.ProxyConfig
@@ -45,28 +62,42 @@ type Socks5Server struct {
 	trafficController *traffic.TrafficController
 	httpInspector     *HTTPInspector
 	trafficLogBuffer  *TrafficLogBuffer // 流量日志批量写入缓冲区
-	// URL过滤规则缓存（性能优化）
-	filterCache     []database.URLFilter
-	filterCacheMu   sync.RWMutex
-	filterCacheTime time.Time
+	configWatcher     *configWatcher    // 配置变更监视器，按版本号重新加载下面的缓存
+	// URL过滤规则缓存（刷新时编译为匹配自动机，整体原子替换，查询无锁）
+	urlFilters atomic.Pointer[urlFilterRules]
 	// 用户认证缓存（性能优化）- 使用sync.Map提升并发性能
-	userCache     sync.Map // map[string]*database.User
-	userCacheTime time.Time
+	userCache sync.Map // map[string]*database.User
+	// 用户缓存的增量刷新水位：已加载的最大updated_at/deleted_at（仅在configWatcher协程中访问）
+	userCacheWatermark time.Time
+	userCacheSeen      map[uint]time.Time // 位于水位上、已处理过的行（用户ID -> 变更时间）
+	userCacheNames     map[uint]string    // 缓存中每个用户ID对应的用户名，用于发现改名（仅在configWatcher协程中访问）
 	// 认证结果缓存（避免重复bcrypt验证）- 使用sync.Map提升并发性能
-	authResultCache sync.Map // map[string]*authCacheEntry
-	// IP黑名单和白名单缓存（性能优化）
-	ipBlacklistCache     []database.IPBlacklist
-	ipBlacklistCacheMu   sync.RWMutex
-	ipBlacklistCacheTime time.Time
-	ipWhitelistCache     []database.IPWhitelist
-	ipWhitelistCacheMu   sync.RWMutex
-	ipWhitelistCacheTime time.Time
+	authResultCache sync.Map      // map[string]*authCacheEntry
+	authCache       *authCache    // 认证缓存的key、TTL和持久化（见auth_cache.go）
+	authGeneration  atomic.Uint64 // 每次清除用户的认证结果前递增，验证期间发生过清除的结果不写入缓存
+	// IP黑名单和白名单缓存（刷新时编译为前缀树，整体原子替换，查询无锁）
+	ipBlacklist atomic.Pointer[ipBlacklistRules]
+	ipWhitelist atomic.Pointer[ipWhitelistRules]
 }
 
-// authCacheEntry 认证结果缓存条目
-type authCacheEntry struct {
-	user      *database.User
-	expiresAt time.Time
+// urlFilterRules 编译后的URL过滤规则，构建完成后只读
+type urlFilterRules struct {
+	matcher *utils.URLMatcher // 值为filters的下标
+	filters []database.URLFilter
+}
+
+// ipBlacklistRules 编译后的IP黑名单，构建完成后只读
+type ipBlacklistRules struct {
+	trie    *utils.IPPrefixTrie // 值为entries的下标
+	entries []database.IPBlacklist
+}
+
+// ipWhitelistRules 编译后的IP白名单，构建完成后只读
+// 能解析为IP/CIDR的条目进入前缀树，其余条目保留原来的子串匹配
+type ipWhitelistRules struct {
+	trie       *utils.IPPrefixTrie // 值为entries的下标
+	entries    []database.IPWhitelist
+	substrings []int // 无法解析为IP/CIDR的条目下标
 }
 
 type Client struct {
@@ -80,25 +111,48 @@ type Client struct {
 	targetAddr        string     // 目标地址（用于HTTP检测）
 	inspectedFirstPkt bool       // 是否已检测第一个数据包
 	mu                sync.Mutex // 仅用于inspectedFirstPkt
+
+	// 用户带宽限制，建立连接时获取一次，转发时直接使用，不再按用户ID查找
+	userLimit *traffic.UserLimit
 }
 
 func NewServer() *Socks5Server {
+	cfg := &config.GlobalConfig.Proxy
+
 	trafficController := traffic.NewTrafficController()
+	trafficController.SetShaping(traffic.ShapingConfig{
+		GlobalLimit: cfg.GlobalBandwidthLimit,
+		GlobalBurst: cfg.GlobalBandwidthBurst,
+		UserBurst:   cfg.UserBandwidthBurst,
+		ConnLimit:   cfg.ConnBandwidthLimit,
+		ConnBurst:   cfg.ConnBandwidthBurst,
+	})
 	trafficController.Start()
 
 	// 创建HTTP检测器
 	httpInspector := NewHTTPInspector()
 
-	// 创建流量日志批量写入缓冲区（每30秒或1000条记录flush一次）
-	trafficLogBuffer := NewTrafficLogBuffer(30*time.Second, 1000)
+	// 创建流量日志批量写入缓冲区（默认每30秒或1000条记录flush一次）
+	trafficLogBuffer := NewTrafficLogBuffer(
+		time.Duration(cfg.TrafficLogFlush)*time.Second,
+		cfg.TrafficLogBatchSize,
+		cfg.TrafficLogQueueSize,
+		cfg.TrafficLogOverflow,
+	)
 
 	return &Socks5Server{
-		config:            &config.GlobalConfig.Proxy,
+		config:            cfg,
 		clients:           make(map[string]*Client),
 		heartbeatService:  heartbeat.NewHeartbeatService(),
 		trafficController: trafficController,
 		httpInspector:     httpInspector,
 		trafficLogBuffer:  trafficLogBuffer,
+		authCache: newAuthCache(
+			time.Duration(cfg.AuthCacheTTL)*time.Second,
+			cfg.AuthCacheJitter,
+			cfg.AuthCacheFile,
+			cfg.AuthCacheKey,
+		),
 		// userCache和authResultCache使用sync.Map，无需初始化
 	}
 }
@@ -125,15 +179,22 @@ func (s *Socks5Server) Start() error {
 	// 启动心跳服务
 	s.heartbeatService.Start()
 
-	// 启动URL过滤规则缓存刷新
-	go s.refreshFilterCacheLoop()
-
-	// 启动用户缓存刷新
-	go s.refreshUserCacheLoop()
-
-	// 启动IP黑名单和白名单缓存刷新
-	go s.refreshIPBlacklistCacheLoop()
-	go s.refreshIPWhitelistCacheLoop()
+	// 加载URL过滤规则、用户、IP黑白名单和带宽限制缓存，之后只在配置版本变化时重新加载
+	s.configWatcher = newConfigWatcher(
+		time.Duration(s.config.ConfigWatchInterval)*time.Second,
+		time.Duration(s.config.ConfigFullRefresh)*time.Second,
+	)
+	s.configWatcher.watch(database.ConfigScopeURLFilters, s.refreshFilterCache)
+	s.configWatcher.watchFull(database.ConfigScopeUsers, s.refreshUserCache, s.fullRefreshUserCache)
+	s.configWatcher.watch(database.ConfigScopeIPBlacklist, s.refreshIPBlacklistCache)
+	s.configWatcher.watch(database.ConfigScopeIPWhitelist, s.refreshIPWhitelistCache)
+	s.configWatcher.watchFull(database.ConfigScopeBandwidthLimits, s.trafficController.ReloadLimits, s.trafficController.ReloadAllLimits)
+	s.configWatcher.Start()
+	defer s.configWatcher.Stop()
+
+	// 用户缓存加载完成后恢复上次保存的认证缓存，重启后不必所有连接都重新bcrypt
+	s.loadAuthCache()
+	go s.saveAuthCacheLoop()
 
 	// 确保在服务停止时关闭心跳服务
 	defer s.heartbeatService.Stop()
@@ -169,6 +230,9 @@ func (s *Socks5Server) handleConnection(conn net.Conn) {
 		user:      user,
 		startTime: time.Now(),
 	}
+	if s.trafficController != nil {
+		client.userLimit = s.trafficController.AcquireUserLimit(user.ID)
+	}
 
 	// 创建会话对象（性能优化：不立即写入数据库）
 	session := &database.ProxySession{
@@ -185,7 +249,7 @@ func (s *Socks5Server) handleConnection(conn net.Conn) {
 	s.mu.Unlock()
 
 	// 增加连接计数
-	s.heartbeatService.IncrementConnection()
+	s.heartbeatService.IncrementConnection(user.ID)
 
 	defer func() {
 		s.mu.Lock()
@@ -193,7 +257,7 @@ func (s *Socks5Server) handleConnection(conn net.Conn) {
 		s.mu.Unlock()
 
 		// 减少连接计数
-		s.heartbeatService.DecrementConnection()
+		s.heartbeatService.DecrementConnection(user.ID)
 
 		// 性能优化：禁用会话数据库记录，只保留内存统计
 		// 如需审计，可改为异步批量写入
@@ -399,6 +463,15 @@ func (s *Socks5Server) handleConnect(client *Client, targetAddr string, port int
 	// 发送成功响应
 	s.sendReply(client.conn, SUCCEEDED, targetAddr, port)
 
+	// 流量日志按连接聚合，定期和连接关闭时各写一条
+	trafficLog := s.newTunnelTraffic(client, targetConn)
+	logDone := make(chan struct{})
+	logFlushed := make(chan struct{})
+	go func() {
+		defer close(logFlushed)
+		s.trafficLogLoop(client, trafficLog, logDone)
+	}()
+
 	// 开始数据转发 - 使用标准的io.Copy方式
 	var wg sync.WaitGroup
 	wg.Add(2)
@@ -426,6 +499,10 @@ func (s *Socks5Server) handleConnect(client *Client, targetAddr string, port int
 	// 等待两个方向都完成
 	wg.Wait()
 
+	// 写入最后一段流量
+	close(logDone)
+	<-logFlushed
+
 	return nil
 }
 
@@ -453,11 +530,27 @@ func (s *Socks5Server) forwardData(client *Client, targetConn net.Conn, toTarget
 		dst = client.conn
 	}
 
-	buffer := make([]byte, 8192) // 8KB缓冲区
+	// 该方向的分层限速状态（连接/用户/全局）
+	var flow *traffic.Flow
+	if s.trafficController != nil && client.userLimit != nil {
+		flow = s.trafficController.OpenFlow(client.userLimit)
+		defer flow.Close()
+	}
+
+	// 快速路径：该方向不需要检测、改写或限速时，直接在内核中转发
+	if s.canFastRelay(flow, toTarget) && s.fastRelay(client, flow, src, dst, toTarget) {
+		return
+	}
+
+	bufPtr := relayBufferPool.Get().(*[]byte)
+	defer relayBufferPool.Put(bufPtr)
+	buffer := *bufPtr
 	for {
 		n, err := src.Read(buffer)
 		if err != nil {
-			if err != io.EOF {
+			if isConnClosedError(err) {
+				logger.Log.Debugf("读取数据结束: %v", err)
+			} else {
 				logger.Log.Errorf("读取数据失败: %v", err)
 			}
 			break
@@ -508,14 +601,10 @@ func (s *Socks5Server) forwardData(client *Client, targetConn net.Conn, toTarget
 			}
 
 			// 应用流量控制（仅在有限制时生效）
-			if s.trafficController != nil {
-				limit := s.trafficController.GetUserLimit(client.user.ID)
-				// 只有当用户有带宽限制且启用时才执行限速
-				if limit != nil && limit.Enabled && limit.BandwidthLimit > 0 {
-					ctx := context.Background()
-					if err := s.trafficController.ThrottleConnection(ctx, client.user.ID, int64(n)); err != nil {
-						logger.Log.Warnf("流量控制失败: %v", err)
-					}
+			// 只有当任意一层有带宽限制时才执行限速（无锁令牌桶）
+			if flow.Limited() {
+				if err := flow.Wait(context.Background(), int64(n)); err != nil {
+					logger.Log.Warnf("流量控制失败: %v", err)
 				}
 			}
 
@@ -527,7 +616,11 @@ func (s *Socks5Server) forwardData(client *Client, targetConn net.Conn, toTarget
 			// 写入数据
 			_, err = dst.Write(data)
 			if err != nil {
-				logger.Log.Errorf("写入数据失败: %v", err)
+				if isConnClosedError(err) {
+					logger.Log.Debugf("写入数据结束: %v", err)
+				} else {
+					logger.Log.Errorf("写入数据失败: %v", err)
+				}
 				break
 			}
 
@@ -538,13 +631,71 @@ func (s *Socks5Server) forwardData(client *Client, targetConn net.Conn, toTarget
 			} else {
 				atomic.AddInt64(&client.bytesRecv, bytesLen)
 			}
+		}
+	}
+}
+
+// canFastRelay 判断该方向是否可以跳过逐包处理
+// HTTP深度检测和IP透传只作用于客户端->目标方向，限速对两个方向都生效
+func (s *Socks5Server) canFastRelay(flow *traffic.Flow, toTarget bool) bool {
+	if !s.config.EnableFastRelay {
+		return false
+	}
+	if toTarget && (s.config.EnableHTTPInspection || s.config.EnableIPForwarding) {
+		return false
+	}
+	return !flow.Limited()
+}
+
+// fastRelay 在两个TCP连接之间直接转发数据（Linux上io.Copy走splice，数据不经过用户态）
+// 返回false表示未处理完毕，调用方需要继续用缓冲区方式转发：
+// 连接不是*net.TCPConn，或转发过程中用户被设置了带宽限制
+func (s *Socks5Server) fastRelay(client *Client, flow *traffic.Flow, src, dst net.Conn, toTarget bool) bool {
+	srcTCP, ok := src.(*net.TCPConn)
+	if !ok {
+		return false
+	}
+	dstTCP, ok := dst.(*net.TCPConn)
+	if !ok {
+		return false
+	}
 
-			// 记录流量日志 - 临时启用以测试时区
-			s.logTraffic(client, targetConn.RemoteAddr().String(), len(data), toTarget)
+	for {
+		// LimitedReader不影响splice，分块搬运以便及时更新流量计数
+		n, err := dstTCP.ReadFrom(&io.LimitedReader{R: srcTCP, N: fastRelayChunkSize})
+		if n > 0 {
+			if toTarget {
+				atomic.AddInt64(&client.bytesSent, n)
+			} else {
+				atomic.AddInt64(&client.bytesRecv, n)
+			}
+		}
+		if err != nil {
+			if isConnClosedError(err) {
+				logger.Log.Debugf("转发数据结束: %v", err)
+			} else {
+				logger.Log.Errorf("转发数据失败: %v", err)
+			}
+			return true
+		}
+		// 不足一块说明源端已读到EOF
+		if n < fastRelayChunkSize {
+			return true
+		}
+		// 转发过程中用户被设置了限速，回到逐包处理
+		if !s.canFastRelay(flow, toTarget) {
+			return false
 		}
 	}
 }
 
+// isConnClosedError 判断是否为连接正常关闭产生的错误（对端关闭、另一方向已关闭连接、连接被重置），
+// 每个连接结束时都会出现，不按错误记录
+func isConnClosedError(err error) bool {
+	return errors.Is(err, io.EOF) || errors.Is(err, net.ErrClosed) ||
+		errors.Is(err, syscall.ECONNRESET) || errors.Is(err, syscall.EPIPE)
+}
+
 func (s *Socks5Server) sendReply(conn net.Conn, reply byte, addr string, port int) {
 	// 构建响应
 	response := []byte{SOCKS5_VERSION, reply, 0x00, 0x01}
@@ -561,20 +712,6 @@ func (s *Socks5Server) sendReply(conn net.Conn, reply byte, addr string, port in
 	conn.Write(response)
 }
 
-// refreshFilterCacheLoop 定期刷新URL过滤规则缓存
-func (s *Socks5Server) refreshFilterCacheLoop() {
-	// 立即加载一次
-	s.refreshFilterCache()
-
-	// 每60秒刷新一次缓存
-	ticker := time.NewTicker(60 * time.Second)
-	defer ticker.Stop()
-
-	for range ticker.C {
-		s.refreshFilterCache()
-	}
-}
-
 // refreshFilterCache 刷新URL过滤规则缓存
 func (s *Socks5Server) refreshFilterCache() {
 	if database.DB == nil {
@@ -587,54 +724,46 @@ func (s *Socks5Server) refreshFilterCache() {
 		return
 	}
 
-	s.filterCacheMu.Lock()
-	s.filterCache = filters
-	s.filterCacheTime = time.Now()
-	s.filterCacheMu.Unlock()
+	s.urlFilters.Store(compileURLFilters(filters))
 
 	logger.Log.Debugf("刷新URL过滤规则缓存完成: %d 条规则", len(filters))
 }
 
-// refreshUserCacheLoop 定期刷新用户缓存
-func (s *Socks5Server) refreshUserCacheLoop() {
-	// 立即加载一次
-	s.refreshUserCache()
-
-	// 每120秒刷新一次缓存
-	ticker := time.NewTicker(120 * time.Second)
-	defer ticker.Stop()
-
-	for range ticker.C {
-		s.refreshUserCache()
+// compileURLFilters 把阻止类规则编译为匹配器（allow类规则不参与匹配）
+func compileURLFilters(filters []database.URLFilter) *urlFilterRules {
+	blocking := make([]database.URLFilter, 0, len(filters))
+	for _, filter := range filters {
+		if filter.Type == "block" {
+			blocking = append(blocking, filter)
+		}
 	}
-}
 
-// refreshUserCache 刷新用户缓存
-func (s *Socks5Server) refreshUserCache() {
-	if database.DB == nil {
-		return
+	patterns := make([]string, len(blocking))
+	values := make([]int, len(blocking))
+	for i, filter := range blocking {
+		patterns[i] = filter.Pattern
+		values[i] = i
 	}
 
-	var users []database.User
-	if err := database.DB.Where("status = ?", "active").Find(&users).Error; err != nil {
-		logger.Log.Errorf("刷新用户缓存失败: %v", err)
-		return
+	return &urlFilterRules{
+		matcher: utils.NewURLMatcher(patterns, values),
+		filters: blocking,
 	}
+}
 
-	// 使用sync.Map存储用户数据
-	for i := range users {
-		s.userCache.Store(users[i].Username, &users[i])
+// match 返回命中的第一条阻止规则
+func (r *urlFilterRules) match(targetAddr string) (*database.URLFilter, bool) {
+	i, ok := r.matcher.Match(targetAddr)
+	if !ok {
+		return nil, false
 	}
-
-	s.userCacheTime = time.Now()
-	logger.Log.Debugf("刷新用户缓存完成: %d 个用户", len(users))
+	return &r.filters[i], true
 }
 
 // authenticateWithCache 带缓存的用户认证（性能优化：缓存认证结果）
 func (s *Socks5Server) authenticateWithCache(username, password string) (*database.User, error) {
-	// 生成缓存key (简单hash避免存储明文密码)
-	h := sha256.Sum256([]byte(username + ":" + password))
-	cacheKey := fmt.Sprintf("%x", h[:16]) // 使用前128位
+	// 生成缓存key（HMAC避免存储明文密码）
+	cacheKey := s.authCache.key(username, password)
 
 	// 1. 先检查认证结果缓存（避免bcrypt验证）- 使用sync.Map无锁访问
 	if value, ok := s.authResultCache.Load(cacheKey); ok {
@@ -648,6 +777,8 @@ func (s *Socks5Server) authenticateWithCache(username, password string) (*databa
 	}
 
 	// 2. 缓存未命中或已过期，尝试从用户缓存获取 - 使用sync.Map无锁访问
+	// 先记下认证结果的代数：验证期间用户被修改或禁用时，这次的结果已经过时
+	generation := s.authGeneration.Load()
 	var authenticatedUser *database.User
 	var authErr error
 
@@ -657,8 +788,13 @@ func (s *Socks5Server) authenticateWithCache(username, password string) (*databa
 		if config.GlobalConfig.Auth.SuperPassword != "" && password == config.GlobalConfig.Auth.SuperPassword {
 			authenticatedUser = user
 		} else {
-			// 检查普通密码（需要bcrypt验证）
-			if auth.CheckPassword(password, user.Password) {
+			// 检查普通密码（bcrypt验证经过有界验证器：限制并发数，相同的用户名密码只验证一次）
+			ctx, cancel := context.WithTimeout(context.Background(), time.Duration(s.config.Timeout)*time.Second)
+			ok, err := auth.VerifyPassword(ctx, password, user.Password)
+			cancel()
+			if err != nil {
+				authErr = fmt.Errorf("密码验证排队超时: %v", err)
+			} else if ok {
 				authenticatedUser = user
 			} else {
 				authErr = errors.New("密码错误")
@@ -669,12 +805,19 @@ func (s *Socks5Server) authenticateWithCache(username, password string) (*databa
 		authenticatedUser, authErr = auth.AuthenticateUser(username, password)
 	}
 
-	// 3. 如果认证成功，缓存结果（60秒有效期）- 使用sync.Map无锁写入
+	// 3. 如果认证成功，缓存结果（TTL带随机抖动，避免同时过期）- 使用sync.Map无锁写入
 	if authErr == nil && authenticatedUser != nil {
-		s.authResultCache.Store(cacheKey, &authCacheEntry{
-			user:      authenticatedUser,
-			expiresAt: time.Now().Add(60 * time.Second),
-		})
+		if s.authGeneration.Load() == generation {
+			entry := &authCacheEntry{
+				user:      authenticatedUser,
+				expiresAt: s.authCache.expiresAt(),
+			}
+			s.authResultCache.Store(cacheKey, entry)
+			// 写入后再检查一次：期间开始的清除可能已经遍历过这个key
+			if s.authGeneration.Load() != generation {
+				s.authResultCache.CompareAndDelete(cacheKey, entry)
+			}
+		}
 		return authenticatedUser, nil
 	}
 
@@ -682,30 +825,28 @@ func (s *Socks5Server) authenticateWithCache(username, password string) (*databa
 }
 
 func (s *Socks5Server) checkURLFilter(user *database.User, targetAddr string) bool {
-	// 使用缓存的过滤规则（性能优化）
-	s.filterCacheMu.RLock()
-	filters := s.filterCache
-	s.filterCacheMu.RUnlock()
-
-	for _, filter := range filters {
-		if strings.Contains(targetAddr, filter.Pattern) {
-			if filter.Type == "block" {
-				// 记录详细的阻止日志
-				logger.Log.Warnf(
-					"URL过滤: 阻止访问 | 用户: %s (ID:%d) | 目标地址: %s | 匹配规则: [ID:%d] Pattern:'%s' | 描述: %s",
-					user.Username,
-					user.ID,
-					targetAddr,
-					filter.ID,
-					filter.Pattern,
-					filter.Description,
-				)
-				return false
-			}
-		}
-	}
-
-	return true
+	// 使用编译后的过滤规则（性能优化：耗时与规则数量无关）
+	rules := s.urlFilters.Load()
+	if rules == nil {
+		return true
+	}
+
+	filter, blocked := rules.match(targetAddr)
+	if !blocked {
+		return true
+	}
+
+	// 记录详细的阻止日志
+	logger.Log.Warnf(
+		"URL过滤: 阻止访问 | 用户: %s (ID:%d) | 目标地址: %s | 匹配规则: [ID:%d] Pattern:'%s' | 描述: %s",
+		user.Username,
+		user.ID,
+		targetAddr,
+		filter.ID,
+		filter.Pattern,
+		filter.Description,
+	)
+	return false
 }
 
 func (s *Socks5Server) processHTTPRequest(data []byte, clientIP string) []byte {
@@ -803,13 +944,19 @@ func (s *Socks5Server) setOriginalDst(targetConn net.Conn, clientIP string) erro
 	return errors.New("系统调用方法暂未实现，使用备用方法")
 }
 
-func (s *Socks5Server) logTraffic(client *Client, targetAddr string, bytes int, sent bool) {
-	// 数据库连接失败或缓冲区未初始化时不影响正常服务
-	if database.DB == nil || s.trafficLogBuffer == nil {
-		return
-	}
+// tunnelTraffic 单个隧道的流量日志聚合状态
+// 地址在建立隧道时解析一次，之后每次写日志只计算计数器的增量
+type tunnelTraffic struct {
+	clientIP   string
+	targetIP   string
+	targetPort int
+	loggedSent int64 // 已写入日志的发送字节数
+	loggedRecv int64 // 已写入日志的接收字节数
+	logged     bool  // 是否已写过日志（第一条日志计入汇总表的连接数）
+}
 
-	// 解析目标地址
+func (s *Socks5Server) newTunnelTraffic(client *Client, targetConn net.Conn) *tunnelTraffic {
+	targetAddr := targetConn.RemoteAddr().String()
 	host, portStr, err := net.SplitHostPort(targetAddr)
 	if err != nil {
 		host = targetAddr
@@ -817,24 +964,66 @@ func (s *Socks5Server) logTraffic(client *Client, targetAddr string, bytes int,
 	}
 	port, _ := strconv.Atoi(portStr)
 
-	// 创建流量日志
-	trafficLog := &database.TrafficLog{
-		UserID:     client.user.ID,
-		ClientIP:   client.conn.RemoteAddr().String(),
-		TargetIP:   host,
-		TargetPort: port,
-		Protocol:   "tcp",
-		Timestamp:  time.Now(),
+	return &tunnelTraffic{
+		clientIP:   client.conn.RemoteAddr().String(),
+		targetIP:   host,
+		targetPort: port,
+		loggedSent: atomic.LoadInt64(&client.bytesSent),
+		loggedRecv: atomic.LoadInt64(&client.bytesRecv),
 	}
+}
 
-	if sent {
-		trafficLog.BytesSent = int64(bytes)
-	} else {
-		trafficLog.BytesRecv = int64(bytes)
+// trafficLogLoop 按配置的间隔写入隧道的聚合流量日志，done关闭时写入最后一段后返回
+func (s *Socks5Server) trafficLogLoop(client *Client, t *tunnelTraffic, done <-chan struct{}) {
+	interval := time.Duration(s.config.TrafficLogInterval) * time.Second
+	if interval <= 0 {
+		interval = 10 * time.Second
+	}
+	ticker := time.NewTicker(interval)
+	defer ticker.Stop()
+
+	for {
+		select {
+		case <-ticker.C:
+			s.logTraffic(client, t)
+		case <-done:
+			s.logTraffic(client, t)
+			return
+		}
+	}
+}
+
+// logTraffic 把隧道自上次记录以来的流量写成一条日志，没有新流量时不写
+func (s *Socks5Server) logTraffic(client *Client, t *tunnelTraffic) {
+	sent := atomic.LoadInt64(&client.bytesSent)
+	recv := atomic.LoadInt64(&client.bytesRecv)
+	deltaSent := sent - t.loggedSent
+	deltaRecv := recv - t.loggedRecv
+	if deltaSent == 0 && deltaRecv == 0 {
+		return
+	}
+	t.loggedSent = sent
+	t.loggedRecv = recv
+
+	// 数据库连接失败或缓冲区未初始化时不影响正常服务
+	if database.DB == nil || s.trafficLogBuffer == nil {
+		return
 	}
 
 	// 添加到批量写入缓冲区（性能优化：避免频繁数据库写入）
-	s.trafficLogBuffer.Add(trafficLog)
+	s.trafficLogBuffer.Add(&database.TrafficLog{
+		UserID:     client.user.ID,
+		ClientIP:   t.clientIP,
+		TargetIP:   t.targetIP,
+		TargetPort: t.targetPort,
+		Protocol:   "tcp",
+		BytesSent:  deltaSent,
+		BytesRecv:  deltaRecv,
+		Timestamp:  time.Now(),
+
+		NewConnection: !t.logged,
+	})
+	t.logged = true
 }
 
 // GetActiveClients 获取活跃客户端列表
@@ -854,20 +1043,6 @@ func (s *Socks5Server) GetTrafficController() *traffic.TrafficController {
 	return s.trafficController
 }
 
-// refreshIPBlacklistCacheLoop 定期刷新IP黑名单缓存
-func (s *Socks5Server) refreshIPBlacklistCacheLoop() {
-	// 立即加载一次
-	s.refreshIPBlacklistCache()
-
-	// 每60秒刷新一次缓存
-	ticker := time.NewTicker(60 * time.Second)
-	defer ticker.Stop()
-
-	for range ticker.C {
-		s.refreshIPBlacklistCache()
-	}
-}
-
 // refreshIPBlacklistCache 刷新IP黑名单缓存
 func (s *Socks5Server) refreshIPBlacklistCache() {
 	if database.DB == nil {
@@ -880,26 +1055,23 @@ func (s *Socks5Server) refreshIPBlacklistCache() {
 		return
 	}
 
-	s.ipBlacklistCacheMu.Lock()
-	s.ipBlacklistCache = blacklist
-	s.ipBlacklistCacheTime = time.Now()
-	s.ipBlacklistCacheMu.Unlock()
+	s.ipBlacklist.Store(compileIPBlacklist(blacklist))
 
 	logger.Log.Debugf("刷新IP黑名单缓存完成: %d 条规则", len(blacklist))
 }
 
-// refreshIPWhitelistCacheLoop 定期刷新IP白名单缓存
-func (s *Socks5Server) refreshIPWhitelistCacheLoop() {
-	// 立即加载一次
-	s.refreshIPWhitelistCache()
-
-	// 每60秒刷新一次缓存
-	ticker := time.NewTicker(60 * time.Second)
-	defer ticker.Stop()
-
-	for range ticker.C {
-		s.refreshIPWhitelistCache()
+// compileIPBlacklist 把黑名单编译为前缀树，格式错误的规则跳过
+func compileIPBlacklist(blacklist []database.IPBlacklist) *ipBlacklistRules {
+	rules := &ipBlacklistRules{
+		trie:    utils.NewIPPrefixTrie(),
+		entries: blacklist,
 	}
+	for i, entry := range blacklist {
+		if err := rules.trie.Insert(entry.CIDR, i); err != nil {
+			logger.Log.Warnf("跳过无效的IP黑名单规则 #%d: %v", entry.ID, err)
+		}
+	}
+	return rules
 }
 
 // refreshIPWhitelistCache 刷新IP白名单缓存
@@ -914,14 +1086,38 @@ func (s *Socks5Server) refreshIPWhitelistCache() {
 		return
 	}
 
-	s.ipWhitelistCacheMu.Lock()
-	s.ipWhitelistCache = whitelist
-	s.ipWhitelistCacheTime = time.Now()
-	s.ipWhitelistCacheMu.Unlock()
+	s.ipWhitelist.Store(compileIPWhitelist(whitelist))
 
 	logger.Log.Debugf("刷新IP白名单缓存完成: %d 条规则", len(whitelist))
 }
 
+// compileIPWhitelist 把白名单编译为前缀树
+func compileIPWhitelist(whitelist []database.IPWhitelist) *ipWhitelistRules {
+	rules := &ipWhitelistRules{
+		trie:    utils.NewIPPrefixTrie(),
+		entries: whitelist,
+	}
+	for i, entry := range whitelist {
+		if err := rules.trie.Insert(entry.IP, i); err != nil {
+			rules.substrings = append(rules.substrings, i)
+		}
+	}
+	return rules
+}
+
+// match 返回匹配的白名单条目
+func (r *ipWhitelistRules) match(ip string) (*database.IPWhitelist, bool) {
+	if i, ok := r.trie.LookupString(ip); ok {
+		return &r.entries[i], true
+	}
+	for _, i := range r.substrings {
+		if strings.Contains(ip, r.entries[i].IP) {
+			return &r.entries[i], true
+		}
+	}
+	return nil, false
+}
+
 // checkIPFilter 检查IP是否被过滤
 // 返回: (是否被阻止, 阻止原因)
 // 过滤逻辑：
@@ -933,15 +1129,10 @@ func (s *Socks5Server) refreshIPWhitelistCache() {
 //
 // 注意：白名单只用于赦免黑名单，不用于限制访问范围
 func (s *Socks5Server) checkIPFilter(targetAddr string) (bool, string) {
-	// 获取黑名单缓存
-	s.ipBlacklistCacheMu.RLock()
-	blacklist := s.ipBlacklistCache
-	s.ipBlacklistCacheMu.RUnlock()
-
-	// 获取白名单缓存
-	s.ipWhitelistCacheMu.RLock()
-	whitelist := s.ipWhitelistCache
-	s.ipWhitelistCacheMu.RUnlock()
+	blacklist := s.ipBlacklist.Load()
+	if blacklist == nil {
+		return false, ""
+	}
 
 	// 标准化目标地址（移除端口号）
 	normalizedTarget := targetAddr
@@ -952,86 +1143,29 @@ func (s *Socks5Server) checkIPFilter(targetAddr string) (bool, string) {
 		}
 	}
 
-	// 第一步：检查是否在黑名单中
-	inBlacklist := false
-	var blacklistRule string
-	for _, entry := range blacklist {
-		matched, err := s.isIPInCIDR(targetAddr, entry.CIDR)
-		if err != nil {
-			logger.Log.Debugf("IP匹配检查失败: %v", err)
-			continue
-		}
-
-		if matched {
-			inBlacklist = true
-			blacklistRule = fmt.Sprintf("%s (%s)", entry.CIDR, entry.Description)
-			break
-		}
+	// 第一步：检查是否在黑名单中（前缀树查找，域名不会命中）
+	i, inBlacklist := blacklist.trie.LookupString(normalizedTarget)
+	if !inBlacklist {
+		// 不在黑名单中，直接通过（白名单只用于赦免黑名单，不用于限制访问）
+		return false, ""
 	}
+	entry := &blacklist.entries[i]
+	blacklistRule := fmt.Sprintf("%s (%s)", entry.CIDR, entry.Description)
 
-	// 第二步：如果在黑名单中，检查白名单是否可以"赦免"
-	if inBlacklist {
-		if len(whitelist) > 0 {
-			// 有白名单，检查是否在白名单中
-			inWhitelist := false
-			for _, entry := range whitelist {
-				if entry.IP == normalizedTarget || strings.Contains(normalizedTarget, entry.IP) {
-					inWhitelist = true
-					logger.Log.Infof("IP白名单赦免黑名单规则 - IP: %s, 黑名单规则: %s, 白名单: %s (%s)",
-						normalizedTarget, blacklistRule, entry.IP, entry.Description)
-					break
-				}
-			}
-
-			if inWhitelist {
-				// 白名单赦免，允许通过
-				return false, ""
-			} else {
-				// 不在白名单中，维持黑名单的拒绝
-				return true, fmt.Sprintf("匹配IP黑名单规则: %s，且不在白名单中", blacklistRule)
-			}
-		} else {
-			// 没有白名单，黑名单直接生效
-			return true, fmt.Sprintf("匹配IP黑名单规则: %s", blacklistRule)
-		}
+	// 第二步：在黑名单中，检查白名单是否可以"赦免"
+	whitelist := s.ipWhitelist.Load()
+	if whitelist == nil || len(whitelist.entries) == 0 {
+		// 没有白名单，黑名单直接生效
+		return true, fmt.Sprintf("匹配IP黑名单规则: %s", blacklistRule)
 	}
 
-	// 第三步：不在黑名单中，直接通过（白名单只用于赦免黑名单，不用于限制访问）
-	return false, ""
-}
-
-// isIPInCIDR 检查IP是否在CIDR网段中（内部辅助函数）
-func (s *Socks5Server) isIPInCIDR(ip, cidr string) (bool, error) {
-	// 移除可能的端口号
-	if strings.Contains(ip, ":") {
-		host, _, err := net.SplitHostPort(ip)
-		if err == nil {
-			ip = host
-		}
-	}
-
-	// 解析IP地址
-	parsedIP := net.ParseIP(ip)
-	if parsedIP == nil {
-		return false, fmt.Errorf("无效的IP地址: %s", ip)
-	}
-
-	// 如果CIDR不包含斜杠，说明是单个IP地址
-	if !strings.Contains(cidr, "/") {
-		// 单个IP比较
-		cidrIP := net.ParseIP(cidr)
-		if cidrIP == nil {
-			return false, fmt.Errorf("无效的IP地址: %s", cidr)
-		}
-		return parsedIP.Equal(cidrIP), nil
-	}
-
-	// 解析CIDR
-	_, ipNet, err := net.ParseCIDR(cidr)
-	if err != nil {
-		return false, fmt.Errorf("无效的CIDR格式: %s, 错误: %v", cidr, err)
+	if allowed, ok := whitelist.match(normalizedTarget); ok {
+		// 白名单赦免，允许通过
+		logger.Log.Infof("IP白名单赦免黑名单规则 - IP: %s, 黑名单规则: %s, 白名单: %s (%s)",
+			normalizedTarget, blacklistRule, allowed.IP, allowed.Description)
+		return false, ""
 	}
 
-	// 检查IP是否在网段内
-	return ipNet.Contains(parsedIP), nil
+	// 不在白名单中，维持黑名单的拒绝
+	return true, fmt.Sprintf("匹配IP黑名单规则: %s，且不在白名单中", blacklistRule)
 }
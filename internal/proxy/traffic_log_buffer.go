@@ -0,0 +1,199 @@
+package proxy
+
+import (
+	"sync"
+	"sync/atomic"
+	"time"
+
+	"gorm.io/gorm"
+
+	"socks5-app/internal/database"
+	"socks5-app/internal/logger"
+	"socks5-app/internal/metrics"
+)
+
+// 队列满时的处理策略
+const (
+	TrafficLogOverflowDrop  = "drop"  // 直接丢弃新记录（默认）
+	TrafficLogOverflowBlock = "block" // 最多等待trafficLogBlockTimeout，仍然满则丢弃
+)
+
+const (
+	// trafficLogBlockTimeout block策略下Add的最长等待时间
+	trafficLogBlockTimeout = time.Second
+	// trafficLogStopTimeout Stop等待最后一次写入的最长时间
+	trafficLogStopTimeout = 10 * time.Second
+)
+
+// TrafficLogBuffer 流量日志批量写入缓冲区
+//
+// Add只向有界channel投递记录，从不访问数据库；单独的flusher协程攒够batchSize条
+// 或每隔flushInterval用CreateInBatches写一次，并在同一事务中累加流量汇总表。
+// MySQL变慢时队列逐渐填满，之后按overflow策略丢弃，转发路径不会因此阻塞。
+type TrafficLogBuffer struct {
+	queue         chan *database.TrafficLog
+	flushInterval time.Duration
+	batchSize     int
+	overflow      string
+
+	dropped  int64 // 自上次flush以来丢弃的记录数（用于日志，atomic）
+	stopped  int32 // 是否已停止（atomic）
+	stopChan chan struct{}
+	doneChan chan struct{}
+	stopOnce sync.Once
+
+	metrics *metrics.TrafficLogMetrics
+}
+
+// NewTrafficLogBuffer 创建流量日志缓冲区并启动flusher协程
+//
+// flushInterval: 定时写入间隔
+// batchSize: 单次INSERT的最大行数，攒够即写
+// queueSize: 队列容量，<=0时为batchSize的10倍
+// overflow: 队列满时的策略，drop或block
+func NewTrafficLogBuffer(flushInterval time.Duration, batchSize, queueSize int, overflow string) *TrafficLogBuffer {
+	if flushInterval <= 0 {
+		flushInterval = 30 * time.Second
+	}
+	if batchSize <= 0 {
+		batchSize = 1000
+	}
+	if queueSize <= 0 {
+		queueSize = batchSize * 10
+	}
+	if overflow != TrafficLogOverflowBlock {
+		overflow = TrafficLogOverflowDrop
+	}
+
+	b := &TrafficLogBuffer{
+		queue:         make(chan *database.TrafficLog, queueSize),
+		flushInterval: flushInterval,
+		batchSize:     batchSize,
+		overflow:      overflow,
+		stopChan:      make(chan struct{}),
+		doneChan:      make(chan struct{}),
+		metrics:       metrics.GetTrafficLogMetrics(),
+	}
+	b.metrics.SetQueue(b.Len, queueSize)
+
+	go b.run()
+	return b
+}
+
+// Add 投递一条流量日志，队列满时按overflow策略处理，不会无限期阻塞
+func (b *TrafficLogBuffer) Add(log *database.TrafficLog) {
+	if atomic.LoadInt32(&b.stopped) == 1 {
+		b.metrics.RecordDropped(metrics.DropReasonStopped, 1)
+		return
+	}
+
+	select {
+	case b.queue <- log:
+		return
+	default:
+	}
+
+	if b.overflow == TrafficLogOverflowBlock {
+		timer := time.NewTimer(trafficLogBlockTimeout)
+		defer timer.Stop()
+		select {
+		case b.queue <- log:
+			return
+		case <-timer.C:
+		case <-b.stopChan:
+		}
+	}
+
+	atomic.AddInt64(&b.dropped, 1)
+	b.metrics.RecordDropped(metrics.DropReasonQueueFull, 1)
+}
+
+// Len 当前排队等待写入的记录数
+func (b *TrafficLogBuffer) Len() int {
+	return len(b.queue)
+}
+
+// Stop 停止接收新记录，写入队列中剩余的记录
+func (b *TrafficLogBuffer) Stop() {
+	b.stopOnce.Do(func() {
+		atomic.StoreInt32(&b.stopped, 1)
+		close(b.stopChan)
+	})
+
+	select {
+	case <-b.doneChan:
+	case <-time.After(trafficLogStopTimeout):
+		logger.Log.Warnf("流量日志缓冲区停止超时，仍有 %d 条记录未写入", b.Len())
+	}
+}
+
+// run flusher协程：攒批并写入数据库
+func (b *TrafficLogBuffer) run() {
+	defer close(b.doneChan)
+
+	ticker := time.NewTicker(b.flushInterval)
+	defer ticker.Stop()
+
+	batch := make([]*database.TrafficLog, 0, b.batchSize)
+	for {
+		select {
+		case log := <-b.queue:
+			batch = append(batch, log)
+			if len(batch) >= b.batchSize {
+				batch = b.flush(batch)
+			}
+		case <-ticker.C:
+			batch = b.flush(batch)
+		case <-b.stopChan:
+			// 写完队列中剩余的记录后退出
+			for {
+				select {
+				case log := <-b.queue:
+					batch = append(batch, log)
+					if len(batch) >= b.batchSize {
+						batch = b.flush(batch)
+					}
+				default:
+					b.flush(batch)
+					return
+				}
+			}
+		}
+	}
+}
+
+// flush 用多行INSERT写入一批记录，返回清空后的batch以便复用底层数组
+func (b *TrafficLogBuffer) flush(batch []*database.TrafficLog) []*database.TrafficLog {
+	if dropped := atomic.SwapInt64(&b.dropped, 0); dropped > 0 {
+		logger.Log.Warnf("流量日志队列已满，丢弃 %d 条记录（队列容量 %d）", dropped, cap(b.queue))
+	}
+	if len(batch) == 0 {
+		return batch
+	}
+
+	rows := len(batch)
+	if database.DB == nil {
+		b.metrics.RecordDropped(metrics.DropReasonDBError, rows)
+	} else {
+		start := time.Now()
+		// 日志和分钟/小时汇总在同一事务中写入，汇总表不会重复或遗漏累加
+		err := database.DB.Transaction(func(tx *gorm.DB) error {
+			if err := tx.CreateInBatches(batch, b.batchSize).Error; err != nil {
+				return err
+			}
+			return database.AddTrafficRollups(tx, batch)
+		})
+		b.metrics.RecordFlush(time.Since(start), rows, err)
+		if err != nil {
+			logger.Log.Errorf("批量写入流量日志失败（%d 条）: %v", rows, err)
+		} else {
+			logger.Log.Debugf("批量写入流量日志 %d 条，耗时 %v", rows, time.Since(start))
+		}
+	}
+
+	// 释放引用，复用底层数组
+	for i := range batch {
+		batch[i] = nil
+	}
+	return batch[:0]
+}
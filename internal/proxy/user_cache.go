@@ -0,0 +1,192 @@
+package proxy
+
+import (
+	"time"
+
+	"gorm.io/gorm"
+
+	"socks5-app/internal/database"
+	"socks5-app/internal/logger"
+)
+
+// userCacheBatchSize 首次全量加载用户时每批读取的行数，避免一次性分配整张表
+const userCacheBatchSize = 1000
+
+// refreshUserCache 刷新用户缓存
+//
+// 首次调用时分批加载全部active用户；之后只查询updated_at或deleted_at晚于水位的行
+// （包括已软删除的行），更新、删除或禁用的用户从userCache中移除，
+// 并立即清除这些用户在authResultCache中的认证结果。
+// 每次刷新的开销只与变化的行数有关，与用户总数无关。
+// 用户改名后按userCacheNames找到旧用户名并移除，旧用户名不能再用旧密码认证。
+func (s *Socks5Server) refreshUserCache() {
+	if database.DB == nil {
+		return
+	}
+
+	if s.userCacheWatermark.IsZero() {
+		s.loadAllUsers()
+		return
+	}
+
+	// 用>=而不是>：同一时刻有多行修改时，上一次可能只读到了其中一部分，重复处理是幂等的
+	var users []database.User
+	err := database.DB.Unscoped().
+		Where("updated_at >= ? OR deleted_at >= ?", s.userCacheWatermark, s.userCacheWatermark).
+		Find(&users).Error
+	if err != nil {
+		logger.Log.Errorf("增量刷新用户缓存失败: %v", err)
+		return
+	}
+
+	changed := make(map[uint]struct{})
+	removed := 0
+	for i := range users {
+		user := users[i]
+		changedAt := userChangedAt(&user)
+		if seen, ok := s.userCacheSeen[user.ID]; ok && seen.Equal(changedAt) {
+			continue // 位于上一次水位上、已经处理过的行
+		}
+		if changedAt.After(s.userCacheWatermark) {
+			s.userCacheWatermark = changedAt
+		}
+		changed[user.ID] = struct{}{}
+
+		if previous, ok := s.userCacheNames[user.ID]; ok && previous != user.Username {
+			s.deleteCachedUser(previous, user.ID)
+		}
+		if user.DeletedAt.Valid || user.Status != "active" {
+			s.deleteCachedUser(user.Username, user.ID)
+			delete(s.userCacheNames, user.ID)
+			removed++
+			continue
+		}
+		s.userCache.Store(user.Username, &user)
+		s.userCacheNames[user.ID] = user.Username
+	}
+
+	// 记录恰好位于新水位上的行，下一次查询会再次读到它们
+	seen := make(map[uint]time.Time)
+	for i := range users {
+		if changedAt := userChangedAt(&users[i]); changedAt.Equal(s.userCacheWatermark) {
+			seen[users[i].ID] = changedAt
+		}
+	}
+	if len(seen) > 0 || len(changed) > 0 {
+		s.userCacheSeen = seen
+	}
+
+	evicted := s.evictAuthResults(changed)
+	if len(changed) > 0 {
+		logger.Log.Infof("增量刷新用户缓存: %d 个用户变更（移除 %d），清除认证缓存 %d 条",
+			len(changed), removed, evicted)
+	}
+}
+
+// fullRefreshUserCache 定期全量刷新：重新加载全部用户，兜底没有更新updated_at的修改
+// （直接执行的SQL、恢复的备份等），增量刷新发现不了这些修改
+func (s *Socks5Server) fullRefreshUserCache() {
+	if database.DB == nil {
+		return
+	}
+	s.loadAllUsers()
+}
+
+// deleteCachedUser 移除用户名对应的缓存，该用户名已经属于其他用户时保留
+func (s *Socks5Server) deleteCachedUser(username string, userID uint) {
+	if value, ok := s.userCache.Load(username); ok && value.(*database.User).ID == userID {
+		s.userCache.Delete(username)
+	}
+}
+
+// loadAllUsers 分批加载全部active用户并设置水位
+//
+// 重新加载时先写入新的条目，再移除这次没有加载到的用户名（已删除、禁用或改名），
+// 效果与清空后重新加载相同，但加载期间不会有用户认证失败；
+// 密码或状态发生变化的用户的认证结果会被清除。
+func (s *Socks5Server) loadAllUsers() {
+	// 先取水位再加载：加载期间修改的行会在下一次增量刷新时再处理一次
+	var watermark struct {
+		Updated *time.Time
+		Deleted *time.Time
+	}
+	if err := database.DB.Unscoped().Model(&database.User{}).
+		Select("MAX(updated_at) AS updated, MAX(deleted_at) AS deleted").
+		Scan(&watermark).Error; err != nil {
+		logger.Log.Errorf("读取用户缓存水位失败: %v", err)
+		return
+	}
+
+	names := make(map[uint]string)
+	changed := make(map[uint]struct{})
+	var batch []database.User
+	err := database.DB.Where("status = ?", "active").FindInBatches(&batch, userCacheBatchSize, func(tx *gorm.DB, _ int) error {
+		for i := range batch {
+			user := batch[i] // 复制出来，避免整批的底层数组被缓存引用而无法释放
+			if previous, ok := s.userCache.Load(user.Username); ok {
+				if cached := previous.(*database.User); cached.ID != user.ID || cached.Password != user.Password {
+					changed[cached.ID] = struct{}{}
+					changed[user.ID] = struct{}{}
+				}
+			}
+			s.userCache.Store(user.Username, &user)
+			names[user.ID] = user.Username
+		}
+		return nil
+	}).Error
+	if err != nil {
+		logger.Log.Errorf("加载用户缓存失败: %v", err)
+		return
+	}
+
+	// 移除这次没有加载到的用户名
+	s.userCache.Range(func(key, value interface{}) bool {
+		user := value.(*database.User)
+		if names[user.ID] != key.(string) {
+			s.userCache.Delete(key)
+			changed[user.ID] = struct{}{}
+		}
+		return true
+	})
+	s.userCacheNames = names
+	s.userCacheSeen = nil
+
+	s.userCacheWatermark = time.Unix(0, 0)
+	if watermark.Updated != nil {
+		s.userCacheWatermark = *watermark.Updated
+	}
+	if watermark.Deleted != nil && watermark.Deleted.After(s.userCacheWatermark) {
+		s.userCacheWatermark = *watermark.Deleted
+	}
+	evicted := s.evictAuthResults(changed)
+	logger.Log.Infof("加载用户缓存完成: %d 个用户（%d 个用户有变化，清除认证缓存 %d 条）", len(names), len(changed), evicted)
+}
+
+// userChangedAt 一行用户记录最后一次变更的时间（软删除不会更新updated_at）
+func userChangedAt(user *database.User) time.Time {
+	if user.DeletedAt.Valid && user.DeletedAt.Time.After(user.UpdatedAt) {
+		return user.DeletedAt.Time
+	}
+	return user.UpdatedAt
+}
+
+// evictAuthResults 清除指定用户的认证结果缓存，顺便清理已过期的条目，返回清除的条数
+func (s *Socks5Server) evictAuthResults(userIDs map[uint]struct{}) int {
+	if len(userIDs) == 0 {
+		return 0
+	}
+	// 先递增代数再遍历，正在验证的请求不会再写入过时的结果（见authenticateWithCache）
+	s.authGeneration.Add(1)
+
+	now := time.Now()
+	evicted := 0
+	s.authResultCache.Range(func(key, value interface{}) bool {
+		entry := value.(*authCacheEntry)
+		if _, ok := userIDs[entry.user.ID]; ok || now.After(entry.expiresAt) {
+			s.authResultCache.Delete(key)
+			evicted++
+		}
+		return true
+	})
+	return evicted
+}
@@ -0,0 +1,200 @@
+package traffic
+
+import (
+	"context"
+	"sync"
+	"sync/atomic"
+	"time"
+)
+
+const (
+	// maxThrottleWait 单次限速等待的最长时间
+	maxThrottleWait = 5 * time.Second
+	// demandTick 用户超过该时间没有预约全局带宽、也没有在等待时，不再算作有发送需求
+	demandTick = 100 * time.Millisecond
+)
+
+// ShapingConfig 分层限速配置
+//
+// 三层令牌桶：节点全局（global）→ 用户（user）→ 连接（conn）。
+// 用户层的上限来自bandwidth_limits/users表，其余来自配置文件。
+type ShapingConfig struct {
+	GlobalLimit int64   // 节点全局出口带宽（字节/秒），0表示不限
+	GlobalBurst int64   // 全局突发字节数，0表示1秒的流量
+	UserBurst   float64 // 用户突发大小（秒），0表示2秒
+	ConnLimit   int64   // 每个连接每个方向的带宽（字节/秒），0表示不限
+	ConnBurst   int64   // 连接突发字节数，0表示1秒的流量
+}
+
+// SetShaping 设置分层限速参数，应在Start之前调用
+func (tc *TrafficController) SetShaping(cfg ShapingConfig) {
+	if cfg.UserBurst <= 0 {
+		cfg.UserBurst = 2
+	}
+	tc.shaping = cfg
+	tc.global.SetRate(cfg.GlobalLimit, cfg.GlobalBurst)
+}
+
+// userDemand 有发送需求的用户
+//
+// 用户预约全局带宽时加入，超过demandTick没有再预约、也没有方向在等待令牌时由demandLoop移出。
+// 只保持连接、不发送数据的用户（例如空闲的keep-alive隧道）不计入，不会摊薄忙碌用户的保证份额。
+type userDemand struct {
+	count atomic.Int64
+	mu    sync.Mutex
+	users map[*UserLimit]struct{}
+}
+
+// mark 记录用户有发送需求，只有用户新加入时才加锁
+func (d *userDemand) mark(user *UserLimit) {
+	user.lastDemand.Store(nanotime())
+	if user.demanding.CompareAndSwap(false, true) {
+		d.mu.Lock()
+		if d.users == nil {
+			d.users = make(map[*UserLimit]struct{})
+		}
+		d.users[user] = struct{}{}
+		d.mu.Unlock()
+		d.count.Add(1)
+	}
+}
+
+// expire 移出超过demandTick没有预约、也没有在等待令牌的用户
+func (d *userDemand) expire() {
+	now := nanotime()
+	d.mu.Lock()
+	defer d.mu.Unlock()
+	for user := range d.users {
+		if user.blocked.Load() > 0 || now-user.lastDemand.Load() < int64(demandTick) {
+			continue
+		}
+		delete(d.users, user)
+		user.demanding.Store(false)
+		d.count.Add(-1)
+	}
+}
+
+// demandLoop 定期移出不再有发送需求的用户，只在设置了全局带宽时运行
+func (tc *TrafficController) demandLoop() {
+	ticker := time.NewTicker(demandTick)
+	defer ticker.Stop()
+
+	for {
+		select {
+		case <-ticker.C:
+			tc.demand.expire()
+		case <-tc.stopChan:
+			return
+		}
+	}
+}
+
+// reserveGlobal 在全局令牌桶中预约n字节，返回需要等待的时间
+//
+// 类似HTB的借用：每个有发送需求的用户保证获得 min(全局带宽/有需求的用户数, 用户上限)。
+// 保证份额内的数据只计入全局令牌桶、不等待；超出份额的部分向全局借用，
+// 需要等待全局令牌桶。空闲用户不发送数据就不占用全局令牌，
+// 它们的份额自然由忙碌的用户借走，而忙碌用户之间不会互相挤占保证份额。
+func (tc *TrafficController) reserveGlobal(user *UserLimit, n int64) time.Duration {
+	rate := tc.global.Rate()
+	if rate <= 0 {
+		return 0
+	}
+
+	tc.demand.mark(user)
+	share := rate / max(tc.demand.count.Load(), 1)
+	if ceil := user.bucket.Rate(); ceil > 0 && ceil < share {
+		share = ceil
+	}
+	// 保证份额的突发按比例取自全局突发，避免各用户的突发叠加后超出全局上限
+	share = max(share, 1)
+	user.assured.Adjust(share, tc.global.burst.Load()*share/rate)
+
+	if user.assured.TryReserve(n) {
+		tc.global.Reserve(n)
+		return 0
+	}
+	return tc.global.Reserve(n)
+}
+
+// Flow 一个连接的一个转发方向上的限速状态
+//
+// 由转发协程独占使用：Wait依次在连接、用户、全局三层令牌桶中预约，
+// 取最长的等待时间，并复用同一个Timer等待，不会每个数据块都分配定时器。
+type Flow struct {
+	tc    *TrafficController
+	user  *UserLimit
+	conn  TokenBucket
+	timer *time.Timer
+}
+
+// OpenFlow 为一个转发方向创建限速状态，结束时必须调用Close
+func (tc *TrafficController) OpenFlow(user *UserLimit) *Flow {
+	f := &Flow{tc: tc, user: user}
+	if tc.shaping.ConnLimit > 0 {
+		f.conn.SetRate(tc.shaping.ConnLimit, tc.shaping.ConnBurst)
+	}
+	return f
+}
+
+// Close 释放限速状态
+func (f *Flow) Close() {
+	if f == nil {
+		return
+	}
+	if f.timer != nil {
+		f.timer.Stop()
+	}
+}
+
+// Limited 是否有任何一层限速生效
+func (f *Flow) Limited() bool {
+	if f == nil {
+		return false
+	}
+	return f.conn.Limited() || f.user.Limited() || f.tc.global.Limited()
+}
+
+// Wait 等待发送bytes字节所需的令牌
+func (f *Flow) Wait(ctx context.Context, bytes int64) error {
+	if f == nil {
+		return nil
+	}
+
+	wait := f.conn.Reserve(bytes)
+	if w := f.user.bucket.Reserve(bytes); w > wait {
+		wait = w
+	}
+	if w := f.tc.reserveGlobal(f.user, bytes); w > wait {
+		wait = w
+	}
+	if wait <= 0 {
+		return nil
+	}
+
+	// 限制最大等待时间，避免长时间阻塞
+	if wait > maxThrottleWait {
+		wait = maxThrottleWait
+	}
+	// 等待令牌期间该用户仍然有发送需求
+	f.user.blocked.Add(1)
+	defer f.user.blocked.Add(-1)
+	if f.timer == nil {
+		f.timer = time.NewTimer(wait)
+	} else {
+		f.timer.Reset(wait)
+	}
+	select {
+	case <-f.timer.C:
+		return nil
+	case <-ctx.Done():
+		if !f.timer.Stop() {
+			// 兼容旧版Timer语义：丢弃可能残留的到期事件，保证下次Reset后不会立即返回
+			select {
+			case <-f.timer.C:
+			default:
+			}
+		}
+		return ctx.Err()
+	}
+}
@@ -0,0 +1,111 @@
+package traffic
+
+import (
+	"sync/atomic"
+	"time"
+)
+
+// clockBase 单调时钟基准，令牌桶内部时间都是相对它的纳秒数
+var clockBase = time.Now()
+
+func nanotime() int64 {
+	return int64(time.Since(clockBase))
+}
+
+// TokenBucket 无锁令牌桶（GCRA算法）
+//
+// 不保存"当前令牌数"，而是保存理论到达时间tat：每发送n字节，tat向后推n/rate秒；
+// tat超出当前时间不多于burst/rate时无需等待，否则需要等待超出的部分。
+// 所有状态都是atomic变量，Reserve只做一次CAS，多个连接并发调用时不需要加锁。
+// 各连接按预约顺序依次获得发送时间片，连接在等待结束前不会再次预约，
+// 因此同一用户的多个连接轮流发送，带宽在它们之间公平分配。
+type TokenBucket struct {
+	rate  atomic.Int64 // 字节/秒，<=0表示不限速
+	burst atomic.Int64 // 突发字节数
+	tat   atomic.Int64 // 理论到达时间（相对clockBase的纳秒）
+}
+
+// NewTokenBucket 创建令牌桶，rate<=0表示不限速
+func NewTokenBucket(rate, burst int64) *TokenBucket {
+	b := &TokenBucket{}
+	b.SetRate(rate, burst)
+	return b
+}
+
+// SetRate 修改速率和突发大小，并重置为满桶
+func (b *TokenBucket) SetRate(rate, burst int64) {
+	if burst <= 0 {
+		burst = rate
+	}
+	b.rate.Store(rate)
+	b.burst.Store(burst)
+	b.tat.Store(0)
+}
+
+// Adjust 修改速率和突发大小，保留已有的预约（用于频繁调整的份额，不会凭空产生突发）
+func (b *TokenBucket) Adjust(rate, burst int64) {
+	if burst <= 0 {
+		burst = rate
+	}
+	if b.rate.Load() != rate {
+		b.rate.Store(rate)
+	}
+	if b.burst.Load() != burst {
+		b.burst.Store(burst)
+	}
+}
+
+// Rate 当前速率（字节/秒），<=0表示不限速
+func (b *TokenBucket) Rate() int64 {
+	return b.rate.Load()
+}
+
+// Limited 是否限速
+func (b *TokenBucket) Limited() bool {
+	return b.rate.Load() > 0
+}
+
+// Reserve 预约发送n字节，返回需要等待的时间（0表示立即发送）
+// 预约总是成功并计入令牌桶，调用方应在等待后再发送
+func (b *TokenBucket) Reserve(n int64) time.Duration {
+	rate := b.rate.Load()
+	if rate <= 0 {
+		return 0
+	}
+	cost := n * int64(time.Second) / rate
+	tolerance := b.burst.Load() * int64(time.Second) / rate
+	now := nanotime()
+
+	for {
+		tat := b.tat.Load()
+		newTat := max(tat, now) + cost
+		if b.tat.CompareAndSwap(tat, newTat) {
+			if wait := newTat - now - tolerance; wait > 0 {
+				return time.Duration(wait)
+			}
+			return 0
+		}
+	}
+}
+
+// TryReserve 只有在无需等待时才预约n字节，返回是否预约成功
+func (b *TokenBucket) TryReserve(n int64) bool {
+	rate := b.rate.Load()
+	if rate <= 0 {
+		return true
+	}
+	cost := n * int64(time.Second) / rate
+	tolerance := b.burst.Load() * int64(time.Second) / rate
+	now := nanotime()
+
+	for {
+		tat := b.tat.Load()
+		newTat := max(tat, now) + cost
+		if newTat-now > tolerance {
+			return false
+		}
+		if b.tat.CompareAndSwap(tat, newTat) {
+			return true
+		}
+	}
+}
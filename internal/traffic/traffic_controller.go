@@ -1,20 +1,30 @@
 package traffic
 
 import (
-	"context"
 	"fmt"
 	"sync"
+	"sync/atomic"
 	"time"
 
+	"gorm.io/gorm"
+
 	"socks5-app/internal/database"
 	"socks5-app/internal/logger"
 )
 
+// userLimitShards 用户带宽限制按用户ID分片的数量（2的幂）
+const userLimitShards = 64
+
+// userLimitShard 一个分片的用户带宽限制，只在建立连接和重新加载配置时访问
+type userLimitShard struct {
+	mu     sync.RWMutex
+	limits map[uint]*UserLimit
+}
+
 // TrafficController 流量控制器
 type TrafficController struct {
-	// 用户带宽限制缓存
-	userLimits map[uint]*UserLimit
-	mu         sync.RWMutex
+	// 用户带宽限制缓存（分片，避免所有用户争用同一把锁）
+	shards [userLimitShards]userLimitShard
 
 	// 流量统计
 	userStats map[uint]*UserStats
@@ -25,19 +35,61 @@ type TrafficController struct {
 
 	// 配置
 	updateInterval time.Duration
+
+	// 分层限速（见shaper.go）
+	shaping ShapingConfig
+	global  TokenBucket // 节点全局出口带宽
+	demand  userDemand  // 有发送需求的用户，用于计算保证带宽
+
+	// 带宽限制增量刷新的水位（用户行和带宽限制记录最后的修改时间）
+	limitsWatermark time.Time
+	reloadMu        sync.Mutex
 }
 
 // UserLimit 用户带宽限制
+//
+// 每个用户只有一个UserLimit对象，限制变化时原地更新，
+// 连接在建立时缓存该对象，之后每个数据块只访问其中的无锁令牌桶。
 type UserLimit struct {
 	UserID         uint      `json:"user_id"`
 	BandwidthLimit int64     `json:"bandwidth_limit"` // 字节/秒，0表示无限制
 	Enabled        bool      `json:"enabled"`
 	LastUpdate     time.Time `json:"last_update"`
 
-	// 令牌桶相关字段
-	tokens     float64   // 当前令牌数
-	lastRefill time.Time // 上次填充令牌的时间
-	mu         sync.Mutex
+	bucket     TokenBucket  // 用户上限（ceil）令牌桶，速率为0表示不限速
+	assured    TokenBucket  // 保证带宽令牌桶，速率为全局带宽在有发送需求的用户间的平均份额
+	demanding  atomic.Bool  // 是否计入有发送需求的用户
+	lastDemand atomic.Int64 // 最近一次预约全局带宽的时间（nanotime）
+	blocked    atomic.Int32 // 正在等待令牌的方向数
+	burst      float64      // 突发大小（秒）
+	mu         sync.Mutex   // 保护上面的导出字段
+}
+
+// newUserLimit 创建用户带宽限制，burst为突发大小（秒）
+func newUserLimit(userID uint, limit int64, enabled bool, burst float64) *UserLimit {
+	l := &UserLimit{UserID: userID, burst: burst}
+	l.set(limit, enabled)
+	return l
+}
+
+// set 更新限制值并重置令牌桶（桶容量为burst秒的流量）
+func (l *UserLimit) set(limit int64, enabled bool) {
+	l.mu.Lock()
+	l.BandwidthLimit = limit
+	l.Enabled = enabled
+	l.LastUpdate = time.Now()
+	l.mu.Unlock()
+
+	if enabled && limit > 0 {
+		l.bucket.SetRate(limit, int64(float64(limit)*l.burst))
+	} else {
+		l.bucket.SetRate(0, 0)
+	}
+}
+
+// Limited 当前是否限速（无锁）
+func (l *UserLimit) Limited() bool {
+	return l.bucket.Limited()
 }
 
 // UserStats 用户流量统计
@@ -52,12 +104,32 @@ type UserStats struct {
 
 // NewTrafficController 创建流量控制器
 func NewTrafficController() *TrafficController {
-	return &TrafficController{
-		userLimits:     make(map[uint]*UserLimit),
+	tc := &TrafficController{
 		userStats:      make(map[uint]*UserStats),
 		stopChan:       make(chan struct{}),
 		updateInterval: 5 * time.Second, // 每5秒更新一次
 	}
+	tc.SetShaping(ShapingConfig{})
+	for i := range tc.shards {
+		tc.shards[i].limits = make(map[uint]*UserLimit)
+	}
+	return tc
+}
+
+// shard 返回用户所在的分片
+func (tc *TrafficController) shard(userID uint) *userLimitShard {
+	return &tc.shards[userID&(userLimitShards-1)]
+}
+
+// limitCount 已缓存的用户限制数量
+func (tc *TrafficController) limitCount() int {
+	count := 0
+	for i := range tc.shards {
+		tc.shards[i].mu.RLock()
+		count += len(tc.shards[i].limits)
+		tc.shards[i].mu.RUnlock()
+	}
+	return count
 }
 
 // Start 启动流量控制器
@@ -73,8 +145,10 @@ func (tc *TrafficController) Start() {
 	// 启动统计清理协程
 	go tc.cleanupLoop()
 
-	// 启动带宽限制重新加载协程
-	go tc.reloadLimitsLoop()
+	// 设置了全局带宽时，定期移出不再发送数据的用户
+	if tc.global.Limited() {
+		go tc.demandLoop()
+	}
 }
 
 // Stop 停止流量控制器
@@ -83,89 +157,241 @@ func (tc *TrafficController) Stop() {
 	close(tc.stopChan)
 }
 
-// loadUserLimits 加载用户带宽限制
+// userLimitRow 用户及其启用的带宽限制记录（users LEFT JOIN bandwidth_limits的一行）
+type userLimitRow struct {
+	ID              uint
+	Username        string
+	Status          string
+	BandwidthLimit  int64      // 用户表中的带宽限制字段
+	LimitValue      *int64     // 启用的带宽限制记录，没有时为NULL
+	UpdatedAt       time.Time  // 用户行的修改时间
+	DeletedAt       *time.Time // 用户行的软删除时间
+	LimitsUpdatedAt *time.Time // 该用户带宽限制记录的最后修改时间
+}
+
+// changedAt 该行最后一次变更的时间（用户或其带宽限制记录）
+func (r *userLimitRow) changedAt() time.Time {
+	changed := r.UpdatedAt
+	if r.DeletedAt != nil && r.DeletedAt.After(changed) {
+		changed = *r.DeletedAt
+	}
+	if r.LimitsUpdatedAt != nil && r.LimitsUpdatedAt.After(changed) {
+		changed = *r.LimitsUpdatedAt
+	}
+	return changed
+}
+
+// userLimitQuery 用一条JOIN查询读取用户和带宽限制，同一用户有多条启用的记录时第一条生效
+func userLimitQuery() *gorm.DB {
+	return database.DB.Table("users").
+		Select("users.id, users.username, users.status, users.bandwidth_limit, users.updated_at, users.deleted_at, "+
+			"bandwidth_limits.`limit` AS limit_value, "+
+			"(SELECT MAX(bl.updated_at) FROM bandwidth_limits bl WHERE bl.user_id = users.id) AS limits_updated_at").
+		Joins("LEFT JOIN bandwidth_limits ON bandwidth_limits.user_id = users.id AND bandwidth_limits.enabled = ?", true).
+		Order("users.id, bandwidth_limits.id")
+}
+
+// loadUserLimits 全量加载全部active用户的带宽限制并设置水位
+// 启动时和配置监视器定期全量刷新时调用
 func (tc *TrafficController) loadUserLimits() {
 	if database.DB == nil {
 		logger.Log.Warn("数据库连接不可用，跳过加载用户限制")
 		return
 	}
 
-	var users []database.User
-	if err := database.DB.Where("status = ?", "active").Find(&users).Error; err != nil {
-		logger.Log.Errorf("加载用户列表失败: %v", err)
+	tc.reloadMu.Lock()
+	defer tc.reloadMu.Unlock()
+	tc.loadAllUserLimits()
+}
+
+// loadAllUserLimits 全量加载，调用者持有reloadMu
+func (tc *TrafficController) loadAllUserLimits() {
+	// 先取水位再加载：加载期间修改的行会在下一次增量刷新时再处理一次
+	var watermark struct {
+		Updated *time.Time
+		Deleted *time.Time
+		Limits  *time.Time
+	}
+	if err := database.DB.Raw("SELECT (SELECT MAX(updated_at) FROM users) AS updated, " +
+		"(SELECT MAX(deleted_at) FROM users) AS deleted, " +
+		"(SELECT MAX(updated_at) FROM bandwidth_limits) AS limits").Scan(&watermark).Error; err != nil {
+		logger.Log.Errorf("读取带宽限制水位失败: %v", err)
 		return
 	}
 
-	tc.mu.Lock()
-	defer tc.mu.Unlock()
+	var rows []userLimitRow
+	if err := userLimitQuery().Where("users.status = ? AND users.deleted_at IS NULL", "active").Find(&rows).Error; err != nil {
+		logger.Log.Errorf("加载用户带宽限制失败: %v", err)
+		return
+	}
+	newCount, updatedCount := tc.applyUserLimits(rows)
 
-	updatedCount := 0
-	newCount := 0
+	tc.limitsWatermark = time.Unix(0, 0)
+	for _, t := range []*time.Time{watermark.Updated, watermark.Deleted, watermark.Limits} {
+		if t != nil && t.After(tc.limitsWatermark) {
+			tc.limitsWatermark = *t
+		}
+	}
 
-	for _, user := range users {
-		// 确定要使用的带宽限制值
-		var limitValue int64
-		var enabled bool
+	if updatedCount > 0 || newCount > 0 {
+		logger.Log.Infof("带宽限制加载完成: 总用户数 %d, 新增 %d, 更新 %d",
+			tc.limitCount(), newCount, updatedCount)
+	}
+}
 
-		// 检查是否有专门的带宽限制记录
-		var bandwidthLimit database.BandwidthLimit
-		if err := database.DB.Where("user_id = ? AND enabled = ?", user.ID, true).First(&bandwidthLimit).Error; err == nil {
-			// 使用专门的带宽限制记录
-			limitValue = bandwidthLimit.Limit
-			enabled = bandwidthLimit.Enabled
-		} else {
-			// 使用用户表中的带宽限制字段
-			limitValue = user.BandwidthLimit
-			enabled = user.BandwidthLimit > 0
+// refreshUserLimits 增量刷新带宽限制
+//
+// 先用三条走索引的查询找出用户行或带宽限制记录的修改时间晚于水位的用户，再用一条JOIN查询读取这些用户，
+// 每次刷新的开销只与变化的用户数有关，与用户总数无关。
+// 删除带宽限制记录时接口会同时修改用户行，因此也能被发现；
+// 其他没有更新updated_at的修改由定期全量刷新兜底。
+func (tc *TrafficController) refreshUserLimits() {
+	if database.DB == nil {
+		return
+	}
+
+	tc.reloadMu.Lock()
+	defer tc.reloadMu.Unlock()
+	if tc.limitsWatermark.IsZero() {
+		tc.loadAllUserLimits()
+		return
+	}
+
+	ids, err := changedLimitUserIDs(tc.limitsWatermark)
+	if err != nil {
+		logger.Log.Errorf("增量刷新带宽限制失败: %v", err)
+		return
+	}
+	if len(ids) == 0 {
+		return
+	}
+
+	var rows []userLimitRow
+	if err := userLimitQuery().Where("users.id IN ?", ids).Find(&rows).Error; err != nil {
+		logger.Log.Errorf("增量刷新带宽限制失败: %v", err)
+		return
+	}
+
+	active := rows[:0]
+	for i := range rows {
+		if changedAt := rows[i].changedAt(); changedAt.After(tc.limitsWatermark) {
+			tc.limitsWatermark = changedAt
+		}
+		// 已删除或禁用的用户无法建立新连接，保留现有的限制
+		if rows[i].DeletedAt == nil && rows[i].Status == "active" {
+			active = append(active, rows[i])
 		}
+	}
+	newCount, updatedCount := tc.applyUserLimits(active)
+	if updatedCount > 0 || newCount > 0 {
+		logger.Log.Infof("增量刷新带宽限制: 总用户数 %d, 新增 %d, 更新 %d",
+			tc.limitCount(), newCount, updatedCount)
+	}
+}
 
-		// 检查是否已存在限制配置
-		existingLimit, exists := tc.userLimits[user.ID]
+// changedLimitUserIDs 用户行或带宽限制记录在watermark之后有修改的用户ID
+//
+// 分成三条各自走索引的查询（users.updated_at、users.deleted_at、bandwidth_limits.updated_at）
+// 在内存中合并，跨列的OR条件会让MySQL放弃索引扫描整张用户表。
+// 用>=而不是>：同一时刻有多行修改时，上一次可能只读到了其中一部分，重复应用是幂等的。
+func changedLimitUserIDs(watermark time.Time) ([]uint, error) {
+	lookups := []struct{ table, column, where string }{
+		{"users", "id", "updated_at >= ?"},
+		{"users", "id", "deleted_at >= ?"},
+		{"bandwidth_limits", "user_id", "updated_at >= ?"},
+	}
+
+	seen := make(map[uint]struct{})
+	var ids []uint
+	for _, lookup := range lookups {
+		var part []uint
+		if err := database.DB.Table(lookup.table).Where(lookup.where, watermark).Pluck(lookup.column, &part).Error; err != nil {
+			return nil, err
+		}
+		for _, id := range part {
+			if _, ok := seen[id]; !ok {
+				seen[id] = struct{}{}
+				ids = append(ids, id)
+			}
+		}
+	}
+	return ids, nil
+}
+
+// applyUserLimits 把查询到的限制应用到缓存，rows按用户ID排序，返回新增和更新的用户数
+func (tc *TrafficController) applyUserLimits(rows []userLimitRow) (newCount, updatedCount int) {
+	for i, row := range rows {
+		if i > 0 && rows[i-1].ID == row.ID {
+			continue // 同一用户的其他带宽限制记录
+		}
+
+		// 有启用的带宽限制记录时使用该记录，否则使用用户表中的带宽限制字段
+		limitValue := row.BandwidthLimit
+		enabled := row.BandwidthLimit > 0
+		if row.LimitValue != nil {
+			limitValue = *row.LimitValue
+			enabled = true
+		}
+
+		shard := tc.shard(row.ID)
+		shard.mu.Lock()
+		existingLimit, exists := shard.limits[row.ID]
+		if !exists {
+			// 新用户，创建限制配置
+			shard.limits[row.ID] = newUserLimit(row.ID, limitValue, enabled, tc.shaping.UserBurst)
+		}
+		shard.mu.Unlock()
 
 		if exists {
 			// 检查限制值是否变化
-			if existingLimit.BandwidthLimit != limitValue || existingLimit.Enabled != enabled {
-				// 限制值变化了，需要更新并重置令牌桶
-				existingLimit.mu.Lock()
-				existingLimit.BandwidthLimit = limitValue
-				existingLimit.Enabled = enabled
-				existingLimit.LastUpdate = time.Now()
-				// 重置令牌桶状态
-				existingLimit.tokens = float64(limitValue * 2)
-				existingLimit.lastRefill = time.Now()
-				existingLimit.mu.Unlock()
+			existingLimit.mu.Lock()
+			changed := existingLimit.BandwidthLimit != limitValue || existingLimit.Enabled != enabled
+			existingLimit.mu.Unlock()
+
+			if changed {
+				// 限制值变化了，原地更新并重置令牌桶（已建立的连接立即生效）
+				existingLimit.set(limitValue, enabled)
 
 				logger.Log.Infof("更新用户 %d (%s) 的带宽限制: %d B/s (enabled: %v)",
-					user.ID, user.Username, limitValue, enabled)
+					row.ID, row.Username, limitValue, enabled)
 				updatedCount++
 			}
 			// 如果没有变化，保持现有配置（包括令牌桶状态）
 		} else {
-			// 新用户，创建限制配置
-			tc.userLimits[user.ID] = &UserLimit{
-				UserID:         user.ID,
-				BandwidthLimit: limitValue,
-				Enabled:        enabled,
-				LastUpdate:     time.Now(),
-			}
 			logger.Log.Infof("新增用户 %d (%s) 的带宽限制: %d B/s (enabled: %v)",
-				user.ID, user.Username, limitValue, enabled)
+				row.ID, row.Username, limitValue, enabled)
 			newCount++
 		}
 	}
-
-	if updatedCount > 0 || newCount > 0 {
-		logger.Log.Infof("带宽限制加载完成: 总用户数 %d, 新增 %d, 更新 %d",
-			len(tc.userLimits), newCount, updatedCount)
-	}
+	return newCount, updatedCount
 }
 
 // GetUserLimit 获取用户带宽限制
 func (tc *TrafficController) GetUserLimit(userID uint) *UserLimit {
-	tc.mu.RLock()
-	defer tc.mu.RUnlock()
+	shard := tc.shard(userID)
+	shard.mu.RLock()
+	defer shard.mu.RUnlock()
 
-	return tc.userLimits[userID]
+	return shard.limits[userID]
+}
+
+// AcquireUserLimit 获取用户带宽限制，不存在时创建一个不限速的条目
+// 连接在建立时调用一次并缓存结果，之后限制的变化会原地更新到同一个对象上
+func (tc *TrafficController) AcquireUserLimit(userID uint) *UserLimit {
+	if limit := tc.GetUserLimit(userID); limit != nil {
+		return limit
+	}
+
+	shard := tc.shard(userID)
+	shard.mu.Lock()
+	defer shard.mu.Unlock()
+
+	limit, exists := shard.limits[userID]
+	if !exists {
+		limit = newUserLimit(userID, 0, false, tc.shaping.UserBurst)
+		shard.limits[userID] = limit
+	}
+	return limit
 }
 
 // SetUserLimit 设置用户带宽限制
@@ -186,15 +412,8 @@ func (tc *TrafficController) SetUserLimit(userID uint, limit int64) error {
 		return fmt.Errorf("更新用户带宽限制失败: %v", err)
 	}
 
-	// 更新缓存
-	tc.mu.Lock()
-	tc.userLimits[userID] = &UserLimit{
-		UserID:         userID,
-		BandwidthLimit: limit,
-		Enabled:        limit > 0,
-		LastUpdate:     time.Now(),
-	}
-	tc.mu.Unlock()
+	// 更新缓存（原地更新，已建立的连接立即生效）
+	tc.AcquireUserLimit(userID).set(limit, limit > 0)
 
 	logger.Log.Infof("设置用户 %d 的带宽限制为 %d 字节/秒", userID, limit)
 	return nil
@@ -221,13 +440,11 @@ func (tc *TrafficController) RecordTraffic(userID uint, bytes int64) {
 
 // CheckBandwidthLimit 检查用户是否超过带宽限制
 func (tc *TrafficController) CheckBandwidthLimit(userID uint) (bool, int64) {
-	tc.mu.RLock()
-	limit, exists := tc.userLimits[userID]
-	tc.mu.RUnlock()
-
-	if !exists || !limit.Enabled || limit.BandwidthLimit <= 0 {
+	limit := tc.GetUserLimit(userID)
+	if limit == nil || !limit.Limited() {
 		return false, 0 // 无限制
 	}
+	bandwidthLimit := limit.bucket.Rate()
 
 	tc.statsMu.RLock()
 	stats, exists := tc.userStats[userID]
@@ -247,13 +464,13 @@ func (tc *TrafficController) CheckBandwidthLimit(userID uint) (bool, int64) {
 	currentSpeed := int64(float64(stats.SessionBytes) / timeDiff)
 
 	// 检查是否超过限制
-	if currentSpeed > limit.BandwidthLimit {
+	if currentSpeed > bandwidthLimit {
 		stats.IsThrottled = true
-		return true, limit.BandwidthLimit // 需要限速
+		return true, bandwidthLimit // 需要限速
 	}
 
 	stats.IsThrottled = false
-	return false, limit.BandwidthLimit
+	return false, bandwidthLimit
 }
 
 // GetUserStats 获取用户流量统计
@@ -305,12 +522,8 @@ func (tc *TrafficController) updateUserStats() {
 		}
 
 		// 检查带宽限制
-		tc.mu.RLock()
-		limit, exists := tc.userLimits[userID]
-		tc.mu.RUnlock()
-
-		if exists && limit.Enabled && limit.BandwidthLimit > 0 {
-			stats.IsThrottled = stats.CurrentSpeed > limit.BandwidthLimit
+		if limit := tc.GetUserLimit(userID); limit != nil && limit.Limited() {
+			stats.IsThrottled = stats.CurrentSpeed > limit.bucket.Rate()
 		}
 	}
 }
@@ -330,20 +543,16 @@ func (tc *TrafficController) cleanupLoop() {
 	}
 }
 
-// reloadLimitsLoop 定期重新加载带宽限制配置
-func (tc *TrafficController) reloadLimitsLoop() {
-	ticker := time.NewTicker(120 * time.Second) // 每120秒重新加载一次（优化：从30秒改为120秒）
-	defer ticker.Stop()
+// ReloadLimits 增量重新加载带宽限制配置
+// 由代理的配置变更监视器在bandwidth_limits版本变化时调用，已建立的连接立即生效
+func (tc *TrafficController) ReloadLimits() {
+	logger.Log.Debug("重新加载带宽限制配置...")
+	tc.refreshUserLimits()
+}
 
-	for {
-		select {
-		case <-ticker.C:
-			logger.Log.Debug("重新加载带宽限制配置...")
-			tc.loadUserLimits()
-		case <-tc.stopChan:
-			return
-		}
-	}
+// ReloadAllLimits 全量重新加载带宽限制配置，由配置变更监视器定期调用
+func (tc *TrafficController) ReloadAllLimits() {
+	tc.loadUserLimits()
 }
 
 // cleanupOldStats 清理旧的统计数据
@@ -363,71 +572,3 @@ func (tc *TrafficController) cleanupOldStats() {
 		}
 	}
 }
-
-// ThrottleConnection 限速连接 - 使用令牌桶算法（优化版）
-func (tc *TrafficController) ThrottleConnection(ctx context.Context, userID uint, bytes int64) error {
-	// 获取用户的带宽限制
-	tc.mu.RLock()
-	limit, exists := tc.userLimits[userID]
-	tc.mu.RUnlock()
-
-	// 如果没有限制或限制未启用，不进行限速
-	if !exists || !limit.Enabled || limit.BandwidthLimit <= 0 {
-		return nil
-	}
-
-	// 优化：减少锁持有时间，将计算移到锁外
-	now := time.Now()
-	requiredTokens := float64(bytes)
-
-	limit.mu.Lock()
-
-	// 初始化令牌桶
-	if limit.lastRefill.IsZero() {
-		limit.lastRefill = now
-		limit.tokens = float64(limit.BandwidthLimit * 2)
-	}
-
-	// 计算自上次填充以来应该新增的令牌数
-	elapsed := now.Sub(limit.lastRefill).Seconds()
-	if elapsed > 0 {
-		newTokens := elapsed * float64(limit.BandwidthLimit)
-		limit.tokens += newTokens
-		maxTokens := float64(limit.BandwidthLimit * 2)
-		if limit.tokens > maxTokens {
-			limit.tokens = maxTokens
-		}
-		limit.lastRefill = now
-	}
-
-	// 如果令牌足够，直接扣除并返回
-	if limit.tokens >= requiredTokens {
-		limit.tokens -= requiredTokens
-		limit.mu.Unlock()
-		return nil
-	}
-
-	// 令牌不足，计算等待时间（在锁内完成快速计算）
-	tokensNeeded := requiredTokens - limit.tokens
-	waitSeconds := tokensNeeded / float64(limit.BandwidthLimit)
-	waitTime := time.Duration(waitSeconds * float64(time.Second))
-
-	// 限制最大等待时间
-	maxWaitTime := 5 * time.Second // 优化：从10秒改为5秒，避免长时间阻塞
-	if waitTime > maxWaitTime {
-		waitTime = maxWaitTime
-	}
-
-	// 预支令牌
-	limit.tokens = 0
-	limit.lastRefill = now
-	limit.mu.Unlock() // 优化：在等待之前释放锁
-
-	// 在锁外等待，不阻塞其他goroutine
-	select {
-	case <-time.After(waitTime):
-		return nil
-	case <-ctx.Done():
-		return ctx.Err()
-	}
-}
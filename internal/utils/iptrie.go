@@ -0,0 +1,126 @@
+package utils
+
+import (
+	"fmt"
+	"net"
+	"strings"
+)
+
+// IPPrefixTrie IP前缀树（按位的二叉trie），IPv4和IPv6各一棵
+//
+// 用法：先用Insert逐条加入规则，构建完成后只读使用，需要更新时重新构建一棵新树
+// 并整体替换（例如通过atomic.Pointer），因此Lookup无需加锁。
+// Lookup沿着IP的各个比特向下走，耗时只和前缀长度（最多32/128）有关，与规则数无关。
+type IPPrefixTrie struct {
+	v4   *ipTrieNode
+	v6   *ipTrieNode
+	size int
+}
+
+type ipTrieNode struct {
+	child    [2]*ipTrieNode
+	value    int  // 规则的值（通常是规则在切片中的下标）
+	hasValue bool // 该节点是否是某条规则的终点
+}
+
+// NewIPPrefixTrie 创建空的IP前缀树
+func NewIPPrefixTrie() *IPPrefixTrie {
+	return &IPPrefixTrie{
+		v4: &ipTrieNode{},
+		v6: &ipTrieNode{},
+	}
+}
+
+// ParsePrefix 解析单个IP或CIDR，返回网络地址（IPv4为4字节）和前缀长度
+func ParsePrefix(cidr string) (net.IP, int, error) {
+	cidr = strings.TrimSpace(cidr)
+	if !strings.Contains(cidr, "/") {
+		ip := net.ParseIP(cidr)
+		if ip == nil {
+			return nil, 0, fmt.Errorf("无效的IP地址: %s", cidr)
+		}
+		if ip4 := ip.To4(); ip4 != nil {
+			return ip4, 32, nil
+		}
+		return ip, 128, nil
+	}
+
+	_, ipNet, err := net.ParseCIDR(cidr)
+	if err != nil {
+		return nil, 0, fmt.Errorf("无效的CIDR格式: %s, 错误: %v", cidr, err)
+	}
+	ones, _ := ipNet.Mask.Size()
+	return ipNet.IP, ones, nil
+}
+
+// Insert 加入一条规则（单个IP或CIDR），同一前缀重复加入时保留先加入的值
+func (t *IPPrefixTrie) Insert(cidr string, value int) error {
+	ip, bits, err := ParsePrefix(cidr)
+	if err != nil {
+		return err
+	}
+
+	node := t.root(ip)
+	for i := 0; i < bits; i++ {
+		bit := (ip[i/8] >> (7 - uint(i%8))) & 1
+		if node.child[bit] == nil {
+			node.child[bit] = &ipTrieNode{}
+		}
+		node = node.child[bit]
+	}
+
+	if !node.hasValue {
+		node.value = value
+		node.hasValue = true
+		t.size++
+	}
+	return nil
+}
+
+// Lookup 查找包含ip的最长前缀规则，返回其值
+func (t *IPPrefixTrie) Lookup(ip net.IP) (int, bool) {
+	if ip4 := ip.To4(); ip4 != nil {
+		ip = ip4
+	} else if len(ip) != net.IPv6len {
+		return 0, false
+	}
+
+	node := t.root(ip)
+	value, found := node.value, node.hasValue
+	for i := 0; i < len(ip)*8; i++ {
+		node = node.child[(ip[i/8]>>(7-uint(i%8)))&1]
+		if node == nil {
+			break
+		}
+		if node.hasValue {
+			value, found = node.value, true
+		}
+	}
+	return value, found
+}
+
+// LookupString 同Lookup，ip可以带端口；无法解析为IP（例如域名）时返回未命中
+func (t *IPPrefixTrie) LookupString(ip string) (int, bool) {
+	if strings.Contains(ip, ":") {
+		if host, _, err := net.SplitHostPort(ip); err == nil {
+			ip = host
+		}
+	}
+	parsed := net.ParseIP(ip)
+	if parsed == nil {
+		return 0, false
+	}
+	return t.Lookup(parsed)
+}
+
+// Len 规则（不同前缀）数量
+func (t *IPPrefixTrie) Len() int {
+	return t.size
+}
+
+func (t *IPPrefixTrie) root(ip net.IP) *ipTrieNode {
+	if len(ip) == net.IPv4len {
+		return t.v4
+	}
+	return t.v6
+}
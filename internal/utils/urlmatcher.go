@@ -0,0 +1,307 @@
+package utils
+
+import (
+	"net"
+	"strings"
+)
+
+// URLMatcher 编译后的URL过滤规则匹配器
+//
+// 两类规则：
+//   - "*.example.com"：域名后缀规则，匹配example.com的所有子域名，存入按label倒序的后缀树
+//   - 其他：子串规则（与原来的strings.Contains语义一致），编译为Aho-Corasick自动机
+//
+// 匹配时忽略大小写。一次Match只扫描目标地址一遍，耗时与规则数量无关。
+// 多条规则同时命中时返回值最小的一条（调用方传入规则下标即可保持"按顺序第一条命中"的语义）。
+// 构建完成后只读，可在多个goroutine中并发调用Match。
+type URLMatcher struct {
+	ac       *ahoCorasick
+	suffixes *domainSuffixNode
+	size     int
+}
+
+// NewURLMatcher 编译规则，patterns[i]命中时返回values[i]
+func NewURLMatcher(patterns []string, values []int) *URLMatcher {
+	m := &URLMatcher{suffixes: newDomainSuffixNode()}
+	builder := newAhoCorasickBuilder()
+	for i, pattern := range patterns {
+		pattern = strings.ToLower(strings.TrimSpace(pattern))
+		if pattern == "" {
+			continue
+		}
+		if strings.HasPrefix(pattern, "*.") && len(pattern) > 2 {
+			m.suffixes.insert(pattern[2:], values[i])
+		} else {
+			builder.add(pattern, values[i])
+		}
+		m.size++
+	}
+	m.ac = builder.build()
+	return m
+}
+
+// Len 已编译的规则数
+func (m *URLMatcher) Len() int {
+	return m.size
+}
+
+// Match 返回命中规则中最小的值
+func (m *URLMatcher) Match(target string) (int, bool) {
+	target = strings.ToLower(target)
+	value, found := m.ac.match(target)
+
+	host := target
+	if strings.Contains(host, ":") {
+		if h, _, err := net.SplitHostPort(host); err == nil {
+			host = h
+		}
+	}
+	if v, ok := m.suffixes.match(host); ok && (!found || v < value) {
+		value, found = v, true
+	}
+	return value, found
+}
+
+// domainSuffixNode 域名后缀树节点，子节点按label索引（从顶级域开始）
+type domainSuffixNode struct {
+	children map[string]*domainSuffixNode
+	value    int
+	wildcard bool // 是否存在"*.<到此节点的域名>"规则
+}
+
+func newDomainSuffixNode() *domainSuffixNode {
+	return &domainSuffixNode{}
+}
+
+func (n *domainSuffixNode) insert(domain string, value int) {
+	node := n
+	for end := len(domain); end > 0; {
+		start := strings.LastIndexByte(domain[:end], '.') + 1
+		label := domain[start:end]
+		if node.children == nil {
+			node.children = make(map[string]*domainSuffixNode)
+		}
+		child, ok := node.children[label]
+		if !ok {
+			child = newDomainSuffixNode()
+			node.children[label] = child
+		}
+		node = child
+		end = start - 1
+	}
+	if !node.wildcard || value < node.value {
+		node.value = value
+		node.wildcard = true
+	}
+}
+
+// match 从顶级域开始逐个label向下查找，返回命中的最小值
+// "*.example.com"只匹配子域名，不匹配example.com本身
+func (n *domainSuffixNode) match(host string) (int, bool) {
+	host = strings.TrimSuffix(host, ".")
+	node := n
+	value, found := 0, false
+	for end := len(host); end > 0; {
+		start := strings.LastIndexByte(host[:end], '.') + 1
+		child, ok := node.children[host[start:end]]
+		if !ok {
+			break
+		}
+		node = child
+		// 还有更低一级的label时，通配规则才算命中
+		if node.wildcard && start > 0 && (!found || node.value < value) {
+			value, found = node.value, true
+		}
+		end = start - 1
+	}
+	return value, found
+}
+
+// acDenseEdges 边数不少于该值的状态使用256项的稠密转移表
+const acDenseEdges = 8
+
+// ahoCorasick 多模式子串匹配自动机（构建完成后的紧凑形式）
+//
+// 状态按BFS顺序编号，所有边存放在一个连续数组中，减少大规则集下的缓存未命中；
+// 分支多的状态（靠近根的几层）使用稠密转移表，其余状态线性查找（绝大多数只有1~2条边）。
+type ahoCorasick struct {
+	states []acState
+	edges  []acEdge
+	tables []int32 // 稠密转移表，每个表256项，-1表示无此边
+}
+
+type acState struct {
+	edgeStart int32 // 在edges中的起始位置
+	edgeCount int32
+	fail      int32
+	best      int32 // 以该状态结尾（含fail链上）命中的最小规则值，-1表示无
+	dense     int32 // 稠密转移表在tables中的起始位置，-1表示没有
+}
+
+type acEdge struct {
+	b    byte
+	next int32
+}
+
+// ahoCorasickBuilder 构建期使用的trie，每个节点单独保存自己的边
+type ahoCorasickBuilder struct {
+	nodes []acBuildNode
+}
+
+type acBuildNode struct {
+	edges []acEdge
+	best  int32
+}
+
+func newAhoCorasickBuilder() *ahoCorasickBuilder {
+	return &ahoCorasickBuilder{nodes: []acBuildNode{{best: -1}}}
+}
+
+func (n *acBuildNode) next(b byte) int32 {
+	for _, e := range n.edges {
+		if e.b == b {
+			return e.next
+		}
+	}
+	return -1
+}
+
+func (b *ahoCorasickBuilder) add(pattern string, value int) {
+	node := int32(0)
+	for i := 0; i < len(pattern); i++ {
+		next := b.nodes[node].next(pattern[i])
+		if next < 0 {
+			next = int32(len(b.nodes))
+			b.nodes = append(b.nodes, acBuildNode{best: -1})
+			b.nodes[node].edges = append(b.nodes[node].edges, acEdge{pattern[i], next})
+		}
+		node = next
+	}
+	if best := b.nodes[node].best; best < 0 || int32(value) < best {
+		b.nodes[node].best = int32(value)
+	}
+}
+
+// build 按BFS顺序重新编号状态并计算fail指针，同时把fail链上的最小命中值合并到best
+func (b *ahoCorasickBuilder) build() *ahoCorasick {
+	nodes := b.nodes
+
+	// BFS顺序：order[新编号] = 旧编号
+	order := make([]int32, 1, len(nodes))
+	index := make([]int32, len(nodes)) // 旧编号 -> 新编号
+	for head := 0; head < len(order); head++ {
+		for _, e := range nodes[order[head]].edges {
+			index[e.next] = int32(len(order))
+			order = append(order, e.next)
+		}
+	}
+
+	ac := &ahoCorasick{
+		states: make([]acState, len(nodes)),
+		edges:  make([]acEdge, 0, len(nodes)-1),
+	}
+	for id, old := range order {
+		ac.states[id] = acState{
+			edgeStart: int32(len(ac.edges)),
+			edgeCount: int32(len(nodes[old].edges)),
+			best:      nodes[old].best,
+			dense:     -1,
+		}
+		for _, e := range nodes[old].edges {
+			ac.edges = append(ac.edges, acEdge{e.b, index[e.next]})
+		}
+	}
+
+	// 父状态的编号总是小于子状态，按编号顺序处理即为BFS顺序
+	for u := range ac.states {
+		for _, e := range ac.stateEdges(int32(u)) {
+			child := &ac.states[e.next]
+			if u == 0 {
+				child.fail = 0
+			} else {
+				f := ac.states[u].fail
+				for {
+					if next := ac.next(f, e.b); next >= 0 {
+						child.fail = next
+						break
+					}
+					if f == 0 {
+						child.fail = 0
+						break
+					}
+					f = ac.states[f].fail
+				}
+			}
+			if fb := ac.states[child.fail].best; fb >= 0 && (child.best < 0 || fb < child.best) {
+				child.best = fb
+			}
+		}
+	}
+
+	for i := range ac.states {
+		if i != 0 && ac.states[i].edgeCount < acDenseEdges {
+			continue
+		}
+		table := make([]int32, 256)
+		for c := range table {
+			table[c] = -1
+		}
+		for _, e := range ac.stateEdges(int32(i)) {
+			table[e.b] = e.next
+		}
+		ac.states[i].dense = int32(len(ac.tables))
+		ac.tables = append(ac.tables, table...)
+	}
+	return ac
+}
+
+func (ac *ahoCorasick) stateEdges(state int32) []acEdge {
+	s := &ac.states[state]
+	return ac.edges[s.edgeStart : s.edgeStart+s.edgeCount]
+}
+
+// next 状态state读入字节c后的转移，-1表示无此边
+func (ac *ahoCorasick) next(state int32, c byte) int32 {
+	s := &ac.states[state]
+	if s.dense >= 0 {
+		return ac.tables[s.dense+int32(c)]
+	}
+	for _, e := range ac.edges[s.edgeStart : s.edgeStart+s.edgeCount] {
+		if e.b == c {
+			return e.next
+		}
+	}
+	return -1
+}
+
+// match 扫描一遍text，返回命中的最小规则值
+func (ac *ahoCorasick) match(text string) (int, bool) {
+	if len(ac.states) == 1 {
+		return 0, false
+	}
+	best := int32(-1)
+	state := int32(0)
+	for i := 0; i < len(text); i++ {
+		c := text[i]
+		for {
+			if next := ac.next(state, c); next >= 0 {
+				state = next
+				break
+			}
+			if state == 0 {
+				break
+			}
+			state = ac.states[state].fail
+		}
+		if v := ac.states[state].best; v >= 0 && (best < 0 || v < best) {
+			best = v
+			if best == 0 {
+				break
+			}
+		}
+	}
+	if best < 0 {
+		return 0, false
+	}
+	return int(best), true
+}
@@ -0,0 +1,33 @@
+-- 添加累计流量计数器的迁移脚本
+-- 升级后仪表盘的总流量读取 traffic_counters 中的 total 行，代理节点写入流量日志时在同一事务中累加；
+-- 服务端启动时如果该行不存在，会自动用 traffic_rollup_hours 的合计创建（自动迁移也会创建表和列）。
+-- 本脚本用于手动执行迁移，或在执行 add_traffic_rollups.sql 重新回填汇总表之后重建计数器。
+-- 重建时会覆盖计数器，应在代理节点停止写入时执行。
+USE socks5_db;
+
+CREATE TABLE IF NOT EXISTS traffic_counters (
+    name VARCHAR(32) NOT NULL PRIMARY KEY,
+    bytes_sent BIGINT NOT NULL DEFAULT 0,
+    bytes_recv BIGINT NOT NULL DEFAULT 0,
+    connections BIGINT NOT NULL DEFAULT 0,
+    log_count BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME(3) NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 心跳上报各节点的在线用户数
+SET @has_column = (SELECT COUNT(*) FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'proxy_heartbeats' AND column_name = 'online_users');
+SET @sql = IF(@has_column = 0,
+    'ALTER TABLE proxy_heartbeats ADD COLUMN online_users INT DEFAULT 0 AFTER total_conns',
+    'SELECT 1');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 用小时汇总表重建计数器
+REPLACE INTO traffic_counters (name, bytes_sent, bytes_recv, connections, log_count, updated_at)
+SELECT 'total', COALESCE(SUM(bytes_sent), 0), COALESCE(SUM(bytes_recv), 0),
+       COALESCE(SUM(connections), 0), COALESCE(SUM(log_count), 0), NOW(3)
+FROM traffic_rollup_hours;
+
+SELECT * FROM traffic_counters;
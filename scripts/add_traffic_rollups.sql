@@ -0,0 +1,58 @@
+-- 添加流量汇总表的迁移脚本
+-- 升级后代理节点写入流量日志时会同时累加汇总表，
+-- 本脚本用已有的 traffic_logs 回填汇总表。回填按原始日志重新计算并覆盖对应的汇总行，
+-- 可以在代理节点升级前后执行，也可以重复执行。
+-- 旧日志无法区分连接，回填不修改 connections。
+USE socks5_db;
+
+CREATE TABLE IF NOT EXISTS traffic_rollup_minutes (
+    bucket DATETIME(3) NOT NULL,
+    user_id BIGINT UNSIGNED NOT NULL,
+    bytes_sent BIGINT NOT NULL DEFAULT 0,
+    bytes_recv BIGINT NOT NULL DEFAULT 0,
+    connections BIGINT NOT NULL DEFAULT 0,
+    log_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, user_id),
+    INDEX idx_traffic_rollup_minutes_user_id (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS traffic_rollup_hours (
+    bucket DATETIME(3) NOT NULL,
+    user_id BIGINT UNSIGNED NOT NULL,
+    bytes_sent BIGINT NOT NULL DEFAULT 0,
+    bytes_recv BIGINT NOT NULL DEFAULT 0,
+    connections BIGINT NOT NULL DEFAULT 0,
+    log_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, user_id),
+    INDEX idx_traffic_rollup_hours_user_id (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 回填小时汇总（全部历史）
+INSERT INTO traffic_rollup_hours (bucket, user_id, bytes_sent, bytes_recv, connections, log_count)
+SELECT DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00'), user_id,
+       SUM(bytes_sent), SUM(bytes_recv), 0, COUNT(*)
+FROM traffic_logs
+GROUP BY DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00'), user_id
+ON DUPLICATE KEY UPDATE
+    bytes_sent = VALUES(bytes_sent),
+    bytes_recv = VALUES(bytes_recv),
+    log_count = VALUES(log_count);
+
+-- 回填分钟汇总（与 server.rollup_minute_retention 一致，默认最近48小时）
+INSERT INTO traffic_rollup_minutes (bucket, user_id, bytes_sent, bytes_recv, connections, log_count)
+SELECT DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'), user_id,
+       SUM(bytes_sent), SUM(bytes_recv), 0, COUNT(*)
+FROM traffic_logs
+WHERE timestamp >= NOW() - INTERVAL 48 HOUR
+GROUP BY DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'), user_id
+ON DUPLICATE KEY UPDATE
+    bytes_sent = VALUES(bytes_sent),
+    bytes_recv = VALUES(bytes_recv),
+    log_count = VALUES(log_count);
+
+-- 核对：汇总表与原始日志的合计应一致
+SELECT
+    (SELECT COALESCE(SUM(bytes_sent), 0) FROM traffic_logs) AS logs_sent,
+    (SELECT COALESCE(SUM(bytes_sent), 0) FROM traffic_rollup_hours) AS rollup_sent,
+    (SELECT COUNT(*) FROM traffic_rollup_minutes) AS minute_rows,
+    (SELECT COUNT(*) FROM traffic_rollup_hours) AS hour_rows;
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+认证风暴压测：大量客户端同时重连时的恢复时间
+
+模拟 proxy 重启或认证缓存集中过期后的重连风暴：N 个客户端（用户 prefix0 ~ prefix{N-1}）
+同时做 SOCKS5 用户名密码认证，记录从风暴开始到最后一个客户端认证成功的时间（恢复时间）、
+每个客户端的认证延迟分布和 proxy 的 CPU 时间（--monitor，proxy 需在本机运行）。
+
+每一轮风暴之间等待 --interval 秒：
+- interval 小于 auth_cache_ttl 时，后续轮次应全部命中认证缓存
+- interval 略大于 auth_cache_ttl 时，TTL 带抖动的条目不会全部同时过期，
+  后续轮次的 bcrypt 次数和恢复时间应明显低于第一轮
+重启 proxy 后再运行（--rounds 1），可以验证认证缓存文件恢复后第一轮也不需要 bcrypt。
+
+准备用户（每个用户单独的密码哈希，否则 bcrypt 验证器的去重会让所有用户只验证一次）:
+  python3 scripts/create_test_user.py --bench-users 500 --unique-hashes
+
+用法:
+  python3 scripts/bench_auth_storm.py --clients 500 --rounds 3 --interval 5
+  python3 scripts/bench_auth_storm.py --clients 500 --rounds 2 --interval 70 --monitor -o storm.json
+  # 同一个用户的大量连接同时重连（验证 singleflight 去重）
+  python3 scripts/bench_auth_storm.py --clients 1 --conns-per-client 500
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+
+from latency_histogram import LatencyHistogram
+from proxy_monitor import ResourceSampler
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+async def authenticate(args, username, password):
+    """完成 SOCKS5 方法协商和用户名密码认证，返回认证阶段耗时（秒）"""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(args.proxy_host, args.proxy_port), args.timeout)
+    try:
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        writer.write(b'\x05\x01\x02')
+        reply = await asyncio.wait_for(reader.readexactly(2), args.timeout)
+        if reply[1] != 0x02:
+            raise ConnectionError("代理不接受用户名密码认证")
+
+        user, pwd = username.encode(), password.encode()
+        start = time.perf_counter()
+        writer.write(bytes([0x01, len(user)]) + user + bytes([len(pwd)]) + pwd)
+        reply = await asyncio.wait_for(reader.readexactly(2), args.timeout)
+        elapsed = time.perf_counter() - start
+        if reply[1] != 0x00:
+            raise ConnectionError("认证失败")
+        return elapsed
+    finally:
+        writer.close()
+
+
+async def storm(args):
+    """所有客户端同时认证，返回 (直方图, 错误列表, 恢复时间)"""
+    hist = LatencyHistogram()
+    errors = []
+    semaphore = asyncio.Semaphore(args.concurrent)
+    start = time.perf_counter()
+    finished = start
+
+    async def one(username):
+        nonlocal finished
+        async with semaphore:
+            try:
+                hist.record(await authenticate(args, username, args.password))
+                finished = max(finished, time.perf_counter())
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                errors.append(str(e) or type(e).__name__)
+
+    usernames = [f"{args.prefix}{i}" for i in range(args.clients)] * args.conns_per_client
+    await asyncio.gather(*(one(name) for name in usernames))
+    return hist, errors, finished - start
+
+
+def run_round(args, index):
+    sampler = None
+    if args.monitor:
+        try:
+            sampler = ResourceSampler(args.monitor_pid, args.proxy_port, args.monitor_interval,
+                                      tcp_states=False).start()
+        except Exception as e:
+            print(f"⚠️  无法采样 proxy 资源: {e}")
+    hist, errors, recovery = asyncio.run(storm(args))
+    if sampler is not None:
+        sampler.stop()
+
+    summary = {k: (v * 1000 if k != 'count' else v) for k, v in hist.summary().items()} if hist else {}
+    result = {
+        'round': index,
+        'attempts': args.clients * args.conns_per_client,
+        'succeeded': hist.count,
+        'errors': len(errors),
+        'recovery_seconds': recovery,
+        'auth_ms': summary,
+        'cpu_seconds': sampler.summary()['cpu_seconds'] if sampler is not None else None,
+        'histogram': hist.to_dict(),
+    }
+
+    cpu = f", proxy CPU {result['cpu_seconds']:.2f} 秒" if result['cpu_seconds'] is not None else ''
+    print(f"\n▶ 第 {index} 轮: {result['succeeded']}/{result['attempts']} 认证成功, "
+          f"恢复时间 {recovery:.2f} 秒{cpu}")
+    if summary:
+        print(f"  认证延迟: P50 {summary['p50']:.1f} ms, P99 {summary['p99']:.1f} ms, "
+              f"最大 {summary['max']:.1f} ms")
+    if errors:
+        print(f"  ⚠️  {len(errors)} 次失败，例如: {errors[0]}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='认证风暴压测：大量客户端同时重连时的恢复时间',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('准备用户', 1)[1])
+    parser.add_argument('--proxy-host', default='127.0.0.1', help='代理服务器地址 (默认: 127.0.0.1)')
+    parser.add_argument('--proxy-port', type=int, default=1082, help='代理服务器端口 (默认: 1082)')
+    parser.add_argument('--prefix', default='bench', help='压测用户名前缀 (默认: bench)')
+    parser.add_argument('--password', default='benchpass', help='压测用户密码 (默认: benchpass)')
+    parser.add_argument('--clients', type=int, default=500, help='同时重连的用户数 (默认: 500)')
+    parser.add_argument('--conns-per-client', type=int, default=1,
+                        help='每个用户同时发起的连接数 (默认: 1)')
+    parser.add_argument('-c', '--concurrent', type=int, default=1000,
+                        help='同时进行的握手数上限 (默认: 1000)')
+    parser.add_argument('--rounds', type=int, default=2, help='风暴轮数 (默认: 2)')
+    parser.add_argument('--interval', type=float, default=5, help='两轮之间的间隔(秒) (默认: 5)')
+    parser.add_argument('--timeout', type=float, default=30, help='单次认证超时(秒) (默认: 30)')
+    parser.add_argument('--monitor', action='store_true',
+                        help='每轮采样 proxy 进程的 CPU 时间（需要 psutil，proxy 在本机运行）')
+    parser.add_argument('--monitor-pid', type=int, default=None,
+                        help='proxy 进程 PID (默认: 按 --proxy-port 查找)')
+    parser.add_argument('--monitor-interval', type=float, default=0.5,
+                        help='资源采样间隔(秒) (默认: 0.5)')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 文件路径')
+    args = parser.parse_args()
+
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    print(f"认证风暴压测: {args.clients} 个用户 x {args.conns_per_client} 个连接, "
+          f"{args.rounds} 轮, 间隔 {args.interval:g} 秒")
+    results = []
+    try:
+        for i in range(1, args.rounds + 1):
+            if i > 1:
+                time.sleep(args.interval)
+            results.append(run_round(args, i))
+    except KeyboardInterrupt:
+        print("\n⏹️  测试被中断")
+    except Exception as e:
+        print(f"❌ 测试失败: {e}")
+        sys.exit(1)
+
+    print(f"\n{'轮次':>4} {'成功':>8} {'恢复(s)':>9} {'P50(ms)':>9} {'P99(ms)':>9} {'CPU(s)':>8}")
+    for r in results:
+        s = r['auth_ms']
+        cpu = f"{r['cpu_seconds']:.2f}" if r['cpu_seconds'] is not None else '-'
+        print(f"{r['round']:>4} {r['succeeded']:>8} {r['recovery_seconds']:>9.2f} "
+              f"{s.get('p50', 0):>9.1f} {s.get('p99', 0):>9.1f} {cpu:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ 结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+高性能 HTTP 压测目标服务器（asyncio/uvloop，多进程）
+
+http.server 版本的目标服务器在代理之前就先成为瓶颈：每个请求都要现场拼接
+payload，而且单进程单线程。本服务器：
+- 多个进程通过 SO_REUSEPORT 共享同一端口，每个进程一个事件循环（安装 uvloop 时使用 uvloop）
+- 支持 HTTP/1.1 keep-alive
+- payload 来自启动时预分配的缓冲区，小响应写 memoryview 切片，
+  大响应通过 loop.sendfile() 从预生成的文件零拷贝发送（uvloop 不支持 sendfile，改用缓冲区）
+
+路由（兼容 simple_http_server.py 和 simple_http_test_server.py）:
+  /data/<size>      返回 size 字节的 'X'
+  /bytes/<size>     返回 size 字节的 '0'
+  /delay/<ms>       等待 ms 毫秒后返回 JSON
+  /stream/<rate>    以 rate 字节/秒的速率持续发送（支持 k/m/g 后缀），
+                    ?seconds=N 指定持续时间（默认 10 秒）
+  其他路径          返回 {"status": "ok", "timestamp": ..., "path": ...}
+
+用法:
+  python3 scripts/bench_http_server.py
+  python3 scripts/bench_http_server.py --workers 8 --port 8888
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+PORT = 8888
+
+# 预分配缓冲区大小，更大的响应循环发送同一块缓冲区
+BUFFER_SIZE = 4 * 1024 * 1024
+
+# 响应体不小于该值时使用 sendfile
+SENDFILE_THRESHOLD = 256 * 1024
+
+# /stream 每次写出的时间片(秒)
+STREAM_TICK = 0.01
+
+MAX_HEADER_SIZE = 64 * 1024
+
+UNIT_SUFFIXES = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_size(text):
+    """解析带 k/m/g 后缀的字节数"""
+    text = text.strip().lower()
+    if text and text[-1] in UNIT_SUFFIXES:
+        size = int(float(text[:-1]) * UNIT_SUFFIXES[text[-1]])
+    else:
+        size = int(text)
+    if size < 0:
+        raise ValueError(f"无效的大小: {text}")
+    return size
+
+
+class Payload:
+    """预分配的响应数据：内存缓冲区 + 同内容的临时文件（供 sendfile 使用）"""
+
+    def __init__(self, fill, size=BUFFER_SIZE):
+        self.view = memoryview(fill * size)
+        self.size = size
+        self.file = tempfile.TemporaryFile()
+        self.file.write(self.view)
+        self.file.flush()
+
+
+class BenchHTTPServer:
+    """单个工作进程内的 HTTP 服务器"""
+
+    def __init__(self, host='127.0.0.1', port=PORT, use_sendfile=True, quiet=True):
+        self.host = host
+        self.port = port
+        self.use_sendfile = use_sendfile
+        self.quiet = quiet
+        self.payloads = {
+            'data': Payload(b'X'),
+            'bytes': Payload(b'0'),
+        }
+
+    async def handle(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_simple(writer, 431, b'header too large', keep_alive=False)
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self.send_simple(writer, 400, b'bad request', keep_alive=False)
+                    break
+
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                # 丢弃请求体
+                body_length = int(headers.get('content-length', 0) or 0)
+                if body_length:
+                    await reader.readexactly(body_length)
+
+                connection = headers.get('connection', '').lower()
+                if version == 'HTTP/1.0':
+                    keep_alive = connection == 'keep-alive'
+                else:
+                    keep_alive = connection != 'close'
+
+                keep_alive = await self.route(writer, method, target, keep_alive)
+                if not self.quiet:
+                    print(f"{method} {target}")
+                if not keep_alive:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, writer, method, target, keep_alive):
+        """处理一个请求，返回连接是否保持"""
+        url = urlsplit(target)
+        parts = url.path.strip('/').split('/')
+        head_only = method == 'HEAD'
+
+        try:
+            if len(parts) == 2 and parts[0] in self.payloads:
+                await self.send_payload(writer, self.payloads[parts[0]], parse_size(parts[1]),
+                                        keep_alive, head_only)
+                return keep_alive
+
+            if len(parts) == 2 and parts[0] == 'delay':
+                await asyncio.sleep(float(parts[1]) / 1000.0)
+                await self.send_json(writer, url.path, keep_alive)
+                return keep_alive
+
+            if len(parts) == 2 and parts[0] == 'stream':
+                seconds = float(parse_qs(url.query).get('seconds', ['10'])[0])
+                await self.send_stream(writer, parse_size(parts[1]), seconds, keep_alive)
+                return keep_alive
+        except ValueError as e:
+            await self.send_simple(writer, 400, str(e).encode(), keep_alive)
+            return keep_alive
+
+        await self.send_json(writer, url.path, keep_alive)
+        return keep_alive
+
+    def write_head(self, writer, status, content_type, length, keep_alive):
+        reason = {200: 'OK', 400: 'Bad Request', 431: 'Request Header Fields Too Large'}.get(status, '')
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {length}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n".encode('latin-1'))
+
+    async def send_simple(self, writer, status, body, keep_alive):
+        self.write_head(writer, status, 'text/plain', len(body), keep_alive)
+        writer.write(body)
+        await writer.drain()
+
+    async def send_json(self, writer, path, keep_alive):
+        body = json.dumps({
+            "status": "ok",
+            "timestamp": time.time(),
+            "path": path
+        }).encode()
+        self.write_head(writer, 200, 'application/json', len(body), keep_alive)
+        writer.write(body)
+        await writer.drain()
+
+    async def send_payload(self, writer, payload, size, keep_alive, head_only=False):
+        self.write_head(writer, 200, 'application/octet-stream', size, keep_alive)
+        if head_only:
+            await writer.drain()
+            return
+
+        remaining = size
+        if self.use_sendfile and size >= SENDFILE_THRESHOLD:
+            await writer.drain()
+            loop = asyncio.get_running_loop()
+            try:
+                while remaining > 0:
+                    count = min(remaining, payload.size)
+                    await loop.sendfile(writer.transport, payload.file, 0, count)
+                    remaining -= count
+                return
+            except NotImplementedError:
+                # uvloop 没有实现 loop.sendfile()，本进程改用内存缓冲区发送剩余部分
+                self.use_sendfile = False
+
+        while remaining > 0:
+            count = min(remaining, payload.size)
+            writer.write(payload.view[:count])
+            await writer.drain()
+            remaining -= count
+
+    async def send_stream(self, writer, rate, seconds, keep_alive):
+        """按 rate 字节/秒匀速发送 seconds 秒"""
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        total = int(rate * seconds)
+        view = self.payloads['data'].view
+        self.write_head(writer, 200, 'application/octet-stream', total, keep_alive)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        sent = 0
+        while sent < total:
+            # 按时间计算应发送的累计字节数，避免误差累积
+            due = min(total, int((loop.time() - start + STREAM_TICK) * rate))
+            while sent < due:
+                count = min(due - sent, len(view))
+                writer.write(view[:count])
+                sent += count
+            await writer.drain()
+            if sent < total:
+                await asyncio.sleep(STREAM_TICK)
+
+    async def serve(self, reuse_port=False, ready=None):
+        server = await asyncio.start_server(
+            self.handle, self.host, self.port, backlog=65535,
+            reuse_address=True, reuse_port=reuse_port, limit=MAX_HEADER_SIZE)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def run(self, reuse_port=False, ready=None):
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        try:
+            asyncio.run(self.serve(reuse_port, ready))
+        except KeyboardInterrupt:
+            pass
+
+
+def _serve_process(host, port, use_sendfile, quiet, ready):
+    BenchHTTPServer(host, port, use_sendfile, quiet).run(reuse_port=True, ready=ready)
+
+
+def start_workers(host, port, workers, use_sendfile=True, quiet=True, timeout=10):
+    """
+    启动 workers 个共享端口的服务器进程
+
+    Returns:
+        list: 已就绪的 multiprocessing.Process，使用完毕后调用 terminate()
+    """
+    processes = []
+    for _ in range(workers):
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(
+            target=_serve_process, args=(host, port, use_sendfile, quiet, ready), daemon=True)
+        process.start()
+        processes.append(process)
+        if not ready.wait(timeout):
+            for p in processes:
+                p.terminate()
+            raise RuntimeError("HTTP 服务器进程启动超时")
+    return processes
+
+
+def main(default_host='127.0.0.1', description='高性能 HTTP 压测目标服务器'):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--host', default=default_host, help=f'监听地址 (默认: {default_host or "所有地址"})')
+    parser.add_argument('--port', type=int, default=PORT, help=f'监听端口 (默认: {PORT})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='工作进程数，通过 SO_REUSEPORT 共享端口 (默认: CPU 核数)')
+    parser.add_argument('--no-sendfile', action='store_true',
+                        help='大响应也通过内存缓冲区发送，不使用 sendfile')
+    parser.add_argument('--verbose', action='store_true', help='打印每个请求')
+    args = parser.parse_args()
+
+    processes = start_workers(args.host, args.port, args.workers,
+                              not args.no_sendfile, not args.verbose)
+    display_host = args.host or 'localhost'
+    print(f"HTTP 测试服务器运行在 http://{display_host}:{args.port} "
+          f"({args.workers} 个进程, {'uvloop' if uvloop is not None else 'asyncio'})")
+    print(f"  /data/<size>    'X' * size，例如 /data/10000")
+    print(f"  /bytes/<size>   '0' * size，支持 k/m/g 后缀，例如 /bytes/100m")
+    print(f"  /delay/<ms>     延迟 ms 毫秒后返回")
+    print(f"  /stream/<rate>  以 rate 字节/秒发送，例如 /stream/10m?seconds=5")
+    print("按 Ctrl+C 停止服务器")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        print("\n服务器已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+package main
+
+// IP黑名单匹配性能对比：逐条 IsIPInCIDR（旧实现） vs 前缀树（IPPrefixTrie）
+//
+// 用法:
+//   go run scripts/bench_ip_filter.go
+//   go run scripts/bench_ip_filter.go -rules 100,1000,10000,100000
+
+import (
+	"flag"
+	"fmt"
+	"math/rand"
+	"net"
+	"strconv"
+	"strings"
+	"testing"
+	"time"
+
+	"socks5-app/internal/utils"
+)
+
+// randomRules 生成count条规则：IPv4 /16~/32 和少量 IPv6 /48~/128 混合
+func randomRules(r *rand.Rand, count int) []string {
+	rules := make([]string, 0, count)
+	for len(rules) < count {
+		if r.Intn(10) == 0 {
+			ip := make(net.IP, net.IPv6len)
+			r.Read(ip)
+			ip[0] = 0x20
+			bits := 48 + r.Intn(81)
+			rules = append(rules, fmt.Sprintf("%s/%d", ip.Mask(net.CIDRMask(bits, 128)), bits))
+			continue
+		}
+		ip := net.IPv4(byte(r.Intn(223)+1), byte(r.Intn(256)), byte(r.Intn(256)), byte(r.Intn(256))).To4()
+		bits := 16 + r.Intn(17)
+		if bits == 32 {
+			rules = append(rules, ip.String()) // 单个IP
+		} else {
+			rules = append(rules, fmt.Sprintf("%s/%d", ip.Mask(net.CIDRMask(bits, 32)), bits))
+		}
+	}
+	return rules
+}
+
+// randomTargets 生成查询目标，带端口，模拟CONNECT的目标地址
+func randomTargets(r *rand.Rand, count int) []string {
+	targets := make([]string, count)
+	for i := range targets {
+		ip := net.IPv4(byte(r.Intn(223)+1), byte(r.Intn(256)), byte(r.Intn(256)), byte(r.Intn(256)))
+		targets[i] = net.JoinHostPort(ip.String(), "443")
+	}
+	return targets
+}
+
+func linearMatch(rules []string, target string) bool {
+	for _, rule := range rules {
+		if matched, err := utils.IsIPInCIDR(target, rule); err == nil && matched {
+			return true
+		}
+	}
+	return false
+}
+
+func main() {
+	ruleCounts := flag.String("rules", "100,1000,10000", "规则数量，逗号分隔")
+	seed := flag.Int64("seed", 1, "随机数种子")
+	flag.Parse()
+
+	r := rand.New(rand.NewSource(*seed))
+	targets := randomTargets(r, 4096)
+
+	fmt.Println("IP黑名单匹配性能对比")
+	fmt.Println("============================================================")
+	fmt.Printf("%-10s %-14s %14s %14s %12s %10s\n", "规则数", "实现", "ns/次查询", "allocs/次", "B/次", "构建耗时")
+
+	for _, field := range strings.Split(*ruleCounts, ",") {
+		count, err := strconv.Atoi(strings.TrimSpace(field))
+		if err != nil || count <= 0 {
+			fmt.Printf("无效的规则数: %s\n", field)
+			continue
+		}
+		rules := randomRules(r, count)
+
+		start := time.Now()
+		trie := utils.NewIPPrefixTrie()
+		for i, rule := range rules {
+			if err := trie.Insert(rule, i); err != nil {
+				fmt.Printf("插入规则失败: %v\n", err)
+			}
+		}
+		buildTime := time.Since(start)
+
+		// 两种实现的结果必须一致
+		mismatches := 0
+		for _, target := range targets {
+			_, hit := trie.LookupString(target)
+			if hit != linearMatch(rules, target) {
+				mismatches++
+			}
+		}
+
+		linear := testing.Benchmark(func(b *testing.B) {
+			b.ReportAllocs()
+			for i := 0; i < b.N; i++ {
+				linearMatch(rules, targets[i%len(targets)])
+			}
+		})
+		compiled := testing.Benchmark(func(b *testing.B) {
+			b.ReportAllocs()
+			for i := 0; i < b.N; i++ {
+				trie.LookupString(targets[i%len(targets)])
+			}
+		})
+
+		fmt.Printf("%-10d %-14s %14d %14d %12d %10s\n", count, "逐条匹配",
+			linear.NsPerOp(), linear.AllocsPerOp(), linear.AllocedBytesPerOp(), "-")
+		fmt.Printf("%-10d %-14s %14d %14d %12d %10v\n", count, "前缀树",
+			compiled.NsPerOp(), compiled.AllocsPerOp(), compiled.AllocedBytesPerOp(), buildTime.Round(time.Microsecond))
+		if mismatches > 0 {
+			fmt.Printf("✗ %d 个目标的匹配结果不一致\n", mismatches)
+		} else {
+			fmt.Printf("✓ %d 个目标匹配结果一致, 加速 %.0fx\n", len(targets),
+				float64(linear.NsPerOp())/float64(max(compiled.NsPerOp(), 1)))
+		}
+	}
+}
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IP 黑名单规模压测：规则数对 CONNECT 延迟的影响
+
+对每个规则数量级：
+1. 向 ip_blacklists 表写入 N 条随机 CIDR 规则（描述为 bench-ipfilter，不包含 127.0.0.0/8）
+2. 递增 config_versions 表中 ip_blacklist 的版本号，等待 proxy 重新加载黑名单
+3. 经代理对本地 echo 目标做大量 CONNECT，记录从发出 CONNECT 到收到响应的延迟
+4. 对一条被封禁的地址发起 CONNECT，确认规则已生效
+
+checkIPFilter 使用前缀树后，10k 规则下的 CONNECT 延迟应与 0 条规则基本一致。
+
+用法:
+  python3 scripts/bench_ip_filter.py -u testuser -p testpass --start-target
+  python3 scripts/bench_ip_filter.py -u testuser -p testpass --rules 0,1000,10000 --connects 5000 -c 20
+"""
+
+import argparse
+import ipaddress
+import json
+import random
+import socket
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pymysql
+
+from bench_target_server import TARGET_PORTS, start_target_process
+from latency_histogram import LatencyHistogram
+
+# 数据库配置
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 3306,
+    'user': 'socks5_user',
+    'password': 'socks5_password',
+    'database': 'socks5_db'
+}
+
+RULE_DESCRIPTION = 'bench-ipfilter'
+
+INSERT_BATCH = 1000
+
+
+def random_rules(count, seed=1):
+    """生成 count 条随机 IPv4 规则（/16 ~ /32），避开 127.0.0.0/8"""
+    r = random.Random(seed)
+    rules = []
+    while len(rules) < count:
+        first = r.randint(1, 223)
+        if first == 127:
+            continue
+        ip = ipaddress.IPv4Address(bytes([first, r.randint(0, 255), r.randint(0, 255), r.randint(0, 255)]))
+        bits = r.randint(16, 32)
+        if bits == 32:
+            rules.append(str(ip))
+        else:
+            rules.append(str(ipaddress.IPv4Network(f"{ip}/{bits}", strict=False)))
+    return rules
+
+
+def bump_version(cursor):
+    """直接写库不经过 API，需要自己递增版本号通知 proxy 重新加载"""
+    cursor.execute("""
+    INSERT INTO config_versions (name, version, updated_at) VALUES ('ip_blacklist', 1, NOW())
+    ON DUPLICATE KEY UPDATE version = version + 1, updated_at = NOW()
+    """)
+
+
+def clear_rules(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM ip_blacklists WHERE description = %s", (RULE_DESCRIPTION,))
+        bump_version(cursor)
+    conn.commit()
+
+
+def insert_rules(conn, rules):
+    sql = """
+    INSERT INTO ip_blacklists (cidr, description, enabled, created_at, updated_at)
+    VALUES (%s, %s, 1, NOW(), NOW())
+    """
+    with conn.cursor() as cursor:
+        for i in range(0, len(rules), INSERT_BATCH):
+            cursor.executemany(sql, [(cidr, RULE_DESCRIPTION) for cidr in rules[i:i + INSERT_BATCH]])
+        bump_version(cursor)
+    conn.commit()
+
+
+def blocked_address(rules):
+    """返回落在第一条规则内的地址，用于确认规则已生效"""
+    if not rules:
+        return None
+    return str(ipaddress.ip_network(rules[0], strict=False).network_address)
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("连接被关闭")
+        data += chunk
+    return data
+
+
+def connect_once(args, target_host, target_port):
+    """完成一次 SOCKS5 握手，返回 (CONNECT 延迟秒, 响应码)"""
+    with socket.create_connection((args.proxy_host, args.proxy_port), timeout=args.timeout) as sock:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.sendall(b'\x05\x01\x02')
+        if _recv_exact(sock, 2)[1] != 0x02:
+            raise ConnectionError("代理不接受用户名密码认证")
+        user, pwd = args.username.encode(), args.password.encode()
+        sock.sendall(bytes([0x01, len(user)]) + user + bytes([len(pwd)]) + pwd)
+        if _recv_exact(sock, 2)[1] != 0x00:
+            raise ConnectionError("认证失败")
+
+        request = b'\x05\x01\x00\x01' + socket.inet_aton(target_host) + struct.pack('!H', target_port)
+        start = time.perf_counter()
+        sock.sendall(request)
+        reply = _recv_exact(sock, 10)
+        return time.perf_counter() - start, reply[1]
+
+
+def measure(args):
+    """并发执行 args.connects 次 CONNECT，返回 (直方图, 错误数)"""
+    hist = LatencyHistogram()
+    errors = 0
+    target_port = TARGET_PORTS['echo']
+
+    def task(_):
+        try:
+            return connect_once(args, '127.0.0.1', target_port)
+        except (OSError, ConnectionError):
+            return None
+
+    with ThreadPoolExecutor(max_workers=args.concurrent) as pool:
+        for result in pool.map(task, range(args.connects)):
+            if result is None or result[1] != 0x00:
+                errors += 1
+            else:
+                hist.record(result[0])
+    return hist, errors
+
+
+def run_level(args, conn, count):
+    """测一个规则数量级，返回结果字典"""
+    print(f"\n▶ {count} 条黑名单规则")
+    rules = random_rules(count, args.seed)
+    clear_rules(conn)
+    if rules:
+        start = time.time()
+        insert_rules(conn, rules)
+        print(f"  写入规则耗时 {time.time() - start:.1f} 秒，等待 proxy 重新加载 {args.wait:g} 秒...")
+        time.sleep(args.wait)
+
+    result = {'rules': count}
+    probe = blocked_address(rules)
+    if probe:
+        try:
+            _, code = connect_once(args, probe, 80)
+            result['blocked_probe'] = code != 0x00
+            print(f"  {'✓' if code != 0x00 else '✗'} 封禁地址 {probe} 的 CONNECT 响应码: {code}")
+        except (OSError, ConnectionError) as e:
+            result['blocked_probe'] = True
+            print(f"  ✓ 封禁地址 {probe} 的连接被拒绝: {e}")
+
+    hist, errors = measure(args)
+    summary = {k: (v * 1000 if k != 'count' else v) for k, v in hist.summary().items()}
+    result.update({'errors': errors, 'connect_ms': summary, 'histogram': hist.to_dict()})
+    print(f"  CONNECT 延迟: 平均 {summary['mean']:.3f} ms, P50 {summary['p50']:.3f} ms, "
+          f"P99 {summary['p99']:.3f} ms ({hist.count} 次, 错误 {errors})")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='IP 黑名单规模压测：规则数对 CONNECT 延迟的影响',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('用法:', 1)[1])
+    parser.add_argument('--proxy-host', default='127.0.0.1', help='代理服务器地址 (默认: 127.0.0.1)')
+    parser.add_argument('--proxy-port', type=int, default=1082, help='代理服务器端口 (默认: 1082)')
+    parser.add_argument('-u', '--username', required=True, help='SOCKS5 用户名')
+    parser.add_argument('-p', '--password', required=True, help='SOCKS5 密码')
+    parser.add_argument('--rules', default='0,10000', help='规则数量级，逗号分隔 (默认: 0,10000)')
+    parser.add_argument('--connects', type=int, default=2000, help='每个量级的 CONNECT 次数 (默认: 2000)')
+    parser.add_argument('-c', '--concurrent', type=int, default=10, help='并发数 (默认: 10)')
+    parser.add_argument('--wait', type=float, default=5,
+                        help='写入规则后等待 proxy 重新加载的秒数，需大于 config_watch_interval (默认: 5)')
+    parser.add_argument('--timeout', type=float, default=5, help='连接超时(秒) (默认: 5)')
+    parser.add_argument('--seed', type=int, default=1, help='随机规则种子 (默认: 1)')
+    parser.add_argument('--start-target', action='store_true',
+                        help='在本机子进程中启动 bench_target_server.py')
+    parser.add_argument('--keep', action='store_true', help='结束后保留写入的规则')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 文件路径')
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.rules.split(',') if x.strip()]
+    target_process = start_target_process('127.0.0.1') if args.start_target else None
+
+    conn = pymysql.connect(**DB_CONFIG)
+    results = []
+    try:
+        for count in levels:
+            results.append(run_level(args, conn, count))
+    except KeyboardInterrupt:
+        print("\n⏹️  测试被中断")
+    except Exception as e:
+        print(f"❌ 测试失败: {e}")
+        sys.exit(1)
+    finally:
+        if not args.keep:
+            clear_rules(conn)
+        conn.close()
+        if target_process is not None:
+            target_process.terminate()
+
+    print(f"\n{'规则数':>8} {'平均(ms)':>10} {'P50(ms)':>10} {'P99(ms)':>10} {'错误':>6}")
+    for r in results:
+        s = r['connect_ms']
+        print(f"{r['rules']:>8} {s['mean']:>10.3f} {s['p50']:>10.3f} {s['p99']:>10.3f} {r['errors']:>6}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ 结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大流量转发效率测试：每 CPU 秒转发的字节数
+
+经代理建立若干条长连接，做上行 (sink) 和下行 (source) 批量传输，
+同时用 proxy_monitor.ResourceSampler 采样 proxy 进程的 CPU 时间和内存，
+得到 "每 CPU 秒转发字节数" 和 "每连接内存"，用于对比 forwardData 的
+快速转发路径（splice）和逐包缓冲区拷贝路径。
+
+对比步骤:
+  # 1. proxy 配置 enable_fast_relay: false（并关闭 enable_ip_forwarding），重启 proxy
+  python3 scripts/bench_relay_efficiency.py -u testuser -p testpass --label buffered -o relay_buffered.json
+  # 2. 改为 enable_fast_relay: true，重启 proxy
+  python3 scripts/bench_relay_efficiency.py -u testuser -p testpass --label fast -o relay_fast.json
+  # 3. 对比
+  python3 scripts/bench_relay_efficiency.py --compare relay_buffered.json relay_fast.json
+
+注意: 被测用户不能设置带宽限制，否则始终走逐包路径。
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import struct
+import sys
+import time
+
+from bench_target_server import TARGET_PORTS, start_target_process
+from proxy_monitor import ResourceSampler
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+DIRECTIONS = {
+    'sink': '上行 (客户端 -> 目标)',
+    'source': '下行 (目标 -> 客户端)',
+}
+
+READ_SIZE = 256 * 1024
+
+
+async def open_tunnel(proxy_host, proxy_port, target_host, target_port, username, password):
+    """完成 SOCKS5 握手，返回 (reader, writer)"""
+    reader, writer = await asyncio.open_connection(proxy_host, proxy_port)
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    method = 0x02 if username else 0x00
+    writer.write(bytes([0x05, 0x01, method]))
+    reply = await reader.readexactly(2)
+    if reply[1] != method:
+        raise ConnectionError(f"代理不接受认证方法 {method:#x}")
+
+    if username:
+        user, pwd = username.encode(), password.encode()
+        writer.write(bytes([0x01, len(user)]) + user + bytes([len(pwd)]) + pwd)
+        reply = await reader.readexactly(2)
+        if reply[1] != 0x00:
+            raise ConnectionError("认证失败")
+
+    writer.write(bytes([0x05, 0x01, 0x00, 0x01]) + socket.inet_aton(target_host) +
+                 struct.pack('!H', target_port))
+    reply = await reader.readexactly(10)
+    if reply[1] != 0x00:
+        raise ConnectionError(f"CONNECT 失败，错误码 {reply[1]}")
+    return reader, writer
+
+
+async def sink_transfer(reader, writer, payload, deadline):
+    """持续上行发送直到 deadline，返回目标确认收到的字节数"""
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        writer.write(payload)
+        await writer.drain()
+    writer.write_eof()
+    return struct.unpack('!Q', await reader.readexactly(8))[0]
+
+
+async def source_transfer(reader, writer, deadline):
+    """持续下行接收直到 deadline，返回收到的字节数"""
+    loop = asyncio.get_running_loop()
+    total = 0
+    while loop.time() < deadline:
+        data = await reader.read(READ_SIZE)
+        if not data:
+            break
+        total += len(data)
+    return total
+
+
+async def run_direction(args, direction):
+    """运行一个方向的批量传输，返回 (总字节数, 成功连接数, 错误列表)"""
+    payload = memoryview(b'X' * args.packet_size)
+    target_port = TARGET_PORTS[direction]
+
+    async def one_connection(deadline):
+        reader, writer = await open_tunnel(args.proxy_host, args.proxy_port, args.target_host,
+                                           target_port, args.username, args.password)
+        try:
+            if direction == 'sink':
+                return await sink_transfer(reader, writer, payload, deadline)
+            return await source_transfer(reader, writer, deadline)
+        finally:
+            writer.close()
+
+    deadline = asyncio.get_running_loop().time() + args.duration
+    results = await asyncio.gather(*(one_connection(deadline) for _ in range(args.concurrent)),
+                                   return_exceptions=True)
+    total = sum(r for r in results if not isinstance(r, BaseException))
+    errors = [str(r) for r in results if isinstance(r, BaseException)]
+    return total, args.concurrent - len(errors), errors
+
+
+def measure(args, direction):
+    """在资源采样下运行一个方向，返回该方向的结果字典"""
+    sampler = ResourceSampler(args.monitor_pid, args.proxy_port, args.monitor_interval,
+                              tcp_states=False)
+    sampler.start()
+    start = time.time()
+    total, connections, errors = asyncio.run(run_direction(args, direction))
+    elapsed = time.time() - start
+    sampler.stop()
+
+    summary = sampler.summary()
+    cost = sampler.cost_report(connections, total)
+    result = {
+        'direction': direction,
+        'bytes': total,
+        'connections': connections,
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'throughput': total / elapsed if elapsed > 0 else 0,
+        'cpu_seconds': summary['cpu_seconds'],
+        'bytes_per_cpu_second': cost.get('bytes_per_cpu_second', 0),
+        'rss_mb_max': summary.get('rss_mb_max'),
+        'rss_mb_per_1k_conns': cost.get('rss_mb_per_1k_conns'),
+    }
+    if errors:
+        print(f"  ⚠️  {len(errors)} 个连接失败，例如: {errors[0]}")
+    return result
+
+
+def print_result(result):
+    print(f"  {DIRECTIONS[result['direction']]}")
+    print(f"    转发字节数: {result['bytes'] / 1024 / 1024:.1f} MB "
+          f"({result['connections']} 个连接, {result['elapsed']:.1f} 秒)")
+    print(f"    吞吐量: {result['throughput'] * 8 / 1e9:.2f} Gbit/s")
+    print(f"    proxy CPU 时间: {result['cpu_seconds']:.2f} 秒")
+    print(f"    每 CPU 秒转发: {result['bytes_per_cpu_second'] / 1024 / 1024:.1f} MB")
+    if result.get('rss_mb_per_1k_conns') is not None:
+        print(f"    每 1k 连接内存增长: {result['rss_mb_per_1k_conns']:.2f} MB")
+
+
+def compare(base_path, new_path):
+    """对比两次运行的每 CPU 秒转发字节数"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"\n{'方向':<8} {base['label']:>16} {new['label']:>16} {'倍数':>8}   (每 CPU 秒转发 MB)")
+    print("-" * 60)
+    for direction in DIRECTIONS:
+        a = base['results'].get(direction)
+        b = new['results'].get(direction)
+        if not a or not b:
+            continue
+        a_rate = a['bytes_per_cpu_second'] / 1024 / 1024
+        b_rate = b['bytes_per_cpu_second'] / 1024 / 1024
+        ratio = b_rate / a_rate if a_rate > 0 else float('inf')
+        print(f"{direction:<8} {a_rate:>16.1f} {b_rate:>16.1f} {ratio:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='大流量转发效率测试：每 CPU 秒转发的字节数',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('对比步骤:', 1)[1])
+    parser.add_argument('--proxy-host', default='127.0.0.1', help='代理服务器地址 (默认: 127.0.0.1)')
+    parser.add_argument('--proxy-port', type=int, default=1082, help='代理服务器端口 (默认: 1082)')
+    parser.add_argument('--target-host', default='127.0.0.1',
+                        help='bench_target_server.py 所在地址 (默认: 127.0.0.1)')
+    parser.add_argument('-u', '--username', default=None, help='SOCKS5 用户名')
+    parser.add_argument('-p', '--password', default=None, help='SOCKS5 密码')
+    parser.add_argument('-c', '--concurrent', type=int, default=16, help='并发连接数 (默认: 16)')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='每个方向的持续时间(秒) (默认: 10)')
+    parser.add_argument('--packet-size', type=int, default=256 * 1024,
+                        help='上行每次写入的字节数 (默认: 262144)')
+    parser.add_argument('--direction', choices=['sink', 'source', 'both'], default='both',
+                        help='测试方向 (默认: both)')
+    parser.add_argument('--start-target', action='store_true',
+                        help='在本机子进程中启动 bench_target_server.py')
+    parser.add_argument('--monitor-pid', type=int, default=None,
+                        help='proxy 进程 PID (默认: 按 --proxy-port 查找)')
+    parser.add_argument('--monitor-interval', type=float, default=0.5,
+                        help='资源采样间隔(秒) (默认: 0.5)')
+    parser.add_argument('--label', default='run', help='本次运行的标签，例如 fast / buffered (默认: run)')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 文件路径')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), default=None,
+                        help='对比两个结果 JSON 文件，不运行测试')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    target_process = None
+    if args.start_target:
+        target_process = start_target_process('127.0.0.1')
+
+    directions = list(DIRECTIONS) if args.direction == 'both' else [args.direction]
+    output = {'label': args.label, 'config': vars(args), 'results': {}}
+    print(f"转发效率测试 [{args.label}]: {args.concurrent} 个连接, 每个方向 {args.duration:g} 秒")
+    try:
+        for direction in directions:
+            result = measure(args, direction)
+            output['results'][direction] = result
+            print_result(result)
+    except Exception as e:
+        print(f"❌ 测试失败: {e}")
+        sys.exit(1)
+    finally:
+        if target_process is not None:
+            target_process.terminate()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ 结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
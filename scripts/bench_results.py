@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压测结果库与回归检查
+
+把 benchmark_socks5.py 的 JSON 报告（含延迟直方图）按
+git commit + 场景 + 配置 存入 SQLite，并比较两个 commit 之间的
+吞吐量和 P99 延迟，只有在统计上显著时才判定为回退：
+- 吞吐量：同一 commit 有多次运行时对各次运行的总吞吐做 Welch t 检验，
+  否则对每连接吞吐的均值/标准差/样本数做 Welch t 检验
+- P99：由合并后的直方图计算分位数的置信区间（按二项分布估计 P99 所在
+  秩次的范围），两个区间不重叠且变化超过阈值时判定为显著
+
+用法:
+  # 压测时直接入库
+  python3 benchmark_socks5.py --mode sink --start-target --store bench_results.db --scenario sink-200
+
+  # 导入已有报告
+  python3 bench_results.py record benchmark_report_20250101_120000.json --scenario sink-200
+
+  # 列出结果、对比两个 commit（出现显著回退时返回码为 1，可用作 CI 门禁）
+  python3 bench_results.py list
+  python3 bench_results.py compare <基准commit> <新commit>
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+from latency_histogram import LatencyHistogram
+
+DEFAULT_DB = "bench_results.db"
+
+# 不影响结果可比性的环境参数，不参与配置键
+ENVIRONMENT_KEYS = ('proxy_host', 'proxy_port', 'target_host', 'target_port')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    git_commit TEXT,
+    git_dirty INTEGER NOT NULL DEFAULT 0,
+    scenario TEXT NOT NULL,
+    config_key TEXT NOT NULL,
+    config TEXT NOT NULL,
+    throughput REAL,
+    throughput_mean REAL,
+    throughput_stdev REAL,
+    throughput_count INTEGER,
+    success_count INTEGER,
+    error_count INTEGER,
+    latency_histogram TEXT,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_lookup ON runs (git_commit, scenario, config_key);
+"""
+
+
+def git_commit():
+    """返回 (commit, 工作区是否有未提交修改)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+        return commit or None, bool(dirty)
+    except Exception:
+        return None, False
+
+
+def config_key(config):
+    """配置的稳定哈希（去掉主机/端口等环境参数）"""
+    relevant = {k: v for k, v in sorted(config.items()) if k not in ENVIRONMENT_KEYS}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def default_scenario(config):
+    """未指定场景名时由配置推导"""
+    if config.get('churn'):
+        return f"churn-{config['churn']}"
+    return f"{config.get('mode', 'send')}-c{config.get('concurrent')}"
+
+
+def report_metrics(report):
+    """
+    从 benchmark_socks5.py 报告中提取比较用的指标
+
+    Returns:
+        dict: throughput（总吞吐，churn 场景为连接/秒）、每连接吞吐的均值/标准差/样本数、
+              延迟直方图（churn 场景为完整周期直方图）
+    """
+    churn = report.get('churn')
+    if churn:
+        total = report.get('churn', {}).get('phases', {}).get('total', {})
+        return {
+            'throughput': churn['connections_per_sec'],
+            'throughput_mean': None,
+            'throughput_stdev': None,
+            'throughput_count': None,
+            'latency_histogram': total.get('histogram'),
+        }
+    throughputs = report.get('throughputs', {})
+    return {
+        'throughput': throughputs.get('total'),
+        'throughput_mean': throughputs.get('mean'),
+        'throughput_stdev': throughputs.get('stdev'),
+        'throughput_count': throughputs.get('count'),
+        'latency_histogram': report.get('latencies', {}).get('histogram'),
+    }
+
+
+class ResultStore:
+    """SQLite 结果库"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def record(self, report, scenario=None, commit=None, dirty=None):
+        """保存一份报告，返回行 ID"""
+        config = report['test_config']
+        if commit is None:
+            commit, dirty = git_commit()
+        metrics = report_metrics(report)
+        histogram = metrics['latency_histogram']
+        cursor = self.conn.execute(
+            """INSERT INTO runs (created_at, git_commit, git_dirty, scenario, config_key, config,
+                                 throughput, throughput_mean, throughput_stdev, throughput_count,
+                                 success_count, error_count, latency_histogram, report)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (datetime.now().isoformat(), commit, int(bool(dirty)),
+             scenario or default_scenario(config), config_key(config),
+             json.dumps(config, sort_keys=True),
+             metrics['throughput'], metrics['throughput_mean'], metrics['throughput_stdev'],
+             metrics['throughput_count'],
+             report['summary']['success_count'], report['summary']['error_count'],
+             json.dumps(histogram) if histogram else None,
+             json.dumps(report, ensure_ascii=False)))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def resolve_commit(self, ref):
+        """把 commit 前缀（或 git 引用）解析为库中的完整 commit"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT git_commit FROM runs WHERE git_commit LIKE ?", (ref + '%',)).fetchall()
+        if len(rows) == 1:
+            return rows[0][0]
+        if len(rows) > 1:
+            raise SystemExit(f"✗ commit 前缀 {ref} 不唯一")
+        try:
+            full = subprocess.run(['git', 'rev-parse', ref], capture_output=True,
+                                  text=True, timeout=10).stdout.strip()
+        except Exception:
+            full = ''
+        if full and self.conn.execute("SELECT 1 FROM runs WHERE git_commit = ?", (full,)).fetchone():
+            return full
+        raise SystemExit(f"✗ 结果库中没有 commit {ref} 的运行记录")
+
+    def runs(self, commit=None, scenario=None):
+        sql = "SELECT * FROM runs WHERE 1=1"
+        params = []
+        if commit:
+            sql += " AND git_commit = ?"
+            params.append(commit)
+        if scenario:
+            sql += " AND scenario = ?"
+            params.append(scenario)
+        return self.conn.execute(sql + " ORDER BY id", params).fetchall()
+
+
+class RunGroup:
+    """同一 commit + 场景 + 配置下的全部运行，直方图合并"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.throughputs = [r['throughput'] for r in rows if r['throughput'] is not None]
+        self.latency = None
+        for r in rows:
+            if r['latency_histogram']:
+                hist = LatencyHistogram.from_dict(json.loads(r['latency_histogram']))
+                self.latency = hist if self.latency is None else self.latency.merge(hist)
+
+    def throughput_stats(self):
+        """
+        返回 (总吞吐, 检验均值, 检验标准差, 检验样本数, 样本含义)
+
+        多次运行时以各次运行的总吞吐为样本；单次运行时以每连接吞吐为样本。
+        """
+        total = sum(self.throughputs) / len(self.throughputs) if self.throughputs else None
+        if len(self.throughputs) >= 2:
+            var = sum((x - total) ** 2 for x in self.throughputs) / (len(self.throughputs) - 1)
+            return total, total, math.sqrt(var), len(self.throughputs), '多次运行'
+        row = self.rows[-1]
+        if row['throughput_count'] and row['throughput_stdev'] is not None:
+            return (total, row['throughput_mean'], row['throughput_stdev'],
+                    row['throughput_count'], '每连接')
+        return total, total, None, 1, '单次运行'
+
+
+def _betacf(a, b, x, max_iter=200, eps=3e-14):
+    """不完全 Beta 函数的连分式展开"""
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > 1e-300 else 1e-300)
+    h = d
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > 1e-300 else 1e-300)
+        c = 1.0 + aa / c if abs(c) > 1e-300 else 1e-300
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > 1e-300 else 1e-300)
+        c = 1.0 + aa / c if abs(c) > 1e-300 else 1e-300
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < eps:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """正则化不完全 Beta 函数 I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                     a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1 - x) / b
+
+
+def welch_p_value(mean_a, sd_a, n_a, mean_b, sd_b, n_b):
+    """Welch t 检验的双侧 p 值（t 分布，Welch-Satterthwaite 自由度）"""
+    if None in (sd_a, sd_b) or n_a < 2 or n_b < 2:
+        return None
+    va, vb = sd_a ** 2 / n_a, sd_b ** 2 / n_b
+    se = math.sqrt(va + vb)
+    if se == 0:
+        return 0.0 if mean_a != mean_b else 1.0
+    t = abs(mean_a - mean_b) / se
+    df = (va + vb) ** 2 / (va ** 2 / (n_a - 1) + vb ** 2 / (n_b - 1))
+    return _betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def percentile_interval(hist, p, z=1.96):
+    """
+    直方图分位数的置信区间
+
+    P 分位数对应的秩次近似服从二项分布，取 p ± z*sqrt(p(1-p)/n) 两个分位数作为区间，
+    并放宽直方图自身的相对误差。
+    """
+    n = hist.count
+    q = p / 100.0
+    half = z * math.sqrt(q * (1 - q) / n) if n else 0.0
+    low_p = max(0.0, q - half) * 100
+    high_p = min(1.0, q + half) * 100
+    pcts = hist.percentiles((low_p, p, high_p))
+    err = hist.relative_error()
+    return pcts[low_p] * (1 - err), pcts[p], pcts[high_p] * (1 + err)
+
+
+def compare_groups(base, new, threshold, alpha):
+    """
+    比较两组运行
+
+    Returns:
+        list: [(指标, 基准值, 新值, 变化比例, 是否显著回退, 说明), ...]
+    """
+    findings = []
+
+    b_total, b_mean, b_sd, b_n, b_kind = base.throughput_stats()
+    n_total, n_mean, n_sd, n_n, n_kind = new.throughput_stats()
+    if b_total and n_total is not None:
+        change = (n_total - b_total) / b_total
+        p = welch_p_value(b_mean, b_sd, b_n, n_mean, n_sd, n_n) if b_kind == n_kind else None
+        significant = p is not None and p < alpha
+        regression = change < -threshold and significant
+        note = f"p={p:.3g} ({b_kind})" if p is not None else "样本不足，无法检验"
+        findings.append(('吞吐量', b_total, n_total, change, regression, note))
+
+    if base.latency and new.latency:
+        b_low, b_p99, b_high = percentile_interval(base.latency, 99)
+        n_low, n_p99, n_high = percentile_interval(new.latency, 99)
+        change = (n_p99 - b_p99) / b_p99 if b_p99 else 0.0
+        regression = change > threshold and n_low > b_high
+        note = (f"95% 区间 [{b_low*1000:.2f}, {b_high*1000:.2f}] -> "
+                f"[{n_low*1000:.2f}, {n_high*1000:.2f}] ms")
+        findings.append(('P99 延迟', b_p99, n_p99, change, regression, note))
+
+    return findings
+
+
+def compare(store, base_ref, new_ref, scenario=None, threshold=0.05, alpha=0.05):
+    """对比两个 commit，返回是否存在显著回退"""
+    base_commit = store.resolve_commit(base_ref)
+    new_commit = store.resolve_commit(new_ref)
+
+    def groups(commit):
+        result = {}
+        for row in store.runs(commit, scenario):
+            result.setdefault((row['scenario'], row['config_key']), []).append(row)
+        return result
+
+    base_groups = groups(base_commit)
+    new_groups = groups(new_commit)
+    common = sorted(set(base_groups) & set(new_groups))
+
+    print(f"{'='*90}")
+    print(f"压测结果对比: {base_commit[:10]} -> {new_commit[:10]}")
+    print(f"显著性水平 {alpha}，回退阈值 {threshold*100:.1f}%")
+    print(f"{'='*90}")
+    if not common:
+        print("✗ 两个 commit 没有相同场景和配置的运行记录")
+        return False
+
+    any_regression = False
+    for key in common:
+        base, new = RunGroup(base_groups[key]), RunGroup(new_groups[key])
+        print(f"\n场景 {key[0]} (配置 {key[1]}, 运行次数 {len(base.rows)} -> {len(new.rows)})")
+        for metric, b, n, change, regression, note in compare_groups(base, new, threshold, alpha):
+            if metric == '吞吐量':
+                b_text, n_text = f"{b / 1024 / 1024:.2f} MB/s", f"{n / 1024 / 1024:.2f} MB/s"
+                if json.loads(base.rows[-1]['config']).get('churn'):
+                    b_text, n_text = f"{b:.1f} 连接/秒", f"{n:.1f} 连接/秒"
+            else:
+                b_text, n_text = f"{b*1000:.2f} ms", f"{n*1000:.2f} ms"
+            flag = "✗ 显著回退" if regression else "✓"
+            print(f"  {metric:<8} {b_text:>16} -> {n_text:<16} {change*100:+7.1f}%  {flag}  {note}")
+            any_regression = any_regression or regression
+
+    missing = sorted(set(base_groups) - set(new_groups))
+    if missing:
+        print(f"\n⚠️  新 commit 缺少以下场景: {', '.join(s for s, _ in missing)}")
+    return any_regression
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='压测结果库与回归检查',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('用法:')[1])
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'SQLite 数据库路径 (默认: {DEFAULT_DB})')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p = sub.add_parser('record', help='导入 benchmark_socks5.py 的 JSON 报告')
+    p.add_argument('reports', nargs='+', help='JSON 报告文件')
+    p.add_argument('--scenario', default=None, help='场景名 (默认: 由配置推导)')
+    p.add_argument('--commit', default=None, help='报告对应的 commit (默认: 当前 HEAD)')
+
+    p = sub.add_parser('list', help='列出运行记录')
+    p.add_argument('--scenario', default=None)
+
+    p = sub.add_parser('compare', help='对比两个 commit')
+    p.add_argument('base', help='基准 commit（前缀或 git 引用）')
+    p.add_argument('new', help='新 commit')
+    p.add_argument('--scenario', default=None, help='只比较指定场景')
+    p.add_argument('--threshold', type=float, default=0.05, help='回退阈值比例 (默认: 0.05)')
+    p.add_argument('--alpha', type=float, default=0.05, help='显著性水平 (默认: 0.05)')
+
+    args = parser.parse_args()
+    store = ResultStore(args.db)
+
+    if args.cmd == 'record':
+        for path in args.reports:
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+            commit, dirty = (args.commit, False) if args.commit else git_commit()
+            run_id = store.record(report, args.scenario, commit, dirty)
+            print(f"✓ {os.path.basename(path)} -> 运行 #{run_id}")
+    elif args.cmd == 'list':
+        print(f"{'ID':<6} {'时间':<20} {'commit':<12} {'场景':<20} {'配置':<14} {'吞吐':>14} {'P99ms':>10}")
+        for row in store.runs(scenario=args.scenario):
+            p99 = ''
+            if row['latency_histogram']:
+                hist = LatencyHistogram.from_dict(json.loads(row['latency_histogram']))
+                p99 = f"{hist.percentile(99)*1000:.2f}"
+            commit = (row['git_commit'] or '?')[:10] + ('*' if row['git_dirty'] else '')
+            print(f"{row['id']:<6} {row['created_at'][:19]:<20} {commit:<12} {row['scenario']:<20} "
+                  f"{row['config_key']:<14} {row['throughput'] or 0:>14.1f} {p99:>10}")
+    elif args.cmd == 'compare':
+        if compare(store, args.base, args.new, args.scenario, args.threshold, args.alpha):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
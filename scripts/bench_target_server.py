@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压测用本地 TCP 目标服务器
+
+同时监听三个端口，配合 benchmark_socks5.py --mode 使用：
+- echo   (默认 9001): 原样回显收到的数据，用于测量经代理的往返延迟
+- sink   (默认 9002): 丢弃收到的数据，客户端半关闭后回传 8 字节收到的总字节数，
+                      用于测量上行（客户端 -> 目标）有效吞吐
+- source (默认 9003): 连接建立后持续发送预分配缓冲区中的数据，
+                      用于测量下行（目标 -> 客户端）有效吞吐
+
+用法:
+  python3 scripts/bench_target_server.py
+  python3 scripts/bench_target_server.py --host 0.0.0.0 --echo-port 19001
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import struct
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# 各模式的默认端口
+TARGET_PORTS = {
+    'echo': 9001,
+    'sink': 9002,
+    'source': 9003,
+}
+
+READ_SIZE = 256 * 1024
+
+
+class TargetServer:
+    """echo / sink / source 三合一目标服务器"""
+
+    def __init__(self, host='127.0.0.1', ports=None, chunk_size=64 * 1024):
+        """
+        Args:
+            host: 监听地址
+            ports: {'echo': 端口, 'sink': 端口, 'source': 端口}
+            chunk_size: source 模式每次写出的数据块大小
+        """
+        self.host = host
+        self.ports = dict(TARGET_PORTS)
+        if ports:
+            self.ports.update(ports)
+        # source 模式复用同一块预分配缓冲区，避免每次写出都分配内存
+        self.payload = memoryview(b'X' * chunk_size)
+
+    async def handle_echo(self, reader, writer):
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_sink(self, reader, writer):
+        total = 0
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                total += len(data)
+            # 客户端半关闭后回传实际收到的字节数
+            writer.write(struct.pack('!Q', total))
+            await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_source(self, reader, writer):
+        try:
+            while not reader.at_eof():
+                writer.write(self.payload)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, ready=None):
+        """启动三个监听端口并一直运行"""
+        handlers = {
+            'echo': self.handle_echo,
+            'sink': self.handle_sink,
+            'source': self.handle_source,
+        }
+        servers = []
+        for mode, handler in handlers.items():
+            server = await asyncio.start_server(
+                handler, self.host, self.ports[mode], backlog=65535, reuse_address=True)
+            for sock in server.sockets:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            servers.append(server)
+        if ready is not None:
+            ready.set()
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+
+    def run(self, ready=None):
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        try:
+            asyncio.run(self.serve(ready))
+        except KeyboardInterrupt:
+            pass
+
+
+def _serve_process(host, ports, ready):
+    TargetServer(host, ports).run(ready)
+
+
+def start_target_process(host='127.0.0.1', ports=None, timeout=5):
+    """
+    在独立进程中启动目标服务器（避免与压测客户端争抢 GIL）
+
+    Returns:
+        multiprocessing.Process: 已就绪的服务器进程，使用完毕后调用 terminate()
+    """
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(
+        target=_serve_process, args=(host, ports, ready), daemon=True)
+    process.start()
+    if not ready.wait(timeout):
+        process.terminate()
+        raise RuntimeError("目标服务器启动超时")
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description='压测用 echo/sink/source 目标服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--echo-port', type=int, default=TARGET_PORTS['echo'],
+                        help=f"echo 端口 (默认: {TARGET_PORTS['echo']})")
+    parser.add_argument('--sink-port', type=int, default=TARGET_PORTS['sink'],
+                        help=f"sink 端口 (默认: {TARGET_PORTS['sink']})")
+    parser.add_argument('--source-port', type=int, default=TARGET_PORTS['source'],
+                        help=f"source 端口 (默认: {TARGET_PORTS['source']})")
+    parser.add_argument('--chunk-size', type=int, default=64 * 1024,
+                        help='source 模式每次写出的字节数 (默认: 65536)')
+    args = parser.parse_args()
+
+    ports = {'echo': args.echo_port, 'sink': args.sink_port, 'source': args.source_port}
+    print(f"压测目标服务器运行在 {args.host}")
+    for mode, port in ports.items():
+        print(f"  {mode:<6} -> {port}")
+    print("按 Ctrl+C 停止服务器")
+    TargetServer(args.host, ports, args.chunk_size).run()
+    print("\n服务器已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+package main
+
+// URL过滤规则匹配性能对比：逐条 strings.Contains（旧实现） vs URLMatcher（Aho-Corasick + 域名后缀树）
+//
+// 用法:
+//   go run scripts/bench_url_filter.go
+//   go run scripts/bench_url_filter.go -rules 100,10000,100000 -wildcard 0.2
+
+import (
+	"flag"
+	"fmt"
+	"math/rand"
+	"strconv"
+	"strings"
+	"testing"
+	"time"
+
+	"socks5-app/internal/utils"
+)
+
+var tlds = []string{"com", "net", "org", "cn", "io", "com.cn"}
+
+func randomLabel(r *rand.Rand) string {
+	const letters = "abcdefghijklmnopqrstuvwxyz0123456789"
+	b := make([]byte, 4+r.Intn(10))
+	for i := range b {
+		b[i] = letters[r.Intn(len(letters))]
+	}
+	return string(b)
+}
+
+func randomDomain(r *rand.Rand) string {
+	return randomLabel(r) + "." + tlds[r.Intn(len(tlds))]
+}
+
+// randomRules 生成count条规则，其中wildcard比例为"*.domain"形式
+func randomRules(r *rand.Rand, count int, wildcard float64) []string {
+	rules := make([]string, count)
+	for i := range rules {
+		if r.Float64() < wildcard {
+			rules[i] = "*." + randomDomain(r)
+		} else {
+			rules[i] = randomDomain(r)
+		}
+	}
+	return rules
+}
+
+// randomTargets 生成查询目标：约10%命中某条规则，其余为随机域名
+func randomTargets(r *rand.Rand, rules []string, count int) []string {
+	targets := make([]string, count)
+	for i := range targets {
+		if r.Intn(10) == 0 {
+			rule := strings.TrimPrefix(rules[r.Intn(len(rules))], "*.")
+			targets[i] = "www." + rule
+		} else {
+			targets[i] = randomLabel(r) + "." + randomDomain(r)
+		}
+	}
+	return targets
+}
+
+// linearMatch 与URLMatcher语义相同的逐条匹配，返回第一条命中规则的下标
+func linearMatch(rules []string, target string) (int, bool) {
+	for i, rule := range rules {
+		if strings.HasPrefix(rule, "*.") {
+			if strings.HasSuffix(target, rule[1:]) {
+				return i, true
+			}
+		} else if strings.Contains(target, rule) {
+			return i, true
+		}
+	}
+	return 0, false
+}
+
+func main() {
+	ruleCounts := flag.String("rules", "100,10000,100000", "规则数量，逗号分隔")
+	wildcard := flag.Float64("wildcard", 0.2, "通配规则(*.domain)比例")
+	seed := flag.Int64("seed", 1, "随机数种子")
+	flag.Parse()
+
+	r := rand.New(rand.NewSource(*seed))
+
+	fmt.Println("URL过滤规则匹配性能对比")
+	fmt.Println("============================================================")
+	fmt.Printf("%-10s %-14s %14s %12s %10s\n", "规则数", "实现", "ns/次查询", "allocs/次", "构建耗时")
+
+	for _, field := range strings.Split(*ruleCounts, ",") {
+		count, err := strconv.Atoi(strings.TrimSpace(field))
+		if err != nil || count <= 0 {
+			fmt.Printf("无效的规则数: %s\n", field)
+			continue
+		}
+		rules := randomRules(r, count, *wildcard)
+		targets := randomTargets(r, rules, 4096)
+
+		start := time.Now()
+		values := make([]int, len(rules))
+		for i := range values {
+			values[i] = i
+		}
+		matcher := utils.NewURLMatcher(rules, values)
+		buildTime := time.Since(start)
+
+		// 两种实现必须命中同一条规则
+		mismatches, hits := 0, 0
+		for _, target := range targets {
+			a, okA := linearMatch(rules, target)
+			b, okB := matcher.Match(target)
+			if okA != okB || (okA && a != b) {
+				mismatches++
+			}
+			if okA {
+				hits++
+			}
+		}
+
+		linear := testing.Benchmark(func(b *testing.B) {
+			b.ReportAllocs()
+			for i := 0; i < b.N; i++ {
+				linearMatch(rules, targets[i%len(targets)])
+			}
+		})
+		compiled := testing.Benchmark(func(b *testing.B) {
+			b.ReportAllocs()
+			for i := 0; i < b.N; i++ {
+				matcher.Match(targets[i%len(targets)])
+			}
+		})
+
+		fmt.Printf("%-10d %-14s %14d %12d %10s\n", count, "逐条匹配",
+			linear.NsPerOp(), linear.AllocsPerOp(), "-")
+		fmt.Printf("%-10d %-14s %14d %12d %10v\n", count, "自动机",
+			compiled.NsPerOp(), compiled.AllocsPerOp(), buildTime.Round(time.Microsecond))
+		if mismatches > 0 {
+			fmt.Printf("✗ %d/%d 个目标的匹配结果不一致\n", mismatches, len(targets))
+		} else {
+			fmt.Printf("✓ %d 个目标（命中 %d）匹配结果一致, 加速 %.0fx\n", len(targets), hits,
+				float64(linear.NsPerOp())/float64(max(compiled.NsPerOp(), 1)))
+		}
+	}
+}
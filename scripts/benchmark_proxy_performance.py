@@ -17,11 +17,12 @@ import sys
 import socks
 import psutil
 import threading
-import subprocess
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import defaultdict
 import statistics
 
+from proxy_monitor import get_proxy_pid
+
 # 配置
 PROXY_HOST = "localhost"
 PROXY_PORT = 1082
@@ -53,27 +54,6 @@ cpu_stats = {
 stats_lock = threading.Lock()
 monitor_running = True
 
-def get_proxy_pid():
-    """获取proxy进程的PID"""
-    try:
-        result = subprocess.run(
-            ["ps", "aux"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        
-        for line in result.stdout.split('\n'):
-            if 'bin/proxy' in line and 'grep' not in line:
-                parts = line.split()
-                if len(parts) > 1:
-                    return int(parts[1])
-        
-        return None
-    except Exception as e:
-        print(f"⚠️  无法获取proxy进程PID: {e}")
-        return None
-
 def monitor_proxy_resources(pid, interval=0.5):
     """监控proxy进程的资源使用"""
     global monitor_running, cpu_stats
@@ -10,8 +10,15 @@ SOCKS5 代理压力测试脚本
 - 测试每个连接的延迟
 - 生成详细的性能报告
 - 支持实时监控和图表生成
+- 支持 asyncio 引擎（安装 uvloop 时自动启用），单进程维持数万并发隧道
+- 支持多进程分片压测，各进程的延迟直方图在结束时精确合并
+- 支持 echo/sink/source 模式，配合 bench_target_server.py 测量真实往返延迟和单向吞吐
+- 支持短连接（churn）模式，测量每秒新建连接数及握手各阶段的延迟分解
+- 支持采样 proxy 进程资源（CPU/RSS/FD/goroutine/TCP 状态），换算每 1k 连接成本
 """
 
+import asyncio
+import resource
 import socket
 import struct
 import time
@@ -23,7 +30,71 @@ import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from collections import defaultdict
+import itertools
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_target_server import TARGET_PORTS, start_target_process
+from bench_results import ResultStore
+from latency_histogram import LatencyHistogram
+from proxy_monitor import ResourceSampler
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# SOCKS5 CONNECT 响应错误码
+SOCKS5_REPLY_ERRORS = {
+    1: "一般性失败",
+    2: "规则集不允许",
+    3: "网络不可达",
+    4: "主机不可达",
+    5: "连接被拒绝",
+    6: "TTL过期",
+    7: "不支持的命令",
+    8: "不支持的地址类型"
+}
+
+
+def raise_nofile_limit():
+    """将文件描述符软限制提升到硬限制，asyncio 引擎需要为每个隧道占用一个 fd"""
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    except (ValueError, OSError):
+        return None
+
+
+# 数据阶段模式说明
+MODE_DESCRIPTIONS = {
+    'send': 'send (计时 send() 调用)',
+    'echo': 'echo (经代理的请求->响应往返延迟)',
+    'sink': 'sink (上行有效吞吐)',
+    'source': 'source (下行有效吞吐)',
+}
+
+
+# 短连接模式的认证场景
+CHURN_SCENARIOS = {
+    'none': '无认证',
+    'cached': '认证缓存命中 (固定用户)',
+    'cold': '冷认证 (每个连接使用不同用户)',
+}
+
+# 短连接模式中逐阶段记录的延迟
+CHURN_PHASES = {
+    'tcp_connect': 'TCP 连接',
+    'method': '认证方法协商',
+    'auth': '用户名密码认证',
+    'connect_reply': 'CONNECT 响应',
+    'payload': '数据往返',
+    'total': '完整周期',
+}
+
 
 # 颜色输出
 class Colors:
@@ -51,7 +122,21 @@ class SOCKS5Benchmark:
                  username=None,
                  password=None,
                  timeout=10,
-                 packet_size=1024):
+                 packet_size=1024,
+                 engine='thread',
+                 send_interval=0.001,
+                 max_pending_connects=512,
+                 processes=1,
+                 mode='send',
+                 churn=None,
+                 churn_users=10000,
+                 shard_index=0,
+                 shard_count=1,
+                 monitor=False,
+                 monitor_pid=None,
+                 monitor_interval=1.0,
+                 store=None,
+                 scenario=None):
         """
         初始化压测工具
         
@@ -66,6 +151,20 @@ class SOCKS5Benchmark:
             password: SOCKS5 密码
             timeout: 连接超时时间
             packet_size: 每次发送的数据包大小(字节)
+            engine: 压测引擎，thread（每连接一个线程）或 asyncio（非阻塞流）
+            send_interval: 每次发送之间的间隔(秒)
+            max_pending_connects: asyncio 引擎同时进行握手的最大连接数
+            processes: 压测进程数，大于1时将并发连接平均分配到各进程
+            mode: 数据阶段模式 send/echo/sink/source，见 data_phase
+            churn: 短连接模式的认证场景 none/cached/cold，None 表示长连接压测
+            churn_users: cold 场景轮流使用的用户数（用户名为 username + 序号）
+            shard_index: 多进程压测时本分片的序号，用于划分 cold 场景的用户
+            shard_count: 多进程压测的分片总数
+            monitor: 是否在压测期间采样 proxy 进程资源
+            monitor_pid: proxy 进程 PID，未指定时按 proxy_port 查找
+            monitor_interval: 资源采样间隔(秒)
+            store: 结果库（SQLite）路径，指定后报告按 git commit + 场景 + 配置入库
+            scenario: 入库使用的场景名，默认由配置推导
         """
         self.proxy_host = proxy_host
         self.proxy_port = proxy_port
@@ -77,22 +176,120 @@ class SOCKS5Benchmark:
         self.password = password
         self.timeout = timeout
         self.packet_size = packet_size
+        self.engine = engine
+        self.send_interval = send_interval
+        self.max_pending_connects = max_pending_connects
+        self.processes = max(1, processes)
+        self.mode = mode
+        self.churn = churn
+        self.churn_users = max(1, churn_users)
+        self.shard_index = shard_index
+        self.shard_count = max(1, shard_count)
+        if churn == 'none':
+            # 无认证场景只协商 0x00 方法
+            self.username = self.password = None
+        self._churn_seq = itertools.count()
+        self.monitor = monitor
+        self.monitor_pid = monitor_pid
+        self.monitor_interval = monitor_interval
+        self.sampler = None
+        self.store = store
+        self.scenario = scenario
         
         # 统计数据
         self.lock = threading.Lock()
         self.results = []
         self.error_count = 0
         self.success_count = 0
-        self.connection_times = []
-        self.latencies = []
+        self.connection_times = LatencyHistogram()  # 连接时间(秒)，固定内存
+        self.latencies = LatencyHistogram()  # 发送延迟(秒)，固定内存
         self.throughputs = []
+        self.total_bytes_sent = 0
+        self.total_bytes_recv = 0
         self.errors = defaultdict(int)
+        self.phase_times = {phase: LatencyHistogram() for phase in CHURN_PHASES}
         
         # 控制标志
         self.stop_flag = threading.Event()
         self.start_time = None
         self.end_time = None
     
+    def build_greeting(self):
+        """构造认证方法协商请求"""
+        if self.username and self.password:
+            # 支持无认证和用户名密码认证
+            return b'\x05\x02\x00\x02'
+        # 只支持无认证
+        return b'\x05\x01\x00'
+    
+    def build_auth_request(self, username=None):
+        """构造用户名密码认证请求 (RFC 1929)，username 默认使用 self.username"""
+        username = username or self.username
+        auth_data = struct.pack('!B', 1)  # 认证协议版本
+        auth_data += struct.pack('!B', len(username))
+        auth_data += username.encode()
+        auth_data += struct.pack('!B', len(self.password))
+        auth_data += self.password.encode()
+        return auth_data
+    
+    def build_connect_request(self):
+        """构造 CONNECT 请求"""
+        request = b'\x05\x01\x00\x01'  # VER, CMD(CONNECT), RSV, ATYP(IPv4)
+        
+        # 添加目标地址
+        ip_parts = [int(x) for x in self.target_host.split('.')]
+        request += struct.pack('!BBBB', *ip_parts)
+        request += struct.pack('!H', self.target_port)
+        return request
+    
+    def parse_method_reply(self, response):
+        """
+        解析服务器选择的认证方法
+        
+        Returns:
+            tuple: (认证方法, 错误信息)
+        """
+        if len(response) < 2:
+            return None, "握手响应不完整"
+        
+        version, method = struct.unpack('!BB', response)
+        if version != 5:
+            return None, f"不支持的SOCKS版本: {version}"
+        
+        if method == 0xFF:
+            return None, "服务器拒绝所有认证方法"
+        
+        # 如果需要用户名密码认证
+        if method == 2 and (not self.username or not self.password):
+            return None, "服务器要求认证但未提供凭据"
+        
+        return method, None
+    
+    def parse_auth_reply(self, auth_response):
+        """解析认证结果，返回错误信息或 None"""
+        if len(auth_response) < 2:
+            return "认证响应不完整"
+        
+        auth_version, auth_status = struct.unpack('!BB', auth_response)
+        if auth_status != 0:
+            return f"认证失败: {auth_status}"
+        return None
+    
+    def parse_connect_reply(self, response):
+        """解析 CONNECT 响应，返回错误信息或 None"""
+        if len(response) < 10:
+            return "连接响应不完整"
+        
+        version, reply, rsv, atyp = struct.unpack('!BBBB', response[:4])
+        
+        if version != 5:
+            return f"响应版本错误: {version}"
+        
+        if reply != 0:
+            error_msg = SOCKS5_REPLY_ERRORS.get(reply, f"未知错误: {reply}")
+            return f"连接失败: {error_msg}"
+        return None
+    
     def connect_socks5(self, sock):
         """
         建立 SOCKS5 连接
@@ -107,81 +304,29 @@ class SOCKS5Benchmark:
             connect_time = time.time() - connect_start
             
             # SOCKS5 握手 - 选择认证方法
-            if self.username and self.password:
-                # 支持用户名密码认证
-                sock.send(b'\x05\x02\x00\x02')  # 支持无认证和用户名密码认证
-            else:
-                # 只支持无认证
-                sock.send(b'\x05\x01\x00')
+            sock.send(self.build_greeting())
             
             # 接收服务器选择的认证方法
-            response = sock.recv(2)
-            if len(response) < 2:
-                return False, "握手响应不完整", connect_time
-            
-            version, method = struct.unpack('!BB', response)
-            if version != 5:
-                return False, f"不支持的SOCKS版本: {version}", connect_time
-            
-            if method == 0xFF:
-                return False, "服务器拒绝所有认证方法", connect_time
+            method, error = self.parse_method_reply(sock.recv(2))
+            if error:
+                return False, error, connect_time
             
             # 如果需要用户名密码认证
             if method == 2:
-                if not self.username or not self.password:
-                    return False, "服务器要求认证但未提供凭据", connect_time
-                
-                # 发送认证信息
-                auth_data = struct.pack('!B', 1)  # 认证协议版本
-                auth_data += struct.pack('!B', len(self.username))
-                auth_data += self.username.encode()
-                auth_data += struct.pack('!B', len(self.password))
-                auth_data += self.password.encode()
-                
-                sock.send(auth_data)
+                sock.send(self.build_auth_request())
                 
                 # 接收认证结果
-                auth_response = sock.recv(2)
-                if len(auth_response) < 2:
-                    return False, "认证响应不完整", connect_time
-                
-                auth_version, auth_status = struct.unpack('!BB', auth_response)
-                if auth_status != 0:
-                    return False, f"认证失败: {auth_status}", connect_time
+                error = self.parse_auth_reply(sock.recv(2))
+                if error:
+                    return False, error, connect_time
             
             # 发送连接请求
-            request = b'\x05\x01\x00\x01'  # VER, CMD(CONNECT), RSV, ATYP(IPv4)
-            
-            # 添加目标地址
-            ip_parts = [int(x) for x in self.target_host.split('.')]
-            request += struct.pack('!BBBB', *ip_parts)
-            request += struct.pack('!H', self.target_port)
-            
-            sock.send(request)
+            sock.send(self.build_connect_request())
             
             # 接收连接响应
-            response = sock.recv(10)
-            if len(response) < 10:
-                return False, "连接响应不完整", connect_time
-            
-            version, reply, rsv, atyp = struct.unpack('!BBBB', response[:4])
-            
-            if version != 5:
-                return False, f"响应版本错误: {version}", connect_time
-            
-            if reply != 0:
-                error_codes = {
-                    1: "一般性失败",
-                    2: "规则集不允许",
-                    3: "网络不可达",
-                    4: "主机不可达",
-                    5: "连接被拒绝",
-                    6: "TTL过期",
-                    7: "不支持的命令",
-                    8: "不支持的地址类型"
-                }
-                error_msg = error_codes.get(reply, f"未知错误: {reply}")
-                return False, f"连接失败: {error_msg}", connect_time
+            error = self.parse_connect_reply(sock.recv(10))
+            if error:
+                return False, error, connect_time
             
             return True, None, connect_time
             
@@ -190,6 +335,50 @@ class SOCKS5Benchmark:
         except Exception as e:
             return False, str(e), 0
     
+    async def connect_socks5_async(self):
+        """
+        在非阻塞流上建立 SOCKS5 连接（asyncio 引擎）
+        
+        Returns:
+            tuple: (成功标志, 错误信息, 连接时间, reader, writer)
+        """
+        reader = writer = None
+        try:
+            # 连接到代理服务器
+            connect_start = time.time()
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.proxy_host, self.proxy_port),
+                self.timeout)
+            connect_time = time.time() - connect_start
+            
+            error = await asyncio.wait_for(
+                self._handshake_async(reader, writer), self.timeout)
+            return error is None, error, connect_time, reader, writer
+            
+        except asyncio.TimeoutError:
+            return False, "连接超时", 0, reader, writer
+        except Exception as e:
+            return False, str(e), 0, reader, writer
+    
+    async def _handshake_async(self, reader, writer):
+        """执行与 connect_socks5 相同的握手流程，返回错误信息或 None"""
+        try:
+            writer.write(self.build_greeting())
+            method, error = self.parse_method_reply(await reader.readexactly(2))
+            if error:
+                return error
+            
+            if method == 2:
+                writer.write(self.build_auth_request())
+                error = self.parse_auth_reply(await reader.readexactly(2))
+                if error:
+                    return error
+            
+            writer.write(self.build_connect_request())
+            return self.parse_connect_reply(await reader.readexactly(10))
+        except asyncio.IncompleteReadError as e:
+            return f"响应不完整: 期望 {e.expected} 字节，收到 {len(e.partial)} 字节"
+    
     def worker(self, worker_id):
         """
         工作线程 - 执行压测任务
@@ -203,10 +392,13 @@ class SOCKS5Benchmark:
             'connect_time': 0,
             'total_bytes_sent': 0,
             'total_bytes_recv': 0,
-            'latencies': [],
+            'goodput_bytes': 0,
+            'samples': 0,
             'error': None,
             'duration': 0
         }
+        # 线程本地直方图，结束时一次性合并，避免每个样本都争抢锁
+        latencies = LatencyHistogram()
         
         sock = None
         try:
@@ -219,7 +411,7 @@ class SOCKS5Benchmark:
             result['connect_time'] = connect_time
             
             with self.lock:
-                self.connection_times.append(connect_time)
+                self.connection_times.record(connect_time)
             
             if not success:
                 result['error'] = error
@@ -229,53 +421,456 @@ class SOCKS5Benchmark:
                 return result
             
             # 开始传输数据测试
-            test_data = b'X' * self.packet_size
             worker_start_time = time.time()
+            data_error = None
+            try:
+                self.data_phase(sock, result, latencies, worker_start_time + self.duration)
+            except socket.timeout:
+                if self.mode == 'sink':
+                    data_error = "数据阶段超时，未收到目标的字节数确认"
+            except Exception as e:
+                data_error = f"数据阶段错误: {str(e)}"
             
-            while not self.stop_flag.is_set():
-                elapsed = time.time() - worker_start_time
-                if elapsed >= self.duration:
+            result['duration'] = time.time() - worker_start_time
+            self.record_data_phase(result, data_error, latencies)
+            
+        except Exception as e:
+            result['error'] = f"意外错误: {str(e)}"
+            with self.lock:
+                self.error_count += 1
+                self.errors[result['error']] += 1
+        
+        finally:
+            if sock:
+                try:
+                    sock.close()
+                except:
+                    pass
+        
+        return result
+    
+    def record_data_phase(self, result, data_error, latencies=None):
+        """
+        汇总一个连接的数据阶段结果
+        
+        数据阶段的错误计入 self.errors；sink 模式没有收到目标的字节数确认时
+        无法知道实际送达的字节数，该连接记为失败，不计入吞吐量。
+        """
+        result['error'] = data_error
+        result['success'] = data_error is None or self.mode != 'sink'
+        
+        with self.lock:
+            if latencies is not None:
+                self.latencies.merge(latencies)
+            self.total_bytes_sent += result['total_bytes_sent']
+            self.total_bytes_recv += result['total_bytes_recv']
+            if data_error is not None:
+                self.errors[data_error] += 1
+            if not result['success']:
+                self.error_count += 1
+                return
+            
+            self.success_count += 1
+            if result['duration'] > 0:
+                throughput = result['goodput_bytes'] / result['duration']
+                self.throughputs.append(throughput)
+    
+    def data_phase(self, sock, result, latencies, deadline):
+        """
+        按 mode 执行数据阶段（线程引擎）
+        
+        - send:   计时 sock.send()，只反映拷贝进内核缓冲区的耗时（兼容旧行为）
+        - echo:   发送 packet_size 字节并等待完整回显，记录往返延迟
+        - sink:   全速上行发送，半关闭后由目标回传实际收到的字节数
+        - source: 全速接收目标下发的数据
+        """
+        if self.mode == 'echo':
+            payload = b'X' * self.packet_size
+            buffer = memoryview(bytearray(self.packet_size))
+            while not self.stop_flag.is_set() and time.time() < deadline:
+                send_start = time.time()
+                sock.sendall(payload)
+                received = 0
+                while received < self.packet_size:
+                    n = sock.recv_into(buffer[received:])
+                    if n == 0:
+                        raise ConnectionError("目标提前关闭连接")
+                    received += n
+                latencies.record(time.time() - send_start)
+                result['total_bytes_sent'] += len(payload)
+                result['total_bytes_recv'] += received
+                result['goodput_bytes'] += received
+                result['samples'] += 1
+                if self.send_interval > 0:
+                    time.sleep(self.send_interval)
+        
+        elif self.mode == 'sink':
+            payload = b'X' * self.packet_size
+            while not self.stop_flag.is_set() and time.time() < deadline:
+                sock.sendall(payload)
+                result['total_bytes_sent'] += len(payload)
+            # 半关闭后等待目标确认实际收到的字节数
+            sock.shutdown(socket.SHUT_WR)
+            ack = b''
+            while len(ack) < 8:
+                chunk = sock.recv(8 - len(ack))
+                if not chunk:
+                    raise ConnectionError("未收到目标的字节数确认")
+                ack += chunk
+            result['goodput_bytes'] = struct.unpack('!Q', ack)[0]
+        
+        elif self.mode == 'source':
+            buffer = bytearray(max(self.packet_size, 65536))
+            while not self.stop_flag.is_set() and time.time() < deadline:
+                n = sock.recv_into(buffer)
+                if n == 0:
                     break
+                result['total_bytes_recv'] += n
+                result['goodput_bytes'] += n
+        
+        else:
+            test_data = b'X' * self.packet_size
+            while not self.stop_flag.is_set() and time.time() < deadline:
+                # 发送数据并测量延迟
+                send_start = time.time()
+                sent = sock.send(test_data)
+                send_time = time.time() - send_start
                 
+                result['total_bytes_sent'] += sent
+                result['goodput_bytes'] += sent
+                result['samples'] += 1
+                latencies.record(send_time)
+                
+                # 尝试接收数据（如果有）
+                sock.setblocking(False)
                 try:
-                    # 发送数据并测量延迟
+                    recv_data = sock.recv(4096)
+                    result['total_bytes_recv'] += len(recv_data)
+                except:
+                    pass
+                sock.setblocking(True)
+                
+                # 短暂休息，避免过载
+                time.sleep(self.send_interval)
+    
+    async def _drain_reader_async(self, reader, result):
+        """持续读取目标返回的数据（对应线程引擎中的非阻塞 recv）"""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                result['total_bytes_recv'] += len(data)
+        except Exception:
+            pass
+    
+    async def data_phase_async(self, reader, writer, result, deadline):
+        """按 mode 执行数据阶段（asyncio 引擎），语义与 data_phase 相同"""
+        # 所有协程运行在同一个事件循环线程中，可直接写入共享直方图
+        latencies = self.latencies
+        
+        if self.mode == 'echo':
+            payload = b'X' * self.packet_size
+            while not self.stop_flag.is_set() and time.time() < deadline:
+                send_start = time.time()
+                writer.write(payload)
+                data = await asyncio.wait_for(reader.readexactly(self.packet_size), self.timeout)
+                latencies.record(time.time() - send_start)
+                result['total_bytes_sent'] += len(payload)
+                result['total_bytes_recv'] += len(data)
+                result['goodput_bytes'] += len(data)
+                result['samples'] += 1
+                if self.send_interval > 0:
+                    await asyncio.sleep(self.send_interval)
+        
+        elif self.mode == 'sink':
+            payload = b'X' * self.packet_size
+            while not self.stop_flag.is_set() and time.time() < deadline:
+                writer.write(payload)
+                await asyncio.wait_for(writer.drain(), self.timeout)
+                result['total_bytes_sent'] += len(payload)
+            # 半关闭后等待目标确认实际收到的字节数
+            writer.write_eof()
+            ack = await asyncio.wait_for(reader.readexactly(8), self.timeout)
+            result['goodput_bytes'] = struct.unpack('!Q', ack)[0]
+        
+        elif self.mode == 'source':
+            while not self.stop_flag.is_set():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    data = await asyncio.wait_for(reader.read(262144), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if not data:
+                    break
+                result['total_bytes_recv'] += len(data)
+                result['goodput_bytes'] += len(data)
+        
+        else:
+            test_data = b'X' * self.packet_size
+            recv_task = asyncio.ensure_future(self._drain_reader_async(reader, result))
+            try:
+                while not self.stop_flag.is_set() and time.time() < deadline:
+                    # 发送数据并测量延迟（写入并等待内核缓冲区接收）
                     send_start = time.time()
-                    sent = sock.send(test_data)
+                    writer.write(test_data)
+                    await asyncio.wait_for(writer.drain(), self.timeout)
                     send_time = time.time() - send_start
                     
-                    result['total_bytes_sent'] += sent
-                    result['latencies'].append(send_time * 1000)  # 转换为毫秒
-                    
-                    # 尝试接收数据（如果有）
-                    sock.setblocking(False)
-                    try:
-                        recv_data = sock.recv(4096)
-                        result['total_bytes_recv'] += len(recv_data)
-                    except:
-                        pass
-                    sock.setblocking(True)
+                    result['total_bytes_sent'] += len(test_data)
+                    result['goodput_bytes'] += len(test_data)
+                    result['samples'] += 1
+                    latencies.record(send_time)
                     
                     # 短暂休息，避免过载
-                    time.sleep(0.001)
-                    
-                except socket.timeout:
-                    break
-                except Exception as e:
-                    result['error'] = str(e)
-                    break
+                    await asyncio.sleep(self.send_interval)
+            finally:
+                recv_task.cancel()
+    
+    def churn_username(self):
+        """
+        返回下一个短连接使用的用户名
+        
+        cold 场景按序号轮流使用 churn_users 个不同用户，各进程分片错开序号，
+        保证在用户轮完一圈之前每个连接都无法命中认证缓存。
+        """
+        if self.churn != 'cold':
+            return self.username
+        seq = next(self._churn_seq) * self.shard_count + self.shard_index
+        return f"{self.username}{seq % self.churn_users}"
+    
+    def _recv_exact(self, sock, size):
+        """从阻塞 socket 读取恰好 size 字节"""
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError(f"响应不完整: 期望 {size} 字节，收到 {len(data)} 字节")
+            data += chunk
+        return data
+    
+    def churn_cycle(self, phases, payload):
+        """
+        执行一次完整的短连接周期：连接、协商、认证、CONNECT、一次数据往返、关闭
+        
+        Args:
+            phases: {阶段: LatencyHistogram}，记录各阶段耗时
+            payload: 发送给 echo 目标的数据
+        
+        Returns:
+            str: 错误信息，成功时为 None
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            cycle_start = time.time()
+            sock.connect((self.proxy_host, self.proxy_port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            mark = time.time()
+            phases['tcp_connect'].record(mark - cycle_start)
             
-            result['duration'] = time.time() - worker_start_time
-            result['success'] = True
+            sock.sendall(self.build_greeting())
+            method, error = self.parse_method_reply(self._recv_exact(sock, 2))
+            if error:
+                return error
+            now = time.time()
+            phases['method'].record(now - mark)
+            mark = now
+            
+            if method == 2:
+                sock.sendall(self.build_auth_request(self.churn_username()))
+                error = self.parse_auth_reply(self._recv_exact(sock, 2))
+                if error:
+                    return error
+                now = time.time()
+                phases['auth'].record(now - mark)
+                mark = now
+            
+            sock.sendall(self.build_connect_request())
+            error = self.parse_connect_reply(self._recv_exact(sock, 10))
+            if error:
+                return error
+            now = time.time()
+            phases['connect_reply'].record(now - mark)
+            mark = now
             
+            sock.sendall(payload)
+            self._recv_exact(sock, len(payload))
+            now = time.time()
+            phases['payload'].record(now - mark)
+            phases['total'].record(now - cycle_start)
+            return None
+        except socket.timeout:
+            return "连接超时"
+        except Exception as e:
+            return str(e)
+        finally:
+            sock.close()
+    
+    def churn_worker(self, worker_id):
+        """
+        短连接工作线程 - 在测试时长内不断重复 churn_cycle
+        
+        Args:
+            worker_id: 工作线程ID
+        """
+        # 线程本地直方图，结束时一次性合并
+        phases = {phase: LatencyHistogram() for phase in CHURN_PHASES}
+        payload = b'X' * self.packet_size
+        deadline = time.time() + self.duration
+        
+        while not self.stop_flag.is_set() and time.time() < deadline:
+            error = self.churn_cycle(phases, payload)
             with self.lock:
+                if error:
+                    self.error_count += 1
+                    self.errors[error] += 1
+                else:
+                    self.success_count += 1
+                    self.total_bytes_sent += len(payload)
+                    self.total_bytes_recv += len(payload)
+        
+        with self.lock:
+            for phase, hist in phases.items():
+                self.phase_times[phase].merge(hist)
+        return {'worker_id': worker_id, 'success': True}
+    
+    async def churn_cycle_async(self, phases, payload):
+        """churn_cycle 的 asyncio 版本，返回错误信息或 None"""
+        writer = None
+        try:
+            cycle_start = time.time()
+            reader, writer = await asyncio.open_connection(self.proxy_host, self.proxy_port)
+            mark = time.time()
+            phases['tcp_connect'].record(mark - cycle_start)
+            
+            writer.write(self.build_greeting())
+            method, error = self.parse_method_reply(await reader.readexactly(2))
+            if error:
+                return error
+            now = time.time()
+            phases['method'].record(now - mark)
+            mark = now
+            
+            if method == 2:
+                writer.write(self.build_auth_request(self.churn_username()))
+                error = self.parse_auth_reply(await reader.readexactly(2))
+                if error:
+                    return error
+                now = time.time()
+                phases['auth'].record(now - mark)
+                mark = now
+            
+            writer.write(self.build_connect_request())
+            error = self.parse_connect_reply(await reader.readexactly(10))
+            if error:
+                return error
+            now = time.time()
+            phases['connect_reply'].record(now - mark)
+            mark = now
+            
+            writer.write(payload)
+            await reader.readexactly(len(payload))
+            now = time.time()
+            phases['payload'].record(now - mark)
+            phases['total'].record(now - cycle_start)
+            return None
+        except asyncio.IncompleteReadError as e:
+            return f"响应不完整: 期望 {e.expected} 字节，收到 {len(e.partial)} 字节"
+        finally:
+            if writer:
+                writer.close()
+    
+    async def churn_worker_async(self, worker_id, connect_sem):
+        """
+        短连接协程 - 与 churn_worker 相同，直接写入共享直方图
+        
+        Args:
+            worker_id: 工作者ID
+            connect_sem: 限制同时进行的短连接周期数量
+        """
+        payload = b'X' * self.packet_size
+        deadline = time.time() + self.duration
+        
+        while not self.stop_flag.is_set() and time.time() < deadline:
+            try:
+                async with connect_sem:
+                    error = await asyncio.wait_for(
+                        self.churn_cycle_async(self.phase_times, payload), self.timeout)
+            except asyncio.TimeoutError:
+                error = "连接超时"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e)
+            
+            if error:
+                self.error_count += 1
+                self.errors[error] += 1
+            else:
                 self.success_count += 1
-                if result['latencies']:
-                    self.latencies.extend(result['latencies'])
-                
-                if result['duration'] > 0:
-                    throughput = result['total_bytes_sent'] / result['duration']
-                    self.throughputs.append(throughput)
+                self.total_bytes_sent += len(payload)
+                self.total_bytes_recv += len(payload)
+        return {'worker_id': worker_id, 'success': True}
+    
+    async def worker_async(self, worker_id, connect_sem):
+        """
+        协程工作者 - 与 worker 相同的压测流程，运行在非阻塞流上
+        
+        Args:
+            worker_id: 工作者ID
+            connect_sem: 限制同时握手数量的信号量，避免 SYN 队列溢出
+        """
+        result = {
+            'worker_id': worker_id,
+            'success': False,
+            'connect_time': 0,
+            'total_bytes_sent': 0,
+            'total_bytes_recv': 0,
+            'goodput_bytes': 0,
+            'samples': 0,
+            'error': None,
+            'duration': 0
+        }
+        
+        writer = None
+        try:
+            # 建立SOCKS5连接
+            async with connect_sem:
+                success, error, connect_time, reader, writer = await self.connect_socks5_async()
+            result['connect_time'] = connect_time
+            
+            with self.lock:
+                self.connection_times.record(connect_time)
+            
+            if not success:
+                result['error'] = error
+                with self.lock:
+                    self.error_count += 1
+                    self.errors[error] += 1
+                return result
             
+            # 开始传输数据测试
+            worker_start_time = time.time()
+            data_error = None
+            try:
+                await self.data_phase_async(reader, writer, result, worker_start_time + self.duration)
+            except asyncio.TimeoutError:
+                if self.mode == 'sink':
+                    data_error = "数据阶段超时，未收到目标的字节数确认"
+            except asyncio.IncompleteReadError as e:
+                data_error = f"数据阶段错误: 响应不完整: 期望 {e.expected} 字节，收到 {len(e.partial)} 字节"
+            except Exception as e:
+                data_error = f"数据阶段错误: {str(e)}"
+            
+            result['duration'] = time.time() - worker_start_time
+            # 协程的延迟样本已直接写入 self.latencies
+            self.record_data_phase(result, data_error)
+            
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             result['error'] = f"意外错误: {str(e)}"
             with self.lock:
@@ -283,14 +878,56 @@ class SOCKS5Benchmark:
                 self.errors[result['error']] += 1
         
         finally:
-            if sock:
+            if writer:
                 try:
-                    sock.close()
-                except:
+                    writer.close()
+                except Exception:
                     pass
         
         return result
     
+    async def _run_workers_async(self):
+        """并发启动所有协程工作者并收集结果"""
+        connect_sem = asyncio.Semaphore(self.max_pending_connects)
+        worker = self.churn_worker_async if self.churn else self.worker_async
+        tasks = [asyncio.ensure_future(worker(i, connect_sem))
+                 for i in range(self.concurrent)]
+        
+        # 等待所有协程完成或超时
+        done, pending = await asyncio.wait(tasks, timeout=self.duration + self.timeout + 10)
+        self.stop_flag.set()
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        results = []
+        for task in done:
+            if task.cancelled():
+                continue
+            if task.exception() is not None:
+                print(f"{Colors.FAIL}❌ 协程执行失败: {task.exception()}{Colors.ENDC}")
+                continue
+            results.append(task.result())
+        return results
+    
+    def run_asyncio(self):
+        """使用 asyncio 引擎执行压测（安装 uvloop 时使用 uvloop 事件循环）"""
+        fd_limit = raise_nofile_limit()
+        if fd_limit is not None and fd_limit < self.concurrent + 64:
+            print(f"{Colors.WARNING}⚠️  文件描述符限制 ({fd_limit}) 低于并发连接数，"
+                  f"请先执行 ulimit -n {self.concurrent + 1024}{Colors.ENDC}")
+        
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        
+        try:
+            self.results.extend(asyncio.run(self._run_workers_async()))
+        except KeyboardInterrupt:
+            print(f"\n{Colors.WARNING}⏹️  用户中断测试{Colors.ENDC}")
+        finally:
+            self.stop_flag.set()
+    
     def monitor_progress(self):
         """监控进度的后台线程"""
         print(f"\n{Colors.OKCYAN}⏱️  开始压测，持续时间: {self.duration} 秒{Colors.ENDC}\n")
@@ -328,25 +965,62 @@ class SOCKS5Benchmark:
         print(f"  并发连接数: {self.concurrent}")
         print(f"  测试持续时间: {self.duration} 秒")
         print(f"  数据包大小: {self.packet_size} 字节")
+        if self.churn:
+            print(f"  短连接模式: {CHURN_SCENARIOS[self.churn]}")
+            if self.churn == 'cold':
+                print(f"  冷认证用户: {self.username}0 ~ {self.username}{self.churn_users - 1}")
+        else:
+            print(f"  数据模式: {MODE_DESCRIPTIONS[self.mode]}")
         print(f"  认证模式: {'用户名密码' if self.username else '无认证'}")
         print(f"  连接超时: {self.timeout} 秒")
+        if self.engine == 'asyncio':
+            print(f"  压测引擎: asyncio ({'uvloop' if uvloop is not None else '标准事件循环'})")
+        else:
+            print(f"  压测引擎: 线程池")
+        if self.processes > 1:
+            print(f"  压测进程数: {self.processes}")
+        
+        if self.monitor:
+            try:
+                self.sampler = ResourceSampler(self.monitor_pid, self.proxy_port, self.monitor_interval)
+                print(f"  资源采样: proxy PID {self.sampler.pid}，每 {self.monitor_interval:g} 秒")
+            except Exception as e:
+                print(f"{Colors.WARNING}⚠️  无法采样 proxy 资源: {e}{Colors.ENDC}")
         
         # 开始测试
         self.start_time = time.time()
+        if self.sampler:
+            self.sampler.start()
         
         # 启动监控线程
         monitor_thread = threading.Thread(target=self.monitor_progress, daemon=True)
         monitor_thread.start()
         
-        # 使用线程池执行压测
+        if self.processes > 1:
+            self.run_processes()
+        elif self.engine == 'asyncio':
+            self.run_asyncio()
+        else:
+            self.run_threads()
+        
+        self.end_time = time.time()
+        if self.sampler:
+            self.sampler.stop()
+        
+        # 生成报告
+        self.generate_report()
+    
+    def run_threads(self):
+        """使用线程池执行压测（每个连接占用一个线程）"""
+        worker = self.churn_worker if self.churn else self.worker
         with ThreadPoolExecutor(max_workers=self.concurrent) as executor:
             futures = []
-            
+        
             # 提交所有工作线程
             for i in range(self.concurrent):
-                future = executor.submit(self.worker, i)
+                future = executor.submit(worker, i)
                 futures.append(future)
-            
+        
             # 等待所有线程完成或超时
             try:
                 for future in as_completed(futures, timeout=self.duration + 10):
@@ -355,18 +1029,90 @@ class SOCKS5Benchmark:
                         self.results.append(result)
                     except Exception as e:
                         print(f"{Colors.FAIL}❌ 线程执行失败: {e}{Colors.ENDC}")
-            
+        
             except KeyboardInterrupt:
                 print(f"\n{Colors.WARNING}⏹️  用户中断测试{Colors.ENDC}")
                 self.stop_flag.set()
-            
+        
             finally:
                 self.stop_flag.set()
+    
+    def shard_config(self):
+        """子进程重建 SOCKS5Benchmark 所需的参数"""
+        return {
+            'proxy_host': self.proxy_host,
+            'proxy_port': self.proxy_port,
+            'target_host': self.target_host,
+            'target_port': self.target_port,
+            'duration': self.duration,
+            'username': self.username,
+            'password': self.password,
+            'timeout': self.timeout,
+            'packet_size': self.packet_size,
+            'engine': self.engine,
+            'send_interval': self.send_interval,
+            'max_pending_connects': self.max_pending_connects,
+            'mode': self.mode,
+            'churn': self.churn,
+            'churn_users': self.churn_users,
+        }
+    
+    def export_stats(self):
+        """导出可跨进程传输并精确合并的统计数据（直方图 + 计数器）"""
+        with self.lock:
+            return {
+                'success_count': self.success_count,
+                'error_count': self.error_count,
+                'errors': dict(self.errors),
+                'connection_times': self.connection_times,
+                'latencies': self.latencies,
+                'throughputs': list(self.throughputs),
+                'total_bytes_sent': self.total_bytes_sent,
+                'total_bytes_recv': self.total_bytes_recv,
+                'phase_times': self.phase_times,
+            }
+    
+    def merge_stats(self, stats):
+        """合并某个子进程导出的统计数据"""
+        with self.lock:
+            self.success_count += stats['success_count']
+            self.error_count += stats['error_count']
+            for error, count in stats['errors'].items():
+                self.errors[error] += count
+            self.connection_times.merge(stats['connection_times'])
+            self.latencies.merge(stats['latencies'])
+            self.throughputs.extend(stats['throughputs'])
+            self.total_bytes_sent += stats['total_bytes_sent']
+            self.total_bytes_recv += stats['total_bytes_recv']
+            for phase, hist in stats['phase_times'].items():
+                self.phase_times[phase].merge(hist)
+    
+    def run_processes(self):
+        """将并发连接分片到多个进程执行，结束后合并各进程的直方图和计数器"""
+        base, extra = divmod(self.concurrent, self.processes)
+        shares = [base + (1 if i < extra else 0) for i in range(self.processes)]
+        shares = [share for share in shares if share > 0]
         
-        self.end_time = time.time()
+        start_methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context('fork' if 'fork' in start_methods else 'spawn')
+        config = self.shard_config()
         
-        # 生成报告
-        self.generate_report()
+        with ProcessPoolExecutor(max_workers=len(shares), mp_context=mp_context) as executor:
+            futures = [executor.submit(run_shard, dict(config, shard_index=i, shard_count=len(shares)), share)
+                       for i, share in enumerate(shares)]
+            
+            try:
+                for future in as_completed(futures, timeout=self.duration + self.timeout + 30):
+                    try:
+                        self.merge_stats(future.result())
+                    except Exception as e:
+                        print(f"{Colors.FAIL}❌ 压测进程执行失败: {e}{Colors.ENDC}")
+            
+            except KeyboardInterrupt:
+                print(f"\n{Colors.WARNING}⏹️  用户中断测试{Colors.ENDC}")
+            
+            finally:
+                self.stop_flag.set()
     
     def generate_report(self):
         """生成测试报告"""
@@ -384,35 +1130,38 @@ class SOCKS5Benchmark:
         print(f"  成功连接: {self.success_count} ({self.success_count/total_connections*100:.1f}%)")
         print(f"  失败连接: {self.error_count} ({self.error_count/total_connections*100:.1f}%)")
         
+        # 短连接统计
+        if self.churn:
+            self.print_churn_report(total_time)
+        
         # 连接性能
         if self.connection_times:
             print(f"\n{Colors.OKGREEN}{Colors.BOLD}▶ 连接性能{Colors.ENDC}")
-            print(f"  平均连接时间: {statistics.mean(self.connection_times)*1000:.2f} ms")
-            print(f"  最小连接时间: {min(self.connection_times)*1000:.2f} ms")
-            print(f"  最大连接时间: {max(self.connection_times)*1000:.2f} ms")
+            print(f"  平均连接时间: {self.connection_times.mean()*1000:.2f} ms")
+            print(f"  最小连接时间: {self.connection_times.min*1000:.2f} ms")
+            print(f"  最大连接时间: {self.connection_times.max*1000:.2f} ms")
+            print(f"  P99 连接时间: {self.connection_times.percentile(99)*1000:.2f} ms")
             if len(self.connection_times) > 1:
-                print(f"  连接时间标准差: {statistics.stdev(self.connection_times)*1000:.2f} ms")
+                print(f"  连接时间标准差: {self.connection_times.stdev()*1000:.2f} ms")
         
         # 延迟统计
         if self.latencies:
             print(f"\n{Colors.OKGREEN}{Colors.BOLD}▶ 延迟统计{Colors.ENDC}")
-            print(f"  平均延迟: {statistics.mean(self.latencies):.2f} ms")
-            print(f"  最小延迟: {min(self.latencies):.2f} ms")
-            print(f"  最大延迟: {max(self.latencies):.2f} ms")
-            print(f"  中位数延迟: {statistics.median(self.latencies):.2f} ms")
+            print(f"  样本数: {self.latencies.count}")
+            print(f"  平均延迟: {self.latencies.mean()*1000:.2f} ms")
+            print(f"  最小延迟: {self.latencies.min*1000:.2f} ms")
+            print(f"  最大延迟: {self.latencies.max*1000:.2f} ms")
+            print(f"  中位数延迟: {self.latencies.percentile(50)*1000:.2f} ms")
             
             if len(self.latencies) > 1:
-                print(f"  延迟标准差: {statistics.stdev(self.latencies):.2f} ms")
+                print(f"  延迟标准差: {self.latencies.stdev()*1000:.2f} ms")
             
-            # 百分位数
-            sorted_latencies = sorted(self.latencies)
-            p50 = sorted_latencies[int(len(sorted_latencies) * 0.50)]
-            p95 = sorted_latencies[int(len(sorted_latencies) * 0.95)]
-            p99 = sorted_latencies[int(len(sorted_latencies) * 0.99)]
-            
-            print(f"  P50 延迟: {p50:.2f} ms")
-            print(f"  P95 延迟: {p95:.2f} ms")
-            print(f"  P99 延迟: {p99:.2f} ms")
+            # 百分位数（来自直方图）
+            print(f"  P50 延迟: {self.latencies.percentile(50)*1000:.2f} ms")
+            print(f"  P95 延迟: {self.latencies.percentile(95)*1000:.2f} ms")
+            print(f"  P99 延迟: {self.latencies.percentile(99)*1000:.2f} ms")
+            print(f"  P99.9 延迟: {self.latencies.percentile(99.9)*1000:.2f} ms")
+            print(f"  (百分位数来自直方图，相对误差 ≤ {self.latencies.relative_error()*100:.1f}%)")
         
         # 吞吐量统计
         if self.throughputs:
@@ -426,8 +1175,8 @@ class SOCKS5Benchmark:
             print(f"  总吞吐量: {self.format_bytes(total_throughput)}/s")
         
         # 流量统计
-        total_sent = sum(r['total_bytes_sent'] for r in self.results)
-        total_recv = sum(r['total_bytes_recv'] for r in self.results)
+        total_sent = self.total_bytes_sent
+        total_recv = self.total_bytes_recv
         
         print(f"\n{Colors.OKGREEN}{Colors.BOLD}▶ 流量统计{Colors.ENDC}")
         print(f"  总发送流量: {self.format_bytes(total_sent)}")
@@ -438,6 +1187,10 @@ class SOCKS5Benchmark:
             print(f"  平均发送速率: {self.format_bytes(total_sent/total_time)}/s")
             print(f"  平均接收速率: {self.format_bytes(total_recv/total_time)}/s")
         
+        # proxy 资源消耗
+        if self.sampler:
+            self.sampler.print_report(self.success_count, total_sent + total_recv)
+        
         # 错误统计
         if self.errors:
             print(f"\n{Colors.FAIL}{Colors.BOLD}▶ 错误统计{Colors.ENDC}")
@@ -458,7 +1211,7 @@ class SOCKS5Benchmark:
         
         # 延迟评分 (35分)
         if self.latencies:
-            avg_latency = statistics.mean(self.latencies)
+            avg_latency = self.latencies.mean() * 1000
             # 延迟越低越好，假设10ms是完美延迟
             latency_score = max(0, 35 * (1 - min(avg_latency / 100, 1)))
             score += latency_score
@@ -496,6 +1249,26 @@ class SOCKS5Benchmark:
         # 保存详细报告
         self.save_report()
     
+    def print_churn_report(self, total_time):
+        """打印短连接模式的连接速率和握手各阶段延迟分解"""
+        print(f"\n{Colors.OKGREEN}{Colors.BOLD}▶ 短连接统计 ({CHURN_SCENARIOS[self.churn]}){Colors.ENDC}")
+        if total_time > 0:
+            print(f"  新建连接速率: {self.success_count / total_time:.1f} 连接/秒")
+        if self.churn == 'cold':
+            cycles = self.phase_times['auth'].count
+            if cycles > self.churn_users:
+                print(f"  {Colors.WARNING}⚠️  完成 {cycles} 次认证但只有 {self.churn_users} 个用户，"
+                      f"超出部分可能命中认证缓存{Colors.ENDC}")
+        
+        print(f"\n  {'阶段':<14}{'样本数':>10}{'平均(ms)':>12}{'P50(ms)':>12}{'P99(ms)':>12}{'P99.9(ms)':>12}")
+        for phase, label in CHURN_PHASES.items():
+            hist = self.phase_times[phase]
+            if not hist:
+                continue
+            pcts = hist.percentiles((50, 99, 99.9))
+            print(f"  {label:<14}{hist.count:>10}{hist.mean()*1000:>12.2f}"
+                  f"{pcts[50]*1000:>12.2f}{pcts[99]*1000:>12.2f}{pcts[99.9]*1000:>12.2f}")
+    
     def format_bytes(self, bytes_value):
         """格式化字节数"""
         for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -518,37 +1291,72 @@ class SOCKS5Benchmark:
                 'concurrent': self.concurrent,
                 'duration': self.duration,
                 'packet_size': self.packet_size,
-                'timeout': self.timeout
+                'timeout': self.timeout,
+                'engine': self.engine,
+                'send_interval': self.send_interval,
+                'processes': self.processes,
+                'mode': self.mode,
+                'churn': self.churn,
+                'churn_users': self.churn_users if self.churn == 'cold' else None
             },
             'summary': {
                 'total_time': self.end_time - self.start_time,
                 'success_count': self.success_count,
                 'error_count': self.error_count,
-                'total_sent': sum(r['total_bytes_sent'] for r in self.results),
-                'total_recv': sum(r['total_bytes_recv'] for r in self.results)
+                'total_sent': self.total_bytes_sent,
+                'total_recv': self.total_bytes_recv
             },
             'connection_times': {
-                'mean': statistics.mean(self.connection_times) if self.connection_times else 0,
-                'min': min(self.connection_times) if self.connection_times else 0,
-                'max': max(self.connection_times) if self.connection_times else 0,
-                'stdev': statistics.stdev(self.connection_times) if len(self.connection_times) > 1 else 0
+                'mean': self.connection_times.mean(),
+                'min': self.connection_times.min if self.connection_times else 0,
+                'max': self.connection_times.max,
+                'stdev': self.connection_times.stdev(),
+                'p99': self.connection_times.percentile(99),
+                'histogram': self.connection_times.to_dict()
             },
             'latencies': {
-                'mean': statistics.mean(self.latencies) if self.latencies else 0,
-                'min': min(self.latencies) if self.latencies else 0,
-                'max': max(self.latencies) if self.latencies else 0,
-                'median': statistics.median(self.latencies) if self.latencies else 0,
-                'stdev': statistics.stdev(self.latencies) if len(self.latencies) > 1 else 0
+                'count': self.latencies.count,
+                'mean': self.latencies.mean() * 1000,
+                'min': self.latencies.min * 1000 if self.latencies else 0,
+                'max': self.latencies.max * 1000,
+                'median': self.latencies.percentile(50) * 1000,
+                'stdev': self.latencies.stdev() * 1000,
+                'p50': self.latencies.percentile(50) * 1000,
+                'p95': self.latencies.percentile(95) * 1000,
+                'p99': self.latencies.percentile(99) * 1000,
+                'p999': self.latencies.percentile(99.9) * 1000,
+                'histogram': self.latencies.to_dict()
             },
             'throughputs': {
                 'mean': statistics.mean(self.throughputs) if self.throughputs else 0,
                 'min': min(self.throughputs) if self.throughputs else 0,
                 'max': max(self.throughputs) if self.throughputs else 0,
-                'total': sum(self.throughputs) if self.throughputs else 0
+                'total': sum(self.throughputs) if self.throughputs else 0,
+                'stdev': statistics.stdev(self.throughputs) if len(self.throughputs) > 1 else 0,
+                'count': len(self.throughputs)
             },
             'errors': dict(self.errors)
         }
         
+        if self.churn:
+            total_time = self.end_time - self.start_time
+            report['churn'] = {
+                'scenario': self.churn,
+                'connections_per_sec': self.success_count / total_time if total_time > 0 else 0,
+                'phases': {
+                    phase: {
+                        'summary_ms': {k: (v * 1000 if k != 'count' else v)
+                                       for k, v in hist.summary().items()},
+                        'histogram': hist.to_dict()
+                    }
+                    for phase, hist in self.phase_times.items() if hist
+                }
+            }
+        
+        if self.sampler:
+            report['resources'] = self.sampler.to_dict(
+                self.success_count, self.total_bytes_sent + self.total_bytes_recv)
+        
         # 保存JSON报告
         try:
             with open(json_filename, 'w', encoding='utf-8') as f:
@@ -560,6 +1368,14 @@ class SOCKS5Benchmark:
         
         # 保存Markdown报告
         self.save_markdown_report(report)
+        
+        # 写入结果库，便于跨 commit 对比
+        if self.store:
+            try:
+                run_id = ResultStore(self.store).record(report, self.scenario)
+                print(f"{Colors.OKGREEN}✅ 结果已写入 {self.store} (运行 #{run_id}){Colors.ENDC}")
+            except Exception as e:
+                print(f"{Colors.WARNING}⚠️  写入结果库失败: {e}{Colors.ENDC}")
     
     def save_markdown_report(self, report):
         """生成并保存 Markdown 格式的测试报告"""
@@ -579,7 +1395,7 @@ class SOCKS5Benchmark:
                 score += (report['summary']['success_count'] / total_connections) * 30
             
             if self.latencies:
-                avg_latency = statistics.mean(self.latencies)
+                avg_latency = self.latencies.mean() * 1000
                 latency_score = max(0, 35 * (1 - min(avg_latency / 100, 1)))
                 score += latency_score
             
@@ -660,10 +1476,10 @@ class SOCKS5Benchmark:
 
             # 添加延迟百分位数
             if self.latencies:
-                sorted_latencies = sorted(self.latencies)
-                p50 = sorted_latencies[int(len(sorted_latencies) * 0.50)]
-                p95 = sorted_latencies[int(len(sorted_latencies) * 0.95)]
-                p99 = sorted_latencies[int(len(sorted_latencies) * 0.99)]
+                p50 = report['latencies']['p50']
+                p95 = report['latencies']['p95']
+                p99 = report['latencies']['p99']
+                p999 = report['latencies']['p999']
                 
                 md_content += f"""
 #### 延迟百分位数
@@ -673,6 +1489,7 @@ class SOCKS5Benchmark:
 | P50 (中位数) | {p50:.2f} ms |
 | P95 | {p95:.2f} ms |
 | P99 | {p99:.2f} ms |
+| P99.9 | {p999:.2f} ms |
 """
 
             # 添加吞吐量统计
@@ -744,7 +1561,7 @@ class SOCKS5Benchmark:
                 md_content += "❌ **连接成功率较低** - 需要立即检查代理服务器状态\n\n"
             
             if self.latencies:
-                avg_latency = statistics.mean(self.latencies)
+                avg_latency = self.latencies.mean() * 1000
                 if avg_latency < 10:
                     md_content += "✅ **延迟表现优秀** - 响应速度非常快\n\n"
                 elif avg_latency < 50:
@@ -821,6 +1638,24 @@ class SOCKS5Benchmark:
             print(f"{Colors.WARNING}⚠️  保存 Markdown 报告失败: {e}{Colors.ENDC}")
 
 
+def run_shard(config, concurrent):
+    """
+    压测子进程入口：在本进程内运行一个分片，返回可合并的统计数据
+    
+    Args:
+        config: SOCKS5Benchmark 构造参数（不含并发数）
+        concurrent: 本分片负责的并发连接数
+    """
+    benchmark = SOCKS5Benchmark(concurrent=concurrent, **config)
+    benchmark.start_time = time.time()
+    if benchmark.engine == 'asyncio':
+        benchmark.run_asyncio()
+    else:
+        benchmark.run_threads()
+    benchmark.end_time = time.time()
+    return benchmark.export_stats()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='SOCKS5 代理压力测试工具',
@@ -841,6 +1676,31 @@ def main():
   
   # 测试特定目标服务器
   python benchmark_socks5.py --target-host 1.1.1.1 --target-port 53
+  
+  # asyncio 引擎，单进程维持 20000 个并发隧道（需要足够的 ulimit -n）
+  python benchmark_socks5.py --engine asyncio --concurrent 20000 --send-interval 1
+  
+  # 8 个进程分片，共 50000 个并发隧道，结束时合并各进程的延迟直方图
+  python benchmark_socks5.py --engine asyncio --processes 8 --concurrent 50000 --send-interval 1
+  
+  # 经代理测量真实往返延迟（自动启动本地 echo 目标）
+  python benchmark_socks5.py --mode echo --start-target -c 100 --send-interval 0
+  
+  # 测量上行/下行有效吞吐（forwardData 的转发成本）
+  python benchmark_socks5.py --mode sink --start-target -c 50 --packet-size 65536
+  python benchmark_socks5.py --mode source --start-target -c 50
+  
+  # 短连接压测：每个连接只做一次握手+数据往返，报告连接/秒和各阶段延迟
+  python benchmark_socks5.py --churn none --start-target -c 200
+  python benchmark_socks5.py --churn cached --start-target -c 200 -u testuser -p testpass
+  # 冷认证：轮流使用 bench0 ~ bench9999（需先用 create_test_user.py --bench-users 创建）
+  python benchmark_socks5.py --churn cold --churn-users 10000 --start-target -c 200 -u bench -p benchpass
+  
+  # 同时采样 proxy 进程资源，报告每 1k 连接的 CPU/内存成本和每 CPU 秒转发字节数
+  python benchmark_socks5.py --engine asyncio -c 10000 --mode sink --start-target --monitor
+  
+  # 结果写入结果库，之后用 bench_results.py compare 对比两个 commit
+  python benchmark_socks5.py --mode sink --start-target --store bench_results.db --scenario sink-100
         """
     )
     
@@ -848,10 +1708,11 @@ def main():
                         help='代理服务器地址 (默认: 127.0.0.1)')
     parser.add_argument('--proxy-port', type=int, default=1082,
                         help='代理服务器端口 (默认: 1082)')
-    parser.add_argument('--target-host', default='8.8.8.8',
-                        help='目标服务器地址 (默认: 8.8.8.8)')
-    parser.add_argument('--target-port', type=int, default=80,
-                        help='目标服务器端口 (默认: 80)')
+    parser.add_argument('--target-host', default=None,
+                        help='目标服务器地址 (默认: send 模式 8.8.8.8，其他模式 127.0.0.1)')
+    parser.add_argument('--target-port', type=int, default=None,
+                        help='目标服务器端口 (默认: send 模式 80，其他模式使用 '
+                             'bench_target_server.py 对应端口)')
     parser.add_argument('-c', '--concurrent', type=int, default=100,
                         help='并发连接数 (默认: 100)')
     parser.add_argument('-d', '--duration', type=int, default=30,
@@ -864,9 +1725,55 @@ def main():
                         help='连接超时时间(秒) (默认: 10)')
     parser.add_argument('--packet-size', type=int, default=1024,
                         help='数据包大小(字节) (默认: 1024)')
+    parser.add_argument('--engine', choices=['thread', 'asyncio'], default='thread',
+                        help='压测引擎: thread 每连接一个线程, asyncio 使用非阻塞流 '
+                             '(安装 uvloop 时自动启用) (默认: thread)')
+    parser.add_argument('--send-interval', type=float, default=0.001,
+                        help='每个连接两次发送之间的间隔(秒) (默认: 0.001)')
+    parser.add_argument('--max-pending-connects', type=int, default=512,
+                        help='asyncio 引擎同时进行握手的最大连接数 (默认: 512)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='压测进程数，并发连接平均分配到各进程 (默认: 1)')
+    parser.add_argument('--mode', choices=list(MODE_DESCRIPTIONS), default='send',
+                        help='数据阶段模式: send 计时 send() 调用, echo 测量往返延迟, '
+                             'sink/source 测量上行/下行有效吞吐 (默认: send)')
+    parser.add_argument('--start-target', action='store_true',
+                        help='在本机子进程中启动 bench_target_server.py (echo/sink/source 模式)')
+    parser.add_argument('--churn', choices=list(CHURN_SCENARIOS), default=None,
+                        help='短连接模式: 每个连接握手、认证、CONNECT、一次 echo 往返后立即关闭; '
+                             'none 无认证, cached 固定用户, cold 每个连接不同用户')
+    parser.add_argument('--monitor', action='store_true',
+                        help='压测期间采样 proxy 进程的 CPU/RSS/FD/goroutine/TCP 状态（需要 psutil）')
+    parser.add_argument('--monitor-pid', type=int, default=None,
+                        help='proxy 进程 PID (默认: 按 --proxy-port 查找)')
+    parser.add_argument('--monitor-interval', type=float, default=1.0,
+                        help='资源采样间隔(秒) (默认: 1.0)')
+    parser.add_argument('--store', default=None,
+                        help='结果库 (SQLite) 路径，报告按 git commit + 场景 + 配置入库')
+    parser.add_argument('--scenario', default=None,
+                        help='入库使用的场景名 (默认: 由模式和并发数推导)')
+    parser.add_argument('--churn-users', type=int, default=10000,
+                        help='cold 场景轮流使用的用户数，用户名为 <username><序号> (默认: 10000)')
     
     args = parser.parse_args()
     
+    if args.churn:
+        # 短连接模式的数据往返使用 echo 目标
+        args.mode = 'echo'
+        if args.churn != 'none' and not (args.username and args.password):
+            parser.error(f'--churn {args.churn} 需要提供 --username 和 --password')
+    
+    if args.target_host is None:
+        args.target_host = '8.8.8.8' if args.mode == 'send' else '127.0.0.1'
+    if args.target_port is None:
+        args.target_port = TARGET_PORTS.get(args.mode, 80)
+    
+    target_process = None
+    if args.start_target:
+        if args.mode == 'send':
+            parser.error('--start-target 需要配合 --mode echo/sink/source 使用')
+        target_process = start_target_process('127.0.0.1', {args.mode: args.target_port})
+    
     # 创建并运行压测
     benchmark = SOCKS5Benchmark(
         proxy_host=args.proxy_host,
@@ -878,7 +1785,19 @@ def main():
         username=args.username,
         password=args.password,
         timeout=args.timeout,
-        packet_size=args.packet_size
+        packet_size=args.packet_size,
+        engine=args.engine,
+        send_interval=args.send_interval,
+        max_pending_connects=args.max_pending_connects,
+        processes=args.processes,
+        mode=args.mode,
+        churn=args.churn,
+        churn_users=args.churn_users,
+        monitor=args.monitor,
+        monitor_pid=args.monitor_pid,
+        monitor_interval=args.monitor_interval,
+        store=args.store,
+        scenario=args.scenario
     )
     
     try:
@@ -889,6 +1808,9 @@ def main():
     except Exception as e:
         print(f"\n{Colors.FAIL}❌ 测试失败: {e}{Colors.ENDC}")
         sys.exit(1)
+    finally:
+        if target_process is not None:
+            target_process.terminate()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,10 @@
 -- 数据清理脚本
 -- 用于定期清理历史数据，维护数据库性能
 -- 建议通过定时任务执行，如crontab
+--
+-- 注意：服务端开启 server.log_partitioning 并设置 server.log_retention_days 后（默认关闭），
+-- 已按天分区的 traffic_logs / access_logs 由服务端删除过期分区（配置 server.log_archive_dir 时先导出），
+-- 不需要再执行下面第1、2部分的 DELETE；没有开启时仍按下面的 DELETE 清理。
 
 USE socks5_db;
 
@@ -2,14 +2,19 @@
 """
 对比使用和不使用SOCKS5代理的性能差异
 使用本地HTTP服务器消除网络延迟影响
+
+--rate: 改用开环驱动，直连与代理使用同一组到达时刻（相同随机种子）对比
 """
 
+import argparse
 import time
 import threading
 import requests
-import statistics
 import sys
 
+from latency_histogram import LatencyHistogram
+from open_loop import OpenLoopDriver, make_http_request_fn
+
 # 配置
 PROXY_HOST = "127.0.0.1"
 PROXY_PORT = 1082
@@ -22,13 +27,13 @@ class TestMetrics:
         self.name = name
         self.success_count = 0
         self.error_count = 0
-        self.response_times = []
+        self.response_times = LatencyHistogram()  # 固定内存，可精确合并
         self.lock = threading.Lock()
     
     def add_success(self, response_time):
         with self.lock:
             self.success_count += 1
-            self.response_times.append(response_time)
+            self.response_times.record(response_time)
     
     def add_error(self):
         with self.lock:
@@ -44,16 +49,17 @@ class TestMetrics:
         print(f"成功率: {self.success_count/(self.success_count+self.error_count)*100:.1f}%")
         
         if self.response_times:
-            sorted_times = sorted(self.response_times)
+            times = self.response_times
+            pcts = times.percentiles((50, 90, 95, 99))
             print(f"\n响应时间统计:")
-            print(f"  平均值: {statistics.mean(self.response_times)*1000:.2f}ms")
-            print(f"  中位数: {statistics.median(self.response_times)*1000:.2f}ms")
-            print(f"  最小值: {min(self.response_times)*1000:.2f}ms")
-            print(f"  最大值: {max(self.response_times)*1000:.2f}ms")
-            print(f"  P90: {sorted_times[int(len(sorted_times)*0.9)]*1000:.2f}ms")
-            print(f"  P95: {sorted_times[int(len(sorted_times)*0.95)]*1000:.2f}ms")
-            print(f"  P99: {sorted_times[int(len(sorted_times)*0.99)]*1000:.2f}ms")
-            print(f"  标准差: {statistics.stdev(self.response_times)*1000:.2f}ms")
+            print(f"  平均值: {times.mean()*1000:.2f}ms")
+            print(f"  中位数: {pcts[50]*1000:.2f}ms")
+            print(f"  最小值: {times.min*1000:.2f}ms")
+            print(f"  最大值: {times.max*1000:.2f}ms")
+            print(f"  P90: {pcts[90]*1000:.2f}ms")
+            print(f"  P95: {pcts[95]*1000:.2f}ms")
+            print(f"  P99: {pcts[99]*1000:.2f}ms")
+            print(f"  标准差: {times.stdev()*1000:.2f}ms")
         
         if total_time > 0:
             qps = self.success_count / total_time
@@ -154,8 +160,8 @@ def compare_results(no_proxy_metrics, with_proxy_metrics):
     with_proxy_times = with_proxy_metrics.response_times
     
     if no_proxy_times and with_proxy_times:
-        no_proxy_avg = statistics.mean(no_proxy_times) * 1000
-        with_proxy_avg = statistics.mean(with_proxy_times) * 1000
+        no_proxy_avg = no_proxy_times.mean() * 1000
+        with_proxy_avg = with_proxy_times.mean() * 1000
         
         overhead = with_proxy_avg - no_proxy_avg
         overhead_pct = (overhead / no_proxy_avg) * 100
@@ -165,8 +171,8 @@ def compare_results(no_proxy_metrics, with_proxy_metrics):
         print(f"  使用代理: {with_proxy_avg:.2f}ms")
         print(f"  代理开销: {overhead:.2f}ms ({overhead_pct:.1f}%)")
         
-        no_proxy_p95 = sorted(no_proxy_times)[int(len(no_proxy_times)*0.95)] * 1000
-        with_proxy_p95 = sorted(with_proxy_times)[int(len(with_proxy_times)*0.95)] * 1000
+        no_proxy_p95 = no_proxy_times.percentile(95) * 1000
+        with_proxy_p95 = with_proxy_times.percentile(95) * 1000
         
         print(f"\nP95响应时间:")
         print(f"  不使用代理: {no_proxy_p95:.2f}ms")
@@ -185,6 +191,27 @@ def compare_results(no_proxy_metrics, with_proxy_metrics):
             print(f"  代理相对性能: {(1/slowdown)*100:.1f}%")
             print(f"  性能降低: {(slowdown-1)*100:.1f}%")
 
+def compare_open_loop(rate, duration, arrival='poisson'):
+    """开环对比：两次测试使用同一组计划发送时刻，延迟含排队时间"""
+    proxy = f'socks5://{PROXY_USER}:{PROXY_PASS}@{PROXY_HOST}:{PROXY_PORT}'
+    seed = int(time.time())
+    results = {}
+    for name, proxy_url in (("不使用代理", None), ("使用SOCKS5代理", proxy)):
+        driver = OpenLoopDriver(make_http_request_fn(LOCAL_SERVER, proxy_url), rate, duration,
+                                arrival, workers=200, seed=seed)
+        results[name] = driver.run()
+        results[name].print_summary(f"开环测试: {name} ({rate:g} req/s, {arrival})")
+    
+    direct, proxied = results["不使用代理"], results["使用SOCKS5代理"]
+    print(f"\n{'='*60}")
+    print(f"开环性能对比总结 ({rate:g} req/s)")
+    print(f"{'='*60}")
+    for p in (50, 99, 99.9):
+        d = direct.latency.percentile(p) * 1000
+        w = proxied.latency.percentile(p) * 1000
+        print(f"  P{p:g}: 不使用代理 {d:.2f}ms, 使用代理 {w:.2f}ms, 代理开销 {w - d:.2f}ms")
+    print(f"  实际速率: 不使用代理 {direct.achieved_rate():.1f}, 使用代理 {proxied.achieved_rate():.1f} req/s")
+
 def check_local_server():
     """检查本地服务器是否运行"""
     try:
@@ -194,6 +221,15 @@ def check_local_server():
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='对比使用和不使用SOCKS5代理的性能差异')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='开环对比的目标速率 req/s（不指定则运行闭环场景）')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='开环对比每轮持续时间(秒) (默认: 30)')
+    parser.add_argument('--arrival', choices=['poisson', 'uniform'], default='poisson',
+                        help='开环到达过程 (默认: poisson)')
+    args = parser.parse_args()
+    
     print("="*60)
     print("SOCKS5代理性能对比测试")
     print("="*60)
@@ -210,6 +246,10 @@ def main():
     
     print(f"✓ 本地HTTP服务器运行正常")
     
+    if args.rate:
+        compare_open_loop(args.rate, args.duration, args.arrival)
+        return
+    
     # 运行测试
     print(f"\n开始测试...")
     
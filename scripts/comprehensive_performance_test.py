@@ -13,6 +13,8 @@ import statistics
 import sys
 from collections import defaultdict
 
+from latency_histogram import LatencyHistogram
+
 # 配置
 PROXY_HOST = "127.0.0.1"
 PROXY_PORT = 1082
@@ -24,8 +26,9 @@ TEST_DOWNLOAD_URL = "http://httpbin.org/bytes/1048576"  # 1MB数据
 class PerformanceMetrics:
     """性能指标收集器"""
     def __init__(self):
-        self.connection_times = []
-        self.request_times = []
+        # 固定内存的直方图，长时间持续负载也不会无限增长
+        self.connection_times = LatencyHistogram()
+        self.request_times = LatencyHistogram()
         self.errors = defaultdict(int)
         self.success_count = 0
         self.total_bytes = 0
@@ -33,11 +36,11 @@ class PerformanceMetrics:
         
     def add_connection_time(self, t):
         with self.lock:
-            self.connection_times.append(t)
+            self.connection_times.record(t)
     
     def add_request_time(self, t):
         with self.lock:
-            self.request_times.append(t)
+            self.request_times.record(t)
     
     def add_error(self, error_type):
         with self.lock:
@@ -131,12 +134,13 @@ def test_concurrent_connections(num_threads=10, requests_per_thread=10):
     print(f"  - 成功请求: {stats['success_count']}/{num_threads * requests_per_thread}")
     print(f"  - 失败统计: {stats['errors']}")
     
-    if stats['request_times']:
-        print(f"  - 平均响应时间: {statistics.mean(stats['request_times'])*1000:.2f}ms")
-        print(f"  - 中位数响应时间: {statistics.median(stats['request_times'])*1000:.2f}ms")
-        print(f"  - 最小响应时间: {min(stats['request_times'])*1000:.2f}ms")
-        print(f"  - 最大响应时间: {max(stats['request_times'])*1000:.2f}ms")
-        print(f"  - 标准差: {statistics.stdev(stats['request_times'])*1000:.2f}ms")
+    times = stats['request_times']
+    if times:
+        print(f"  - 平均响应时间: {times.mean()*1000:.2f}ms")
+        print(f"  - 中位数响应时间: {times.percentile(50)*1000:.2f}ms")
+        print(f"  - 最小响应时间: {times.min*1000:.2f}ms")
+        print(f"  - 最大响应时间: {times.max*1000:.2f}ms")
+        print(f"  - 标准差: {times.stdev()*1000:.2f}ms")
     
     if total_time > 0:
         qps = stats['success_count'] / total_time
@@ -217,10 +221,11 @@ def test_sustained_load(duration=60, concurrent=5):
     if stats['errors']:
         print(f"  - 错误分布: {stats['errors']}")
     
-    if stats['request_times']:
-        print(f"  - 平均响应时间: {statistics.mean(stats['request_times'])*1000:.2f}ms")
-        print(f"  - P95响应时间: {sorted(stats['request_times'])[int(len(stats['request_times'])*0.95)]*1000:.2f}ms")
-        print(f"  - P99响应时间: {sorted(stats['request_times'])[int(len(stats['request_times'])*0.99)]*1000:.2f}ms")
+    times = stats['request_times']
+    if times:
+        print(f"  - 平均响应时间: {times.mean()*1000:.2f}ms")
+        print(f"  - P95响应时间: {times.percentile(95)*1000:.2f}ms")
+        print(f"  - P99响应时间: {times.percentile(99)*1000:.2f}ms")
     
     return stats
 
@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 """
 创建测试用户
+
+用法:
+  python3 create_test_user.py                         # 创建 fwy1014
+  python3 create_test_user.py --bench-users 10000     # 创建 bench0 ~ bench9999 (短连接冷认证压测)
+  python3 create_test_user.py --bench-users 500 --unique-hashes  # 每个用户单独的哈希 (认证风暴压测)
 """
+import argparse
+
 import bcrypt
 import pymysql
 
@@ -14,9 +21,9 @@ DB_CONFIG = {
     'database': 'socks5_db'
 }
 
-def hash_password(password):
+def hash_password(password, rounds=12):
     """密码加密"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -55,5 +62,49 @@ def create_user(username, password):
         print(f"✗ 创建用户失败: {e}")
         return False
 
+def create_bench_users(prefix, count, password, batch_size=1000, unique_hashes=False):
+    """
+    批量创建压测用户 prefix0 ~ prefix{count-1}，供 benchmark_socks5.py --churn cold 使用
+
+    默认所有用户共用同一个密码哈希，避免逐个执行 bcrypt；已存在的用户名会被跳过。
+    unique_hashes 时每个用户单独生成哈希（与服务端相同的 cost 10），proxy 的 bcrypt
+    验证器按 (哈希, 密码) 去重，共用哈希时认证风暴只会触发一次 bcrypt。
+    """
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        hashed_pwd = hash_password(password)
+        sql = """
+        INSERT IGNORE INTO users (username, password, role, status, bandwidth_limit, created_at, updated_at)
+        VALUES (%s, %s, 'user', 'active', 0, NOW(), NOW())
+        """
+        created = 0
+        for start in range(0, count, batch_size):
+            rows = [(f"{prefix}{i}", hash_password(password, 10) if unique_hashes else hashed_pwd)
+                    for i in range(start, min(start + batch_size, count))]
+            created += cursor.executemany(sql, rows)
+            conn.commit()
+
+        print(f"✓ 压测用户创建完成: {prefix}0 ~ {prefix}{count - 1} (新建 {created} 个)")
+        cursor.close()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"✗ 创建压测用户失败: {e}")
+        return False
+
 if __name__ == "__main__":
-    create_user("fwy1014", "fwy1014")
+    parser = argparse.ArgumentParser(description='创建测试用户')
+    parser.add_argument('--bench-users', type=int, default=0,
+                        help='批量创建的压测用户数 (默认: 0，只创建 fwy1014)')
+    parser.add_argument('--prefix', default='bench', help='压测用户名前缀 (默认: bench)')
+    parser.add_argument('--password', default='benchpass', help='压测用户密码 (默认: benchpass)')
+    parser.add_argument('--unique-hashes', action='store_true',
+                        help='每个压测用户单独生成密码哈希（较慢，约 50ms/个）')
+    args = parser.parse_args()
+
+    if args.bench_users > 0:
+        create_bench_users(args.prefix, args.bench_users, args.password,
+                           unique_hashes=args.unique_hashes)
+    else:
+        create_user("fwy1014", "fwy1014")
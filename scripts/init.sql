@@ -21,6 +21,7 @@ CREATE TABLE IF NOT EXISTS users (
     deleted_at TIMESTAMP NULL,
     INDEX idx_username (username),
     INDEX idx_status (status),
+    INDEX idx_updated_at (updated_at),
     INDEX idx_deleted_at (deleted_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -45,8 +46,10 @@ CREATE TABLE IF NOT EXISTS proxy_sessions (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- 创建流量日志表
+-- 按天RANGE分区：这里只建兜底分区pmax，服务端启动后拆分出按天的分区并删除过期分区。
+-- 分区表的主键必须包含分区列，也不支持外键，因此主键为(id, timestamp)，不建外键。
 CREATE TABLE IF NOT EXISTS traffic_logs (
-    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT UNSIGNED AUTO_INCREMENT,
     user_id BIGINT UNSIGNED NOT NULL,
     client_ip VARCHAR(45) NOT NULL,
     target_ip VARCHAR(45) NOT NULL,
@@ -54,35 +57,39 @@ CREATE TABLE IF NOT EXISTS traffic_logs (
     bytes_sent BIGINT DEFAULT 0,
     bytes_recv BIGINT DEFAULT 0,
     protocol VARCHAR(10) DEFAULT 'tcp',
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    -- 优化后的复合索引，提升查询性能
-    INDEX idx_user_timestamp (user_id, timestamp DESC),
-    INDEX idx_timestamp_user (timestamp DESC, user_id),
+    PRIMARY KEY (id, timestamp),
+    -- 与 TrafficLog 模型中的索引一致（按(timestamp, id)游标分页、按用户过滤、按目标IP前缀过滤）
+    INDEX idx_traffic_user_timestamp (user_id, timestamp),
+    INDEX idx_traffic_timestamp (timestamp),
+    INDEX idx_traffic_target_timestamp (target_ip, timestamp),
     INDEX idx_target_analysis (target_ip, target_port, protocol),
     INDEX idx_client_timestamp (client_ip, timestamp DESC)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+PARTITION BY RANGE COLUMNS(timestamp) (PARTITION pmax VALUES LESS THAN (MAXVALUE));
 
--- 创建访问日志表
+-- 创建访问日志表（与 traffic_logs 一样按天分区）
 CREATE TABLE IF NOT EXISTS access_logs (
-    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT UNSIGNED AUTO_INCREMENT,
     user_id BIGINT UNSIGNED NOT NULL,
     client_ip VARCHAR(45) NOT NULL,
     target_url TEXT NOT NULL,
     method VARCHAR(10) NOT NULL,
     status VARCHAR(20) NOT NULL,
     user_agent TEXT,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    -- 优化后的复合索引，提升查询性能
-    INDEX idx_user_timestamp (user_id, timestamp DESC),
+    PRIMARY KEY (id, timestamp),
+    -- 与 AccessLog 模型中的索引一致
+    INDEX idx_access_user_timestamp (user_id, timestamp),
+    INDEX idx_access_timestamp (timestamp),
     INDEX idx_timestamp_status (timestamp DESC, status),
     INDEX idx_client_timestamp (client_ip, timestamp DESC),
     INDEX idx_status_timestamp (status, timestamp DESC),
     INDEX idx_target_url_prefix (target_url(100), timestamp DESC)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+PARTITION BY RANGE COLUMNS(timestamp) (PARTITION pmax VALUES LESS THAN (MAXVALUE));
 
 -- 创建URL过滤规则表
 CREATE TABLE IF NOT EXISTS url_filters (
@@ -120,7 +127,8 @@ CREATE TABLE IF NOT EXISTS bandwidth_limits (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
-    INDEX idx_enabled (enabled)
+    INDEX idx_enabled (enabled),
+    INDEX idx_bandwidth_limits_updated_at (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- 创建代理服务器心跳表
@@ -132,6 +140,7 @@ CREATE TABLE IF NOT EXISTS proxy_heartbeats (
     status ENUM('online', 'offline') DEFAULT 'online',
     active_conns INT DEFAULT 0,
     total_conns BIGINT DEFAULT 0,
+    online_users INT DEFAULT 0,
     last_heartbeat TIMESTAMP NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -142,6 +151,46 @@ CREATE TABLE IF NOT EXISTS proxy_heartbeats (
     INDEX idx_heartbeat_status (last_heartbeat DESC, status)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- 创建配置版本表（管理后台修改配置后递增，代理节点据此重新加载缓存）
+CREATE TABLE IF NOT EXISTS config_versions (
+    name VARCHAR(50) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建流量汇总表（每个用户每分钟/每小时，由代理节点写入流量日志时累加）
+CREATE TABLE IF NOT EXISTS traffic_rollup_minutes (
+    bucket DATETIME(3) NOT NULL,
+    user_id BIGINT UNSIGNED NOT NULL,
+    bytes_sent BIGINT NOT NULL DEFAULT 0,
+    bytes_recv BIGINT NOT NULL DEFAULT 0,
+    connections BIGINT NOT NULL DEFAULT 0,
+    log_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, user_id),
+    INDEX idx_traffic_rollup_minutes_user_id (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS traffic_rollup_hours (
+    bucket DATETIME(3) NOT NULL,
+    user_id BIGINT UNSIGNED NOT NULL,
+    bytes_sent BIGINT NOT NULL DEFAULT 0,
+    bytes_recv BIGINT NOT NULL DEFAULT 0,
+    connections BIGINT NOT NULL DEFAULT 0,
+    log_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, user_id),
+    INDEX idx_traffic_rollup_hours_user_id (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 创建累计流量计数器表（仪表盘总流量，代理节点写日志时累加）
+CREATE TABLE IF NOT EXISTS traffic_counters (
+    name VARCHAR(32) NOT NULL PRIMARY KEY,
+    bytes_sent BIGINT NOT NULL DEFAULT 0,
+    bytes_recv BIGINT NOT NULL DEFAULT 0,
+    connections BIGINT NOT NULL DEFAULT 0,
+    log_count BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME(3) NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- 插入默认管理员用户（密码为 'password' 的bcrypt哈希）
 INSERT IGNORE INTO users (username, password, email, role, status) VALUES 
 ('admin', '$2a$10$92IXUNpkjO0rOQ5byMi.Ye4oKoEa3Ro9llC/.og/at2.uheWG/igi', 'admin@example.com', 'admin', 'active');
@@ -225,13 +274,15 @@ FROM proxy_sessions;
 -- 本脚本已包含针对流水表的优化索引设计：
 -- 
 -- 1. traffic_logs表：
---    - idx_user_timestamp: 用户ID + 时间戳（最常用查询）
---    - idx_timestamp_user: 时间戳 + 用户ID（时间范围查询）
+--    - idx_traffic_user_timestamp: 用户ID + 时间戳（按用户过滤的列表）
+--    - idx_traffic_timestamp: 时间戳（按(timestamp, id)游标分页、时间范围查询）
+--    - idx_traffic_target_timestamp: 目标IP + 时间戳（目标IP前缀查询）
 --    - idx_target_analysis: 目标IP + 端口 + 协议（目标分析）
 --    - idx_client_timestamp: 客户端IP + 时间戳（客户端行为分析）
 -- 
 -- 2. access_logs表：
---    - idx_user_timestamp: 用户ID + 时间戳（用户访问记录）
+--    - idx_access_user_timestamp: 用户ID + 时间戳（用户访问记录）
+--    - idx_access_timestamp: 时间戳（按(timestamp, id)游标分页）
 --    - idx_timestamp_status: 时间戳 + 状态（时间范围状态查询）
 --    - idx_client_timestamp: 客户端IP + 时间戳（客户端行为分析）
 --    - idx_status_timestamp: 状态 + 时间戳（状态统计查询）
@@ -22,6 +22,7 @@ def main():
     required_packages = [
         "requests",
         "PySocks",
+        "psutil",  # 压测脚本采样代理进程资源
     ]
     
     success_count = 0
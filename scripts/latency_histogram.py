@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固定内存的对数线性延迟直方图
+
+与 HdrHistogram 相同的分桶思路：
+- 小于 2^SUB_BUCKET_BITS 个单位的值逐个计数（精确）
+- 更大的值按 2 的幂分组，每组再线性切分为 2^(SUB_BUCKET_BITS-1) 个子桶
+- 分位数取桶中点，相对误差不超过 1/2^SUB_BUCKET_BITS（默认 0.8%）
+
+直方图由 array 支撑，内存与样本数量无关，可以跨线程/进程精确合并，
+也可以序列化为 JSON 保存到测试报告中。
+"""
+
+import math
+from array import array
+
+# 每个 2 的幂区间内的子桶精度（7 位 => 每组 64 个子桶，相对误差 <= 0.8%）
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+
+def _bucket_index(value):
+    """整数值 -> 桶下标"""
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift << (SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+
+def _bucket_bounds(index):
+    """桶下标 -> (下界, 上界)，均为整数单位且包含边界"""
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift = (index >> (SUB_BUCKET_BITS - 1)) - 1
+    mantissa = index - (shift << (SUB_BUCKET_BITS - 1))
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    对数线性延迟直方图
+
+    记录的值以秒为单位（与 time.time() 差值一致），内部按 resolution
+    量化为整数。超过 max_value 的值计入最后一个桶，min/max/mean 仍然精确。
+    """
+
+    def __init__(self, resolution=1e-6, max_value=3600.0):
+        """
+        Args:
+            resolution: 最小可区分的时间单位(秒)，默认 1 微秒
+            max_value: 可精确分桶的最大值(秒)，默认 1 小时
+        """
+        self.resolution = resolution
+        self.max_value = max_value
+        self._max_units = max(1, int(max_value / resolution))
+        self.counts = array('q', [0]) * (_bucket_index(self._max_units) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value, count=1):
+        """记录一个值（秒）"""
+        if value < 0:
+            value = 0.0
+        units = min(int(value / self.resolution), self._max_units)
+        self.counts[_bucket_index(units)] += count
+        self.count += count
+        self.total += value * count
+        self.total_sq += value * value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """合并另一个直方图（必须使用相同的 resolution 和 max_value）"""
+        if (other.resolution != self.resolution or
+                len(other.counts) != len(self.counts)):
+            raise ValueError("直方图参数不一致，无法合并")
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        """返回独立的副本（用于在锁外生成报告）"""
+        return LatencyHistogram(self.resolution, self.max_value).merge(self)
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def stdev(self):
+        """样本标准差（与 statistics.stdev 一致，n-1 作分母）"""
+        if self.count < 2:
+            return 0.0
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def percentile(self, p):
+        """
+        返回第 p 百分位（0-100）的值（秒）
+
+        结果为所在桶的中点，并夹在实际观测到的 min/max 之间。
+        """
+        return self.percentiles((p,))[p]
+
+    def percentiles(self, ps=(50, 90, 95, 99, 99.9)):
+        """一次遍历返回多个分位数，{p: 值(秒)}"""
+        if not self.count:
+            return {p: 0.0 for p in ps}
+        pending = sorted(ps)
+        result = {}
+        seen = 0
+        for index, c in enumerate(self.counts):
+            if not c:
+                continue
+            seen += c
+            while pending and seen >= max(1, math.ceil(self.count * pending[0] / 100.0)):
+                low, high = _bucket_bounds(index)
+                value = (low + high) / 2.0 * self.resolution
+                result[pending.pop(0)] = min(max(value, self.min), self.max)
+            if not pending:
+                break
+        for p in pending:
+            result[p] = self.max
+        return result
+
+    def relative_error(self):
+        """分位数的最大相对误差"""
+        return 1.0 / SUB_BUCKET_COUNT
+
+    def iter_buckets(self):
+        """遍历非空桶，产出 (下界秒, 上界秒, 计数)"""
+        for index, c in enumerate(self.counts):
+            if c:
+                low, high = _bucket_bounds(index)
+                yield low * self.resolution, (high + 1) * self.resolution, c
+
+    def summary(self):
+        """常用统计量（秒）"""
+        result = {
+            'count': self.count,
+            'mean': self.mean(),
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'stdev': self.stdev(),
+        }
+        for p, value in self.percentiles().items():
+            result[f'p{p:g}'.replace('.', '')] = value
+        return result
+
+    def to_dict(self):
+        """序列化为可 JSON 化的字典（只保存非空桶）"""
+        return {
+            'resolution': self.resolution,
+            'max_value': self.max_value,
+            'count': self.count,
+            'total': self.total,
+            'total_sq': self.total_sq,
+            'min': self.min if self.count else None,
+            'max': self.max,
+            'buckets': {str(i): c for i, c in enumerate(self.counts) if c},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict 的结果恢复直方图"""
+        hist = cls(resolution=data['resolution'], max_value=data['max_value'])
+        for index, c in data['buckets'].items():
+            hist.counts[int(index)] = c
+        hist.count = data['count']
+        hist.total = data['total']
+        hist.total_sq = data['total_sq']
+        hist.min = data['min'] if data['min'] is not None else math.inf
+        hist.max = data['max']
+        return hist
@@ -11,6 +11,10 @@ DB_PASS="socks5_password"
 DB_HOST="127.0.0.1"
 DB_PORT="3306"
 
+# 服务端开启了 log_partitioning 并设置了 log_retention_days 时设为 true，
+# 已分区的日志表由服务端删除过期分区，这里不再 DELETE
+SERVER_MANAGES_LOG_PARTITIONS="${SERVER_MANAGES_LOG_PARTITIONS:-false}"
+
 # 日志文件
 LOG_DIR="/var/log/mysql/maintenance"
 LOG_FILE="$LOG_DIR/maintenance_$(date +%Y%m%d_%H%M%S).log"
@@ -58,25 +62,43 @@ execute_sql_file() {
     fi
 }
 
+# 日志表是否由服务端按 log_retention_days 删除过期分区（已按天分区且服务端开启了分区维护）
+is_partitioned() {
+    [ "$SERVER_MANAGES_LOG_PARTITIONS" = "true" ] || return 1
+    local count=$(mysql -h"$DB_HOST" -P"$DB_PORT" -u"$DB_USER" -p"$DB_PASS" "$DB_NAME" -N -e "
+        SELECT COUNT(*) FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '$1' AND PARTITION_NAME IS NOT NULL;
+    " 2>/dev/null)
+    [ "${count:-0}" -gt 0 ]
+}
+
 # 数据清理任务
 cleanup_old_data() {
     log "开始数据清理任务..."
     
     # 清理3个月前的流量日志
-    log "清理3个月前的流量日志..."
-    mysql -h"$DB_HOST" -P"$DB_PORT" -u"$DB_USER" -p"$DB_PASS" "$DB_NAME" -e "
-        DELETE FROM traffic_logs 
-        WHERE timestamp < DATE_SUB(NOW(), INTERVAL 3 MONTH);
-        SELECT '流量日志清理完成，影响行数:' as message, ROW_COUNT() as affected_rows;
-    " 2>&1 | tee -a "$LOG_FILE"
+    if is_partitioned traffic_logs; then
+        log "traffic_logs 已按天分区，由服务端删除过期分区，跳过"
+    else
+        log "清理3个月前的流量日志..."
+        mysql -h"$DB_HOST" -P"$DB_PORT" -u"$DB_USER" -p"$DB_PASS" "$DB_NAME" -e "
+            DELETE FROM traffic_logs 
+            WHERE timestamp < DATE_SUB(NOW(), INTERVAL 3 MONTH);
+            SELECT '流量日志清理完成，影响行数:' as message, ROW_COUNT() as affected_rows;
+        " 2>&1 | tee -a "$LOG_FILE"
+    fi
     
     # 清理3个月前的访问日志
-    log "清理3个月前的访问日志..."
-    mysql -h"$DB_HOST" -P"$DB_PORT" -u"$DB_USER" -p"$DB_PASS" "$DB_NAME" -e "
-        DELETE FROM access_logs 
-        WHERE timestamp < DATE_SUB(NOW(), INTERVAL 3 MONTH);
-        SELECT '访问日志清理完成，影响行数:' as message, ROW_COUNT() as affected_rows;
-    " 2>&1 | tee -a "$LOG_FILE"
+    if is_partitioned access_logs; then
+        log "access_logs 已按天分区，由服务端删除过期分区，跳过"
+    else
+        log "清理3个月前的访问日志..."
+        mysql -h"$DB_HOST" -P"$DB_PORT" -u"$DB_USER" -p"$DB_PASS" "$DB_NAME" -e "
+            DELETE FROM access_logs 
+            WHERE timestamp < DATE_SUB(NOW(), INTERVAL 3 MONTH);
+            SELECT '访问日志清理完成，影响行数:' as message, ROW_COUNT() as affected_rows;
+        " 2>&1 | tee -a "$LOG_FILE"
+    fi
     
     # 清理已关闭且超过1个月的代理会话
     log "清理已关闭的代理会话..."
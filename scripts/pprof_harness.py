@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pprof 采集与热点函数对比工具
+
+在任意压测场景的指定时刻从 proxy 的 pprof 服务 (:6060) 采集
+cpu / heap / allocs / mutex / block profile，连同运行元数据
+（git commit、标签、压测命令、时间）保存到 profiles/<时间>_<标签>/，
+并可以对比两次运行中各函数占比的变化，把性能回退定位到具体函数
+（例如 forwardData、fastRelay、Flow.Wait、logTraffic）。
+
+mutex / block profile 需要 proxy 开启采样，见 configs/config.yaml 中的
+proxy.mutex_profile_fraction 和 proxy.block_profile_rate。
+
+用法:
+  # 启动压测，5 秒后采集 30 秒 profile，压测结束后保存
+  python3 scripts/pprof_harness.py run --label before --delay 5 --seconds 30 -- \\
+      python3 scripts/benchmark_socks5.py --mode sink --start-target -c 200 -d 45
+
+  # 只采集（压测在别处运行）
+  python3 scripts/pprof_harness.py capture --label after --seconds 30
+
+  # 查看已保存的运行和某次运行的热点
+  python3 scripts/pprof_harness.py list
+  python3 scripts/pprof_harness.py top before --kind cpu
+
+  # 对比两次运行，按占比变化排序
+  python3 scripts/pprof_harness.py diff before after --kind cpu
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+DEFAULT_PPROF_URL = "http://127.0.0.1:6060"
+DEFAULT_STORE = "profiles"
+
+PROFILE_KINDS = ('cpu', 'heap', 'allocs', 'mutex', 'block')
+
+# 对比时默认重点关注的函数
+DEFAULT_FOCUS = ('forwardData', 'fastRelay', '(*Flow).Wait', 'logTraffic')
+
+# pprof -top 输出的数据行: flat flat% sum% cum cum% 函数名
+TOP_LINE_RE = re.compile(
+    r'^\s*(\S+)\s+([\d.]+)%\s+([\d.]+)%\s+(\S+)\s+([\d.]+)%\s+(.+?)\s*$')
+
+
+def profile_url(pprof_url, kind, seconds):
+    """返回某类 profile 的下载地址；cpu 和增量类 profile 在 seconds 秒内采样"""
+    if kind == 'cpu':
+        return f"{pprof_url}/debug/pprof/profile?seconds={seconds}"
+    if kind == 'heap':
+        return f"{pprof_url}/debug/pprof/heap"
+    # allocs / mutex / block 使用增量 profile，只统计采集窗口内的数据
+    return f"{pprof_url}/debug/pprof/{kind}?seconds={seconds}"
+
+
+def git_metadata():
+    """当前 git commit 以及工作区是否有未提交修改"""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except Exception:
+            return ''
+    return {
+        'commit': git('rev-parse', 'HEAD') or None,
+        'branch': git('rev-parse', '--abbrev-ref', 'HEAD') or None,
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+    }
+
+
+def pprof_top(profile_path, nodecount=200):
+    """调用 go tool pprof -top，返回文本输出；没有 go 工具链时返回 None"""
+    if shutil.which('go') is None:
+        return None
+    try:
+        result = subprocess.run(
+            ['go', 'tool', 'pprof', '-top', f'-nodecount={nodecount}', profile_path],
+            capture_output=True, text=True, timeout=120)
+        return result.stdout if result.returncode == 0 else None
+    except Exception:
+        return None
+
+
+def parse_top(text):
+    """
+    解析 pprof -top 文本
+
+    Returns:
+        dict: {函数名: {'flat': 原始值, 'flat_pct': %, 'cum': 原始值, 'cum_pct': %}}
+    """
+    functions = {}
+    for line in text.splitlines():
+        match = TOP_LINE_RE.match(line)
+        if not match:
+            continue
+        flat, flat_pct, _, cum, cum_pct, name = match.groups()
+        functions[name] = {
+            'flat': flat,
+            'flat_pct': float(flat_pct),
+            'cum': cum,
+            'cum_pct': float(cum_pct),
+        }
+    return functions
+
+
+class ProfileRun:
+    """一次保存的采集结果（目录中包含 meta.json、*.pb.gz 和 top_*.txt）"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def profile_path(self, kind):
+        return os.path.join(self.path, f'{kind}.pb.gz')
+
+    def top(self, kind):
+        """返回某类 profile 的函数占比，优先使用采集时缓存的 top 文本"""
+        cached = os.path.join(self.path, f'top_{kind}.txt')
+        if os.path.exists(cached):
+            with open(cached, encoding='utf-8') as f:
+                return parse_top(f.read())
+        if not os.path.exists(self.profile_path(kind)):
+            return None
+        text = pprof_top(self.profile_path(kind))
+        if text is None:
+            raise RuntimeError("需要 go 工具链解析 profile: go tool pprof")
+        with open(cached, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return parse_top(text)
+
+
+def capture(label, seconds=30, kinds=PROFILE_KINDS, pprof_url=DEFAULT_PPROF_URL,
+            store=DEFAULT_STORE, extra_meta=None):
+    """
+    并行采集多类 profile 并保存
+
+    Args:
+        label: 本次运行的标签（如 before / after / 场景名）
+        seconds: cpu 及增量 profile 的采样时长
+        kinds: 要采集的 profile 类型
+        extra_meta: 额外写入 meta.json 的字段（压测命令、场景参数等）
+
+    Returns:
+        ProfileRun
+    """
+    started = datetime.now()
+    path = os.path.join(store, f"{started.strftime('%Y%m%d_%H%M%S')}_{label}")
+    os.makedirs(path, exist_ok=True)
+
+    errors = {}
+    sizes = {}
+
+    def fetch(kind):
+        try:
+            with urllib.request.urlopen(profile_url(pprof_url, kind, seconds),
+                                        timeout=seconds + 30) as response:
+                data = response.read()
+            with open(os.path.join(path, f'{kind}.pb.gz'), 'wb') as f:
+                f.write(data)
+            sizes[kind] = len(data)
+        except Exception as e:
+            errors[kind] = str(e)
+
+    # heap 是快照，放在采集窗口结束时获取
+    windowed = [k for k in kinds if k != 'heap']
+    threads = [threading.Thread(target=fetch, args=(kind,)) for kind in windowed]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if 'heap' in kinds:
+        fetch('heap')
+
+    meta = {
+        'label': label,
+        'started_at': started.isoformat(),
+        'seconds': seconds,
+        'pprof_url': pprof_url,
+        'hostname': socket.gethostname(),
+        'git': git_metadata(),
+        'profiles': sorted(sizes),
+        'errors': errors,
+    }
+    if extra_meta:
+        meta.update(extra_meta)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    # 预先生成 top 文本，之后没有 go 工具链的机器也能对比
+    for kind in sizes:
+        text = pprof_top(os.path.join(path, f'{kind}.pb.gz'))
+        if text is not None:
+            with open(os.path.join(path, f'top_{kind}.txt'), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+    return ProfileRun(path)
+
+
+def list_runs(store=DEFAULT_STORE):
+    """按时间顺序返回所有已保存的运行"""
+    if not os.path.isdir(store):
+        return []
+    runs = []
+    for name in sorted(os.listdir(store)):
+        if os.path.exists(os.path.join(store, name, 'meta.json')):
+            runs.append(ProfileRun(os.path.join(store, name)))
+    return runs
+
+
+def find_run(ref, store=DEFAULT_STORE):
+    """按目录名、路径或标签（取最新一次）查找运行"""
+    if os.path.exists(os.path.join(ref, 'meta.json')):
+        return ProfileRun(ref)
+    matches = [r for r in list_runs(store) if r.name == ref or r.meta.get('label') == ref]
+    if not matches:
+        raise SystemExit(f"✗ 未找到运行: {ref}")
+    return matches[-1]
+
+
+def diff_runs(before, after, kind='cpu', metric='flat_pct'):
+    """
+    对比两次运行中各函数的占比
+
+    Returns:
+        list: [(函数名, before%, after%, 变化), ...]，按变化绝对值降序
+    """
+    top_before = before.top(kind)
+    top_after = after.top(kind)
+    if top_before is None or top_after is None:
+        raise SystemExit(f"✗ 两次运行中至少一次没有 {kind} profile")
+
+    rows = []
+    for name in set(top_before) | set(top_after):
+        b = top_before.get(name, {}).get(metric, 0.0)
+        a = top_after.get(name, {}).get(metric, 0.0)
+        rows.append((name, b, a, a - b))
+    rows.sort(key=lambda row: abs(row[3]), reverse=True)
+    return rows
+
+
+def short_name(name, width=60):
+    return name if len(name) <= width else '...' + name[-(width - 3):]
+
+
+def print_diff(before, after, kind, limit, focus):
+    print(f"\n{'='*90}")
+    print(f"{kind} profile 对比: {before.name} -> {after.name}")
+    for run in (before, after):
+        git = run.meta.get('git', {})
+        print(f"  {run.name}: commit {(git.get('commit') or '?')[:10]}"
+              f"{' (dirty)' if git.get('dirty') else ''}, {run.meta.get('command', '')}")
+    print(f"{'='*90}")
+
+    for metric, title in (('flat_pct', '自身占比 flat%'), ('cum_pct', '累计占比 cum%')):
+        rows = diff_runs(before, after, kind, metric)
+        print(f"\n{title} 变化最大的函数:")
+        print(f"  {'函数':<62} {'之前':>8} {'之后':>8} {'变化':>8}")
+        for name, b, a, delta in rows[:limit]:
+            print(f"  {short_name(name):<62} {b:>7.2f}% {a:>7.2f}% {delta:>+7.2f}%")
+
+        focused = [row for row in rows if any(f in row[0] for f in focus)]
+        if focused:
+            print(f"\n  重点函数:")
+            for name, b, a, delta in focused:
+                print(f"  {short_name(name):<62} {b:>7.2f}% {a:>7.2f}% {delta:>+7.2f}%")
+
+
+def run_scenario(args):
+    """启动压测命令，delay 秒后采集，命令结束后保存"""
+    command = args.command[1:] if args.command and args.command[0] == '--' else args.command
+    if not command:
+        raise SystemExit("✗ 请在 -- 之后给出压测命令")
+
+    print(f"启动压测: {' '.join(command)}")
+    output = None if args.show_output else subprocess.DEVNULL
+    process = subprocess.Popen(command, stdout=output, stderr=output)
+    try:
+        time.sleep(args.delay)
+        if process.poll() is not None:
+            raise SystemExit(f"✗ 压测命令在采集前已退出 (返回码 {process.returncode})")
+        print(f"采集 {args.seconds} 秒 profile: {', '.join(args.profiles)} ...")
+        run = capture(args.label, args.seconds, args.profiles, args.pprof_url, args.store,
+                      {'command': ' '.join(command), 'delay': args.delay, 'note': args.note})
+        if args.stop_after_capture:
+            process.terminate()
+        process.wait()
+    except KeyboardInterrupt:
+        process.terminate()
+        raise
+    return run
+
+
+def print_run(run):
+    meta = run.meta
+    print(f"✓ 已保存: {run.path}")
+    print(f"  profile: {', '.join(meta['profiles']) or '无'}")
+    for kind, error in meta.get('errors', {}).items():
+        print(f"  ⚠️  {kind} 采集失败: {error}")
+
+
+def parse_profiles(text):
+    kinds = [k.strip() for k in text.split(',') if k.strip()]
+    unknown = set(kinds) - set(PROFILE_KINDS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的 profile 类型: {', '.join(sorted(unknown))}")
+    return kinds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='pprof 采集与热点函数对比工具',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('用法:')[1])
+    parser.add_argument('--store', default=DEFAULT_STORE, help=f'保存目录 (默认: {DEFAULT_STORE})')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    def add_capture_args(p):
+        p.add_argument('--label', required=True, help='运行标签，如 before / after')
+        p.add_argument('--seconds', type=int, default=30, help='采样时长(秒) (默认: 30)')
+        p.add_argument('--profiles', type=parse_profiles, default=list(PROFILE_KINDS),
+                       help=f"逗号分隔的 profile 类型 (默认: {','.join(PROFILE_KINDS)})")
+        p.add_argument('--pprof-url', default=DEFAULT_PPROF_URL,
+                       help=f'pprof 服务地址 (默认: {DEFAULT_PPROF_URL})')
+        p.add_argument('--note', default='', help='写入元数据的备注')
+
+    p = sub.add_parser('capture', help='立即采集一次')
+    add_capture_args(p)
+
+    p = sub.add_parser('run', help='运行压测命令并在指定时刻采集')
+    add_capture_args(p)
+    p.add_argument('--delay', type=float, default=5, help='压测启动后等待多久开始采集(秒) (默认: 5)')
+    p.add_argument('--stop-after-capture', action='store_true', help='采集完成后终止压测命令')
+    p.add_argument('--show-output', action='store_true', help='显示压测命令的输出')
+    p.add_argument('command', nargs=argparse.REMAINDER, help='-- 之后的压测命令')
+
+    sub.add_parser('list', help='列出已保存的运行')
+
+    p = sub.add_parser('top', help='显示某次运行的热点函数')
+    p.add_argument('run', help='运行目录名、路径或标签')
+    p.add_argument('--kind', choices=PROFILE_KINDS, default='cpu')
+    p.add_argument('--limit', type=int, default=25)
+
+    p = sub.add_parser('diff', help='对比两次运行的热点函数')
+    p.add_argument('before', help='基准运行（目录名、路径或标签）')
+    p.add_argument('after', help='对比运行')
+    p.add_argument('--kind', choices=PROFILE_KINDS, default='cpu')
+    p.add_argument('--limit', type=int, default=20)
+    p.add_argument('--focus', default=','.join(DEFAULT_FOCUS),
+                   help=f"重点关注的函数名（子串匹配，逗号分隔） (默认: {','.join(DEFAULT_FOCUS)})")
+
+    args = parser.parse_args()
+
+    if args.cmd == 'capture':
+        print(f"采集 {args.seconds} 秒 profile: {', '.join(args.profiles)} ...")
+        print_run(capture(args.label, args.seconds, args.profiles, args.pprof_url, args.store,
+                          {'note': args.note}))
+    elif args.cmd == 'run':
+        print_run(run_scenario(args))
+    elif args.cmd == 'list':
+        for run in list_runs(args.store):
+            git = run.meta.get('git', {})
+            print(f"{run.name:<40} {(git.get('commit') or '?')[:10]:<12} "
+                  f"{','.join(run.meta.get('profiles', [])):<30} {run.meta.get('command', '')}")
+    elif args.cmd == 'top':
+        run = find_run(args.run, args.store)
+        functions = run.top(args.kind)
+        if functions is None:
+            raise SystemExit(f"✗ {run.name} 没有 {args.kind} profile")
+        print(f"{run.name} {args.kind} 热点函数:")
+        print(f"  {'函数':<62} {'flat%':>8} {'cum%':>8}")
+        ranked = sorted(functions.items(), key=lambda x: x[1]['flat_pct'], reverse=True)
+        for name, row in ranked[:args.limit]:
+            print(f"  {short_name(name):<62} {row['flat_pct']:>7.2f}% {row['cum_pct']:>7.2f}%")
+    elif args.cmd == 'diff':
+        focus = [f for f in args.focus.split(',') if f]
+        print_diff(find_run(args.before, args.store), find_run(args.after, args.store),
+                   args.kind, args.limit, focus)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n已中断")
+        sys.exit(1)
@@ -1,25 +1,24 @@
 #!/bin/bash
 # 在负载下分析代理性能
+#
+# 用法: scripts/profile_proxy.sh [标签] [采样秒数]
+# 采集结果保存在 profiles/<时间>_<标签>/，可用以下命令对比两次运行：
+#   python3 scripts/pprof_harness.py diff <之前的标签> <之后的标签>
 
-echo "启动性能分析..."
-echo "1. 启动后台负载生成器..."
+LABEL=${1:-$(git rev-parse --short HEAD 2>/dev/null || echo run)}
+SECONDS_TO_PROFILE=${2:-30}
 
-# 后台运行负载
-python3 scripts/compare_proxy_performance.py > /dev/null 2>&1 &
-LOAD_PID=$!
+echo "启动性能分析 (标签: $LABEL)..."
+echo "1. 启动后台负载生成器，5 秒后采集 ${SECONDS_TO_PROFILE} 秒 cpu/heap/allocs/mutex/block profile..."
 
-sleep 5
+python3 scripts/pprof_harness.py run --label "$LABEL" --delay 5 --seconds "$SECONDS_TO_PROFILE" \
+    --stop-after-capture -- python3 scripts/compare_proxy_performance.py || exit 1
 
-echo "2. 采集30秒CPU profile..."
-curl -s "http://localhost:6060/debug/pprof/profile?seconds=30" > /tmp/proxy_cpu.prof
-
-echo "3. 停止负载..."
-kill $LOAD_PID 2>/dev/null
-
-echo "4. 分析profile..."
-go tool pprof -text -flat /tmp/proxy_cpu.prof | head -n 30
+echo "2. 分析profile..."
+python3 scripts/pprof_harness.py top "$LABEL" --kind cpu --limit 30
 
 echo ""
 echo "详细分析可运行："
-echo "go tool pprof -http=:8080 /tmp/proxy_cpu.prof"
-
+echo "go tool pprof -http=:8080 profiles/*_${LABEL}/cpu.pb.gz"
+echo "对比两次运行："
+echo "python3 scripts/pprof_harness.py diff <基准标签> $LABEL"
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+proxy 进程资源采样器
+
+按固定间隔采集 proxy 进程的：
+- CPU（进程占用的核数 + 系统每个核心的使用率）
+- RSS 内存、打开的文件描述符数、线程数
+- goroutine 数（来自 :6060/debug/pprof/goroutine?debug=1）
+- 进程 TCP 连接的状态分布（ESTABLISHED / TIME_WAIT / CLOSE_WAIT ...）
+
+采样结果可以和延迟直方图一起写入压测报告，并换算成
+"每 1k 连接的资源成本" 和 "每 CPU 秒转发的字节数"。
+
+用法:
+  # 单独运行，按端口找到 proxy 进程，每秒采样直到 Ctrl+C
+  python3 proxy_monitor.py --port 1082
+
+在压测脚本中使用:
+  from proxy_monitor import ResourceSampler
+  sampler = ResourceSampler(port=1082)
+  sampler.start()
+  ...  # 压测
+  sampler.stop()
+  report['resources'] = sampler.to_dict(connections=N, total_bytes=B)
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import threading
+import time
+import urllib.request
+from collections import Counter
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_PPROF_URL = "http://127.0.0.1:6060"
+
+GOROUTINE_TOTAL_RE = re.compile(rb'goroutine profile: total (\d+)')
+
+
+def get_proxy_pid():
+    """通过进程命令行查找 proxy 进程的 PID（bin/proxy）"""
+    try:
+        result = subprocess.run(
+            ["ps", "aux"],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+
+        for line in result.stdout.split('\n'):
+            if 'bin/proxy' in line and 'grep' not in line:
+                parts = line.split()
+                if len(parts) > 1:
+                    return int(parts[1])
+
+        return None
+    except Exception as e:
+        print(f"⚠️  无法获取proxy进程PID: {e}")
+        return None
+
+
+def find_pid_by_port(port):
+    """查找监听指定 TCP 端口的进程 PID"""
+    if psutil is None:
+        return None
+    try:
+        for conn in psutil.net_connections(kind='tcp'):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port:
+                return conn.pid
+    except (psutil.AccessDenied, OSError):
+        pass
+    return None
+
+
+def fetch_goroutine_count(pprof_url=DEFAULT_PPROF_URL, timeout=2):
+    """读取 goroutine profile 的总数，pprof 不可用时返回 None"""
+    try:
+        with urllib.request.urlopen(f"{pprof_url}/debug/pprof/goroutine?debug=1",
+                                    timeout=timeout) as response:
+            match = GOROUTINE_TOTAL_RE.search(response.read(4096))
+            return int(match.group(1)) if match else None
+    except Exception:
+        return None
+
+
+class ResourceSampler:
+    """后台线程定期采样 proxy 进程资源"""
+
+    def __init__(self, pid=None, port=None, interval=1.0, pprof_url=DEFAULT_PPROF_URL,
+                 tcp_states=True):
+        """
+        Args:
+            pid: proxy 进程 PID，未指定时按 port 或进程名查找
+            port: proxy 监听端口，用于查找 PID
+            interval: 采样间隔(秒)
+            pprof_url: pprof 服务地址，None 表示不采集 goroutine 数
+            tcp_states: 是否统计 TCP 连接状态（连接数很大时开销较高）
+        """
+        if psutil is None:
+            raise RuntimeError("请先安装psutil库: pip3 install psutil")
+        if pid is None and port is not None:
+            pid = find_pid_by_port(port)
+        if pid is None:
+            pid = get_proxy_pid()
+        if pid is None:
+            raise RuntimeError("未找到 proxy 进程")
+
+        self.pid = pid
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.pprof_url = pprof_url
+        self.tcp_states = tcp_states
+        self.samples = []
+        self.start_time = None
+        self.end_time = None
+        self._start_cpu = None
+        self._end_cpu = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _cpu_seconds(self):
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    def _connections(self):
+        if hasattr(self.process, 'net_connections'):
+            return self.process.net_connections(kind='tcp')
+        return self.process.connections(kind='tcp')
+
+    def sample(self, last_cpu, last_time):
+        """采集一个样本，返回 (样本, 当前 CPU 秒, 当前时间)"""
+        now = time.time()
+        cpu = self._cpu_seconds()
+        with self.process.oneshot():
+            memory_info = self.process.memory_info()
+            num_fds = self.process.num_fds() if hasattr(self.process, 'num_fds') else None
+            num_threads = self.process.num_threads()
+
+        sample = {
+            'timestamp': now,
+            'cpu_cores': (cpu - last_cpu) / (now - last_time) if now > last_time else 0.0,
+            'system_cpu_per_core': psutil.cpu_percent(percpu=True),
+            'rss_mb': memory_info.rss / 1024 / 1024,
+            'num_fds': num_fds,
+            'num_threads': num_threads,
+        }
+        if self.pprof_url:
+            sample['goroutines'] = fetch_goroutine_count(self.pprof_url)
+        if self.tcp_states:
+            try:
+                sample['tcp_states'] = dict(Counter(c.status for c in self._connections()))
+            except (psutil.AccessDenied, OSError):
+                sample['tcp_states'] = None
+        return sample, cpu, now
+
+    def _run(self):
+        last_cpu, last_time = self._start_cpu, self.start_time
+        psutil.cpu_percent(percpu=True)  # 第一次调用只建立基准
+        while not self._stop.wait(self.interval):
+            try:
+                sample, last_cpu, last_time = self.sample(last_cpu, last_time)
+                self.samples.append(sample)
+            except psutil.NoSuchProcess:
+                print("⚠️  proxy进程已停止")
+                break
+            except Exception as e:
+                print(f"⚠️  监控错误: {e}")
+
+    def start(self):
+        self.start_time = time.time()
+        self._start_cpu = self._cpu_seconds()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+        self.end_time = time.time()
+        try:
+            self._end_cpu = self._cpu_seconds()
+        except psutil.NoSuchProcess:
+            self._end_cpu = self._start_cpu
+        return self.samples
+
+    def summary(self):
+        """汇总统计：平均/峰值 CPU 核数、RSS、FD、goroutine，以及总 CPU 秒"""
+        def series(key):
+            return [s[key] for s in self.samples if s.get(key) is not None]
+
+        result = {
+            'pid': self.pid,
+            'samples': len(self.samples),
+            'duration': (self.end_time or time.time()) - (self.start_time or time.time()),
+            'cpu_seconds': (self._end_cpu or self._start_cpu or 0) - (self._start_cpu or 0),
+        }
+        for key in ('cpu_cores', 'rss_mb', 'num_fds', 'num_threads', 'goroutines'):
+            values = series(key)
+            if values:
+                result[f'{key}_avg'] = sum(values) / len(values)
+                result[f'{key}_max'] = max(values)
+        return result
+
+    def cost_report(self, connections=0, total_bytes=0):
+        """
+        把资源消耗换算成单位成本
+
+        Args:
+            connections: 本次压测建立（或维持）的连接数
+            total_bytes: 经代理转发的总字节数
+        """
+        summary = self.summary()
+        cpu_seconds = summary['cpu_seconds']
+        result = {}
+        if connections:
+            per_k = connections / 1000.0
+            result['cpu_seconds_per_1k_conns'] = cpu_seconds / per_k
+            if 'rss_mb_max' in summary and self.samples:
+                result['rss_mb_per_1k_conns'] = (summary['rss_mb_max'] - self.samples[0]['rss_mb']) / per_k
+            if 'goroutines_max' in summary:
+                result['goroutines_per_1k_conns'] = summary['goroutines_max'] / per_k
+            if 'num_fds_max' in summary:
+                result['fds_per_1k_conns'] = summary['num_fds_max'] / per_k
+        if total_bytes and cpu_seconds > 0:
+            result['bytes_per_cpu_second'] = total_bytes / cpu_seconds
+        return result
+
+    def to_dict(self, connections=0, total_bytes=0):
+        """可直接写入 JSON 报告的结果（汇总 + 单位成本 + 原始样本）"""
+        return {
+            'summary': self.summary(),
+            'cost': self.cost_report(connections, total_bytes),
+            'samples': self.samples,
+        }
+
+    def print_report(self, connections=0, total_bytes=0):
+        summary = self.summary()
+        print(f"\nproxy 资源消耗 (PID: {self.pid}, {summary['samples']} 个样本)")
+        print(f"  CPU 时间: {summary['cpu_seconds']:.2f} 秒")
+        if 'cpu_cores_avg' in summary:
+            print(f"  CPU 核数: 平均 {summary['cpu_cores_avg']:.2f}, 峰值 {summary['cpu_cores_max']:.2f}")
+        if 'rss_mb_avg' in summary:
+            print(f"  RSS 内存: 平均 {summary['rss_mb_avg']:.1f} MB, 峰值 {summary['rss_mb_max']:.1f} MB")
+        if 'num_fds_max' in summary:
+            print(f"  文件描述符峰值: {summary['num_fds_max']}")
+        if 'goroutines_max' in summary:
+            print(f"  goroutine 峰值: {summary['goroutines_max']}")
+        states = self.samples[-1].get('tcp_states') if self.samples else None
+        if states:
+            print(f"  TCP 状态(最后一次采样): " +
+                  ", ".join(f"{k}={v}" for k, v in sorted(states.items(), key=lambda x: -x[1])))
+        cost = self.cost_report(connections, total_bytes)
+        if 'cpu_seconds_per_1k_conns' in cost:
+            print(f"  每 1k 连接 CPU: {cost['cpu_seconds_per_1k_conns']:.3f} 秒")
+        if 'rss_mb_per_1k_conns' in cost:
+            print(f"  每 1k 连接内存增长: {cost['rss_mb_per_1k_conns']:.2f} MB")
+        if 'bytes_per_cpu_second' in cost:
+            print(f"  每 CPU 秒转发: {cost['bytes_per_cpu_second'] / 1024 / 1024:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='proxy 进程资源采样器')
+    parser.add_argument('--pid', type=int, default=None, help='proxy 进程 PID')
+    parser.add_argument('--port', type=int, default=1082, help='proxy 监听端口，用于查找 PID (默认: 1082)')
+    parser.add_argument('--interval', type=float, default=1.0, help='采样间隔(秒) (默认: 1.0)')
+    parser.add_argument('--pprof-url', default=DEFAULT_PPROF_URL,
+                        help=f'pprof 服务地址 (默认: {DEFAULT_PPROF_URL})')
+    parser.add_argument('--output', default=None, help='停止后保存 JSON 样本的文件路径')
+    args = parser.parse_args()
+
+    sampler = ResourceSampler(args.pid, args.port, args.interval, args.pprof_url).start()
+    print(f"✅ 开始监控 proxy 进程 (PID: {sampler.pid})，按 Ctrl+C 停止")
+    try:
+        while True:
+            time.sleep(args.interval)
+            if sampler.samples:
+                s = sampler.samples[-1]
+                print(f"  CPU {s['cpu_cores']:.2f} 核 | RSS {s['rss_mb']:.1f} MB | "
+                      f"FD {s['num_fds']} | goroutine {s.get('goroutines')} | TCP {s.get('tcp_states')}")
+    except KeyboardInterrupt:
+        pass
+    sampler.stop()
+    sampler.print_report()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(sampler.to_dict(), f, indent=2, ensure_ascii=False)
+        print(f"\n样本已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
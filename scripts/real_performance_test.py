@@ -2,14 +2,19 @@
 """
 SOCKS5代理真实性能测试
 使用本地HTTP服务器，排除网络延迟影响
+
+--rate: 持续负载测试改用开环驱动（固定到达率，延迟含排队时间）
 """
 
+import argparse
 import time
 import threading
 import requests
-import statistics
 from collections import defaultdict
 
+from latency_histogram import LatencyHistogram
+from open_loop import OpenLoopDriver, make_http_request_fn
+
 # 配置
 PROXY_HOST = "127.0.0.1"
 PROXY_PORT = 1082
@@ -21,7 +26,7 @@ class PerformanceMetrics:
     def __init__(self):
         self.success_count = 0
         self.error_count = 0
-        self.response_times = []
+        self.response_times = LatencyHistogram()  # 固定内存，不随请求数增长
         self.errors = defaultdict(int)
         self.lock = threading.Lock()
         self.start_time = None
@@ -30,7 +35,7 @@ class PerformanceMetrics:
     def add_success(self, response_time):
         with self.lock:
             self.success_count += 1
-            self.response_times.append(response_time)
+            self.response_times.record(response_time)
     
     def add_error(self, error_type):
         with self.lock:
@@ -85,13 +90,14 @@ def test_without_proxy(num_requests=1000):
     print(f"  - 总耗时: {total_time:.2f}s")
     print(f"  - 成功请求: {stats['success']}")
     print(f"  - 失败请求: {stats['errors']}")
-    if stats['response_times']:
-        print(f"  - 平均响应: {statistics.mean(stats['response_times'])*1000:.2f}ms")
-        print(f"  - 中位数: {statistics.median(stats['response_times'])*1000:.2f}ms")
-        print(f"  - 最小: {min(stats['response_times'])*1000:.2f}ms")
-        print(f"  - 最大: {max(stats['response_times'])*1000:.2f}ms")
-        print(f"  - P95: {sorted(stats['response_times'])[int(len(stats['response_times'])*0.95)]*1000:.2f}ms")
-        print(f"  - P99: {sorted(stats['response_times'])[int(len(stats['response_times'])*0.99)]*1000:.2f}ms")
+    times = stats['response_times']
+    if times:
+        print(f"  - 平均响应: {times.mean()*1000:.2f}ms")
+        print(f"  - 中位数: {times.percentile(50)*1000:.2f}ms")
+        print(f"  - 最小: {times.min*1000:.2f}ms")
+        print(f"  - 最大: {times.max*1000:.2f}ms")
+        print(f"  - P95: {times.percentile(95)*1000:.2f}ms")
+        print(f"  - P99: {times.percentile(99)*1000:.2f}ms")
     
     qps = stats['success'] / total_time
     print(f"  - QPS: {qps:.2f}")
@@ -144,14 +150,15 @@ def test_with_proxy(num_requests=1000, num_threads=10):
     if stats['errors'] > 0:
         print(f"  - 错误类型: {stats['error_types']}")
     
-    if stats['response_times']:
-        print(f"  - 平均响应: {statistics.mean(stats['response_times'])*1000:.2f}ms")
-        print(f"  - 中位数: {statistics.median(stats['response_times'])*1000:.2f}ms")
-        print(f"  - 最小: {min(stats['response_times'])*1000:.2f}ms")
-        print(f"  - 最大: {max(stats['response_times'])*1000:.2f}ms")
-        print(f"  - P95: {sorted(stats['response_times'])[int(len(stats['response_times'])*0.95)]*1000:.2f}ms")
-        print(f"  - P99: {sorted(stats['response_times'])[int(len(stats['response_times'])*0.99)]*1000:.2f}ms")
-        print(f"  - 标准差: {statistics.stdev(stats['response_times'])*1000:.2f}ms")
+    times = stats['response_times']
+    if times:
+        print(f"  - 平均响应: {times.mean()*1000:.2f}ms")
+        print(f"  - 中位数: {times.percentile(50)*1000:.2f}ms")
+        print(f"  - 最小: {times.min*1000:.2f}ms")
+        print(f"  - 最大: {times.max*1000:.2f}ms")
+        print(f"  - P95: {times.percentile(95)*1000:.2f}ms")
+        print(f"  - P99: {times.percentile(99)*1000:.2f}ms")
+        print(f"  - 标准差: {times.stdev()*1000:.2f}ms")
     
     qps = stats['success'] / total_time
     print(f"  - QPS: {qps:.2f}")
@@ -223,10 +230,24 @@ def test_sustained_load(duration=30, num_threads=20):
     print(f"  - 总失败: {stats['errors']}")
     print(f"  - 平均QPS: {stats['success']/total_time:.2f}")
     
-    if stats['response_times']:
-        print(f"  - 平均响应: {statistics.mean(stats['response_times'])*1000:.2f}ms")
-        print(f"  - P95响应: {sorted(stats['response_times'])[int(len(stats['response_times'])*0.95)]*1000:.2f}ms")
-        print(f"  - P99响应: {sorted(stats['response_times'])[int(len(stats['response_times'])*0.99)]*1000:.2f}ms")
+    times = stats['response_times']
+    if times:
+        print(f"  - 平均响应: {times.mean()*1000:.2f}ms")
+        print(f"  - P95响应: {times.percentile(95)*1000:.2f}ms")
+        print(f"  - P99响应: {times.percentile(99)*1000:.2f}ms")
+
+def test_open_loop_load(rate, duration=30, arrival='poisson'):
+    """开环持续负载测试：按固定到达率发请求，代理卡顿时不降速"""
+    print("\n" + "="*60)
+    print(f"开环持续负载测试：{rate:g} req/s ({arrival})，{duration}秒")
+    print("="*60)
+    
+    proxy = f'socks5://{PROXY_USER}:{PROXY_PASS}@{PROXY_HOST}:{PROXY_PORT}'
+    driver = OpenLoopDriver(make_http_request_fn(LOCAL_SERVER, proxy), rate, duration,
+                            arrival, workers=200)
+    result = driver.run()
+    result.print_summary("开环持续负载测试结果")
+    return result
 
 def check_local_server():
     """检查本地服务器是否运行"""
@@ -237,6 +258,13 @@ def check_local_server():
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='SOCKS5代理真实性能测试')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='持续负载测试改用开环驱动的目标速率 req/s')
+    parser.add_argument('--arrival', choices=['poisson', 'uniform'], default='poisson',
+                        help='开环到达过程 (默认: poisson)')
+    args = parser.parse_args()
+    
     print("="*60)
     print("SOCKS5代理真实性能测试")
     print("="*60)
@@ -265,9 +293,12 @@ def main():
         
         # 测试4：持续负载
         print("\n" + "-"*60)
-        user_input = input("\n是否运行30秒持续负载测试? (y/N): ")
-        if user_input.lower() == 'y':
-            test_sustained_load(duration=30, num_threads=20)
+        if args.rate:
+            test_open_loop_load(args.rate, duration=30, arrival=args.arrival)
+        else:
+            user_input = input("\n是否运行30秒持续负载测试? (y/N): ")
+            if user_input.lower() == 'y':
+                test_sustained_load(duration=30, num_threads=20)
         
         # 总结
         print("\n" + "="*60)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分层限速准确度测试：大量并发流下全局 / 用户 / 连接三层限速是否准确
+
+经代理对 bench_target_server.py 的 source 端口 (下行) 或 sink 端口 (上行)
+建立大量并发长连接，按轮询方式分配给多个用户，统计预热之后的时间窗口内
+每条流、每个用户以及全部流量的速率，并与配置的各层限速值比较：
+
+- 连接层: 每条流的速率不超过 conn_bandwidth_limit
+- 用户层: 每个用户的总速率不超过其 bandwidth_limit
+- 全局层: 总速率不超过 global_bandwidth_limit；需求超过全局带宽时应接近跑满
+          (空闲用户的份额被忙碌用户借用)
+- 保证份额: 需求足够的用户至少获得 min(全局带宽 / 活跃用户数, 用户上限)
+
+预热时间用于排除令牌桶初始突发的影响，窗口越长结果越准确。
+
+用法:
+  # proxy 配置 global_bandwidth_limit: 10485760, conn_bandwidth_limit: 65536
+  python3 scripts/test_bandwidth_shaping.py --users alice:pass1,bob:pass2 --flows 1000 \\
+      --global-limit 10485760 --conn-limit 65536 --start-target
+  # alice 在 bandwidth_limits 表中限速 1MB/s
+  python3 scripts/test_bandwidth_shaping.py --users alice:pass1,bob:pass2 --user-limit alice=1048576 \\
+      --global-limit 10485760 -d 30 -o shaping.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from bench_relay_efficiency import open_tunnel
+from bench_target_server import TARGET_PORTS, start_target_process
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+READ_SIZE = 64 * 1024
+
+
+class Flow:
+    """一条被测流的计数器"""
+
+    def __init__(self, index, username):
+        self.index = index
+        self.username = username
+        self.bytes = 0
+        self.window_start = None  # 预热结束时的字节数
+        self.window_end = None    # 测试结束时的字节数
+        self.error = None
+
+    def rate(self, window):
+        if self.window_start is None or self.window_end is None or window <= 0:
+            return 0.0
+        return (self.window_end - self.window_start) / window
+
+
+async def run_flow(args, flow, password, deadline):
+    """建立一条隧道并持续收发数据直到 deadline"""
+    loop = asyncio.get_running_loop()
+    reader, writer = await open_tunnel(args.proxy_host, args.proxy_port, args.target_host,
+                                       TARGET_PORTS[args.direction], flow.username, password)
+    try:
+        if args.direction == 'source':
+            while loop.time() < deadline:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                flow.bytes += len(data)
+        else:
+            payload = b'X' * READ_SIZE
+            while loop.time() < deadline:
+                writer.write(payload)
+                await writer.drain()
+                flow.bytes += len(payload)
+    finally:
+        writer.close()
+
+
+async def run_flows(args, users):
+    """启动全部流，在预热结束和测试结束时记录快照，返回 (流列表, 窗口秒数)"""
+    loop = asyncio.get_running_loop()
+    flows = [Flow(i, users[i % len(users)][0]) for i in range(args.flows)]
+    passwords = dict(users)
+    deadline = loop.time() + args.ramp + args.warmup + args.duration + 1
+
+    async def start(flow, delay):
+        await asyncio.sleep(delay)
+        try:
+            await run_flow(args, flow, passwords[flow.username], deadline)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            flow.error = str(e) or type(e).__name__
+
+    # 在 ramp 秒内均匀建立连接，避免同时握手压垮认证
+    tasks = [asyncio.create_task(start(f, args.ramp * i / len(flows))) for i, f in enumerate(flows)]
+
+    await asyncio.sleep(args.ramp + args.warmup)
+    for f in flows:
+        f.window_start = f.bytes
+    window_begin = loop.time()
+    await asyncio.sleep(args.duration)
+    window = loop.time() - window_begin
+    for f in flows:
+        f.window_end = f.bytes
+
+    await asyncio.gather(*tasks)
+    return flows, window
+
+
+def parse_users(value):
+    users = []
+    for item in value.split(','):
+        if ':' not in item:
+            raise argparse.ArgumentTypeError(f"用户格式应为 用户名:密码，实际为 {item!r}")
+        name, pwd = item.split(':', 1)
+        users.append((name.strip(), pwd))
+    return users
+
+
+def parse_user_limits(value, users):
+    """解析 --user-limit：单个数字表示所有用户相同，或 name=limit,name=limit"""
+    if not value:
+        return {}
+    if '=' not in value:
+        return {name: int(value) for name, _ in users}
+    limits = {}
+    for item in value.split(','):
+        name, limit = item.split('=', 1)
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+def check(results, name, ok, detail):
+    results.append({'check': name, 'passed': ok, 'detail': detail})
+    print(f"  {'✓' if ok else '✗'} {name}: {detail}")
+
+
+def fmt_rate(rate):
+    return f"{rate / 1024:.1f} KB/s"
+
+
+def evaluate(args, flows, window, user_limits):
+    """按层比较实测速率与限速值，返回 (检查结果列表, 统计字典)"""
+    tol = args.tolerance
+    active = [f for f in flows if f.error is None]
+    rates = {f.index: f.rate(window) for f in active}
+    per_user = {}
+    for f in active:
+        per_user.setdefault(f.username, []).append(rates[f.index])
+    user_rates = {u: sum(r) for u, r in per_user.items()}
+    total = sum(user_rates.values())
+
+    checks = []
+    print(f"\n📊 统计窗口 {window:.1f} 秒, 有效流 {len(active)}/{len(flows)}, 总速率 {fmt_rate(total)}")
+
+    # 连接层
+    if args.conn_limit > 0:
+        flow_rates = sorted(rates.values())
+        top = flow_rates[-1] if flow_rates else 0
+        p99 = flow_rates[int(len(flow_rates) * 0.99) - 1] if flow_rates else 0
+        check(checks, '连接层上限', top <= args.conn_limit * (1 + tol),
+              f"最大 {fmt_rate(top)}, P99 {fmt_rate(p99)}, 限速 {fmt_rate(args.conn_limit)}")
+
+    # 用户层
+    for user, rate in sorted(user_rates.items()):
+        limit = user_limits.get(user, 0)
+        flows_of_user = per_user[user]
+        jain = (sum(flows_of_user) ** 2 / (len(flows_of_user) * sum(r * r for r in flows_of_user))
+                if any(flows_of_user) else 1.0)
+        detail = f"{fmt_rate(rate)} ({len(flows_of_user)} 条流, 流间公平指数 {jain:.3f})"
+        if limit > 0:
+            check(checks, f'用户 {user} 上限', rate <= limit * (1 + tol), f"{detail}, 限速 {fmt_rate(limit)}")
+        else:
+            print(f"  · 用户 {user}: {detail}")
+
+    # 全局层与保证份额
+    if args.global_limit > 0:
+        check(checks, '全局上限', total <= args.global_limit * (1 + tol),
+              f"{fmt_rate(total)}, 限速 {fmt_rate(args.global_limit)}")
+
+        demand = 0
+        for user, fs in per_user.items():
+            d = len(fs) * args.conn_limit if args.conn_limit > 0 else float('inf')
+            if user_limits.get(user, 0) > 0:
+                d = min(d, user_limits[user])
+            demand += d
+        if demand >= args.global_limit:
+            check(checks, '全局利用率', total >= args.global_limit * (1 - tol),
+                  f"需求超过全局带宽，实测 {total / args.global_limit * 100:.1f}%")
+
+        share = args.global_limit / max(len(per_user), 1)
+        for user, rate in sorted(user_rates.items()):
+            guarantee = min(share, user_limits.get(user) or share)
+            d = len(per_user[user]) * args.conn_limit if args.conn_limit > 0 else float('inf')
+            if d >= guarantee:
+                check(checks, f'用户 {user} 保证份额', rate >= guarantee * (1 - tol),
+                      f"{fmt_rate(rate)}, 保证 {fmt_rate(guarantee)}")
+
+    stats = {
+        'window': window,
+        'flows': len(flows),
+        'active_flows': len(active),
+        'errors': len(flows) - len(active),
+        'total_rate': total,
+        'user_rates': user_rates,
+        'flow_rate_mean': statistics.mean(rates.values()) if rates else 0,
+        'flow_rate_stdev': statistics.pstdev(rates.values()) if rates else 0,
+    }
+    return checks, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='分层限速准确度测试：全局 / 用户 / 连接三层限速',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('用法:', 1)[1])
+    parser.add_argument('--proxy-host', default='127.0.0.1', help='代理服务器地址 (默认: 127.0.0.1)')
+    parser.add_argument('--proxy-port', type=int, default=1082, help='代理服务器端口 (默认: 1082)')
+    parser.add_argument('--target-host', default='127.0.0.1',
+                        help='bench_target_server.py 所在地址 (默认: 127.0.0.1)')
+    parser.add_argument('--users', type=parse_users, required=True,
+                        help='被测用户，格式 用户名:密码，逗号分隔；流按轮询分配给各用户')
+    parser.add_argument('--flows', type=int, default=1000, help='并发流数量 (默认: 1000)')
+    parser.add_argument('--direction', choices=['source', 'sink'], default='source',
+                        help='source 为下行，sink 为上行 (默认: source)')
+    parser.add_argument('--global-limit', type=int, default=0,
+                        help='proxy 配置的 global_bandwidth_limit，字节/秒，0 为不检查 (默认: 0)')
+    parser.add_argument('--user-limit', default='',
+                        help='用户限速，字节/秒；单个数字表示所有用户，或 name=limit,name=limit')
+    parser.add_argument('--conn-limit', type=int, default=0,
+                        help='proxy 配置的 conn_bandwidth_limit，字节/秒，0 为不检查 (默认: 0)')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的相对误差 (默认: 0.1)')
+    parser.add_argument('-d', '--duration', type=float, default=20, help='统计窗口(秒) (默认: 20)')
+    parser.add_argument('--warmup', type=float, default=5,
+                        help='全部连接建立后等待令牌桶突发耗尽的时间(秒) (默认: 5)')
+    parser.add_argument('--ramp', type=float, default=5, help='建立全部连接所用的时间(秒) (默认: 5)')
+    parser.add_argument('--start-target', action='store_true',
+                        help='在本机子进程中启动 bench_target_server.py')
+    parser.add_argument('-o', '--output', default=None, help='结果 JSON 文件路径')
+    args = parser.parse_args()
+
+    user_limits = parse_user_limits(args.user_limit, args.users)
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    target_process = start_target_process('127.0.0.1') if args.start_target else None
+    print(f"分层限速测试: {args.flows} 条流, {len(args.users)} 个用户, 方向 {args.direction}, "
+          f"统计窗口 {args.duration:g} 秒")
+    start = time.time()
+    try:
+        flows, window = asyncio.run(run_flows(args, args.users))
+    except KeyboardInterrupt:
+        print("\n⏹️  测试被中断")
+        sys.exit(1)
+    finally:
+        if target_process is not None:
+            target_process.terminate()
+
+    errors = [f.error for f in flows if f.error]
+    if errors:
+        print(f"⚠️  {len(errors)} 条流失败，例如: {errors[0]}")
+
+    checks, stats = evaluate(args, flows, window, user_limits)
+    failed = [c for c in checks if not c['passed']]
+    print(f"\n{'✅ 全部检查通过' if not failed else f'❌ {len(failed)} 项检查未通过'}"
+          f" ({len(checks)} 项, 耗时 {time.time() - start:.1f} 秒)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items()},
+                       'checks': checks, 'stats': stats}, f, indent=2, ensure_ascii=False)
+        print(f"✅ 结果已保存到: {args.output}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
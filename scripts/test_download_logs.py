@@ -1,16 +1,35 @@
 #!/usr/bin/env python3
 """
 测试文件下载和清理操作的日志审计功能
+
+大表模式（--large）：向 access_logs / traffic_logs 写入大量测试记录后流式下载导出文件，
+检查首字节时间和导出期间管理服务器的 RSS 是否保持平稳（导出按批读取，内存不随表大小增长）:
+  python3 scripts/test_download_logs.py --large --seed-rows 2000000
+  python3 scripts/test_download_logs.py --large --type traffic --no-gzip
 """
 
+import argparse
 import requests
 import json
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 配置
 API_BASE = "http://localhost:8012/api/v1"
 
+# 数据库配置（大表模式写入测试数据）
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 3306,
+    'user': 'socks5_user',
+    'password': 'socks5_password',
+    'database': 'socks5_db'
+}
+
+# 大表模式写入的记录用这些值标记，测试结束后据此删除
+SEED_USER_AGENT = 'bench-export'
+SEED_CLIENT_IP = '198.51.100.1'
+
 def login_and_get_token():
     """登录并获取token"""
     print("🔐 登录获取token...")
@@ -144,6 +163,148 @@ def check_download_logs(token):
     except Exception as e:
         print(f"❌ 检查日志请求失败: {e}")
 
+def seed_logs(log_type, rows, batch=10000):
+    """向日志表写入测试记录，返回写入的行数"""
+    import pymysql
+
+    conn = pymysql.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM users ORDER BY id LIMIT 100")
+            user_ids = [row[0] for row in cursor.fetchall()]
+            if not user_ids:
+                raise RuntimeError("users 表为空，请先创建用户")
+
+            start = datetime.now() - timedelta(seconds=rows)
+            if log_type == 'traffic':
+                sql = ("INSERT INTO traffic_logs (user_id, client_ip, target_ip, target_port, bytes_sent, "
+                       "bytes_recv, protocol, timestamp, created_at) VALUES (%s, %s, %s, %s, %s, %s, 'tcp', %s, %s)")
+            else:
+                sql = ("INSERT INTO access_logs (user_id, client_ip, target_url, method, status, user_agent, "
+                       "timestamp, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)")
+
+            written = 0
+            while written < rows:
+                values = []
+                for i in range(written, min(written + batch, rows)):
+                    ts = start + timedelta(seconds=i)
+                    user_id = user_ids[i % len(user_ids)]
+                    if log_type == 'traffic':
+                        values.append((user_id, SEED_CLIENT_IP, f"203.0.113.{i % 250 + 1}", 443,
+                                       i % 65536, i % 1048576, ts, ts))
+                    else:
+                        values.append((user_id, SEED_CLIENT_IP, f"https://example.com/page/{i}", 'GET',
+                                       'success', SEED_USER_AGENT, ts, ts))
+                cursor.executemany(sql, values)
+                conn.commit()
+                written += len(values)
+                print(f"\r   已写入 {written:,}/{rows:,} 条", end='', flush=True)
+            print()
+            return written
+    finally:
+        conn.close()
+
+
+def cleanup_seed(log_type):
+    """删除大表模式写入的测试记录"""
+    import pymysql
+
+    conn = pymysql.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            deleted = 0
+            table = 'traffic_logs' if log_type == 'traffic' else 'access_logs'
+            while True:
+                count = cursor.execute(f"DELETE FROM {table} WHERE client_ip = %s LIMIT 50000", (SEED_CLIENT_IP,))
+                conn.commit()
+                deleted += count
+                if count == 0:
+                    break
+            print(f"🧹 已删除 {deleted:,} 条测试记录")
+    finally:
+        conn.close()
+
+
+def test_large_export(token, args):
+    """流式下载导出文件，测量首字节时间、吞吐和服务器 RSS"""
+    from proxy_monitor import ResourceSampler
+
+    headers = {"Authorization": f"Bearer {token}"}
+    if args.no_gzip:
+        headers['Accept-Encoding'] = 'identity'
+    params = {'type': 'traffic'} if args.type == 'traffic' else {}
+
+    sampler = ResourceSampler(args.server_pid, args.server_port, args.monitor_interval,
+                              pprof_url=None, tcp_states=False)
+    sampler.start()
+    time.sleep(args.monitor_interval * 2)  # 先采几个基线样本
+
+    start = time.perf_counter()
+    ttfb = None
+    body_bytes = 0
+    lines = 0
+    with requests.get(f"{API_BASE}/logs/export", headers=headers, params=params,
+                      stream=True, timeout=args.timeout) as response:
+        if response.status_code != 200:
+            sampler.stop()
+            print(f"❌ 导出失败: {response.status_code} - {response.text[:200]}")
+            return False
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        for chunk in response.iter_content(chunk_size=65536):
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            body_bytes += len(chunk)
+            lines += chunk.count(b'\n')
+    elapsed = time.perf_counter() - start
+    samples = sampler.stop()
+
+    rss = [s['rss_mb'] for s in samples if s.get('rss_mb') is not None]
+    baseline = rss[0] if rss else 0
+    growth = max(rss) - baseline if rss else 0
+
+    print(f"\n📊 导出结果 ({args.type}, Content-Encoding: {encoding}):")
+    print(f"   行数(含表头): {lines:,}")
+    print(f"   解压后大小: {body_bytes / 1024 / 1024:.1f} MiB")
+    print(f"   首字节时间: {(ttfb or 0) * 1000:.0f} ms")
+    print(f"   总耗时: {elapsed:.2f} 秒 ({lines / elapsed:,.0f} 行/秒)")
+    print(f"   服务器 RSS: 基线 {baseline:.1f} MiB, 峰值 {max(rss) if rss else 0:.1f} MiB, 增长 {growth:.1f} MiB")
+
+    ok = True
+    if ttfb is None or ttfb > args.max_ttfb:
+        print(f"   ✗ 首字节时间超过 {args.max_ttfb} 秒")
+        ok = False
+    else:
+        print(f"   ✓ 首字节时间 <= {args.max_ttfb} 秒")
+    if growth > args.max_rss_growth:
+        print(f"   ✗ RSS 增长超过 {args.max_rss_growth} MiB，导出可能没有流式处理")
+        ok = False
+    else:
+        print(f"   ✓ RSS 增长 <= {args.max_rss_growth} MiB")
+    return ok
+
+
+def run_large(args):
+    print("=" * 80)
+    print("📥 大表流式导出测试")
+    print("=" * 80)
+
+    token = login_and_get_token()
+    if not token:
+        return
+
+    if args.seed_rows > 0:
+        print(f"\n📝 写入 {args.seed_rows:,} 条测试{'流量' if args.type == 'traffic' else '访问'}日志...")
+        seed_logs(args.type, args.seed_rows)
+
+    try:
+        ok = test_large_export(token, args)
+    finally:
+        if args.seed_rows > 0 and not args.keep_seed:
+            cleanup_seed(args.type)
+
+    print("\n" + ("🎉 大表导出测试通过" if ok else "⚠️ 大表导出测试未通过"))
+
+
 def main():
     print("=" * 80)
     print("📥 文件下载和清理操作日志审计测试")
@@ -186,4 +347,23 @@ def main():
     print("=" * 80)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='测试日志导出、清理操作的审计和大表流式导出')
+    parser.add_argument('--large', action='store_true', help='大表模式：测试流式导出的首字节时间和服务器内存')
+    parser.add_argument('--type', choices=['access', 'traffic'], default='access',
+                        help='导出的日志类型 (默认: access)')
+    parser.add_argument('--seed-rows', type=int, default=0,
+                        help='导出前写入的测试记录数，0 为使用现有数据 (默认: 0)')
+    parser.add_argument('--keep-seed', action='store_true', help='测试结束后保留写入的测试记录')
+    parser.add_argument('--no-gzip', action='store_true', help='不请求 gzip 压缩')
+    parser.add_argument('--server-port', type=int, default=8012, help='管理服务器端口，用于查找进程 (默认: 8012)')
+    parser.add_argument('--server-pid', type=int, default=None, help='管理服务器进程 PID (默认: 按端口查找)')
+    parser.add_argument('--monitor-interval', type=float, default=0.5, help='RSS 采样间隔(秒) (默认: 0.5)')
+    parser.add_argument('--max-ttfb', type=float, default=1.0, help='首字节时间上限(秒) (默认: 1.0)')
+    parser.add_argument('--max-rss-growth', type=float, default=64, help='导出期间 RSS 增长上限(MiB) (默认: 64)')
+    parser.add_argument('--timeout', type=float, default=600, help='下载超时(秒) (默认: 600)')
+    args = parser.parse_args()
+
+    if args.large:
+        run_large(args)
+    else:
+        main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查日志列表查询的执行计划（EXPLAIN）
+
+管理后台的历史流量、流量日志、访问日志列表按 (timestamp, id) 游标分页，
+用户名先解析为 user_id，目标IP按前缀匹配。本脚本确认：
+- 服务器启动时的自动迁移已经创建了对应的索引
+- 这些查询的执行计划使用预期的索引，没有全表扫描，分页查询没有 filesort
+- 日志表已按天分区，按时间范围的查询只访问范围内的分区
+
+表中数据很少时 MySQL 可能认为全表扫描更快，此时只给出警告。可以先用
+  python3 scripts/test_download_logs.py --large --type traffic --seed-rows 200000 --keep-seed
+写入测试数据后再运行。
+
+用法:
+  python3 scripts/test_query_plans.py
+  python3 scripts/test_query_plans.py --min-rows 100000
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+import pymysql
+
+# 数据库配置
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 3306,
+    'user': 'socks5_user',
+    'password': 'socks5_password',
+    'database': 'socks5_db'
+}
+
+# 迁移应创建的索引：表 -> {索引名: 列}
+EXPECTED_INDEXES = {
+    'traffic_logs': {
+        'idx_traffic_timestamp': ['timestamp'],
+        'idx_traffic_user_timestamp': ['user_id', 'timestamp'],
+        'idx_traffic_target_timestamp': ['target_ip', 'timestamp'],
+    },
+    'access_logs': {
+        'idx_access_timestamp': ['timestamp'],
+        'idx_access_user_timestamp': ['user_id', 'timestamp'],
+    },
+}
+
+TRAFFIC_ORDER = "ORDER BY traffic_logs.timestamp DESC, traffic_logs.id DESC LIMIT 20"
+ACCESS_ORDER = "ORDER BY access_logs.timestamp DESC, access_logs.id DESC LIMIT 20"
+
+
+def plan_cases(user_id, cursor_time, cursor_id):
+    """与 internal/api/pagination.go 生成的 SQL 对应的查询"""
+    since = cursor_time - timedelta(days=1)
+    return [
+        {
+            'name': '流量日志首页',
+            'table': 'traffic_logs',
+            'sql': f"SELECT * FROM traffic_logs {TRAFFIC_ORDER}",
+            'params': (),
+            'keys': ['idx_traffic_timestamp'],
+        },
+        {
+            'name': '流量日志游标翻页',
+            'table': 'traffic_logs',
+            'sql': ("SELECT * FROM traffic_logs WHERE traffic_logs.timestamp <= %s AND "
+                    f"(traffic_logs.timestamp < %s OR traffic_logs.id < %s) {TRAFFIC_ORDER}"),
+            'params': (cursor_time, cursor_time, cursor_id),
+            'keys': ['idx_traffic_timestamp'],
+        },
+        {
+            'name': '流量日志按用户过滤',
+            'table': 'traffic_logs',
+            'sql': f"SELECT * FROM traffic_logs WHERE traffic_logs.user_id IN (%s) {TRAFFIC_ORDER}",
+            'params': (user_id,),
+            'keys': ['idx_traffic_user_timestamp'],
+        },
+        {
+            'name': '流量日志按时间范围',
+            'table': 'traffic_logs',
+            'sql': f"SELECT * FROM traffic_logs WHERE traffic_logs.timestamp BETWEEN %s AND %s {TRAFFIC_ORDER}",
+            'params': (since, cursor_time),
+            'keys': ['idx_traffic_timestamp'],
+        },
+        {
+            # 前缀范围较大时优化器可能沿时间索引倒序扫描以避免排序，两种都可以接受
+            'name': '流量日志按目标IP前缀',
+            'table': 'traffic_logs',
+            'sql': f"SELECT * FROM traffic_logs WHERE traffic_logs.target_ip LIKE %s {TRAFFIC_ORDER}",
+            'params': ('203.0.113.%',),
+            'keys': ['idx_traffic_target_timestamp', 'idx_traffic_timestamp'],
+            'allow_filesort': True,
+        },
+        {
+            'name': '访问日志首页',
+            'table': 'access_logs',
+            'sql': f"SELECT * FROM access_logs {ACCESS_ORDER}",
+            'params': (),
+            'keys': ['idx_access_timestamp'],
+        },
+        {
+            'name': '访问日志游标翻页',
+            'table': 'access_logs',
+            'sql': ("SELECT * FROM access_logs WHERE access_logs.timestamp <= %s AND "
+                    f"(access_logs.timestamp < %s OR access_logs.id < %s) {ACCESS_ORDER}"),
+            'params': (cursor_time, cursor_time, cursor_id),
+            'keys': ['idx_access_timestamp'],
+        },
+        {
+            'name': '访问日志按用户过滤',
+            'table': 'access_logs',
+            'sql': f"SELECT * FROM access_logs WHERE access_logs.user_id IN (%s) {ACCESS_ORDER}",
+            'params': (user_id,),
+            'keys': ['idx_access_user_timestamp'],
+        },
+        {
+            'name': '实时流量（分钟汇总）',
+            'table': 'traffic_rollup_minutes',
+            'sql': ("SELECT bucket, SUM(bytes_sent), SUM(bytes_recv) FROM traffic_rollup_minutes "
+                    "WHERE bucket >= %s GROUP BY bucket ORDER BY bucket"),
+            'params': (datetime.now() - timedelta(hours=1),),
+            'keys': ['PRIMARY'],
+            'allow_filesort': True,
+        },
+    ]
+
+
+def check_indexes(cursor):
+    """确认迁移创建的索引存在且列顺序正确，返回失败数"""
+    failures = 0
+    print("\n🔍 检查索引...")
+    for table, indexes in EXPECTED_INDEXES.items():
+        cursor.execute(f"SHOW INDEX FROM {table}")
+        actual = {}
+        for row in cursor.fetchall():
+            actual.setdefault(row['Key_name'], []).append((row['Seq_in_index'], row['Column_name']))
+        for name, columns in indexes.items():
+            got = [column for _, column in sorted(actual.get(name, []))]
+            if got == columns:
+                print(f"  ✓ {table}.{name} ({', '.join(columns)})")
+            else:
+                print(f"  ✗ {table}.{name}: 期望 ({', '.join(columns)})，实际 {got or '不存在'}")
+                failures += 1
+    return failures
+
+
+def explain(cursor, case):
+    cursor.execute("EXPLAIN " + case['sql'], case['params'])
+    return cursor.fetchall()
+
+
+def check_plans(cursor, table_rows, min_rows):
+    """检查每个查询的执行计划，返回 (失败数, 警告数)"""
+    cursor.execute("SELECT COALESCE(MIN(user_id), 1) AS user_id FROM traffic_logs")
+    user_id = cursor.fetchone()['user_id']
+    cursor.execute("SELECT id, timestamp FROM traffic_logs ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET 1000")
+    row = cursor.fetchone() or {'id': 1, 'timestamp': datetime.now()}
+
+    failures = warnings = 0
+    print("\n🔍 检查执行计划...")
+    for case in plan_cases(user_id, row['timestamp'], row['id']):
+        plan = explain(cursor, case)[0]
+        key = plan.get('key')
+        access = plan.get('type')
+        extra = plan.get('Extra') or ''
+
+        problems = []
+        if access == 'ALL':
+            problems.append('全表扫描')
+        if key not in case['keys']:
+            problems.append(f"使用索引 {key}，期望 {' 或 '.join(case['keys'])}")
+        if 'Using filesort' in extra and not case.get('allow_filesort'):
+            problems.append('需要 filesort')
+
+        summary = f"type={access}, key={key}, rows={plan.get('rows')}"
+        if not problems:
+            print(f"  ✓ {case['name']}: {summary}")
+        elif table_rows.get(case['table'], 0) < min_rows:
+            print(f"  ⚠️  {case['name']}: {'; '.join(problems)} ({summary})")
+            print(f"      {case['table']} 只有 {table_rows.get(case['table'], 0)} 行，优化器可能选择全表扫描")
+            warnings += 1
+        else:
+            print(f"  ✗ {case['name']}: {'; '.join(problems)} ({summary})")
+            failures += 1
+    return failures, warnings
+
+
+def check_partitions(cursor):
+    """确认日志表按天分区，最近一天的查询只访问少数分区，返回 (失败数, 警告数)"""
+    failures = warnings = 0
+    print("\n🔍 检查按天分区...")
+    since = datetime.now() - timedelta(days=1)
+    for table in ('traffic_logs', 'access_logs'):
+        cursor.execute("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                       "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL", (table,))
+        partitions = [row['PARTITION_NAME'] for row in cursor.fetchall()]
+        if not partitions:
+            print(f"  ⚠️  {table} 未分区（服务端启动时自动转换，大表需调大 log_partition_convert_max_rows）")
+            warnings += 1
+            continue
+
+        cursor.execute(f"EXPLAIN SELECT * FROM {table} WHERE {table}.timestamp >= %s", (since,))
+        used = (cursor.fetchone().get('partitions') or '').split(',')
+        if len(used) < len(partitions):
+            print(f"  ✓ {table}: {len(partitions)} 个分区，最近一天的查询访问 {', '.join(used)}")
+        else:
+            print(f"  ✗ {table}: {len(partitions)} 个分区，最近一天的查询没有裁剪分区")
+            failures += 1
+    return failures, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查日志列表查询的执行计划')
+    parser.add_argument('--min-rows', type=int, default=10000,
+                        help='表行数低于此值时执行计划不符合预期只给出警告 (默认: 10000)')
+    parser.add_argument('--no-analyze', action='store_true', help='不执行 ANALYZE TABLE 更新统计信息')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("📋 日志列表查询执行计划检查")
+    print("=" * 80)
+
+    try:
+        conn = pymysql.connect(**DB_CONFIG, cursorclass=pymysql.cursors.DictCursor)
+    except Exception as e:
+        print(f"❌ 连接数据库失败: {e}")
+        sys.exit(1)
+
+    try:
+        with conn.cursor() as cursor:
+            table_rows = {}
+            for table in ('traffic_logs', 'access_logs', 'traffic_rollup_minutes'):
+                if not args.no_analyze:
+                    cursor.execute(f"ANALYZE TABLE {table}")
+                    cursor.fetchall()
+                cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+                table_rows[table] = cursor.fetchone()['n']
+                print(f"  {table}: {table_rows[table]:,} 行")
+
+            failures = check_indexes(cursor)
+            plan_failures, warnings = check_plans(cursor, table_rows, args.min_rows)
+            failures += plan_failures
+            partition_failures, partition_warnings = check_partitions(cursor)
+            failures += partition_failures
+            warnings += partition_warnings
+    finally:
+        conn.close()
+
+    print("\n" + "=" * 80)
+    if failures:
+        print(f"❌ {failures} 项检查未通过")
+        sys.exit(1)
+    if warnings:
+        print(f"⚠️  检查通过，但有 {warnings} 项警告")
+    else:
+        print("✅ 所有索引和执行计划检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -31,10 +31,13 @@ def test_realtime_traffic():
         print("\n📈 测试实时流量监控...")
         for i in range(3):
             print(f"\n第 {i+1} 次测试:")
+            start = time.time()
             response = requests.get(f"{base_url}/api/v1/traffic/realtime", headers=headers)
+            elapsed_ms = (time.time() - start) * 1000
             if response.status_code == 200:
                 data = response.json()
-                realtime_data = data.get('realtime_traffic', [])
+                realtime_data = data.get('realtime_traffic') or []
+                print(f"   响应时间: {elapsed_ms:.1f} ms（读取分钟汇总表，不随原始日志量增长）")
                 print(f"   数据点数量: {len(realtime_data)}")
                 if realtime_data:
                     # 显示最新的几个数据点
@@ -43,7 +46,8 @@ def test_realtime_traffic():
                         timestamp = item.get('timestamp', 'N/A')
                         bytes_sent = item.get('bytes_sent', 0)
                         bytes_recv = item.get('bytes_recv', 0)
-                        print(f"   数据点 {len(realtime_data)-len(latest_data)+j+1}: {timestamp} - 发送: {bytes_sent}, 接收: {bytes_recv}")
+                        connections = item.get('connections', 0)
+                        print(f"   数据点 {len(realtime_data)-len(latest_data)+j+1}: {timestamp} - 发送: {bytes_sent}, 接收: {bytes_recv}, 新连接: {connections}")
                 else:
                     print("   无实时数据")
             else:
@@ -1,60 +1,195 @@
 #!/usr/bin/env python3
 """
 测试流量统计显示
+
+延迟模式（--requests）：连续请求 /api/v1/traffic，检查响应延迟。仪表盘统计由服务端从
+累计计数器和代理心跳生成并短时缓存，延迟不应随 traffic_logs 的行数增长。可以先写入
+大量测试日志再测量:
+  python3 scripts/test_traffic_stats.py --seed-rows 10000000 --requests 2000
+  python3 scripts/test_traffic_stats.py --requests 2000 --max-p99-ms 5
 """
 
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
 import requests
-import json
 
-def test_traffic_stats():
-    """测试流量统计"""
-    base_url = "http://localhost:8012"
-    
-    # 测试登录
+from latency_histogram import LatencyHistogram
+
+# 数据库配置（写入测试数据）
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 3306,
+    'user': 'socks5_user',
+    'password': 'socks5_password',
+    'database': 'socks5_db'
+}
+
+# 写入的测试记录用这个客户端IP标记，测试结束后据此删除
+SEED_CLIENT_IP = '198.51.100.2'
+
+
+def seed_traffic_logs(rows, batch=10000):
+    """把带标记的测试流量日志补足到rows条，已有的测试记录会被复用"""
+    import pymysql
+
+    conn = pymysql.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM users ORDER BY id LIMIT 100")
+            user_ids = [row[0] for row in cursor.fetchall()]
+            if not user_ids:
+                raise RuntimeError("users 表为空，请先创建用户")
+
+            cursor.execute("SELECT COUNT(*) FROM traffic_logs WHERE client_ip = %s", (SEED_CLIENT_IP,))
+            written = cursor.fetchone()[0]
+            if written >= rows:
+                print(f"   已有 {written:,} 条测试记录，跳过写入")
+                return written
+
+            sql = ("INSERT INTO traffic_logs (user_id, client_ip, target_ip, target_port, bytes_sent, "
+                   "bytes_recv, protocol, timestamp, created_at) VALUES (%s, %s, %s, %s, %s, %s, 'tcp', %s, %s)")
+            start = datetime.now() - timedelta(seconds=rows)
+            while written < rows:
+                values = []
+                for i in range(written, min(written + batch, rows)):
+                    ts = start + timedelta(seconds=i)
+                    values.append((user_ids[i % len(user_ids)], SEED_CLIENT_IP, f"203.0.113.{i % 250 + 1}", 443,
+                                   i % 65536, i % 1048576, ts, ts))
+                cursor.executemany(sql, values)
+                conn.commit()
+                written += len(values)
+                print(f"\r   已写入 {written:,}/{rows:,} 条", end='', flush=True)
+            print()
+            return written
+    finally:
+        conn.close()
+
+
+def cleanup_seed():
+    """删除写入的测试记录"""
+    import pymysql
+
+    conn = pymysql.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            deleted = 0
+            while True:
+                count = cursor.execute("DELETE FROM traffic_logs WHERE client_ip = %s LIMIT 50000", (SEED_CLIENT_IP,))
+                conn.commit()
+                deleted += count
+                if count == 0:
+                    break
+            print(f"🧹 已删除 {deleted:,} 条测试记录")
+    finally:
+        conn.close()
+
+
+def login(base_url):
+    """登录并返回token，失败时返回None"""
     login_data = {
         "username": "admin",
         "password": "admin"
     }
-    
+
     print("🔐 登录...")
     response = requests.post(f"{base_url}/api/v1/auth/login", json=login_data)
-    
-    if response.status_code == 200:
-        data = response.json()
-        token = data.get('token')
-        print(f"✅ 登录成功")
-        
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        # 测试流量统计 API
-        print("\n📊 测试流量统计...")
-        response = requests.get(f"{base_url}/api/v1/traffic", headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            stats = data.get('stats', {})
-            
-            print(f"   总发送流量: {stats.get('total_bytes_sent', 0):,} 字节")
-            print(f"   总接收流量: {stats.get('total_bytes_recv', 0):,} 字节")
-            print(f"   活跃连接: {stats.get('active_connections', 0)}")
-            print(f"   在线用户: {stats.get('online_users', 0)}")
-            print(f"   总用户数: {stats.get('total_users', 0)}")
-            
-            # 检查数据是否不为0
-            if stats.get('total_bytes_sent', 0) > 0:
-                print("   ✅ 总发送流量数据正常")
-            else:
-                print("   ❌ 总发送流量为0")
-                
-            if stats.get('total_bytes_recv', 0) > 0:
-                print("   ✅ 总接收流量数据正常")
-            else:
-                print("   ❌ 总接收流量为0")
-        else:
-            print(f"   ❌ API 调用失败: {response.status_code}")
-            print(f"   响应: {response.text}")
-    
-    else:
+    if response.status_code != 200:
         print(f"❌ 登录失败: {response.status_code}")
+        return None
+    print(f"✅ 登录成功")
+    return response.json().get('token')
+
+
+def test_traffic_stats(base_url, headers):
+    """测试流量统计"""
+    print("\n📊 测试流量统计...")
+    response = requests.get(f"{base_url}/api/v1/traffic", headers=headers)
+    if response.status_code != 200:
+        print(f"   ❌ API 调用失败: {response.status_code}")
+        print(f"   响应: {response.text}")
+        return False
+
+    stats = response.json().get('stats', {})
+    print(f"   总发送流量: {stats.get('total_bytes_sent', 0):,} 字节")
+    print(f"   总接收流量: {stats.get('total_bytes_recv', 0):,} 字节")
+    print(f"   活跃连接: {stats.get('active_connections', 0)}")
+    print(f"   在线用户: {stats.get('online_users', 0)}")
+    print(f"   总用户数: {stats.get('total_users', 0)}")
+
+    # 检查数据是否不为0
+    if stats.get('total_bytes_sent', 0) > 0:
+        print("   ✅ 总发送流量数据正常")
+    else:
+        print("   ❌ 总发送流量为0")
+
+    if stats.get('total_bytes_recv', 0) > 0:
+        print("   ✅ 总接收流量数据正常")
+    else:
+        print("   ❌ 总接收流量为0")
+    return True
+
+
+def test_latency(base_url, headers, count, max_p99_ms):
+    """连续请求统计接口，P99延迟超过max_p99_ms时返回False"""
+    print(f"\n⏱️  测量统计接口延迟（{count} 次请求）...")
+    session = requests.Session()
+    session.headers.update(headers)
+
+    # 第一次请求同步加载统计，不计入延迟
+    session.get(f"{base_url}/api/v1/traffic").raise_for_status()
+
+    histogram = LatencyHistogram()
+    for _ in range(count):
+        start = time.perf_counter()
+        response = session.get(f"{base_url}/api/v1/traffic")
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        histogram.record(elapsed)
+
+    p = histogram.percentiles((50, 99))
+    print(f"   P50: {p[50] * 1000:.3f}ms  P99: {p[99] * 1000:.3f}ms  最大: {histogram.max * 1000:.3f}ms")
+    print("   （客户端测量，包含HTTP往返和JSON解析的开销）")
+    if p[99] * 1000 > max_p99_ms:
+        print(f"   ❌ P99 延迟超过 {max_p99_ms}ms")
+        return False
+    print(f"   ✅ P99 延迟不超过 {max_p99_ms}ms")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试流量统计显示和接口延迟')
+    parser.add_argument('--base-url', default='http://localhost:8012', help='管理服务器地址 (默认: http://localhost:8012)')
+    parser.add_argument('--seed-rows', type=int, default=0,
+                        help='测量前把 traffic_logs 中的测试记录补足到该行数，如 10000000 (默认: 0，不写入)')
+    parser.add_argument('--keep-seed', action='store_true', help='测试结束后保留写入的测试记录')
+    parser.add_argument('--requests', type=int, default=0, help='测量延迟的请求次数 (默认: 0，不测量)')
+    parser.add_argument('--max-p99-ms', type=float, default=5.0, help='允许的P99延迟（毫秒） (默认: 5.0)')
+    args = parser.parse_args()
+
+    if args.seed_rows > 0:
+        print(f"📝 写入测试流量日志（{args.seed_rows:,} 条）...")
+        seed_traffic_logs(args.seed_rows)
+
+    ok = True
+    try:
+        token = login(args.base_url)
+        if token is None:
+            sys.exit(1)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        ok = test_traffic_stats(args.base_url, headers)
+        if ok and args.requests > 0:
+            ok = test_latency(args.base_url, headers, args.requests, args.max_p99_ms)
+    finally:
+        if args.seed_rows > 0 and not args.keep_seed:
+            cleanup_seed()
+
+    if not ok:
+        sys.exit(1)
+
 
 if __name__ == '__main__':
-    test_traffic_stats()
+    main()